@@ -9,8 +9,13 @@ from .layers.attention.config import CrossAttentionConfig, SelfAttentionConfig
 from .layers.mlp.config import MLPConfig
 from .nets.conditional_lgatr import ConditionalLGATr
 from .nets.conditional_lgatr_slim import ConditionalLGATrSlim
+from .nets.cost_model import cost_model
+from .nets.export import aot_compile, export_model, load_aot_package
+from .nets.inference import optimize_for_inference
 from .nets.lgatr import LGATr
 from .nets.lgatr_slim import LGATrSlim
+from .nets.quantization import quantize_for_inference
+from .nets.small_set import optimize_for_small_sets
 from .primitives.config import gatr_config
 
 __version__ = _pkg_version("lgatr")
@@ -0,0 +1,4 @@
+from .cases import BenchmarkCase, all_cases, build_network, network_cases, primitive_cases
+from .crossover import attention_crossover
+from .runner import compare, load_results, run_benchmarks, save_results
+from .timing import measure, output_errors, peak_memory, timed_forward
@@ -0,0 +1,73 @@
+"""Command line interface of the benchmark suite, ``python -m lgatr.bench --help``."""
+
+import argparse
+import sys
+
+from .crossover import attention_crossover
+from .runner import compare, load_results, run_benchmarks, save_results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m lgatr.bench",
+        description="Time and memory-profile the L-GATr primitives and networks.",
+    )
+    parser.add_argument("-k", "--pattern", help="only run cases matching this fnmatch pattern")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--quick", action="store_true", help="small grid of shapes")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--no-memory", action="store_true", help="skip the memory measurement")
+    parser.add_argument(
+        "--crossover",
+        action="store_true",
+        help="only time softmax against linear attention over the number of items",
+    )
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="relative increase of time or memory that counts as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    if args.crossover:
+        result = attention_crossover(
+            device=args.device, num_warmup=args.warmup, num_repeats=args.repeats, verbose=True
+        )
+        print(f"Linear attention is faster from {result['crossover']} items on")
+        return 0
+    results = run_benchmarks(
+        device=args.device,
+        quick=args.quick,
+        pattern=args.pattern,
+        num_warmup=args.warmup,
+        num_repeats=args.repeats,
+        memory=not args.no_memory,
+        verbose=True,
+    )
+    if args.output is not None:
+        save_results(results, args.output)
+    if args.baseline is None:
+        return 0
+
+    comparisons = compare(results, load_results(args.baseline), args.threshold)
+    regressions = [c for c in comparisons if c["regression"]]
+    missing = [c for c in comparisons if c["missing"]]
+    print(f"\nCompared {len(comparisons) - len(missing)} metrics with {args.baseline}")
+    for c in missing:
+        print(f"MISSING {c['name']} {c['metric']}: not in the baseline")
+    for c in regressions:
+        print(
+            f"REGRESSION {c['name']} {c['metric']}: "
+            f"{c['baseline']:.4g} -> {c['current']:.4g} ({c['ratio']:.2f}x)"
+        )
+    if not regressions:
+        print(f"No regressions above {100 * args.threshold:.0f}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""Benchmark cases for the primitives and the networks."""
+
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Any
+
+import torch
+from torch import nn
+
+from ..nets import ConditionalLGATr, ConditionalLGATrSlim, LGATr, LGATrSlim
+from ..primitives.attention import linear_sdp_attention, sdp_attention
+from ..primitives.attention_backends import available_backends
+from ..primitives.bilinear import geometric_product
+from ..primitives.dropout import grade_dropout
+from ..primitives.invariants import inner_product
+from ..primitives.linear import equi_linear
+from ..primitives.normalization import equi_layer_norm
+from ..utils.batching import padding_attention_kwargs
+
+NETWORKS = dict(
+    LGATr=LGATr,
+    ConditionalLGATr=ConditionalLGATr,
+    LGATrSlim=LGATrSlim,
+    ConditionalLGATrSlim=ConditionalLGATrSlim,
+)
+
+# (items, channels, batch) of the primitives and the networks
+PRIMITIVE_GRID = dict(items=(64, 256), channels=(16,), batch=(8,))
+NETWORK_GRID = dict(items=(16, 64), channels=(16, 32), batch=(1, 8))
+QUICK_PRIMITIVE_GRID = dict(items=(32,), channels=(8,), batch=(2,))
+QUICK_NETWORK_GRID = dict(items=(16,), channels=(8,), batch=(2,))
+
+
+@dataclass
+class BenchmarkCase:
+    """Single benchmark.
+
+    Attributes
+    ----------
+    name : str
+        Unique name, e.g. ``"primitives/equi_linear/items=64,channels=16,batch=8"``.
+    setup : Callable
+        Allocates the inputs and returns the function without arguments that is measured.
+    params : dict
+        Parameters of the case, stored with the results.
+    """
+
+    name: str
+    setup: Callable[[], Callable[[], Any]]
+    params: dict[str, Any] = field(default_factory=dict)
+
+
+def attention_backends(device: torch.device | str = "cpu") -> list[str]:
+    """Attention backends that can be benchmarked on ``device``."""
+    device = torch.device(device)
+    available = available_backends()
+    backends = [name for name in ("native", "flex") if name in available]
+    if device.type == "cuda":
+        backends += [name for name in ("varlen", "xformers", "flash") if name in available]
+    return backends
+
+
+def primitive_cases(device: torch.device | str = "cpu", quick: bool = False) -> list[BenchmarkCase]:
+    """Benchmark cases for ``equi_linear``, ``geometric_product``, ``inner_product``,
+    ``equi_layer_norm``, ``grade_dropout``, ``linear_sdp_attention`` and ``sdp_attention`` with
+    each attention backend."""
+    grid = QUICK_PRIMITIVE_GRID if quick else PRIMITIVE_GRID
+    cases = []
+    for items, channels, batch in _grid(grid):
+        params = dict(items=items, channels=channels, batch=batch)
+        suffix = _suffix(params)
+
+        def mv(*shape, params=params):
+            return torch.randn(params["batch"], params["items"], *shape, 16, device=device)
+
+        cases += [
+            BenchmarkCase(
+                f"primitives/equi_linear/{suffix}",
+                lambda mv=mv, c=channels: _bind(
+                    equi_linear, mv(c), torch.randn(c, c, 10, device=device)
+                ),
+                params,
+            ),
+            BenchmarkCase(
+                f"primitives/geometric_product/{suffix}",
+                lambda mv=mv, c=channels: _bind(geometric_product, mv(c), mv(c)),
+                params,
+            ),
+            BenchmarkCase(
+                f"primitives/inner_product/{suffix}",
+                lambda mv=mv, c=channels: _bind(inner_product, mv(c), mv(c)),
+                params,
+            ),
+            BenchmarkCase(
+                f"primitives/equi_layer_norm/{suffix}",
+                lambda mv=mv, c=channels: _bind(equi_layer_norm, mv(c)),
+                params,
+            ),
+            BenchmarkCase(
+                f"primitives/grade_dropout/{suffix}",
+                lambda mv=mv, c=channels: _bind(grade_dropout, mv(c), p=0.1),
+                params,
+            ),
+            BenchmarkCase(
+                f"primitives/linear_sdp_attention/{suffix}",
+                lambda params=params: _attention("linear", device, **params),
+                params,
+            ),
+        ]
+        for backend in attention_backends(device):
+            cases.append(
+                BenchmarkCase(
+                    f"primitives/sdp_attention[{backend}]/{suffix}",
+                    lambda backend=backend, params=params: _attention(backend, device, **params),
+                    dict(params, backend=backend),
+                )
+            )
+    return cases
+
+
+def build_network(
+    name: str, channels: int, num_blocks: int = 2, num_heads: int = 4, **kwargs
+) -> nn.Module:
+    """Network with ``channels`` hidden multivector/vector and scalar channels, as used in the
+    benchmarks.
+
+    Parameters
+    ----------
+    name : str
+        ``"LGATr"``, ``"ConditionalLGATr"``, ``"LGATrSlim"`` or ``"ConditionalLGATrSlim"``.
+    channels : int
+        Number of hidden multivector (or vector) and scalar channels.
+    num_blocks : int
+        Number of blocks.
+    num_heads : int
+        Number of attention heads.
+    **kwargs
+        Further arguments of the network.
+
+    Returns
+    -------
+    torch.nn.Module
+    """
+    if name in ("LGATr", "ConditionalLGATr"):
+        options = dict(
+            num_blocks=num_blocks,
+            in_mv_channels=1,
+            out_mv_channels=1,
+            hidden_mv_channels=channels,
+            in_s_channels=4,
+            out_s_channels=1,
+            hidden_s_channels=channels,
+            attention=dict(num_heads=num_heads),
+            mlp=dict(),
+        )
+        if name == "ConditionalLGATr":
+            options.update(
+                condition_mv_channels=1,
+                condition_s_channels=4,
+                crossattention=dict(num_heads=num_heads),
+            )
+    else:
+        options = dict(
+            in_v_channels=1,
+            out_v_channels=1,
+            hidden_v_channels=channels,
+            in_s_channels=4,
+            out_s_channels=1,
+            hidden_s_channels=channels,
+            num_blocks=num_blocks,
+            num_heads=num_heads,
+        )
+        if name == "ConditionalLGATrSlim":
+            options.update(condition_v_channels=1, condition_s_channels=4)
+    options.update(kwargs)
+    return NETWORKS[name](**options)
+
+
+def network_inputs(
+    name: str, batch: int, items: int, device: torch.device | str = "cpu"
+) -> tuple[tuple, dict]:
+    """Random inputs for ``build_network(name, ...)`` with shape (batch, items, ...), the
+    condition of the conditional networks has ``items`` items as well."""
+    vector_dim = 16 if name in ("LGATr", "ConditionalLGATr") else 4
+
+    def inputs():
+        return (
+            torch.randn(batch, items, 1, vector_dim, device=device),
+            torch.randn(batch, items, 4, device=device),
+        )
+
+    x, s = inputs()
+    if name == "LGATr":
+        return (x,), dict(scalars=s)
+    if name == "LGATrSlim":
+        return (x, s), {}
+    x_c, s_c = inputs()
+    if name == "ConditionalLGATr":
+        return (x, x_c), dict(scalars=s, scalars_condition=s_c)
+    return (x, x_c, s, s_c), {}
+
+
+def network_cases(device: torch.device | str = "cpu", quick: bool = False) -> list[BenchmarkCase]:
+    """Benchmark cases for the forward and the forward+backward pass of all networks."""
+    grid = QUICK_NETWORK_GRID if quick else NETWORK_GRID
+    cases = []
+    for name in NETWORKS:
+        for items, channels, batch in _grid(grid):
+            params = dict(items=items, channels=channels, batch=batch)
+            for backward in (False, True):
+                mode = "backward" if backward else "forward"
+                cases.append(
+                    BenchmarkCase(
+                        f"nets/{name}/{_suffix(params)}/{mode}",
+                        lambda name=name, params=params, backward=backward: _network(
+                            name, device, backward, **params
+                        ),
+                        dict(params, network=name, mode=mode),
+                    )
+                )
+    return cases
+
+
+def all_cases(device: torch.device | str = "cpu", quick: bool = False) -> list[BenchmarkCase]:
+    """All benchmark cases."""
+    return primitive_cases(device, quick) + network_cases(device, quick)
+
+
+def _grid(grid: dict[str, tuple]) -> Iterator[tuple]:
+    return product(grid["items"], grid["channels"], grid["batch"])
+
+
+def _suffix(params: dict[str, Any]) -> str:
+    return ",".join(f"{key}={value}" for key, value in params.items())
+
+
+def _bind(fn, *args, **kwargs) -> Callable[[], Any]:
+    @torch.no_grad()
+    def call():
+        return fn(*args, **kwargs)
+
+    return call
+
+
+def _identity_score(score, batch, head, q_index, kv_index):
+    return score
+
+
+def _attention(backend, device, items, channels, batch) -> Callable[[], Any]:
+    """``sdp_attention`` with 4 heads, selected through the keyword arguments of ``backend``,
+    or ``linear_sdp_attention`` for the backend ``"linear"``."""
+    heads = 4
+    shape = (batch, heads, items)
+    attn_kwargs = {}
+    if backend in ("varlen", "flash"):
+        shape = (1, heads, batch * items)
+        offsets = torch.arange(0, batch * items + 1, items, dtype=torch.int32, device=device)
+        names = ("cu_seq_q", "cu_seq_k", "max_q", "max_k")
+        if backend == "flash":
+            names = ("cu_seqlens_q", "cu_seqlens_k", "max_seqlen_q", "max_seqlen_k")
+        attn_kwargs = dict(zip(names, (offsets, offsets, items, items), strict=True))
+    elif backend == "flex":
+        attn_kwargs = dict(score_mod=_identity_score)
+    elif backend == "xformers":
+        attn_kwargs = padding_attention_kwargs(
+            [items] * batch, backend="xformers", num_heads=heads, device=device
+        )
+    mv = [torch.randn(*shape, channels, 16, device=device) for _ in range(3)]
+    s = [torch.randn(*shape, channels, device=device) for _ in range(3)]
+    if backend == "linear":
+        return _bind(linear_sdp_attention, *mv, *s)
+    return _bind(sdp_attention, *mv, *s, **attn_kwargs)
+
+
+def _network(name, device, backward, items, channels, batch) -> Callable[[], Any]:
+    torch.manual_seed(0)
+    net = build_network(name, channels).to(device)
+    args, kwargs = network_inputs(name, batch, items, device)
+    if not backward:
+        net.eval()
+        return _bind(net, *args, **kwargs)
+
+    def call():
+        net.zero_grad(set_to_none=True)
+        outputs = net(*args, **kwargs)
+        sum(out.sum() for out in outputs if out is not None).backward()
+
+    return call
@@ -0,0 +1,76 @@
+"""Crossover between softmax attention and linear attention."""
+
+from collections.abc import Sequence
+from functools import partial
+from typing import Any
+
+import torch
+
+from ..primitives.attention import linear_sdp_attention, sdp_attention
+from .timing import measure
+
+CROSSOVER_ITEMS = (100, 1000, 5000, 20000)
+
+
+def attention_crossover(
+    items: Sequence[int] = CROSSOVER_ITEMS,
+    channels: int = 4,
+    heads: int = 4,
+    batch: int = 1,
+    device: torch.device | str = "cpu",
+    num_warmup: int = 1,
+    num_repeats: int = 3,
+    verbose: bool = False,
+) -> dict[str, Any]:
+    """Times ``sdp_attention`` and ``linear_sdp_attention`` over the number of items.
+
+    Each head attends with ``17 channels`` features of the multivector and scalar channels.
+    Softmax attention costs ``O(items^2 channels)`` operations, while linear attention costs
+    ``O(items channels^3)`` because of the quadratic features of
+    ``linear_scaled_dot_product_attention``, so linear attention only pays off above a number
+    of items that grows quadratically with the channels. The softmax uses the default
+    attention backend of ``device``.
+
+    Parameters
+    ----------
+    items : Sequence of int
+        Numbers of items, with the same number of queries and keys.
+    channels : int
+        Number of multivector and scalar channels of each head.
+    heads : int
+        Number of attention heads.
+    batch : int
+        Batch size.
+    device : torch.device or str
+        Device of the benchmark.
+    num_warmup : int
+        Number of calls before the timing starts.
+    num_repeats : int
+        Number of timed samples, see ``lgatr.bench.timing.measure``.
+    verbose : bool
+        Whether to print each result.
+
+    Returns
+    -------
+    dict
+        ``items``, the median times ``softmax`` and ``linear`` in seconds for each number of
+        items, and ``crossover``, the smallest number of items for which linear attention is
+        faster, or None.
+    """
+    result = dict(items=list(items), softmax=[], linear=[], crossover=None)
+    for num_items in items:
+        shape = (batch, heads, num_items)
+        mv = [torch.randn(*shape, channels, 16, device=device) for _ in range(3)]
+        s = [torch.randn(*shape, channels, device=device) for _ in range(3)]
+        for name, fn in (("softmax", sdp_attention), ("linear", linear_sdp_attention)):
+            with torch.no_grad():
+                timing = measure(partial(fn, *mv, *s), device, num_warmup, num_repeats, False)
+            result[name].append(timing["time_median"])
+        if result["crossover"] is None and result["linear"][-1] < result["softmax"][-1]:
+            result["crossover"] = num_items
+        if verbose:
+            print(
+                f"items={num_items}: softmax {1e3 * result['softmax'][-1]:.3g} ms, "
+                f"linear {1e3 * result['linear'][-1]:.3g} ms"
+            )
+    return result
@@ -0,0 +1,148 @@
+"""Running benchmark cases and comparing the results with a stored baseline."""
+
+import fnmatch
+import json
+import platform
+from collections.abc import Sequence
+from typing import Any
+
+import torch
+
+from .cases import BenchmarkCase, all_cases
+from .timing import measure
+
+# metrics that are compared with the baseline, the minimum time is least affected by other load
+METRICS = ("time_min", "peak_memory_bytes")
+
+
+def run_benchmarks(
+    cases: Sequence[BenchmarkCase] | None = None,
+    device: torch.device | str = "cpu",
+    quick: bool = False,
+    pattern: str | None = None,
+    num_warmup: int = 2,
+    num_repeats: int = 10,
+    memory: bool = True,
+    verbose: bool = False,
+) -> dict[str, Any]:
+    """Measures benchmark cases.
+
+    Parameters
+    ----------
+    cases : Sequence of BenchmarkCase or None
+        Cases to measure. Defaults to ``lgatr.bench.cases.all_cases(device, quick)``.
+    device : torch.device or str
+        Device of the benchmarks.
+    quick : bool
+        Whether to use the small grid of shapes of the default cases.
+    pattern : str or None
+        Only measure cases whose name matches this ``fnmatch`` pattern, e.g. ``"nets/LGATr/*"``.
+    num_warmup : int
+        Number of calls before the timing starts.
+    num_repeats : int
+        Number of timed samples, see ``lgatr.bench.timing.measure``.
+    memory : bool
+        Whether to measure the peak memory.
+    verbose : bool
+        Whether to print each result.
+
+    Returns
+    -------
+    dict
+        ``metadata`` with the environment and ``results`` with the measurements and parameters
+        of each case, see ``lgatr.bench.timing.measure``.
+    """
+    if cases is None:
+        cases = all_cases(device, quick)
+    results = {}
+    for case in cases:
+        if pattern is not None and not fnmatch.fnmatch(case.name, pattern):
+            continue
+        fn = case.setup()
+        result = measure(fn, device, num_warmup, num_repeats, memory)
+        results[case.name] = dict(**result, params=case.params)
+        del fn
+        if verbose:
+            print(_format_result(case.name, result))
+    return dict(metadata=environment(device, quick), results=results)
+
+
+def environment(device: torch.device | str = "cpu", quick: bool = False) -> dict[str, Any]:
+    """Environment of a benchmark run, stored with the results."""
+    device = torch.device(device)
+    return dict(
+        torch=torch.__version__,
+        python=platform.python_version(),
+        machine=platform.machine(),
+        processor=platform.processor(),
+        device=str(device),
+        device_name=torch.cuda.get_device_name(device) if device.type == "cuda" else "cpu",
+        num_threads=torch.get_num_threads(),
+        quick=quick,
+    )
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.25
+) -> list[dict[str, Any]]:
+    """Compares benchmark results with a baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Output of ``run_benchmarks``.
+    baseline : dict
+        Output of ``run_benchmarks`` for the reference version.
+    threshold : float
+        Relative increase of a metric that counts as a regression.
+
+    Returns
+    -------
+    list of dict
+        Comparison of each metric of ``results``, with ``name``, ``metric``, ``baseline``,
+        ``current``, ``ratio``, ``regression`` and ``missing``. Metrics that the baseline lacks,
+        e.g. of new cases, have ``missing=True``, ``baseline`` and ``ratio`` None and no
+        regression.
+    """
+    comparisons = []
+    for name, result in results["results"].items():
+        reference = baseline["results"].get(name, {})
+        for metric in METRICS:
+            if metric not in result:
+                continue
+            missing = metric not in reference
+            if not missing and reference[metric] <= 0:
+                continue
+            ratio = None if missing else result[metric] / reference[metric]
+            comparisons.append(
+                dict(
+                    name=name,
+                    metric=metric,
+                    baseline=reference.get(metric),
+                    current=result[metric],
+                    ratio=ratio,
+                    regression=not missing and ratio > 1 + threshold,
+                    missing=missing,
+                )
+            )
+    return comparisons
+
+
+def save_results(results: dict[str, Any], path: str) -> None:
+    """Writes benchmark results to a JSON file."""
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def load_results(path: str) -> dict[str, Any]:
+    """Reads benchmark results from a JSON file."""
+    with open(path) as file:
+        return json.load(file)
+
+
+def _format_result(name: str, result: dict[str, float]) -> str:
+    line = f"{name:<72} {1e3 * result['time_median']:10.3f} ms"
+    if "peak_memory_bytes" in result:
+        line += f" {result['peak_memory_bytes'] / 2**20:10.2f} MiB"
+    return line
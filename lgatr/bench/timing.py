@@ -0,0 +1,82 @@
+"""Timing and memory measurements of single benchmark cases."""
+
+import statistics
+import time
+from collections.abc import Callable
+
+import torch
+
+from ..utils.timing import output_errors, peak_memory, timed_forward
+
+# the generic helpers live in lgatr.utils.timing, such that the library does not import the
+# benchmark harness, and are re-exported here
+__all__ = ["measure", "output_errors", "peak_memory", "timed_forward"]
+
+
+def measure(
+    fn: Callable[[], object],
+    device: torch.device | str = "cpu",
+    num_warmup: int = 2,
+    num_repeats: int = 10,
+    memory: bool = True,
+    min_sample_time: float = 5e-3,
+) -> dict[str, float]:
+    """Measures the wall time and the peak memory of ``fn``.
+
+    Parameters
+    ----------
+    fn : Callable
+        Function without arguments to measure.
+    device : torch.device or str
+        Device on which ``fn`` computes, used to synchronize CUDA and to choose the memory
+        measurement.
+    num_warmup : int
+        Number of calls before the timing starts.
+    num_repeats : int
+        Number of timed samples.
+    memory : bool
+        Whether to measure the peak memory of a single call.
+    min_sample_time : float
+        Each timed sample repeats ``fn`` until it takes at least this many seconds, which reduces
+        the timer noise of fast functions, like ``timeit.Timer.autorange``.
+
+    Returns
+    -------
+    dict[str, float]
+        ``time_median``, ``time_min`` and ``time_std`` of a single call in seconds,
+        ``calls_per_sample``, and ``peak_memory_bytes``,
+        the largest amount of memory allocated during a call on top of the memory allocated
+        before the call.
+    """
+    device = torch.device(device)
+    for _ in range(num_warmup):
+        fn()
+    calls = 1
+    while _sample(fn, device, calls) < min_sample_time and calls < 2**16:
+        calls *= 2
+    times = [_sample(fn, device, calls) / calls for _ in range(num_repeats)]
+
+    result = dict(
+        time_median=statistics.median(times),
+        time_min=min(times),
+        time_std=statistics.stdev(times) if len(times) > 1 else 0.0,
+        calls_per_sample=calls,
+    )
+    if memory:
+        result["peak_memory_bytes"] = peak_memory(fn, device)
+    return result
+
+
+def _sample(fn: Callable[[], object], device: torch.device, calls: int) -> float:
+    """Wall time of ``calls`` calls of ``fn``."""
+    _synchronize(device)
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    _synchronize(device)
+    return time.perf_counter() - start
+
+
+def _synchronize(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
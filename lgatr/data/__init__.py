@@ -0,0 +1,3 @@
+from .bucketing import BucketBatchSampler, PaddedBatch, PaddedCollator
+from .events import PackedBatch, PackedEventLoader, RaggedEventDataset, write_events
+from .prefetch import EventPreprocessor, PrefetchPipeline
@@ -0,0 +1,194 @@
+"""Length-bucketing of events into padded batches with little padding."""
+
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+import torch
+from torch import Tensor
+
+from ..interface.vector import embed_vector
+from ..utils.batching import pad_events, padding_attention_kwargs, unpad_events
+from .events import PackedBatch
+
+
+class BucketBatchSampler(torch.utils.data.Sampler):
+    """Groups events of similar length into batches under a padded token budget.
+
+    The events are sorted into buckets by their number of items. Each bucket is split into
+    batches whose cost after padding, i.e. the number of events times the largest number of
+    items, is at most ``max_tokens``. With ``shuffle=True``, the events are shuffled within each
+    bucket and the batches are shuffled across buckets, with a new permutation in every epoch,
+    see ``set_epoch``. Use it as ``batch_sampler`` of a ``torch.utils.data.DataLoader`` with
+    ``PaddedCollator``, or pass it as ``batches`` to ``PackedEventLoader``. The padding of the
+    resulting batches is reported by ``stats``.
+
+    Parameters
+    ----------
+    lengths : Sequence of int or np.ndarray
+        Number of items of each event, e.g. ``RaggedEventDataset.lengths``.
+    max_tokens : int
+        Largest number of items of a batch after padding. An event with more items forms its
+        own batch.
+    boundaries : Sequence of int or None
+        Upper bounds of the numbers of items in each bucket, events with more items than the
+        last boundary form an additional bucket. Defaults to ``num_buckets`` quantiles of
+        ``lengths``.
+    num_buckets : int
+        Number of buckets if ``boundaries`` is not given.
+    shuffle : bool
+        Whether to shuffle the events within and the batches across buckets.
+    drop_last : bool
+        Whether to drop the last, incomplete batch of each bucket.
+    seed : int
+        Seed of the permutations, combined with the epoch.
+    """
+
+    def __init__(
+        self,
+        lengths: Sequence[int] | np.ndarray,
+        max_tokens: int,
+        boundaries: Sequence[int] | None = None,
+        num_buckets: int = 8,
+        shuffle: bool = True,
+        drop_last: bool = False,
+        seed: int = 0,
+    ) -> None:
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.max_tokens = max_tokens
+        if boundaries is None:
+            quantiles = np.linspace(0, 1, num_buckets + 1)[1:]
+            boundaries = np.unique(np.ceil(np.quantile(self.lengths, quantiles)).astype(np.int64))
+        self.boundaries = np.asarray(boundaries, dtype=np.int64)
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+        bucket_ids = np.searchsorted(self.boundaries, self.lengths, side="left")
+        self.buckets = [
+            np.flatnonzero(bucket_ids == bucket) for bucket in range(len(self.boundaries) + 1)
+        ]
+
+    def set_epoch(self, epoch: int) -> None:
+        """Sets the epoch, which changes the permutations for ``shuffle=True``."""
+        self.epoch = epoch
+
+    def batches(self) -> list[list[int]]:
+        """Batches of the current epoch."""
+        rng = np.random.default_rng((self.seed, self.epoch))
+        batches = []
+        for bucket in self.buckets:
+            indices = rng.permutation(bucket) if self.shuffle else bucket
+            batch, max_items = [], 0
+            for index in indices.tolist():
+                items = max(max_items, int(self.lengths[index]))
+                if batch and (len(batch) + 1) * items > self.max_tokens:
+                    batches.append(batch)
+                    batch, items = [], int(self.lengths[index])
+                batch.append(index)
+                max_items = items
+            if batch and not self.drop_last:
+                batches.append(batch)
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        return batches
+
+    def __iter__(self) -> Iterator[list[int]]:
+        yield from self.batches()
+
+    def __len__(self) -> int:
+        return len(self.batches())
+
+    def stats(self) -> dict[str, float]:
+        """Padding statistics of the batches of the current epoch.
+
+        Returns
+        -------
+        dict[str, float]
+            ``padding_efficiency``, the fraction of padded items that belong to events,
+            ``padding_efficiency_random`` for random batches with the same numbers of events,
+            ``num_batches``, ``events_per_batch``, and ``bucket_efficiency`` with the padding
+            efficiency of each bucket.
+        """
+        batches = self.batches()
+        sizes = np.array([len(batch) for batch in batches])
+        rng = np.random.default_rng(self.seed)
+        random_lengths = np.split(rng.permutation(self.lengths)[: sizes.sum()], sizes.cumsum()[:-1])
+
+        bucket_efficiency = []
+        for bucket in self.buckets:
+            members = set(bucket.tolist())
+            bucket_batches = [batch for batch in batches if batch[0] in members]
+            bucket_efficiency.append(_padding_efficiency(self.lengths, bucket_batches))
+        return dict(
+            padding_efficiency=_padding_efficiency(self.lengths, batches),
+            padding_efficiency_random=_padding_efficiency(None, random_lengths),
+            num_batches=len(batches),
+            events_per_batch=float(sizes.mean()) if len(sizes) else 0.0,
+            bucket_efficiency=bucket_efficiency,
+        )
+
+
+@dataclass
+class PaddedBatch(PackedBatch):
+    """Events padded to a common number of items, see ``PackedBatch``.
+
+    ``vectors`` has the shape (batch, max_items, 1, 4) or (batch, max_items, 1, 16), and
+    ``scalars`` the shape (batch, max_items, num_scalars). The padded items are zero and are
+    excluded from the attention by ``attn_kwargs``.
+    """
+
+    def unpack(self, outputs: Tensor) -> list[Tensor]:
+        """Removes the padding from network outputs with shape (batch, max_items, ...)."""
+        return unpad_events(outputs, self.lengths.tolist())
+
+
+class PaddedCollator:
+    """Collates events of ``RaggedEventDataset`` into a ``PaddedBatch``.
+
+    Parameters
+    ----------
+    embed : bool
+        Whether to embed the four-momenta into multivectors for ``LGATr``, or to keep them as
+        vectors for ``LGATrSlim``.
+    backend : str
+        Attention backend, see ``lgatr.utils.batching.padding_attention_kwargs``.
+    num_heads : int
+        Number of attention heads, only used for ``backend="xformers"``.
+    """
+
+    def __init__(self, embed: bool = True, backend: str = "native", num_heads: int = 1) -> None:
+        self.embed = embed
+        self.backend = backend
+        self.num_heads = num_heads
+
+    def __call__(
+        self, events: Sequence[tuple[Tensor, Tensor | None, Tensor | None]]
+    ) -> PaddedBatch:
+        vectors, scalars, labels = zip(*events, strict=True)
+        lengths = [len(vector) for vector in vectors]
+        vectors = pad_events(vectors)[:, :, None, :]
+        if self.embed:
+            vectors = embed_vector(vectors)
+        return PaddedBatch(
+            vectors=vectors,
+            scalars=None if scalars[0] is None else pad_events(scalars),
+            labels=None if labels[0] is None else torch.stack(labels),
+            lengths=torch.tensor(lengths),
+            attn_kwargs=padding_attention_kwargs(
+                lengths, backend=self.backend, num_heads=self.num_heads, dtype=vectors.dtype
+            ),
+        )
+
+
+def _padding_efficiency(lengths: np.ndarray | None, batches: Sequence) -> float:
+    """Fraction of padded items that belong to events, for batches of indices into ``lengths``
+    or, if ``lengths`` is None, batches of lengths."""
+    items, padded = 0, 0
+    for batch in batches:
+        batch_lengths = np.asarray(batch) if lengths is None else lengths[batch]
+        if len(batch_lengths):
+            items += batch_lengths.sum()
+            padded += len(batch_lengths) * batch_lengths.max()
+    return float(items / padded) if padded else 1.0
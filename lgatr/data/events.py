@@ -0,0 +1,353 @@
+"""Memory-mapped on-disk format for events with variable numbers of particles."""
+
+import os
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+import torch
+from torch import Tensor
+
+from ..interface.vector import embed_vector
+from ..utils.batching import event_offsets, varlen_attention_kwargs
+
+_FILES = dict(
+    vectors="vectors.npy", scalars="scalars.npy", labels="labels.npy", offsets="offsets.npy"
+)
+
+
+def write_events(
+    path: str,
+    vectors: Sequence[np.ndarray | Tensor],
+    scalars: Sequence[np.ndarray | Tensor] | None = None,
+    labels: np.ndarray | Tensor | None = None,
+    dtype=np.float32,
+) -> None:
+    """Writes events in the memory-mapped format of ``RaggedEventDataset``.
+
+    The directory ``path`` contains the contiguous arrays ``vectors.npy`` with shape
+    (total_items, 4), ``scalars.npy`` with shape (total_items, num_scalars) and ``offsets.npy``
+    with shape (num_events + 1,) and dtype int64, such that event ``i`` consists of the items
+    ``offsets[i]:offsets[i + 1]``. Optional per-event labels are stored in ``labels.npy``.
+    If ``path`` ends with ``.npz``, the same arrays are stored in a single uncompressed archive
+    instead, which is convenient for small files but cannot be memory-mapped.
+
+    Parameters
+    ----------
+    path : str
+        Output directory, created if it does not exist, or ``.npz`` file.
+    vectors : Sequence of np.ndarray or torch.Tensor
+        Four-momenta of each event with shape (items_i, 4).
+    scalars : Sequence of np.ndarray or torch.Tensor or None
+        Per-particle scalars of each event with shape (items_i, num_scalars).
+    labels : np.ndarray or torch.Tensor or None
+        Per-event labels with shape (num_events, ...).
+    dtype : np.dtype
+        Floating-point dtype of ``vectors`` and ``scalars`` on disk.
+    """
+    lengths = [len(event) for event in vectors]
+    offsets = event_offsets(lengths).numpy()
+    if labels is not None and len(labels) != len(lengths):
+        raise ValueError(f"Expected {len(lengths)} labels, got {len(labels)}")
+    if path.endswith(".npz"):
+        arrays = dict(offsets=offsets, vectors=_concatenate(vectors, 4, dtype))
+        if scalars is not None:
+            num_scalars = np.shape(scalars[0])[-1] if len(scalars) else 0
+            arrays["scalars"] = _concatenate(scalars, num_scalars, dtype)
+        if labels is not None:
+            arrays["labels"] = np.asarray(labels)
+        np.savez(path, **arrays)
+        return
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, _FILES["offsets"]), offsets)
+
+    def write(name, events, width):
+        array = np.lib.format.open_memmap(
+            os.path.join(path, _FILES[name]),
+            mode="w+",
+            dtype=dtype,
+            shape=(int(offsets[-1]), width),
+        )
+        for start, stop, event in zip(offsets[:-1], offsets[1:], events, strict=True):
+            array[start:stop] = np.asarray(event, dtype=dtype).reshape(stop - start, width)
+        array.flush()
+
+    write("vectors", vectors, 4)
+    if scalars is not None:
+        num_scalars = np.shape(scalars[0])[-1] if len(scalars) else 0
+        write("scalars", scalars, num_scalars)
+    if labels is not None:
+        np.save(os.path.join(path, _FILES["labels"]), np.asarray(labels))
+
+
+def _concatenate(events: Sequence[np.ndarray | Tensor], width: int, dtype) -> np.ndarray:
+    """Concatenates events into an array with shape (total_items, width)."""
+    arrays = [np.asarray(event, dtype=dtype).reshape(-1, width) for event in events]
+    return np.concatenate(arrays) if arrays else np.zeros((0, width), dtype=dtype)
+
+
+@dataclass
+class PackedBatch:
+    """Events packed into a single sequence, ready for the networks.
+
+    Attributes
+    ----------
+    vectors : torch.Tensor
+        Four-momenta with shape (1, items, 1, 4), or their multivector embeddings with shape
+        (1, items, 1, 16).
+    scalars : torch.Tensor or None
+        Per-particle scalars with shape (1, items, num_scalars).
+    labels : torch.Tensor or None
+        Per-event labels with shape (batch, ...).
+    lengths : torch.Tensor
+        Number of items of each event, with shape (batch,).
+    attn_kwargs : dict
+        Attention arguments that restrict the attention to each event, see
+        ``lgatr.utils.batching.varlen_attention_kwargs``.
+    offsets : torch.Tensor or None
+        Start offsets of the events in the packed sequence, followed by the total number of
+        items, with shape (batch + 1,) and dtype int64, see ``lgatr.utils.batching.event_offsets``.
+        Computed from ``lengths`` if not given.
+    """
+
+    vectors: Tensor
+    scalars: Tensor | None
+    labels: Tensor | None
+    lengths: Tensor
+    attn_kwargs: dict = field(default_factory=dict)
+    offsets: Tensor | None = None
+
+    def __post_init__(self) -> None:
+        if self.offsets is None:
+            self.offsets = event_offsets(self.lengths, device=self.lengths.device)
+
+    def attention_kwargs(self, backend: str = "varlen") -> dict[str, Tensor | int]:
+        """Attention arguments for another ``backend``, on the device of the batch, see
+        ``lgatr.utils.batching.varlen_attention_kwargs``."""
+        return varlen_attention_kwargs(self.lengths, backend=backend, device=self.lengths.device)
+
+    def to(self, device=None, dtype=None, non_blocking: bool = False) -> "PackedBatch":
+        """Moves all tensors to ``device`` and casts ``vectors`` and ``scalars`` to ``dtype``."""
+
+        def move(value, dtype=None):
+            if not isinstance(value, Tensor):
+                return value
+            return value.to(device=device, dtype=dtype, non_blocking=non_blocking)
+
+        return type(self)(
+            vectors=move(self.vectors, dtype),
+            scalars=move(self.scalars, dtype),
+            labels=move(self.labels),
+            lengths=move(self.lengths),
+            attn_kwargs={key: move(value) for key, value in self.attn_kwargs.items()},
+            offsets=move(self.offsets),
+        )
+
+    def pin_memory(self) -> "PackedBatch":
+        """Pins all tensors, used by ``torch.utils.data.DataLoader(pin_memory=True)``."""
+
+        def pin(value):
+            return value.pin_memory() if isinstance(value, Tensor) else value
+
+        values = {f.name: pin(getattr(self, f.name)) for f in fields(self)}
+        values["attn_kwargs"] = {key: pin(value) for key, value in self.attn_kwargs.items()}
+        return type(self)(**values)
+
+    def unpack(self, outputs: Tensor) -> list[Tensor]:
+        """Splits packed network outputs with shape (1, items, ...) into the events."""
+        return list(outputs[0].split(self.lengths.tolist(), dim=0))
+
+
+class RaggedEventDataset(torch.utils.data.Dataset):
+    """Events with variable numbers of particles, memory-mapped from the files of ``write_events``.
+
+    The arrays are opened with ``np.load(mmap_mode="c")``, i.e. as copy-on-write
+    ``np.memmap``. Events and contiguous ranges of events are returned as tensors that share
+    memory with the page cache, such that many processes read the same file without loading it
+    into RAM. The arrays are not pickled, each process opens them again on first access, which
+    makes the dataset cheap to send to ``torch.utils.data.DataLoader`` workers.
+
+    Archives written by ``write_events`` to a ``.npz`` file are loaded into memory instead.
+
+    Parameters
+    ----------
+    path : str
+        Directory or ``.npz`` file written by ``write_events``.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._arrays = None
+        if path.endswith(".npz"):
+            with np.load(path) as archive:
+                self.offsets = archive["offsets"]
+        else:
+            self.offsets = np.load(os.path.join(path, _FILES["offsets"]))
+        self.lengths = np.diff(self.offsets)
+
+    @property
+    def arrays(self) -> dict[str, np.ndarray | None]:
+        """Memory-mapped arrays, opened on first access."""
+        if self._arrays is None and self.path.endswith(".npz"):
+            with np.load(self.path) as archive:
+                self._arrays = {
+                    name: archive[name] if name in archive else None
+                    for name in ("vectors", "scalars", "labels")
+                }
+        if self._arrays is None:
+            arrays = {}
+            for name in ("vectors", "scalars", "labels"):
+                file = os.path.join(self.path, _FILES[name])
+                arrays[name] = np.load(file, mmap_mode="c") if os.path.exists(file) else None
+            self._arrays = arrays
+        return self._arrays
+
+    def __getstate__(self):
+        return {**self.__dict__, "_arrays": None}
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __getitem__(self, index: int) -> tuple[Tensor, Tensor | None, Tensor | None]:
+        """Single event.
+
+        Returns
+        -------
+        vectors : torch.Tensor
+            Four-momenta with shape (items, 4).
+        scalars : torch.Tensor or None
+            Per-particle scalars with shape (items, num_scalars).
+        label : torch.Tensor or None
+            Label of the event.
+        """
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        arrays = self.arrays
+        return (
+            _as_tensor(arrays["vectors"], slice(start, stop)),
+            _as_tensor(arrays["scalars"], slice(start, stop)),
+            _as_tensor(arrays["labels"], index),
+        )
+
+    def get_batch(
+        self, indices: Sequence[int], embed: bool = True, backend: str = "varlen"
+    ) -> PackedBatch:
+        """Packs events into a single sequence.
+
+        Consecutive indices are sliced from the memory map without a copy, other indices are
+        gathered.
+
+        Parameters
+        ----------
+        indices : Sequence of int
+            Events of the batch.
+        embed : bool
+            Whether to embed the four-momenta into multivectors for ``LGATr``, or to keep them as
+            vectors for ``LGATrSlim``.
+        backend : str
+            Attention backend, see ``lgatr.utils.batching.varlen_attention_kwargs``. The default
+            ``"varlen"`` only passes the event offsets and requires a CUDA device. ``"native"``
+            materializes a block-diagonal mask with ``total_items^2`` entries, e.g. 67M for
+            8192 items; on CPUs, padded batches of events with similar lengths are usually
+            cheaper, see ``lgatr.data.BucketBatchSampler``.
+
+        Returns
+        -------
+        PackedBatch
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = self.lengths[indices]
+        contiguous = len(indices) > 0 and (np.diff(indices) == 1).all()
+        if contiguous:
+            items = slice(self.offsets[indices[0]], self.offsets[indices[-1] + 1])
+        else:
+            items = np.concatenate(
+                [np.arange(self.offsets[i], self.offsets[i + 1]) for i in indices]
+            )
+        arrays = self.arrays
+
+        vectors = _as_tensor(arrays["vectors"], items)[None, :, None, :]
+        if embed:
+            vectors = embed_vector(vectors)
+        scalars = _as_tensor(arrays["scalars"], items)
+        return PackedBatch(
+            vectors=vectors,
+            scalars=None if scalars is None else scalars[None],
+            labels=_as_tensor(arrays["labels"], indices),
+            lengths=torch.from_numpy(lengths),
+            attn_kwargs=varlen_attention_kwargs(lengths, backend=backend),
+        )
+
+
+class PackedEventLoader(torch.utils.data.IterableDataset):
+    """Streams packed batches from a ``RaggedEventDataset``.
+
+    By default, the events are read in file order and grouped into contiguous batches, which
+    are sliced from the memory map without a copy. Pass ``batches`` to control the grouping,
+    e.g. with a shuffling or length-bucketing sampler.
+    Inside a ``torch.utils.data.DataLoader`` with ``batch_size=None``, the batches are
+    distributed over the workers.
+
+    Parameters
+    ----------
+    dataset : RaggedEventDataset
+        Events to stream.
+    max_tokens : int or None
+        Largest number of items in a batch. An event with more items forms its own batch.
+    max_events : int or None
+        Largest number of events in a batch. One of ``max_tokens`` and ``max_events`` is
+        required.
+    batches : Iterable of Sequence of int or None
+        Event indices of each batch. Overrides ``max_tokens`` and ``max_events``.
+    embed : bool
+        Whether to embed the four-momenta into multivectors, see ``RaggedEventDataset.get_batch``.
+    backend : str
+        Attention backend, see ``RaggedEventDataset.get_batch``. The default ``"varlen"``
+        requires a CUDA device, ``"native"`` builds a dense mask over all items of a batch.
+    """
+
+    def __init__(
+        self,
+        dataset: RaggedEventDataset,
+        max_tokens: int | None = None,
+        max_events: int | None = None,
+        batches: Iterable[Sequence[int]] | None = None,
+        embed: bool = True,
+        backend: str = "varlen",
+    ) -> None:
+        if batches is None and max_tokens is None and max_events is None:
+            raise ValueError("Specify max_tokens, max_events or batches")
+        self.dataset = dataset
+        self.max_tokens = max_tokens
+        self.max_events = max_events
+        self.batches = batches
+        self.embed = embed
+        self.backend = backend
+
+    def batch_indices(self) -> Iterator[range]:
+        """Contiguous batches of events in file order under the token and event budgets."""
+        start, tokens = 0, 0
+        for index, length in enumerate(self.dataset.lengths):
+            num_events = index - start
+            full_tokens = self.max_tokens is not None and tokens + length > self.max_tokens
+            full_events = self.max_events is not None and num_events == self.max_events
+            if num_events > 0 and (full_tokens or full_events):
+                yield range(start, index)
+                start, tokens = index, 0
+            tokens += length
+        if start < len(self.dataset):
+            yield range(start, len(self.dataset))
+
+    def __iter__(self) -> Iterator[PackedBatch]:
+        batches = self.batch_indices() if self.batches is None else self.batches
+        worker = torch.utils.data.get_worker_info()
+        for i, indices in enumerate(batches):
+            if worker is None or i % worker.num_workers == worker.id:
+                yield self.dataset.get_batch(indices, embed=self.embed, backend=self.backend)
+
+
+def _as_tensor(array: np.ndarray | None, index=slice(None)) -> Tensor | None:
+    """Indexes an array and converts it to a tensor, without a copy for slices."""
+    if array is None:
+        return None
+    return torch.from_numpy(np.asarray(array[index]))
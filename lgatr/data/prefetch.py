@@ -0,0 +1,223 @@
+"""Background preprocessing and prefetching of batches."""
+
+import queue
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import torch
+from torch import Tensor
+
+from ..interface.vector import embed_vector
+from ..utils.batching import (
+    pack_events,
+    pad_events,
+    padding_attention_kwargs,
+    varlen_attention_kwargs,
+)
+from .bucketing import PaddedBatch
+from .events import PackedBatch
+
+EXECUTORS = ("thread", "process")
+_END = object()
+
+
+class EventPreprocessor:
+    """Prepares raw batches of ``PackedEventLoader`` or ``PaddedCollator`` for the networks.
+
+    Embeds the four-momenta into multivectors, appends reference multivectors ('spurions', see
+    ``lgatr.interface.spurions``) as extra channels or extra tokens, and computes the attention
+    arguments for the resulting numbers of items. Use it as ``transform`` of ``PrefetchPipeline``
+    to move this work out of the training loop.
+
+    Parameters
+    ----------
+    embed : bool
+        Whether to embed four-momenta with shape (..., 4) into multivectors.
+    spurions : torch.Tensor or None
+        Reference multivectors with shape (num_spurions, 16), or reference vectors with shape
+        (num_spurions, 4) for ``embed=False``.
+    spurion_tokens : bool
+        Whether to prepend the spurions to each event as extra tokens with zero scalars, instead of
+        appending them to each item as extra channels.
+    backend : str or None
+        Attention backend, see ``lgatr.utils.batching.varlen_attention_kwargs`` for packed and
+        ``lgatr.utils.batching.padding_attention_kwargs`` for padded batches. Defaults to
+        ``"varlen"`` for packed and ``"native"`` for padded batches, such that the attention
+        arguments never contain a dense mask over all items of a packed batch.
+    num_heads : int
+        Number of attention heads, only used for padded batches with ``backend="xformers"``.
+    """
+
+    def __init__(
+        self,
+        embed: bool = True,
+        spurions: Tensor | None = None,
+        spurion_tokens: bool = False,
+        backend: str | None = None,
+        num_heads: int = 1,
+    ) -> None:
+        self.embed = embed
+        self.spurions = spurions
+        self.spurion_tokens = spurion_tokens
+        self.backend = backend
+        self.num_heads = num_heads
+
+    def __call__(self, batch: PackedBatch) -> PackedBatch:
+        vectors, scalars, lengths = batch.vectors, batch.scalars, batch.lengths
+        if self.embed and vectors.shape[-1] == 4:
+            vectors = embed_vector(vectors)
+
+        if self.spurions is not None:
+            spurions = self.spurions.to(dtype=vectors.dtype, device=vectors.device)
+            if spurions.shape[-1] != vectors.shape[-1]:
+                raise ValueError(
+                    f"Spurions with shape {tuple(spurions.shape)} do not match the inputs with "
+                    f"shape {tuple(vectors.shape)}"
+                )
+            if self.spurion_tokens:
+                vectors, scalars, lengths = self._prepend_tokens(batch, vectors, scalars, spurions)
+            else:
+                spurions = spurions.expand(*vectors.shape[:-2], *spurions.shape)
+                vectors = torch.cat((vectors, spurions), dim=-2)
+
+        if isinstance(batch, PaddedBatch):
+            attn_kwargs = padding_attention_kwargs(
+                lengths,
+                max_items=vectors.shape[1],
+                backend=self.backend or "native",
+                num_heads=self.num_heads,
+                dtype=vectors.dtype,
+            )
+        else:
+            attn_kwargs = varlen_attention_kwargs(lengths, backend=self.backend or "varlen")
+        return type(batch)(
+            vectors=vectors,
+            scalars=scalars,
+            labels=batch.labels,
+            lengths=lengths,
+            attn_kwargs=attn_kwargs,
+        )
+
+    def _prepend_tokens(self, batch, vectors, scalars, spurions):
+        """Prepends the spurions to each event as extra tokens in the first channel."""
+        tokens = spurions.new_zeros(len(spurions), *vectors.shape[2:])
+        tokens[:, 0] = spurions
+        combine = pad_events if isinstance(batch, PaddedBatch) else pack_events
+        vectors = combine([torch.cat((tokens, event)) for event in batch.unpack(vectors)])
+        if scalars is not None:
+            zeros = scalars.new_zeros(len(spurions), scalars.shape[-1])
+            scalars = combine([torch.cat((zeros, event)) for event in batch.unpack(scalars)])
+        return vectors, scalars, batch.lengths + len(spurions)
+
+
+class PrefetchPipeline:
+    """Prepares batches in the background while the model consumes previous batches.
+
+    A background thread iterates ``source`` and submits ``transform`` for every batch to a pool
+    of ``num_workers`` threads or processes. Up to ``prefetch`` batches are prepared ahead of the
+    consumer, and the batches are yielded in the order of ``source``. Exceptions in ``source``
+    or ``transform`` are raised in the consumer.
+
+    With ``executor="thread"``, batches are passed between the stages without copies. Threads
+    are sufficient if ``transform`` mostly runs torch operations, which release the GIL.
+    With ``executor="process"``, batches are sent through shared memory via
+    ``torch.multiprocessing``, such that only the batch inputs of ``transform`` are copied once
+    into shared memory. ``transform`` has to be picklable in this case.
+
+    .. code-block::
+
+        loader = PackedEventLoader(dataset, max_tokens=4096, embed=False)
+        pipeline = PrefetchPipeline(loader, EventPreprocessor(spurions=get_spurions()))
+        for batch in pipeline:
+            outputs = model(batch.vectors, scalars=batch.scalars, **batch.attn_kwargs)
+
+    Parameters
+    ----------
+    source : Iterable
+        Batches, e.g. a ``PackedEventLoader`` or a ``torch.utils.data.DataLoader``.
+    transform : Callable or None
+        Preprocessing of each batch, e.g. an ``EventPreprocessor``.
+    num_workers : int
+        Number of threads or processes that run ``transform``.
+    prefetch : int
+        Largest number of batches that are prepared ahead of the consumer.
+    executor : str
+        ``"thread"`` or ``"process"``.
+    device : torch.device or None
+        If not None, batches are moved to this device with ``non_blocking=True`` before they
+        are yielded, which requires a ``to`` method.
+    """
+
+    def __init__(
+        self,
+        source: Iterable,
+        transform: Callable | None = None,
+        num_workers: int = 1,
+        prefetch: int = 2,
+        executor: str = "thread",
+        device: torch.device | None = None,
+    ) -> None:
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor {executor}, choose from {EXECUTORS}")
+        if prefetch < 1:
+            raise ValueError(f"prefetch has to be positive, got {prefetch}")
+        self.source = source
+        self.transform = transform
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.executor = executor
+        self.device = device
+
+    def __iter__(self) -> Iterator:
+        pool = self._make_executor()
+        pending: queue.Queue = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce, args=(pool, pending, stop), name="lgatr-prefetch", daemon=True
+        )
+        producer.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                batch = item.result()
+                if self.device is not None:
+                    batch = batch.to(self.device, non_blocking=True)
+                yield batch
+        finally:
+            stop.set()
+            while producer.is_alive():
+                # unblock the producer if it waits for a free slot
+                try:
+                    pending.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _make_executor(self) -> Executor:
+        if self.executor == "thread":
+            return ThreadPoolExecutor(self.num_workers, thread_name_prefix="lgatr-preprocess")
+        import torch.multiprocessing as mp
+
+        return ProcessPoolExecutor(self.num_workers, mp_context=mp.get_context("spawn"))
+
+    def _produce(self, pool: Executor, pending: queue.Queue, stop: threading.Event) -> None:
+        """Submits the batches of ``source`` to ``pool``, runs in a background thread."""
+        try:
+            for batch in self.source:
+                if stop.is_set():
+                    return
+                future = pool.submit(_identity if self.transform is None else self.transform, batch)
+                pending.put(future)
+        except BaseException as exc:
+            pending.put(exc)
+            return
+        pending.put(_END)
+
+
+def _identity(batch):
+    return batch
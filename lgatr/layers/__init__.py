@@ -1,12 +1,14 @@
-from .attention.config import CrossAttentionConfig, SelfAttentionConfig
+from .attention.config import CrossAttentionConfig, SelfAttentionConfig, block_attention_configs
 from .attention.cross_attention import CrossAttention
 from .attention.self_attention import SelfAttention
 from .conditional_lgatr_block import ConditionalLGATrBlock
 from .dropout import GradeDropout
+from .instrumentation import register_instrumentation
 from .layer_norm import EquiLayerNorm
 from .lgatr_block import LGATrBlock
-from .linear import EquiLinear
+from .linear import EquiLinear, FrozenEquiLinear
 from .mlp.config import MLPConfig
 from .mlp.geometric_bilinears import GeometricBilinear
 from .mlp.mlp import GeoMLP
 from .mlp.nonlinearities import ScalarGatedNonlinearity
+from .quantization import Int8Linear, QuantizedEquiLinear
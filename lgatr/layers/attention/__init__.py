@@ -1,3 +1,3 @@
-from .config import CrossAttentionConfig, SelfAttentionConfig
+from .config import CrossAttentionConfig, SelfAttentionConfig, block_attention_configs
 from .cross_attention import CrossAttention
 from .self_attention import SelfAttention
@@ -2,7 +2,11 @@
 
 from torch import nn
 
-from ...primitives.attention import sdp_attention
+from ...primitives.attention import (
+    linear_sdp_attention,
+    sdp_attention,
+    small_set_sdp_attention,
+)
 from .config import SelfAttentionConfig
 
 
@@ -22,6 +26,15 @@ class GeometricAttention(nn.Module):
         out_mv[..., i, c, :] = sum_j attn_weights[..., i, j] v_mv[..., j, c, :] / norm
         out_s[..., i, c] = sum_j attn_weights[..., i, j] v_s[..., j, c] / norm
 
+    If ``config.linear_attention`` is set, the softmax is replaced by a linear-complexity kernel,
+    see ``lgatr.primitives.attention.linear_sdp_attention``.
+    If ``small_set`` is set, the attention is evaluated with explicit batched matrix
+    multiplications, see ``lgatr.nets.small_set.optimize_for_small_sets``.
+
+    The inner product factors are applied to the multivector queries, unless ``query_metric`` is
+    set to False because they are folded into the query projection, see
+    ``lgatr.nets.inference.optimize_for_inference``.
+
     Parameters
     ----------
     config : SelfAttentionConfig
@@ -30,6 +43,14 @@ class GeometricAttention(nn.Module):
 
     def __init__(self, config: SelfAttentionConfig) -> None:
         super().__init__()
+        if not isinstance(config.linear_attention, bool):
+            raise ValueError(
+                "Expected a single linear_attention flag, "
+                "distribute per-block flags with block_attention_configs"
+            )
+        self.linear_attention = config.linear_attention
+        self.query_metric = True
+        self.small_set = False
 
     def forward(self, q_mv, k_mv, v_mv, q_s, k_s, v_s, **attn_kwargs):
         """Forward pass through geometric attention.
@@ -63,13 +84,24 @@ class GeometricAttention(nn.Module):
             Optional keyword arguments passed to attention.
         """
 
-        h_mv, h_s = sdp_attention(
+        if self.linear_attention:
+            if any(value is not None for value in attn_kwargs.values()):
+                raise NotImplementedError(
+                    f"Linear attention does not support attention arguments, got {list(attn_kwargs)}"
+                )
+            return linear_sdp_attention(
+                q_mv, k_mv, v_mv, q_s, k_s, v_s, query_metric=self.query_metric
+            )
+
+        attention = small_set_sdp_attention if self.small_set else sdp_attention
+        h_mv, h_s = attention(
             q_mv,
             k_mv,
             v_mv,
             q_s,
             k_s,
             v_s,
+            query_metric=self.query_metric,
             **attn_kwargs,
         )
 
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from collections.abc import Mapping
-from dataclasses import dataclass
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, replace
 from typing import Any
 
 
@@ -23,6 +23,16 @@ class SelfAttentionConfig:
     head_scale: bool
         Whether to use HeadScaleMHA following the NormFormer, see https://arxiv.org/pdf/2110.09456.
         Before combining the heads, each head is scaled by a learnable parameter.
+    linear_attention: bool or sequence of bool
+        Whether to replace the softmax attention by a linear-complexity Taylor kernel,
+        see ``lgatr.primitives.attention.linear_sdp_attention``. Default is False.
+        Attention masks and attention backends are not supported in this mode.
+        A sequence selects the kernel per block, see ``block_attention_configs``.
+    pairwise_bias: bool
+        Whether to add the learnable pairwise Lorentz-invariant bias
+        ``scale[h] * log(1 + |(p_i + p_j)^2|)`` to the attention logits, default is False.
+        Only active if per-item Lorentz vectors are passed to the network,
+        see ``lgatr.primitives.pairwise``.
 
 
     Parameters auto-set by LGATr
@@ -57,6 +67,8 @@ class SelfAttentionConfig:
     multi_query: bool = False
     increase_hidden_channels: int = 1
     head_scale: bool = False
+    linear_attention: bool | Sequence[bool] = False
+    pairwise_bias: bool = False
 
     @property
     def hidden_mv_channels(self) -> int | None:
@@ -105,6 +117,11 @@ class CrossAttentionConfig:
     head_scale: bool
         Whether to use HeadScaleMHA following the NormFormer, see https://arxiv.org/pdf/2110.09456.
         Before combining the heads, each head is scaled by a learnable parameter.
+    linear_attention: bool or sequence of bool
+        Whether to replace the softmax attention by a linear-complexity Taylor kernel,
+        see ``lgatr.primitives.attention.linear_sdp_attention``. Default is False.
+        Attention masks and attention backends are not supported in this mode.
+        A sequence selects the kernel per block, see ``block_attention_configs``.
 
     Parameters auto-set by LGATr
     ----------------------------
@@ -150,6 +167,7 @@ class CrossAttentionConfig:
     multi_query: bool = False
     increase_hidden_channels: int = 1
     head_scale: bool = False
+    linear_attention: bool | Sequence[bool] = False
 
     @property
     def hidden_mv_channels(self) -> int | None:
@@ -175,3 +193,44 @@ class CrossAttentionConfig:
         if isinstance(config, Mapping):
             return cls(**config)
         raise ValueError(f"Can not cast {config} to {cls}")
+
+
+def block_attention_configs(
+    config: SelfAttentionConfig | CrossAttentionConfig, num_blocks: int
+) -> list[SelfAttentionConfig | CrossAttentionConfig]:
+    """Distributes an attention configuration over blocks.
+
+    A sequence of ``linear_attention`` flags selects the attention kernel of each block, e.g.
+    linear attention in the first blocks of a network that processes many items and softmax
+    attention in the last ones. A single flag applies to all blocks.
+
+    Parameters
+    ----------
+    config : SelfAttentionConfig or CrossAttentionConfig
+        Attention configuration shared by the blocks.
+    num_blocks : int
+        Number of blocks.
+
+    Returns
+    -------
+    list of SelfAttentionConfig or CrossAttentionConfig
+        Attention configuration of each block, with a single ``linear_attention`` flag.
+    """
+    if isinstance(config.linear_attention, bool):
+        return [config] * num_blocks
+    return [
+        replace(config, linear_attention=flag)
+        for flag in block_linear_attention(config.linear_attention, num_blocks)
+    ]
+
+
+def block_linear_attention(linear_attention: bool | Sequence[bool], num_blocks: int) -> list[bool]:
+    """Distributes a single or per-block ``linear_attention`` flag over blocks."""
+    if isinstance(linear_attention, bool):
+        return [linear_attention] * num_blocks
+    if len(linear_attention) != num_blocks:
+        raise ValueError(
+            f"Expected {num_blocks} linear_attention flags, one for each block, "
+            f"got {len(linear_attention)}"
+        )
+    return [bool(flag) for flag in linear_attention]
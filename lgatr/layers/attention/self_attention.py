@@ -59,12 +59,17 @@ class SelfAttention(nn.Module):
         if self.use_head_scale:
             self.head_scale = nn.Parameter(torch.ones(config.num_heads))
 
+        # Pairwise Lorentz-invariant attention bias
+        if config.pairwise_bias:
+            self.pair_bias_scale = nn.Parameter(torch.zeros(config.num_heads))
+
     def forward(
         self,
         multivectors: torch.Tensor,
         additional_qk_features_mv: torch.Tensor | None = None,
         scalars: torch.Tensor | None = None,
         additional_qk_features_s: torch.Tensor | None = None,
+        pair_features: torch.Tensor | None = None,
         **attn_kwargs,
     ) -> tuple[torch.Tensor, torch.Tensor]:
         """Computes self-attention.
@@ -95,6 +100,10 @@ class SelfAttention(nn.Module):
             Additional scalar Q/K features with shape (..., items, add_qk_mv_channels, 16)
         scalars : None or torch.Tensor
             Optional input scalars with shape (..., items, s_channels).
+        pair_features : None or torch.Tensor
+            Optional per-item features with shape (..., items, 5) for the pairwise attention bias,
+            see ``lgatr.primitives.pairwise.pairwise_bias_features``.
+            Ignored unless ``config.pairwise_bias`` is set.
         **attn_kwargs
             Optional keyword arguments passed to attention.
 
@@ -110,6 +119,11 @@ class SelfAttention(nn.Module):
             multivectors, scalars, additional_qk_features_mv, additional_qk_features_s
         )
 
+        if self.config.pairwise_bias and pair_features is not None:
+            attn_kwargs = dict(
+                attn_kwargs, pair_features=pair_features, pair_scale=self.pair_bias_scale
+            )
+
         # Attention layer
         h_mv, h_s = self.attention(
             q_mv,
@@ -5,6 +5,7 @@ from dataclasses import replace
 import torch
 from torch import nn
 
+from ..utils.checkpoint import checkpoint_sublayer
 from .attention import (
     CrossAttention,
     CrossAttentionConfig,
@@ -44,6 +45,10 @@ class ConditionalLGATrBlock(nn.Module):
         MLP configuration
     dropout_prob : float or None
         Dropout probability
+    checkpoint_sublayers : None or str
+        If "attention", the self- and cross-attention sublayers are evaluated with activation
+        checkpointing, if "mlp" the MLP sublayer. Usually set by the network,
+        see ``lgatr.utils.checkpoint``.
     """
 
     def __init__(
@@ -56,8 +61,10 @@ class ConditionalLGATrBlock(nn.Module):
         crossattention: CrossAttentionConfig,
         mlp: MLPConfig,
         dropout_prob: float | None = None,
+        checkpoint_sublayers: str | None = None,
     ) -> None:
         super().__init__()
+        self._checkpoint_sublayers = checkpoint_sublayers
 
         # Normalization layer (stateless, so we can use the same layer for both normalization instances)
         self.norm = EquiLayerNorm()
@@ -137,7 +144,9 @@ class ConditionalLGATrBlock(nn.Module):
         h_mv, h_s = self.norm(multivectors, scalars=scalars)
 
         # Self-attention block: self attention
-        h_mv, h_s = self.attention(
+        h_mv, h_s = checkpoint_sublayer(
+            self.attention,
+            self._checkpoint_sublayers == "attention",
             h_mv,
             scalars=h_s,
             **attn_kwargs,
@@ -152,7 +161,9 @@ class ConditionalLGATrBlock(nn.Module):
         c_mv, c_s = self.norm(multivectors_condition, scalars=scalars_condition)
 
         # Cross-attention block: cross attention
-        h_mv, h_s = self.crossattention(
+        h_mv, h_s = checkpoint_sublayer(
+            self.crossattention,
+            self._checkpoint_sublayers == "attention",
             multivectors_q=h_mv,
             multivectors_kv=c_mv,
             scalars_q=h_s,
@@ -168,7 +179,9 @@ class ConditionalLGATrBlock(nn.Module):
         h_mv, h_s = self.norm(outputs_mv, scalars=outputs_s)
 
         # MLP block: MLP
-        h_mv, h_s = self.mlp(h_mv, scalars=h_s)
+        h_mv, h_s = checkpoint_sublayer(
+            self.mlp, self._checkpoint_sublayers == "mlp", h_mv, scalars=h_s
+        )
 
         # MLP block: skip connection
         outputs_mv = outputs_mv + h_mv
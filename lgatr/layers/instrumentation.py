@@ -0,0 +1,135 @@
+"""Instrumentation of L-GATr blocks with cheap summary statistics."""
+
+from collections.abc import Callable
+
+import torch
+from torch import Tensor, nn
+
+from ..primitives.attention import register_attention_hook
+
+
+class InstrumentationHandle:
+    """Handle returned by ``register_instrumentation``.
+
+    Removes all hooks with ``handle.remove()``, can also be used as a context manager.
+    """
+
+    def __init__(self, handles: list) -> None:
+        self._handles = handles
+
+    def remove(self) -> None:
+        """Removes all hooks registered by ``register_instrumentation``."""
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+
+    def __enter__(self) -> "InstrumentationHandle":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.remove()
+
+
+def register_instrumentation(
+    model: nn.Module,
+    hook: Callable[[str, dict[str, Tensor]], None],
+    attention: bool = True,
+    activations: bool = True,
+    entropy: bool = False,
+) -> InstrumentationHandle:
+    """Emits summary statistics of the attention and activations of each block of a network.
+
+    Works for ``LGATr``, ``ConditionalLGATr``, ``LGATrSlim``, ``ConditionalLGATrSlim``
+    and for individual blocks. For each block, ``hook`` is called with
+
+    - ``("blocks.{i}.attention", stats)`` for every attention call within the block,
+      see ``lgatr.primitives.attention.attention_statistics`` for the per-head statistics
+    - ``("blocks.{i}", stats)`` after the block, with the statistics ``mv_absmax``, ``mv_rms``,
+      ``s_absmax``, ``s_rms`` and ``nonfinite`` (number of NaN or inf entries) of the block outputs.
+      For the slim networks, ``mv`` refers to the vector outputs.
+
+    Statistics are detached scalar tensors or tensors of shape (head,), computed with fused
+    reductions. Without registered instrumentation, no statistics are computed.
+    The attention entropy is opt-in, because it recomputes the attention logits and roughly
+    doubles the cost of each attention call.
+    Note that blocks that are recomputed with gradient checkpointing emit their statistics again
+    during the backward pass.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network with a ``blocks`` attribute, or a single block.
+    hook : Callable
+        Function with signature ``hook(name, stats) -> None``.
+    attention : bool
+        Whether to emit attention statistics.
+    activations : bool
+        Whether to emit activation statistics of the block outputs.
+    entropy : bool
+        Whether the attention statistics include the entropy and the largest logit.
+
+    Returns
+    -------
+    InstrumentationHandle
+        Handle that removes all hooks with ``handle.remove()``.
+    """
+    if hasattr(model, "blocks"):
+        blocks = [(f"blocks.{i}", block) for i, block in enumerate(model.blocks)]
+    else:
+        blocks = [("block", model)]
+
+    # stack of blocks that are currently executed, used to attribute attention statistics
+    active_blocks = []
+    handles = []
+
+    def _make_hooks(name: str):
+        def pre_hook(module, args):
+            active_blocks.append(name)
+
+        def post_hook(module, args, outputs):
+            active_blocks.pop()
+            if activations:
+                hook(name, activation_statistics(outputs))
+
+        return pre_hook, post_hook
+
+    for name, block in blocks:
+        pre_hook, post_hook = _make_hooks(name)
+        handles.append(block.register_forward_pre_hook(pre_hook))
+        handles.append(block.register_forward_hook(post_hook))
+
+    if attention:
+
+        def attention_hook(stats):
+            if active_blocks:
+                hook(f"{active_blocks[-1]}.attention", stats)
+
+        handles.append(register_attention_hook(attention_hook, entropy=entropy))
+
+    return InstrumentationHandle(handles)
+
+
+@torch.no_grad()
+def activation_statistics(outputs: tuple[Tensor, Tensor | None]) -> dict[str, Tensor]:
+    """Computes summary statistics of the (multivector, scalar) outputs of a block.
+
+    Parameters
+    ----------
+    outputs : tuple of torch.Tensor
+        Multivector (or vector) outputs and optional scalar outputs of a block.
+
+    Returns
+    -------
+    dict[str, torch.Tensor]
+        Scalar statistics ``mv_absmax``, ``mv_rms``, ``s_absmax``, ``s_rms`` and ``nonfinite``.
+    """
+    stats = {}
+    nonfinite = 0
+    for label, tensor in zip(["mv", "s"], outputs, strict=False):
+        if tensor is None or tensor.numel() == 0:
+            continue
+        stats[f"{label}_absmax"] = tensor.abs().amax().float()
+        stats[f"{label}_rms"] = tensor.float().square().mean().sqrt()
+        nonfinite = nonfinite + (~torch.isfinite(tensor)).sum()
+    stats["nonfinite"] = torch.as_tensor(nonfinite)
+    return stats
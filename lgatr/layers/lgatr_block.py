@@ -5,6 +5,7 @@ from dataclasses import replace
 import torch
 from torch import nn
 
+from ..utils.checkpoint import checkpoint_sublayer
 from .attention import SelfAttention, SelfAttentionConfig
 from .layer_norm import EquiLayerNorm
 from .mlp.config import MLPConfig
@@ -31,6 +32,9 @@ class LGATrBlock(nn.Module):
         MLP configuration
     dropout_prob : float or None
         Dropout probability
+    checkpoint_sublayers : None or str
+        If "attention" or "mlp", the corresponding sublayer is evaluated with activation
+        checkpointing. Usually set by the network, see ``lgatr.utils.checkpoint``.
     """
 
     def __init__(
@@ -40,8 +44,10 @@ class LGATrBlock(nn.Module):
         attention: SelfAttentionConfig,
         mlp: MLPConfig,
         dropout_prob: float | None = None,
+        checkpoint_sublayers: str | None = None,
     ) -> None:
         super().__init__()
+        self._checkpoint_sublayers = checkpoint_sublayers
 
         # Normalization layer (stateless, so we can use the same layer for both normalization instances)
         self.norm = EquiLayerNorm()
@@ -102,7 +108,9 @@ class LGATrBlock(nn.Module):
         h_mv, h_s = self.norm(multivectors, scalars=scalars)
 
         # Attention block: self attention
-        h_mv, h_s = self.attention(
+        h_mv, h_s = checkpoint_sublayer(
+            self.attention,
+            self._checkpoint_sublayers == "attention",
             h_mv,
             scalars=h_s,
             additional_qk_features_mv=additional_qk_features_mv,
@@ -118,7 +126,9 @@ class LGATrBlock(nn.Module):
         h_mv, h_s = self.norm(outputs_mv, scalars=outputs_s)
 
         # MLP block: MLP
-        h_mv, h_s = self.mlp(h_mv, scalars=h_s)
+        h_mv, h_s = checkpoint_sublayer(
+            self.mlp, self._checkpoint_sublayers == "mlp", h_mv, scalars=h_s
+        )
 
         # MLP block: skip connection
         outputs_mv = outputs_mv + h_mv
@@ -1,5 +1,6 @@
 """Pin-equivariant linear layers between multivector tensors (torch.nn.Modules)."""
 
+import copy
 import math
 
 import torch
@@ -7,7 +8,7 @@ from torch import nn
 
 from ..interface import embed_scalar
 from ..primitives.config import gatr_config
-from ..primitives.linear import equi_linear
+from ..primitives.linear import _compute_scalar_components, equi_linear
 
 
 class EquiLinear(nn.Module):
@@ -148,6 +149,12 @@ class EquiLinear(nn.Module):
         outputs_s : None or torch.Tensor
             Output scalars with shape (..., out_s_channels)
         """
+        dtype = gatr_config.precision.compute_dtype("linear", multivectors)
+        if dtype is not None:
+            with gatr_config.precision.autocast("linear", multivectors.device.type):
+                return self.forward(
+                    multivectors.to(dtype), None if scalars is None else scalars.to(dtype)
+                )
 
         outputs_mv = equi_linear(multivectors, self.weight)  # (..., out_channels, 16)
 
@@ -156,12 +163,13 @@ class EquiLinear(nn.Module):
             outputs_mv = outputs_mv + bias
 
         if self.s2mvs is not None and scalars is not None:
-            if gatr_config.use_fully_connected_subgroup:
-                outputs_mv[..., [0, -1]] += self.s2mvs(scalars).view(
-                    *outputs_mv.shape[:-2], outputs_mv.shape[-2], 2
-                )
-            else:
-                outputs_mv[..., 0] += self.s2mvs(scalars)
+            # out-of-place, because outputs_mv may be saved for backward (selective checkpointing)
+            components = _compute_scalar_components(
+                gatr_config.use_fully_connected_subgroup, device=outputs_mv.device
+            )
+            s2mv = self.s2mvs(scalars).view(*outputs_mv.shape[:-1], len(components))
+            dtype = torch.promote_types(outputs_mv.dtype, s2mv.dtype)
+            outputs_mv = outputs_mv.to(dtype).index_add(-1, components, s2mv.to(dtype))
 
         if self.mvs2s is not None:
             if gatr_config.use_fully_connected_subgroup:
@@ -353,3 +361,189 @@ class EquiLinear(nn.Module):
                 fan_in += nn.init._calculate_fan_in_and_fan_out(self.s2s.weight)[0]
             bound = s_factor / math.sqrt(fan_in) if fan_in > 0 else 0
             nn.init.uniform_(self.mvs2s.bias, -bound, bound)
+
+
+class FrozenEquiLinear(nn.Module):
+    """Inference version of ``EquiLinear`` based on a single dense matrix.
+
+    The equivariant basis maps, the scalar-multivector mixing and the biases of an ``EquiLinear``
+    layer are composed into one affine map acting on the flattened inputs
+    ``concat(multivectors.flatten(-2), scalars)``, such that the forward pass is a single matrix
+    multiplication. The layer has no trainable parameters, use
+    ``FrozenEquiLinear.from_equi_linear`` to construct it.
+
+    Parameters
+    ----------
+    weight : torch.Tensor
+        Composed weight with shape (16 * out_mv_channels + out_s_channels,
+        16 * in_mv_channels + in_s_channels).
+    bias : torch.Tensor
+        Composed bias with shape (16 * out_mv_channels + out_s_channels,).
+    in_mv_channels : int
+        Input multivector channels
+    out_mv_channels : int
+        Output multivector channels
+    in_s_channels : int or None
+        Input scalar channels
+    out_s_channels : int or None
+        Output scalar channels
+    bias_without_scalars : torch.Tensor or None
+        Composed bias that is used if the layer is called without scalars, which differs from
+        ``bias`` because ``EquiLinear`` skips the scalar maps including their biases in this case.
+    """
+
+    def __init__(
+        self,
+        weight: torch.Tensor,
+        bias: torch.Tensor,
+        in_mv_channels: int,
+        out_mv_channels: int,
+        in_s_channels: int | None = None,
+        out_s_channels: int | None = None,
+        bias_without_scalars: torch.Tensor | None = None,
+    ) -> None:
+        super().__init__()
+        self._in_mv_channels = in_mv_channels
+        self._out_mv_channels = out_mv_channels
+        self._in_s_channels = in_s_channels
+        self._out_s_channels = out_s_channels
+        self.register_buffer("weight", weight)
+        self.register_buffer("bias", bias)
+        self.register_buffer("bias_without_scalars", bias_without_scalars)
+
+    @classmethod
+    @torch.no_grad()
+    def from_equi_linear(cls, linear: EquiLinear) -> "FrozenEquiLinear":
+        """Composes the weights of an ``EquiLinear`` layer.
+
+        The layer is an affine map, so it is fully determined by its outputs on the zero input
+        and on the canonical basis vectors. These are evaluated in float64 and then cast back to
+        the dtype of the layer.
+
+        Parameters
+        ----------
+        linear : EquiLinear
+            Layer to freeze.
+
+        Returns
+        -------
+        FrozenEquiLinear
+            Frozen layer that is numerically equivalent to ``linear``.
+        """
+        weight = linear.weight
+        in_mv, in_s = linear._in_mv_channels, linear._in_s_channels
+        linear64 = copy.deepcopy(linear).to(torch.float64)
+
+        def evaluate(inputs, with_scalars):
+            multivectors = inputs[:, : 16 * in_mv].reshape(-1, in_mv, 16)
+            scalars = inputs[:, 16 * in_mv :] if with_scalars else None
+            outputs_mv, outputs_s = linear64(multivectors, scalars=scalars)
+            outputs = [outputs_mv.flatten(start_dim=-2)]
+            if outputs_s is not None:
+                outputs.append(outputs_s)
+            return torch.cat(outputs, dim=-1)
+
+        num_inputs = 16 * in_mv + (in_s or 0)
+        inputs = torch.cat(
+            [
+                torch.zeros(1, num_inputs, dtype=torch.float64, device=weight.device),
+                torch.eye(num_inputs, dtype=torch.float64, device=weight.device),
+            ]
+        )
+        outputs = evaluate(inputs, with_scalars=in_s is not None)
+        bias, composed = outputs[0], (outputs[1:] - outputs[0]).T
+
+        bias_without_scalars = None
+        if in_s is not None:
+            bias_without_scalars = evaluate(inputs[:1], with_scalars=False)[0]
+            bias_without_scalars = bias_without_scalars.to(weight.dtype)
+
+        return cls(
+            composed.to(weight.dtype).contiguous(),
+            bias.to(weight.dtype),
+            in_mv_channels=in_mv,
+            out_mv_channels=linear._out_mv_channels,
+            in_s_channels=in_s,
+            out_s_channels=linear._out_s_channels if linear.mvs2s is not None else None,
+            bias_without_scalars=bias_without_scalars,
+        )
+
+    def forward(
+        self, multivectors: torch.Tensor, scalars: torch.Tensor | None = None
+    ) -> tuple[torch.Tensor, torch.Tensor | None]:
+        """Same as ``EquiLinear.forward``.
+
+        Parameters
+        ----------
+        multivectors : torch.Tensor
+            Input multivectors with shape (..., in_mv_channels, 16)
+        scalars : None or torch.Tensor
+            Optional input scalars with shape (..., in_s_channels)
+
+        Returns
+        -------
+        outputs_mv : torch.Tensor
+            Output multivectors with shape (..., out_mv_channels, 16)
+        outputs_s : None or torch.Tensor
+            Output scalars with shape (..., out_s_channels)
+        """
+        inputs = multivectors.flatten(start_dim=-2)
+        if self._in_s_channels is not None and scalars is not None:
+            inputs = torch.cat([inputs, scalars], dim=-1)
+            outputs = nn.functional.linear(inputs, self.weight, self.bias)
+        elif self._in_s_channels is not None:
+            weight = self.weight[:, : 16 * self._in_mv_channels]
+            outputs = nn.functional.linear(inputs, weight, self.bias_without_scalars)
+        else:
+            outputs = nn.functional.linear(inputs, self.weight, self.bias)
+
+        num_mv = 16 * self._out_mv_channels
+        outputs_mv = outputs[..., :num_mv].unflatten(-1, (self._out_mv_channels, 16))
+        outputs_s = outputs[..., num_mv:] if self._out_s_channels is not None else None
+        return outputs_mv, outputs_s
+
+    @torch.no_grad()
+    def scale_inputs(self, mv_factors: torch.Tensor, s_factors: torch.Tensor | None = None) -> None:
+        """Folds an elementwise rescaling of the inputs into the layer.
+
+        Parameters
+        ----------
+        mv_factors : torch.Tensor
+            Factors for the input multivectors with shape (in_mv_channels, 1) or
+            (in_mv_channels, 16).
+        s_factors : torch.Tensor or None
+            Factors for the input scalars with shape (in_s_channels,).
+        """
+        mv_factors = mv_factors.expand(self._in_mv_channels, 16).flatten()
+        factors = [mv_factors]
+        if self._in_s_channels is not None:
+            factors.append(
+                s_factors if s_factors is not None else mv_factors.new_ones(self._in_s_channels)
+            )
+        self.weight.mul_(torch.cat(factors).to(self.weight.dtype))
+
+    @torch.no_grad()
+    def scale_outputs(
+        self, mv_factors: torch.Tensor, s_factors: torch.Tensor | None = None
+    ) -> None:
+        """Folds an elementwise rescaling of the outputs into the layer.
+
+        Parameters
+        ----------
+        mv_factors : torch.Tensor
+            Factors for the output multivectors with shape (out_mv_channels, 1) or
+            (out_mv_channels, 16).
+        s_factors : torch.Tensor or None
+            Factors for the output scalars with shape (out_s_channels,).
+        """
+        mv_factors = mv_factors.expand(self._out_mv_channels, 16).flatten()
+        factors = [mv_factors]
+        if self._out_s_channels is not None:
+            factors.append(
+                s_factors if s_factors is not None else mv_factors.new_ones(self._out_s_channels)
+            )
+        factors = torch.cat(factors).to(self.weight.dtype)
+        self.weight.mul_(factors[:, None])
+        self.bias.mul_(factors)
+        if self.bias_without_scalars is not None:
+            self.bias_without_scalars.mul_(factors)
@@ -5,6 +5,7 @@ from torch import nn
 
 from ...primitives import geometric_product
 from ...primitives.config import gatr_config
+from ...primitives.linear import _compute_bivector_mask
 from ..layer_norm import EquiLayerNorm
 from ..linear import EquiLinear
 
@@ -91,7 +92,8 @@ class GeometricBilinear(nn.Module):
         right, _ = self.linear_right(multivectors, scalars=scalars)
         gp_outputs = geometric_product(left, right)
         if not gatr_config.use_bivector:
-            gp_outputs[..., 5:11] = 0.0
+            # out of place, the output of the einsum may be cached by selective checkpointing
+            gp_outputs = gp_outputs * _compute_bivector_mask(gp_outputs.device, gp_outputs.dtype)
 
         # Output linear
         outputs_mv, outputs_s = self.linear_out(gp_outputs, scalars=scalars)
@@ -0,0 +1,245 @@
+"""Int8 weight-quantized versions of the linear layers (torch.nn.Modules)."""
+
+import copy
+
+import torch
+from torch import nn
+
+from ..primitives.quantization import (
+    dequantize_equi_linear_weight,
+    int8_linear,
+    quantize_equi_linear_weight,
+    quantize_per_channel,
+)
+from .linear import EquiLinear, FrozenEquiLinear
+
+
+class Int8Linear(nn.Module):
+    """Inference version of ``torch.nn.Linear`` with int8 weights.
+
+    The weights are quantized with one scale per output channel, the inputs are quantized
+    dynamically with one scale per row, see ``lgatr.primitives.quantization.int8_linear``.
+    Use ``Int8Linear.from_linear`` to construct it.
+
+    Parameters
+    ----------
+    qweight : torch.Tensor
+        Int8 weights with shape (out_features, in_features).
+    scale : torch.Tensor
+        Weight scales with shape (out_features,).
+    bias : torch.Tensor or None
+        Optional bias with shape (out_features,).
+    dynamic_activations : bool
+        Whether to quantize the inputs. If False, only the weights are stored in int8.
+    """
+
+    def __init__(
+        self,
+        qweight: torch.Tensor,
+        scale: torch.Tensor,
+        bias: torch.Tensor | None = None,
+        dynamic_activations: bool = True,
+    ) -> None:
+        super().__init__()
+        self.in_features = qweight.shape[1]
+        self.out_features = qweight.shape[0]
+        self.dynamic_activations = dynamic_activations
+        self.register_buffer("qweight", qweight)
+        self.register_buffer("scale", scale)
+        self.register_buffer("bias", bias)
+
+    @classmethod
+    @torch.no_grad()
+    def from_linear(cls, linear: nn.Linear, dynamic_activations: bool = True) -> "Int8Linear":
+        """Quantizes the weights of a ``torch.nn.Linear`` layer.
+
+        Parameters
+        ----------
+        linear : torch.nn.Linear
+            Layer to quantize.
+        dynamic_activations : bool
+            Whether to quantize the inputs.
+
+        Returns
+        -------
+        Int8Linear
+            Quantized layer.
+        """
+        qweight, scale = quantize_per_channel(linear.weight.detach())
+        bias = None if linear.bias is None else linear.bias.detach().clone()
+        return cls(qweight, scale, bias, dynamic_activations=dynamic_activations)
+
+    def forward(self, inputs: torch.Tensor) -> torch.Tensor:
+        """Same as ``torch.nn.Linear.forward``."""
+        return int8_linear(
+            inputs,
+            self.qweight,
+            self.scale,
+            self.bias,
+            dynamic_activations=self.dynamic_activations,
+        )
+
+    def extra_repr(self) -> str:
+        return f"in_features={self.in_features}, out_features={self.out_features}"
+
+
+class QuantizedEquiLinear(nn.Module):
+    """Inference version of ``EquiLinear`` with int8 weights.
+
+    Like ``FrozenEquiLinear``, the layer is a single affine map acting on the flattened inputs
+    ``concat(multivectors.flatten(-2), scalars)``, but the composed weight is stored in int8 with
+    one scale per output row. The output rows that belong to the same output channel and grade
+    contain the same coefficients up to signs, so they share their scale and the quantized layer
+    is still exactly equivariant.
+    With ``dynamic_activations``, the inputs are quantized on the fly and the composed matrix
+    multiplication is performed in int8, which makes equivariance approximate.
+    Use ``QuantizedEquiLinear.from_equi_linear`` or
+    ``QuantizedEquiLinear.from_frozen_equi_linear`` to construct it.
+
+    Parameters
+    ----------
+    qweight : torch.Tensor
+        Int8 composed weight with shape (16 * out_mv_channels + out_s_channels,
+        16 * in_mv_channels + in_s_channels), see ``quantize_per_channel``.
+    scale : torch.Tensor
+        Weight scales with shape (16 * out_mv_channels + out_s_channels,).
+    bias : torch.Tensor
+        Composed bias with shape (16 * out_mv_channels + out_s_channels,).
+    in_mv_channels : int
+        Input multivector channels
+    out_mv_channels : int
+        Output multivector channels
+    in_s_channels : int or None
+        Input scalar channels
+    out_s_channels : int or None
+        Output scalar channels
+    bias_without_scalars : torch.Tensor or None
+        Composed bias that is used if the layer is called without scalars,
+        see ``FrozenEquiLinear``.
+    dynamic_activations : bool
+        Whether to quantize the inputs.
+    """
+
+    def __init__(
+        self,
+        qweight: torch.Tensor,
+        scale: torch.Tensor,
+        bias: torch.Tensor,
+        in_mv_channels: int,
+        out_mv_channels: int,
+        in_s_channels: int | None = None,
+        out_s_channels: int | None = None,
+        bias_without_scalars: torch.Tensor | None = None,
+        dynamic_activations: bool = True,
+    ) -> None:
+        super().__init__()
+        self._in_mv_channels = in_mv_channels
+        self._out_mv_channels = out_mv_channels
+        self._in_s_channels = in_s_channels
+        self._out_s_channels = out_s_channels
+        self.dynamic_activations = dynamic_activations
+        self.register_buffer("qweight", qweight)
+        self.register_buffer("scale", scale)
+        self.register_buffer("bias", bias)
+        self.register_buffer("bias_without_scalars", bias_without_scalars)
+
+    @classmethod
+    @torch.no_grad()
+    def from_equi_linear(
+        cls, linear: EquiLinear, dynamic_activations: bool = True
+    ) -> "QuantizedEquiLinear":
+        """Quantizes the weights of an ``EquiLinear`` layer.
+
+        The coefficients of the basis maps are first quantized with one scale per output channel
+        and basis element, see ``quantize_equi_linear_weight``. The resulting layer is then
+        composed and quantized with ``from_frozen_equi_linear``. For the full Lorentz group,
+        every output grade receives contributions from a single basis element, and the second
+        quantization is lossless.
+
+        Parameters
+        ----------
+        linear : EquiLinear
+            Layer to quantize.
+        dynamic_activations : bool
+            Whether to quantize the inputs.
+
+        Returns
+        -------
+        QuantizedEquiLinear
+            Quantized layer.
+        """
+        qweight, scale = quantize_equi_linear_weight(linear.weight.detach())
+        linear = copy.deepcopy(linear)
+        linear.weight.copy_(dequantize_equi_linear_weight(qweight, scale))
+        frozen = FrozenEquiLinear.from_equi_linear(linear)
+        return cls.from_frozen_equi_linear(frozen, dynamic_activations=dynamic_activations)
+
+    @classmethod
+    @torch.no_grad()
+    def from_frozen_equi_linear(
+        cls, linear: FrozenEquiLinear, dynamic_activations: bool = True
+    ) -> "QuantizedEquiLinear":
+        """Quantizes the composed weight of a ``FrozenEquiLinear`` layer.
+
+        Parameters
+        ----------
+        linear : FrozenEquiLinear
+            Layer to quantize.
+        dynamic_activations : bool
+            Whether to quantize the inputs.
+
+        Returns
+        -------
+        QuantizedEquiLinear
+            Quantized layer.
+        """
+        qweight, scale = quantize_per_channel(linear.weight)
+        bias_without_scalars = linear.bias_without_scalars
+        return cls(
+            qweight,
+            scale,
+            linear.bias.clone(),
+            in_mv_channels=linear._in_mv_channels,
+            out_mv_channels=linear._out_mv_channels,
+            in_s_channels=linear._in_s_channels,
+            out_s_channels=linear._out_s_channels,
+            bias_without_scalars=None
+            if bias_without_scalars is None
+            else bias_without_scalars.clone(),
+            dynamic_activations=dynamic_activations,
+        )
+
+    def forward(
+        self, multivectors: torch.Tensor, scalars: torch.Tensor | None = None
+    ) -> tuple[torch.Tensor, torch.Tensor | None]:
+        """Same as ``EquiLinear.forward``.
+
+        Parameters
+        ----------
+        multivectors : torch.Tensor
+            Input multivectors with shape (..., in_mv_channels, 16)
+        scalars : None or torch.Tensor
+            Optional input scalars with shape (..., in_s_channels)
+
+        Returns
+        -------
+        outputs_mv : torch.Tensor
+            Output multivectors with shape (..., out_mv_channels, 16)
+        outputs_s : None or torch.Tensor
+            Output scalars with shape (..., out_s_channels)
+        """
+        inputs = multivectors.flatten(start_dim=-2)
+        qweight, bias = self.qweight, self.bias
+        if self._in_s_channels is not None and scalars is not None:
+            inputs = torch.cat([inputs, scalars], dim=-1)
+        elif self._in_s_channels is not None:
+            qweight = qweight[:, : 16 * self._in_mv_channels]
+            bias = self.bias_without_scalars
+        outputs = int8_linear(
+            inputs, qweight, self.scale, bias, dynamic_activations=self.dynamic_activations
+        )
+
+        num_mv = 16 * self._out_mv_channels
+        outputs_mv = outputs[..., :num_mv].unflatten(-1, (self._out_mv_channels, 16))
+        outputs_s = outputs[..., num_mv:] if self._out_s_channels is not None else None
+        return outputs_mv, outputs_s
@@ -1,4 +1,10 @@
 from .conditional_lgatr import ConditionalLGATr
 from .conditional_lgatr_slim import ConditionalLGATrSlim
+from .config import network_from_config
+from .cost_model import cost_model
+from .export import aot_compile, export_model, load_aot_package
+from .inference import optimize_for_inference
 from .lgatr import LGATr
 from .lgatr_slim import LGATrSlim
+from .quantization import quantization_report, quantize_for_inference
+from .small_set import optimize_for_small_sets, small_set_report
@@ -2,15 +2,24 @@
 
 import torch
 from torch import nn
-from torch.utils.checkpoint import checkpoint
 
 from ..layers import (
     ConditionalLGATrBlock,
     CrossAttentionConfig,
     EquiLinear,
     SelfAttentionConfig,
+    block_attention_configs,
 )
 from ..layers.mlp.config import MLPConfig
+from ..primitives.config import resolve_precision
+from ..utils.checkpoint import (
+    block_checkpoint_policies,
+    checkpoint_block,
+    resolve_checkpoint_policy,
+)
+from ..utils.compile import compile_network
+from ..utils.offload import ActivationOffloader, offload_group, resolve_offloader
+from .inference import optimize_for_inference
 
 
 class ConditionalLGATr(nn.Module):
@@ -42,15 +51,36 @@ class ConditionalLGATr(nn.Module):
     hidden_s_channels : None or int
         If not None, sets the number of scalar hidden channels.
     attention: Dict
-        Data for SelfAttentionConfig.
+        Data for SelfAttentionConfig. A sequence of ``linear_attention`` flags selects the
+        attention kernel per block.
     crossattention: Dict
-        Data for CrossAttentionConfig.
+        Data for CrossAttentionConfig, with per-block ``linear_attention`` flags as above.
     mlp: Dict
         Data for MLPConfig.
     dropout_prob : float or None
         Dropout probability.
-    checkpoint_blocks : bool
-        Whether to use checkpointing for the transformer blocks to save memory.
+    checkpoint_blocks : bool or str
+        Activation checkpointing policy. If True or "block", full blocks are checkpointed to save
+        memory. "attention" or "mlp" only checkpoint the respective sublayers, and "selective"
+        saves matrix multiplication outputs while recomputing everything else.
+        See ``lgatr.utils.checkpoint.resolve_checkpoint_policy`` for details.
+    checkpoint_every : int
+        Only checkpoint every ``checkpoint_every``-th block.
+    offload_activations : bool or str or ActivationOffloader
+        Offload the activations saved for backward of each block. True or "cpu" moves them
+        to host memory, "disk" to memory-mapped scratch files. During backward, the
+        activations of the previous block are prefetched in the background.
+        See ``lgatr.utils.offload.ActivationOffloader`` for more options.
+    compile : bool or str
+        Whether to compile the model with torch.compile. The primitives are traced without graph
+        breaks, except for attention backends that are excluded from compilation.
+        True or "full" compiles the full network, "regional" compiles each block separately
+        and reuses the compiled code across blocks, which is much faster to compile for deep
+        networks. See ``lgatr.utils.compile.warmup`` for precompiling shape buckets.
+    compile_mode : str
+        torch.compile compilation mode, see torch docs for more information.
+    compile_dynamic : bool
+        Whether to use dynamic shapes with torch.compile.
     """
 
     def __init__(
@@ -68,7 +98,12 @@ class ConditionalLGATr(nn.Module):
         crossattention: CrossAttentionConfig,
         mlp: MLPConfig,
         dropout_prob: float | None = None,
-        checkpoint_blocks: bool = False,
+        checkpoint_blocks: bool | str = False,
+        checkpoint_every: int = 1,
+        offload_activations: bool | str | ActivationOffloader = False,
+        compile: bool | str = False,
+        compile_mode: str = "default",
+        compile_dynamic: bool = True,
     ) -> None:
         super().__init__()
 
@@ -83,6 +118,10 @@ class ConditionalLGATr(nn.Module):
         crossattention = CrossAttentionConfig.cast(crossattention)
         mlp = MLPConfig.cast(mlp)
 
+        self._checkpoint_policies = block_checkpoint_policies(
+            resolve_checkpoint_policy(checkpoint_blocks), num_blocks, checkpoint_every
+        )
+        self._offloader = resolve_offloader(offload_activations)
         self.blocks = nn.ModuleList(
             [
                 ConditionalLGATrBlock(
@@ -90,12 +129,18 @@ class ConditionalLGATr(nn.Module):
                     s_channels=hidden_s_channels,
                     condition_mv_channels=condition_mv_channels,
                     condition_s_channels=condition_s_channels,
-                    attention=attention,
-                    crossattention=crossattention,
+                    attention=block_attention,
+                    crossattention=block_crossattention,
                     mlp=mlp,
                     dropout_prob=dropout_prob,
+                    checkpoint_sublayers=policy,
+                )
+                for block_attention, block_crossattention, policy in zip(
+                    block_attention_configs(attention, num_blocks),
+                    block_attention_configs(crossattention, num_blocks),
+                    self._checkpoint_policies,
+                    strict=True,
                 )
-                for _ in range(num_blocks)
             ]
         )
         self.linear_out = EquiLinear(
@@ -104,8 +149,10 @@ class ConditionalLGATr(nn.Module):
             in_s_channels=hidden_s_channels,
             out_s_channels=out_s_channels,
         )
-        self._checkpoint_blocks = checkpoint_blocks
 
+        compile_network(self, compile, mode=compile_mode, dynamic=compile_dynamic)
+
+    @resolve_precision
     def forward(
         self,
         multivectors: torch.Tensor,
@@ -144,21 +191,14 @@ class ConditionalLGATr(nn.Module):
 
         # Decode condition into main track with
         h_mv, h_s = self.linear_in(multivectors, scalars=scalars)
-        for block in self.blocks:
-            if self._checkpoint_blocks:
-                h_mv, h_s = checkpoint(
+        for i, (block, policy) in enumerate(
+            zip(self.blocks, self._checkpoint_policies, strict=True)
+        ):
+            with offload_group(self._offloader, i):
+                h_mv, h_s = checkpoint_block(
                     block,
                     h_mv,
-                    use_reentrant=False,
-                    scalars=h_s,
-                    multivectors_condition=multivectors_condition,
-                    scalars_condition=scalars_condition,
-                    attn_kwargs=attn_kwargs,
-                    crossattn_kwargs=crossattn_kwargs,
-                )
-            else:
-                h_mv, h_s = block(
-                    h_mv,
+                    policy=policy,
                     scalars=h_s,
                     multivectors_condition=multivectors_condition,
                     scalars_condition=scalars_condition,
@@ -169,3 +209,10 @@ class ConditionalLGATr(nn.Module):
         outputs_mv, outputs_s = self.linear_out(h_mv, scalars=h_s)
 
         return outputs_mv, outputs_s
+
+    def freeze(self) -> "ConditionalLGATr":
+        """Returns a copy of the network that is optimized for inference.
+
+        See ``lgatr.nets.inference.optimize_for_inference`` for details.
+        """
+        return optimize_for_inference(self)
@@ -2,21 +2,37 @@
 
 import torch
 from torch import nn
-from torch.utils.checkpoint import checkpoint
 
+from ..primitives.attention import (
+    concat_features,
+    scaled_dot_product_attention,
+    small_set_attention,
+)
+from ..primitives.config import gatr_config, resolve_precision
+from ..utils.checkpoint import (
+    block_checkpoint_policies,
+    checkpoint_block,
+    checkpoint_sublayer,
+    resolve_checkpoint_policy,
+)
+from ..utils.compile import compile_network
+from ..utils.offload import ActivationOffloader, offload_group, resolve_offloader
 from .lgatr_slim import (
     MLP,
     Dropout,
     Linear,
     RMSNorm,
     SelfAttention,
-    _call_attention,
     _post_attention_reshape,
 )
 
 
 class CrossAttention(nn.Module):
-    """Cross-attention module for Lorentz vectors and scalar features."""
+    """Cross-attention module for Lorentz vectors and scalar features.
+
+    If ``small_set`` is set, the attention is evaluated with explicit batched matrix
+    multiplications, see ``lgatr.nets.small_set.optimize_for_small_sets``.
+    """
 
     def __init__(
         self,
@@ -32,6 +48,7 @@ class CrossAttention(nn.Module):
         self.hidden_v_channels = max(attn_ratio * q_v_channels // num_heads, 1)
         self.hidden_s_channels = max(attn_ratio * q_s_channels // num_heads, 4)
         self.num_heads = num_heads
+        self.small_set = False
 
         metric = torch.tensor([1.0, -1.0, -1.0, -1.0])
         self.register_buffer("metric", metric)
@@ -90,9 +107,10 @@ class CrossAttention(nn.Module):
         k_s, v_s = kv_s.unbind(0)
 
         q_v_mod = q_v * self.metric.to(q_v.dtype)
-        q = torch.cat([q_v_mod.flatten(start_dim=-2), q_s], dim=-1)
-        k = torch.cat([k_v.flatten(start_dim=-2), k_s], dim=-1)
-        v = torch.cat([v_v.flatten(start_dim=-2), v_s], dim=-1)
+        dtype = gatr_config.precision.compute_dtype("attention", q_s)
+        q = concat_features([q_v_mod.flatten(start_dim=-2), q_s], dtype=dtype)
+        k = concat_features([k_v.flatten(start_dim=-2), k_s], dtype=dtype)
+        v = concat_features([v_v.flatten(start_dim=-2), v_s], dtype=dtype)
         return q, k, v
 
     def forward(self, vectors, vectors_condition, scalars, scalars_condition, **attn_kwargs):
@@ -119,7 +137,8 @@ class CrossAttention(nn.Module):
         kv_v, kv_s = self.linear_in_kv(vectors_condition, scalars_condition)
 
         q, k, v = self._pre_attention_reshape(q_v, kv_v, q_s, kv_s)
-        out = _call_attention(q, k, v, **attn_kwargs)
+        attention = small_set_attention if self.small_set else scaled_dot_product_attention
+        out = attention(q, k, v, **attn_kwargs)
         h_v, h_s = _post_attention_reshape(out, self.hidden_v_channels)
 
         out_v, out_s = self.linear_out(h_v, h_s)
@@ -145,8 +164,10 @@ class ConditionalLGATrSlimBlock(nn.Module):
         attn_ratio: int = 1,
         num_layers_mlp: int = 2,
         dropout_prob: float | None = None,
+        checkpoint_sublayers: str | None = None,
     ):
         super().__init__()
+        self._checkpoint_sublayers = checkpoint_sublayers
 
         self.norm = RMSNorm()
 
@@ -211,7 +232,9 @@ class ConditionalLGATrSlimBlock(nn.Module):
 
         # self-attention block
         h_v, h_s = self.norm(vectors, scalars)
-        h_v, h_s = self.selfattention(
+        h_v, h_s = checkpoint_sublayer(
+            self.selfattention,
+            self._checkpoint_sublayers == "attention",
             h_v,
             h_s,
             **attn_kwargs,
@@ -221,7 +244,9 @@ class ConditionalLGATrSlimBlock(nn.Module):
 
         # cross-attention block
         h_v, h_s = self.norm(outputs_v, outputs_s)
-        h_v, h_s = self.crossattention(
+        h_v, h_s = checkpoint_sublayer(
+            self.crossattention,
+            self._checkpoint_sublayers == "attention",
             h_v,
             vectors_condition,
             h_s,
@@ -233,7 +258,7 @@ class ConditionalLGATrSlimBlock(nn.Module):
 
         # MLP block
         h_v, h_s = self.norm(outputs_v, outputs_s)
-        h_v, h_s = self.mlp(h_v, h_s)
+        h_v, h_s = checkpoint_sublayer(self.mlp, self._checkpoint_sublayers == "mlp", h_v, h_s)
         outputs_v = outputs_v + h_v
         outputs_s = outputs_s + h_s
 
@@ -260,8 +285,10 @@ class ConditionalLGATrSlim(nn.Module):
         attn_ratio: int = 1,
         num_layers_mlp: int = 2,
         dropout_prob: float | None = None,
-        checkpoint_blocks: bool = False,
-        compile: bool = False,
+        checkpoint_blocks: bool | str = False,
+        checkpoint_every: int = 1,
+        offload_activations: bool | str | ActivationOffloader = False,
+        compile: bool | str = False,
         compile_mode: str = "default",
         compile_dynamic: bool = True,
     ):
@@ -298,10 +325,22 @@ class ConditionalLGATrSlim(nn.Module):
             Number of layers in MLP, by default 2.
         dropout_prob : float | None, optional
             Dropout probability, by default None.
-        checkpoint_blocks : bool, optional
-            Whether to use gradient checkpointing for blocks, by default False.
-        compile : bool, optional
+        checkpoint_blocks : bool | str, optional
+            Activation checkpointing policy, by default False. True or "block" checkpoints
+            full blocks, "attention" or "mlp" only the respective sublayers, and "selective"
+            saves matrix multiplication outputs while recomputing everything else.
+            See ``lgatr.utils.checkpoint.resolve_checkpoint_policy`` for details.
+        checkpoint_every : int, optional
+            Only checkpoint every ``checkpoint_every``-th block, by default 1.
+        offload_activations : bool | str | ActivationOffloader, optional
+            Offload the activations saved for backward of each block, by default False.
+            True or "cpu" moves them to host memory, "disk" to memory-mapped scratch files.
+            See ``lgatr.utils.offload.ActivationOffloader`` for more options.
+        compile : bool | str, optional
             Whether to compile the model with torch.compile, by default False.
+            True or "full" compiles the full network, "regional" compiles each block separately
+            and reuses the compiled code across blocks, which is much faster to compile for deep
+            networks. See ``lgatr.utils.compile.warmup`` for precompiling shape buckets.
         compile_mode : str, optional
             Mode for torch.compile, by default "default".
         compile_dynamic : bool, optional
@@ -316,6 +355,10 @@ class ConditionalLGATrSlim(nn.Module):
             out_s_channels=hidden_s_channels,
         )
 
+        self._checkpoint_policies = block_checkpoint_policies(
+            resolve_checkpoint_policy(checkpoint_blocks), num_blocks, checkpoint_every
+        )
+        self._offloader = resolve_offloader(offload_activations)
         self.blocks = nn.ModuleList(
             [
                 ConditionalLGATrSlimBlock(
@@ -329,8 +372,9 @@ class ConditionalLGATrSlim(nn.Module):
                     attn_ratio=attn_ratio,
                     num_layers_mlp=num_layers_mlp,
                     dropout_prob=dropout_prob,
+                    checkpoint_sublayers=policy,
                 )
-                for _ in range(num_blocks)
+                for policy in self._checkpoint_policies
             ]
         )
 
@@ -340,16 +384,10 @@ class ConditionalLGATrSlim(nn.Module):
             out_v_channels=out_v_channels,
             out_s_channels=out_s_channels,
         )
-        self._checkpoint_blocks = checkpoint_blocks
 
-        if compile:
-            # ugly hack to make torch.compile convenient for users
-            # the clean solution is model = torch.compile(model, **kwargs) outside of the constructor
-            # note that we need fullgraph=False because of the torch.compiler.disable for attention
-            self.__class__ = torch.compile(
-                self.__class__, dynamic=compile_dynamic, mode=compile_mode
-            )
+        compile_network(self, compile, mode=compile_mode, dynamic=compile_dynamic)
 
+    @resolve_precision
     def forward(
         self,
         vectors,
@@ -385,20 +423,13 @@ class ConditionalLGATrSlim(nn.Module):
 
         h_v, h_s = self.linear_in(vectors, scalars)
 
-        for block in self.blocks:
-            if self._checkpoint_blocks:
-                h_v, h_s = checkpoint(
+        for i, (block, policy) in enumerate(
+            zip(self.blocks, self._checkpoint_policies, strict=True)
+        ):
+            with offload_group(self._offloader, i):
+                h_v, h_s = checkpoint_block(
                     block,
-                    vectors=h_v,
-                    scalars=h_s,
-                    vectors_condition=vectors_condition,
-                    scalars_condition=scalars_condition,
-                    use_reentrant=False,
-                    attn_kwargs=attn_kwargs,
-                    crossattn_kwargs=crossattn_kwargs,
-                )
-            else:
-                h_v, h_s = block(
+                    policy=policy,
                     vectors=h_v,
                     scalars=h_s,
                     vectors_condition=vectors_condition,
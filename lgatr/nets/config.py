@@ -0,0 +1,47 @@
+"""Construction of the networks from configuration mappings, e.g. read from JSON files."""
+
+from collections.abc import Mapping
+from typing import Any
+
+from torch import nn
+
+from .conditional_lgatr import ConditionalLGATr
+from .conditional_lgatr_slim import ConditionalLGATrSlim
+from .lgatr import LGATr
+from .lgatr_slim import LGATrSlim
+
+NETWORKS = dict(
+    LGATr=LGATr,
+    ConditionalLGATr=ConditionalLGATr,
+    LGATrSlim=LGATrSlim,
+    ConditionalLGATrSlim=ConditionalLGATrSlim,
+)
+
+
+def network_from_config(config: Mapping[str, Any]) -> nn.Module:
+    """Constructs a network from its class name and keyword arguments.
+
+    .. code-block::
+
+        model = network_from_config(
+            dict(net="LGATrSlim", in_v_channels=1, out_v_channels=1, hidden_v_channels=16,
+                 in_s_channels=0, out_s_channels=1, hidden_s_channels=32, num_blocks=4,
+                 num_heads=4)
+        )
+
+    Parameters
+    ----------
+    config : Mapping
+        Keyword arguments of the network together with its class name under the key ``"net"``,
+        one of ``NETWORKS``.
+
+    Returns
+    -------
+    torch.nn.Module
+        Network with freshly initialized parameters.
+    """
+    config = dict(config)
+    name = config.pop("net", None)
+    if name not in NETWORKS:
+        raise ValueError(f"Unknown network {name}, choose from {tuple(NETWORKS)}")
+    return NETWORKS[name](**config)
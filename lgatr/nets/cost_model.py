@@ -0,0 +1,522 @@
+"""Analytic FLOP and activation-memory cost model of the L-GATr networks."""
+
+import math
+from collections import defaultdict
+from collections.abc import Mapping
+from functools import cache
+from typing import Any
+
+import opt_einsum
+import torch
+from torch import nn
+from torch.func import functional_call
+
+from ..layers import EquiLayerNorm, EquiLinear, GeometricBilinear, ScalarGatedNonlinearity
+from ..layers.attention.attention import GeometricAttention
+from ..primitives.config import gatr_config
+from ..utils.checkpoint import block_checkpoint_policies, resolve_checkpoint_policy
+from . import conditional_lgatr_slim, lgatr_slim
+from .conditional_lgatr import ConditionalLGATr
+from .config import NETWORKS, network_from_config
+from .lgatr import LGATr
+
+KINDS = ("linear", "geometric_product", "attention", "norm", "nonlinearity")
+
+# "fused" kernels only store the logsumexp of the attention logits and recompute the attention
+# weights in the backward pass, "materialized" backends store the attention weights
+ATTENTION_BACKENDS = dict(
+    native="fused",
+    flex="fused",
+    varlen="fused",
+    xformers="fused",
+    flash="fused",
+    math="materialized",
+)
+
+# estimated FLOPs per element of elementwise operations
+_NORM_FLOPS = 5
+_NONLINEARITY_FLOPS = 8
+_SOFTMAX_FLOPS = 5
+
+
+def cost_model(
+    model: nn.Module | Mapping[str, Any],
+    items: int,
+    batch: int = 1,
+    condition_items: int | None = None,
+    backend: str = "native",
+    checkpoint_blocks: bool | str | None = None,
+    checkpoint_every: int = 1,
+    dtype: torch.dtype | None = None,
+) -> dict[str, Any]:
+    """Estimates the FLOPs and the activation memory of an L-GATr network without running it.
+
+    The network is traced once on the meta device to obtain the shapes of all layers, and the
+    costs of each layer are evaluated analytically:
+
+    - ``linear``: ``EquiLinear`` layers, including the contraction of the weights with the
+      equivariant basis maps, and the vector/scalar linear layers of the slim networks
+    - ``geometric_product``: the geometric products in ``GeometricBilinear``, contracted along
+      the same path as ``lgatr.utils.einsum.cached_einsum``
+    - ``attention``: the scaled dot products, softmax and weighted sums of the attention
+      layers, with the kernel of ``backend`` (or the linear or small-set variants if enabled)
+    - ``norm`` and ``nonlinearity``: elementwise operations, with estimated FLOPs per element
+
+    The activation memory consists of the tensors that are stored for the backward pass, taking
+    the checkpointing policy into account: checkpointed blocks or sublayers only store their
+    inputs and are evaluated a second time in the backward pass, and the ``"selective"`` policy
+    stores the outputs of matrix multiplications and recomputes elementwise operations.
+    Matrix multiplication FLOPs are exact, elementwise FLOPs and memory are estimates.
+
+    .. code-block::
+
+        cost = cost_model(dict(net="LGATr", **config), items=128, batch=32)
+        cost["flops_forward"], cost["peak_memory"], cost["layers"]["attention"]
+
+    Parameters
+    ----------
+    model : torch.nn.Module or Mapping
+        ``LGATr``, ``ConditionalLGATr``, ``LGATrSlim`` or ``ConditionalLGATrSlim`` network, or
+        the keyword arguments of one of these networks together with its class name under the
+        key ``"net"``.
+    items : int
+        Number of items per event.
+    batch : int
+        Number of events.
+    condition_items : int or None
+        Number of condition items per event of the conditional networks, defaults to ``items``.
+    backend : str
+        Attention backend, see ``ATTENTION_BACKENDS``. ``"math"`` stands for kernels that
+        materialize the attention weights, like the math fallback of the native backend.
+    checkpoint_blocks : bool or str or None
+        Checkpointing policy, see ``lgatr.utils.checkpoint.resolve_checkpoint_policy``.
+        Defaults to the policy of ``model``.
+    checkpoint_every : int
+        Only checkpoint every ``checkpoint_every``-th block, used with ``checkpoint_blocks``.
+    dtype : torch.dtype or None
+        Dtype of the activations, defaults to the dtype of the parameters of ``model``.
+
+    Returns
+    -------
+    dict
+        ``flops_forward`` and ``flops_backward`` (including recomputation for checkpointing),
+        ``activation_memory`` (bytes stored for the backward pass), ``peak_memory`` (largest
+        amount of activation memory in a training step, in bytes), ``peak_memory_inference``
+        (largest amount of activation memory in a forward pass without gradients, in bytes),
+        and ``layers`` with the ``calls``, ``flops_forward``, ``flops_backward`` and
+        ``activation_memory`` of each kind of layer, see ``KINDS``.
+    """
+    if backend not in ATTENTION_BACKENDS:
+        raise ValueError(
+            f"Unknown attention backend {backend}, choose from {tuple(ATTENTION_BACKENDS)}"
+        )
+    model = _network(model)
+    if dtype is None:
+        dtype = next(model.parameters()).dtype
+    condition_items = items if condition_items is None else condition_items
+    policies = (
+        model._checkpoint_policies
+        if checkpoint_blocks is None
+        else block_checkpoint_policies(
+            resolve_checkpoint_policy(checkpoint_blocks), len(model.blocks), checkpoint_every
+        )
+    )
+
+    tracer = _Tracer(model, ATTENTION_BACKENDS[backend], dtype.itemsize)
+    args, kwargs = _meta_inputs(model, batch, items, condition_items, dtype)
+    state = {
+        name: torch.empty_like(
+            tensor, device="meta", dtype=dtype if tensor.is_floating_point() else tensor.dtype
+        )
+        for name, tensor in [*model.named_parameters(), *model.named_buffers()]
+    }
+    with tracer, torch.no_grad():
+        functional_call(model, state, args, kwargs)
+    return tracer.costs(policies)
+
+
+def _network(model: nn.Module | Mapping[str, Any]) -> nn.Module:
+    """Returns ``model`` or constructs the network described by the mapping."""
+    if isinstance(model, nn.Module):
+        if not isinstance(model, tuple(NETWORKS.values())):
+            raise ValueError(f"Unsupported network {type(model).__name__}")
+        return model
+    return network_from_config({**model, "compile": False})
+
+
+def _meta_inputs(
+    model: nn.Module, batch: int, items: int, condition_items: int, dtype: torch.dtype
+) -> tuple[tuple, dict]:
+    """Inputs of ``model.forward`` on the meta device."""
+
+    def empty(items, channels, *shape):
+        if channels is None:
+            return None
+        return torch.empty(batch, items, channels, *shape, dtype=dtype, device="meta")
+
+    if isinstance(model, (LGATr, ConditionalLGATr)):
+        linear = model.linear_in
+        x = empty(items, linear._in_mv_channels, 16)
+        s = empty(items, linear._in_s_channels)
+        if isinstance(model, LGATr):
+            return (x,), dict(scalars=s)
+        linear = model.blocks[0].crossattention.kv_linear
+        x_c = empty(condition_items, linear._in_mv_channels, 16)
+        s_c = empty(condition_items, linear._in_s_channels)
+        return (x, x_c), dict(scalars=s, scalars_condition=s_c)
+
+    linear = model.linear_in
+    v = empty(items, linear._in_v_channels, 4)
+    s = empty(items, linear._in_s_channels)
+    if isinstance(model, lgatr_slim.LGATrSlim):
+        return (v, s), {}
+    linear = model.blocks[0].crossattention.linear_in_kv
+    v_c = empty(condition_items, linear._in_v_channels, 4)
+    s_c = empty(condition_items, linear._in_s_channels)
+    return (v, v_c, s, s_c), {}
+
+
+class _Tracer:
+    """Records the costs of each layer call with forward hooks.
+
+    Each record stores the forward and backward FLOPs, the bytes that are stored for the
+    backward pass (``saved``), the bytes of the matrix multiplication outputs that are stored
+    with selective checkpointing (``saved_selective``), and the bytes of temporary buffers
+    (``workspace``).
+    """
+
+    def __init__(self, model: nn.Module, attention: str, itemsize: int) -> None:
+        self.model = model
+        self.attention = attention
+        self.itemsize = itemsize
+        self.records: list[dict[str, Any]] = []
+        self.inputs: dict[tuple, int] = {}
+        self._handles = []
+
+    def __enter__(self) -> "_Tracer":
+        layers = (
+            EquiLinear,
+            lgatr_slim.Linear,
+            GeometricBilinear,
+            GeometricAttention,
+            lgatr_slim.SelfAttention,
+            conditional_lgatr_slim.CrossAttention,
+            EquiLayerNorm,
+            lgatr_slim.RMSNorm,
+            ScalarGatedNonlinearity,
+            lgatr_slim.GatedLinearUnit,
+        )
+        for name, module in self.model.named_modules():
+            location = _location(name)
+            hooks = []
+            if location is not None and name.count(".") == (1 if location[1] is None else 2):
+                # blocks and their sublayers, which store their inputs if they are checkpointed
+                hooks.append(self._input_hook(location))
+            if isinstance(module, layers):
+                hooks.append(self._layer_hook(name, location))
+            for hook in hooks:
+                self._handles.append(module.register_forward_hook(hook, with_kwargs=True))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+
+    def _input_hook(self, location: tuple):
+        def hook(module, args, kwargs, outputs):
+            tensors = [*args, *kwargs.values()]
+            self.inputs[location] = sum(self._bytes(t) for t in tensors if torch.is_tensor(t))
+
+        return hook
+
+    def _layer_hook(self, name: str, location: tuple | None):
+        def hook(module, args, kwargs, outputs):
+            inputs = [*args, *kwargs.values()]
+            kind, record = _layer_costs(module, inputs, outputs, self.attention)
+            for key in ("saved", "saved_selective", "workspace"):
+                record[key] = record.get(key, 0) * self.itemsize
+            record.update(
+                name=name,
+                kind=kind,
+                location=location,
+                inputs=sum(self._bytes(t) for t in inputs if torch.is_tensor(t)),
+                outputs=sum(self._bytes(t) for t in outputs if torch.is_tensor(t)),
+            )
+            self.records.append(record)
+
+        return hook
+
+    def _bytes(self, tensor: torch.Tensor) -> int:
+        return tensor.numel() * self.itemsize
+
+    def costs(self, policies: list) -> dict[str, Any]:
+        """Aggregates the records for the checkpointing policy of each block."""
+        layers = {
+            kind: dict(calls=0, flops_forward=0, flops_backward=0, activation_memory=0)
+            for kind in KINDS
+        }
+        # a layer needs its inputs, outputs and temporary buffers, or their gradients
+        transient = 0
+        regions = set()
+        recompute = defaultdict(int)  # bytes stored while a checkpointed region is recomputed
+        for record in self.records:
+            row = layers[record["kind"]]
+            layer = record["inputs"] + record["outputs"] + record["workspace"]
+            policy, region = self._policy(record["location"], policies)
+            flops_backward, saved = record["flops_backward"], record["saved"]
+            if policy == "selective":
+                if record["kind"] in ("norm", "nonlinearity"):
+                    flops_backward += record["flops_forward"]
+                saved = record["saved_selective"]
+            elif policy is not None:
+                flops_backward += record["flops_forward"]
+                recompute[region] += saved
+                layer += recompute[region]
+                saved = 0
+            if region is not None:
+                regions.add(region)
+            transient = max(transient, layer)
+            row["calls"] += 1
+            row["flops_forward"] += record["flops_forward"]
+            row["flops_backward"] += flops_backward
+            row["activation_memory"] += saved
+
+        # checkpointed regions store their inputs instead
+        checkpointed = sum(self.inputs.get(region, 0) for region in regions)
+        activation_memory = checkpointed + sum(row["activation_memory"] for row in layers.values())
+        inference = max(
+            (
+                record["inputs"]
+                + record["outputs"]
+                + record["workspace"]
+                # the residual stream of the block
+                + (0 if record["location"] is None else self.inputs[record["location"][0], None])
+                for record in self.records
+            ),
+            default=0,
+        )
+        return dict(
+            flops_forward=sum(row["flops_forward"] for row in layers.values()),
+            flops_backward=sum(row["flops_backward"] for row in layers.values()),
+            activation_memory=activation_memory,
+            peak_memory=activation_memory + transient,
+            peak_memory_inference=inference,
+            layers=layers,
+        )
+
+    @staticmethod
+    def _policy(location: tuple | None, policies: list) -> tuple[Any, tuple | None]:
+        """Checkpointing policy that applies to a layer, and the checkpointed region."""
+        if location is None:
+            return None, None
+        block, sublayer = location
+        policy = policies[block]
+        if policy is None:
+            return None, None
+        if policy in ("attention", "mlp"):
+            if sublayer is None or _SUBLAYERS.get(sublayer) != policy:
+                return None, None
+            return "block", location
+        if policy != "block":
+            policy = "selective"
+        return policy, (block, None)
+
+
+# checkpointing policy that applies to the sublayers of the blocks
+_SUBLAYERS = dict(
+    attention="attention", selfattention="attention", crossattention="attention", mlp="mlp"
+)
+
+
+def _location(name: str) -> tuple[int, str | None] | None:
+    """Block index and checkpointable sublayer of a module, e.g. (3, "mlp") for
+    ``blocks.3.mlp.layers.0``, or None outside of the blocks."""
+    parts = name.split(".")
+    if len(parts) < 2 or parts[0] != "blocks":
+        return None
+    sublayer = parts[2] if len(parts) > 2 and parts[2] in _SUBLAYERS else None
+    return int(parts[1]), sublayer
+
+
+def _layer_costs(
+    module: nn.Module, inputs: list, outputs: Any, attention: str
+) -> tuple[str, dict[str, int]]:
+    """Kind and costs of a layer call, with memory in elements."""
+    if isinstance(module, EquiLinear):
+        return "linear", _equi_linear_costs(module, *inputs)
+    if isinstance(module, lgatr_slim.Linear):
+        return "linear", _slim_linear_costs(module, *inputs)
+    if isinstance(module, GeometricBilinear):
+        hidden = module.linear_left._out_mv_channels
+        tokens = inputs[0].numel() // (16 * module.linear_left._in_mv_channels)
+        return "geometric_product", _geometric_product_costs(tokens * hidden)
+    if isinstance(module, GeometricAttention):
+        q_mv, k_mv, v_mv, q_s, k_s, v_s = inputs[:6]
+        q = _flat_shape(q_mv, q_s)
+        k = _flat_shape(k_mv, k_s)
+        v = _flat_shape(v_mv, v_s)
+        return "attention", _attention_costs(module, q, k, v, attention)
+    if isinstance(module, (lgatr_slim.SelfAttention, conditional_lgatr_slim.CrossAttention)):
+        channels = 4 * module.hidden_v_channels + module.hidden_s_channels
+        batch_shape = (*inputs[0].shape[:-3], module.num_heads)
+        items_q = inputs[0].shape[-3]
+        items_k = items_q if isinstance(module, lgatr_slim.SelfAttention) else inputs[1].shape[-3]
+        q = (*batch_shape, items_q, channels)
+        k = (*batch_shape, items_k, channels)
+        return "attention", _attention_costs(module, q, k, k, attention)
+    mv, s = inputs[0].numel(), _numel(inputs[1] if len(inputs) > 1 else None)
+    if isinstance(module, EquiLayerNorm):
+        # the inputs, the normalized outputs and the grade-wise squared norms
+        return "norm", _elementwise_costs(mv + s, _NORM_FLOPS, 2 * mv + 5 * mv // 16 + s)
+    if isinstance(module, lgatr_slim.RMSNorm):
+        return "norm", _elementwise_costs(mv + s, _NORM_FLOPS, mv + 2 * s)
+    if isinstance(module, ScalarGatedNonlinearity):
+        costs = _elementwise_costs(mv + s, _NONLINEARITY_FLOPS, mv + mv // 16 + s)
+        return "nonlinearity", costs
+    if isinstance(module, lgatr_slim.GatedLinearUnit):
+        # the inputs of the gates are three (two) times larger than the vector (scalar) outputs
+        v, s = (x.numel() for x in outputs)
+        costs = _elementwise_costs(3 * (v + s), _NONLINEARITY_FLOPS, 3 * v + v // 2 + 3 * s)
+        return "nonlinearity", costs
+    raise ValueError(f"Unsupported layer {type(module).__name__}")
+
+
+def _equi_linear_costs(
+    module: EquiLinear, multivectors: torch.Tensor, scalars: torch.Tensor | None = None, *_
+) -> dict[str, int]:
+    """``equi_linear`` contracts the weights with the basis maps and then multiplies the
+    resulting (out, in, 16, 16) matrix with the multivectors, see ``lgatr.primitives.linear``."""
+    in_mv, out_mv = module._in_mv_channels, module._out_mv_channels
+    tokens = multivectors.numel() // (16 * in_mv)
+    weights = out_mv * in_mv * 16**2
+    basis = 2 * weights * gatr_config.num_pin_linear_basis_elements
+    flops = 2 * tokens * weights
+    # the contracted weights are stored as well
+    saved, saved_selective = weights + tokens * in_mv * 16, weights + tokens * out_mv * 16
+    linears = [module.mvs2s]
+    if scalars is not None:
+        linears += [module.s2mvs, module.s2s]
+        if module.s2mvs is not None or module.s2s is not None:
+            saved += scalars.numel()
+    for linear in linears:
+        if linear is None:
+            continue
+        flops += 2 * tokens * linear.in_features * linear.out_features
+        saved_selective += tokens * linear.out_features
+    if module.mvs2s is not None:
+        saved += tokens * module.mvs2s.in_features
+    return dict(
+        flops_forward=basis + flops,
+        flops_backward=basis + 2 * flops,
+        saved=saved,
+        saved_selective=saved_selective,
+        workspace=2 * weights,
+    )
+
+
+def _slim_linear_costs(
+    module: lgatr_slim.Linear, vectors: torch.Tensor, scalars: torch.Tensor, *_
+) -> dict[str, int]:
+    in_v, out_v = module._in_v_channels, module._out_v_channels
+    in_s, out_s = module._in_s_channels, module._out_s_channels
+    tokens = vectors.numel() // (4 * in_v)
+    flops = 2 * tokens * (4 * out_v * in_v + out_s * in_s)
+    return dict(
+        flops_forward=flops,
+        flops_backward=2 * flops,
+        saved=tokens * (4 * in_v + in_s),
+        saved_selective=tokens * (4 * out_v + out_s),
+        workspace=tokens * 4 * (in_v + out_v),
+    )
+
+
+def _geometric_product_costs(multivectors: int) -> dict[str, int]:
+    """The geometric product of ``multivectors`` pairs, see ``lgatr.primitives.bilinear``.
+
+    The intermediate outer product is only multiplied with the constant geometric product
+    tensor, so it is not stored for the backward pass.
+    """
+    flops, intermediate = _contraction("i j k, ... j, ... k -> ... i", multivectors)
+    return dict(
+        flops_forward=flops,
+        flops_backward=2 * flops,
+        saved=2 * 16 * multivectors,
+        saved_selective=16 * multivectors,
+        workspace=intermediate,
+    )
+
+
+@cache
+def _contraction(equation: str, multivectors: int) -> tuple[int, int]:
+    """FLOPs and size of the intermediate result of the contraction path chosen by
+    ``lgatr.utils.einsum.cached_einsum``, which applies per multivector."""
+    shapes = [(16, 16, 16), (multivectors, 16), (multivectors, 16)]
+    _, info = opt_einsum.contract_path(equation, *shapes, optimize="optimal", shapes=True)
+    return int(info.opt_cost), int(info.largest_intermediate)
+
+
+def _attention_costs(
+    module: nn.Module, q: tuple, k: tuple, v: tuple, attention: str
+) -> dict[str, int]:
+    """Costs of attention with queries, keys and values of the given shapes (..., items, channels).
+
+    Fused kernels store the logsumexp and recompute the attention weights in the backward pass,
+    which costs one more matrix multiplication. The small-set variant always materializes the
+    attention weights, and the linear variant replaces them with second-order Taylor features.
+    """
+    batch_heads = math.prod(torch.broadcast_shapes(q[:-2], k[:-2]))
+    items_q, items_k, channels, channels_v = q[-2], k[-2], q[-1], v[-1]
+    q_numel = batch_heads * items_q * channels
+    kv_numel = math.prod(k) + math.prod(v)
+    out_numel = batch_heads * items_q * channels_v
+
+    if getattr(module, "linear_attention", False):
+        features = 1 + channels * (channels + 3) // 2
+        pairs = batch_heads * (items_q + items_k) * features
+        flops = 2 * pairs * (channels_v + 1) + 3 * pairs
+        return dict(
+            flops_forward=flops,
+            flops_backward=2 * flops,
+            saved=q_numel + kv_numel + pairs + out_numel,
+            saved_selective=pairs + out_numel,
+            workspace=batch_heads * max(items_q, items_k) * features,
+        )
+
+    weights = batch_heads * items_q * items_k
+    matmuls = 2 * weights * (channels + channels_v)
+    flops = matmuls + _SOFTMAX_FLOPS * weights
+    if attention == "fused" and not getattr(module, "small_set", False):
+        return dict(
+            flops_forward=flops,
+            flops_backward=2 * flops + 2 * weights * channels,
+            saved=q_numel + kv_numel + out_numel + batch_heads * items_q,
+            saved_selective=out_numel + batch_heads * items_q,
+        )
+    return dict(
+        flops_forward=flops,
+        flops_backward=2 * flops,
+        saved=q_numel + kv_numel + weights + out_numel,
+        saved_selective=2 * weights + out_numel,
+        workspace=2 * weights,
+    )
+
+
+def _elementwise_costs(numel: int, flops_per_element: int, saved: int) -> dict[str, int]:
+    return dict(
+        flops_forward=flops_per_element * numel,
+        flops_backward=2 * flops_per_element * numel,
+        saved=saved,
+        saved_selective=0,
+        workspace=saved,
+    )
+
+
+def _numel(x: torch.Tensor | None) -> int:
+    return 0 if x is None else x.numel()
+
+
+def _flat_shape(mv: torch.Tensor, s: torch.Tensor | None) -> tuple[int, ...]:
+    """Shape of the queries, keys or values after ``lgatr.primitives.attention.geometric_qkv``."""
+    channels = 16 * mv.shape[-2] + (0 if s is None else s.shape[-1])
+    return (*mv.shape[:-2], channels)
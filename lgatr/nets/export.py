@@ -0,0 +1,119 @@
+"""Ahead-of-time export of the L-GATr networks."""
+
+import inspect
+from typing import Any
+
+import torch
+from torch import Tensor, nn
+
+from ..utils.misc import mark_compile_constants
+
+
+def export_model(
+    model: nn.Module,
+    args: tuple,
+    kwargs: dict[str, Any] | None = None,
+    dynamic_batch: bool = True,
+    dynamic_items: bool = True,
+) -> torch.export.ExportedProgram:
+    """Exports an L-GATr network with ``torch.export``.
+
+    Works for ``LGATr``, ``ConditionalLGATr``, ``LGATrSlim``, ``ConditionalLGATrSlim`` and their
+    ``optimize_for_inference`` versions. All tensor inputs are expected to have the shape
+    (batch, items, ...), the batch and item dimensions are exported as dynamic dimensions.
+    Inputs with ``condition`` in their name share the batch dimension,
+    but have a separate item dimension. The example inputs should have batch and item dimensions
+    larger than 1, otherwise they are specialized to the example values.
+    The attention backend is selected at export time based on ``kwargs``.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network to export, in eval mode.
+    args : tuple
+        Example positional arguments of ``model.forward``.
+    kwargs : dict or None
+        Example keyword arguments of ``model.forward``.
+    dynamic_batch : bool
+        Whether the batch dimension is dynamic.
+    dynamic_items : bool
+        Whether the item dimensions are dynamic.
+
+    Returns
+    -------
+    torch.export.ExportedProgram
+        Exported program, call ``exported.module()`` to evaluate it in Python.
+    """
+    kwargs = {} if kwargs is None else kwargs
+    dims = {
+        "batch": torch.export.Dim("batch") if dynamic_batch else None,
+        "items": torch.export.Dim("items") if dynamic_items else None,
+        "items_condition": torch.export.Dim("items_condition") if dynamic_items else None,
+    }
+
+    bound = inspect.signature(model.forward).bind(*args, **kwargs)
+    dynamic_shapes = {}
+    for name, value in bound.arguments.items():
+        if not isinstance(value, Tensor) or value.dim() < 2:
+            dynamic_shapes[name] = None
+            continue
+        items = dims["items_condition"] if "condition" in name else dims["items"]
+        spec = {0: dims["batch"], 1: items}
+        dynamic_shapes[name] = {dim: d for dim, d in spec.items() if d is not None} or None
+
+    # strict mode traces the model with dynamo, which treats the cached basis loaders as constants
+    mark_compile_constants()
+    return torch.export.export(model, args, kwargs, dynamic_shapes=dynamic_shapes, strict=True)
+
+
+def aot_compile(
+    model: nn.Module | torch.export.ExportedProgram,
+    package_path: str,
+    args: tuple | None = None,
+    kwargs: dict[str, Any] | None = None,
+    **export_kwargs: Any,
+) -> str:
+    """Compiles an L-GATr network with AOTInductor into a self-contained package.
+
+    The package can be loaded with ``load_aot_package`` in Python, or with
+    ``torch::inductor::AOTIModelPackageLoader`` in a C++ runtime.
+
+    Parameters
+    ----------
+    model : torch.nn.Module or torch.export.ExportedProgram
+        Network to compile, or the result of ``export_model``.
+    package_path : str
+        Path of the ``.pt2`` package.
+    args : tuple or None
+        Example positional arguments, required if ``model`` is not exported yet.
+    kwargs : dict or None
+        Example keyword arguments.
+    **export_kwargs
+        Further arguments for ``export_model``.
+
+    Returns
+    -------
+    str
+        Path of the compiled package.
+    """
+    if isinstance(model, nn.Module):
+        if args is None:
+            raise ValueError("Example inputs are required to export the model")
+        model = export_model(model, args, kwargs, **export_kwargs)
+    return torch._inductor.aoti_compile_and_package(model, package_path=package_path)
+
+
+def load_aot_package(package_path: str):
+    """Loads a package compiled with ``aot_compile``.
+
+    Parameters
+    ----------
+    package_path : str
+        Path of the ``.pt2`` package.
+
+    Returns
+    -------
+    Callable
+        Compiled model with the call signature of the original ``forward``.
+    """
+    return torch._inductor.aoti_load_package(package_path)
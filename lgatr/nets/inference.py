@@ -0,0 +1,117 @@
+"""Inference transforms for the L-GATr networks."""
+
+import copy
+
+import torch
+from torch import nn
+
+from ..layers.attention.cross_attention import CrossAttention
+from ..layers.attention.qkv import MultiQueryQKVModule, QKVModule
+from ..layers.attention.self_attention import SelfAttention
+from ..layers.dropout import GradeDropout
+from ..layers.linear import EquiLinear, FrozenEquiLinear
+from ..layers.mlp.mlp import GeoMLP
+from ..primitives.invariants import _load_inner_product_factors
+
+
+def optimize_for_inference(model: nn.Module, inplace: bool = False) -> nn.Module:
+    """Rewrites an L-GATr network or layer for serving.
+
+    Evaluating a trained network repeats a lot of constant work in every forward pass. This
+    transform precomputes it once:
+
+    - every ``EquiLinear`` is replaced by a ``FrozenEquiLinear``, which composes the weights with
+      the equivariant basis maps, the scalar-multivector mixing and ``embed_scalar(bias)`` into a
+      single dense matrix
+    - the ``head_scale`` of the attention layers is folded into their output projection
+    - the inner product factors that are applied to the multivector queries in every attention
+      call are folded into the query projection
+    - ``GradeDropout`` layers are removed
+
+    The result is numerically equivalent to ``model.eval()`` up to floating-point rounding.
+    It has no trainable parameters and does not support gradient-based training anymore.
+    Works for ``LGATr``, ``ConditionalLGATr`` and their layers.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network or layer to optimize.
+    inplace : bool
+        If False, the transform is applied to a copy of ``model``.
+
+    Returns
+    -------
+    torch.nn.Module
+        Optimized network in eval mode.
+    """
+    if not inplace:
+        model = copy.deepcopy(model)
+    model.eval()
+
+    # Dropout is the identity in eval mode
+    for module in model.modules():
+        if isinstance(module, SelfAttention | CrossAttention):
+            module.dropout = None
+        elif isinstance(module, GeoMLP):
+            module.layers = nn.ModuleList(
+                [layer for layer in module.layers if not isinstance(layer, GradeDropout)]
+            )
+
+    # Compose linear layers
+    if isinstance(model, EquiLinear):
+        model = FrozenEquiLinear.from_equi_linear(model)
+    for parent in list(model.modules()):
+        for name, child in parent.named_children():
+            if isinstance(child, EquiLinear):
+                setattr(parent, name, FrozenEquiLinear.from_equi_linear(child))
+
+    # Fold constant factors into the attention projections
+    for module in model.modules():
+        if isinstance(module, SelfAttention | CrossAttention):
+            _fold_head_scale(module)
+            _fold_query_metric(module)
+
+    return model.requires_grad_(False)
+
+
+@torch.no_grad()
+def _fold_head_scale(attention: SelfAttention | CrossAttention) -> None:
+    """Folds the head scale into the inputs of the output projection, which are ordered as
+    (heads, hidden_channels)."""
+    if not attention.use_head_scale:
+        return
+    config = attention.config
+    head_scale = attention.head_scale.detach()
+    attention.out_linear.scale_inputs(
+        head_scale.repeat_interleave(config.hidden_mv_channels)[:, None],
+        head_scale.repeat_interleave(config.hidden_s_channels),
+    )
+    attention.use_head_scale = False
+    del attention.head_scale
+
+
+@torch.no_grad()
+def _fold_query_metric(attention: SelfAttention | CrossAttention) -> None:
+    """Folds the inner product factors into the multivector outputs of the query projection.
+
+    The factors are +-1 and leave the GA norm invariant, so they commute with the ``EquiLayerNorm``
+    that is applied to the queries in self-attention.
+    """
+    config = attention.config
+    num_query_channels = config.hidden_mv_channels * config.num_heads
+    if isinstance(attention, CrossAttention):
+        linear = attention.q_linear
+    elif isinstance(attention.qkv_module, MultiQueryQKVModule):
+        linear = attention.qkv_module.q_linear
+    else:
+        assert isinstance(attention.qkv_module, QKVModule)
+        # outputs are ordered as (qkv, hidden_channels, heads), starting with the queries
+        linear = attention.qkv_module.in_linear
+
+    weight = linear.weight
+    factors = torch.ones(linear._out_mv_channels, 16, device=weight.device, dtype=weight.dtype)
+    factors[:num_query_channels] = _load_inner_product_factors(
+        device=weight.device, dtype=weight.dtype
+    )
+    linear.scale_outputs(factors)
+    attention.attention.query_metric = False
@@ -4,12 +4,21 @@ from dataclasses import replace
 
 import torch
 from torch import nn
-from torch.utils.checkpoint import checkpoint
 
-from ..layers.attention.config import SelfAttentionConfig
+from ..layers.attention.config import SelfAttentionConfig, block_attention_configs
 from ..layers.lgatr_block import LGATrBlock
 from ..layers.linear import EquiLinear
 from ..layers.mlp.config import MLPConfig
+from ..primitives.config import resolve_precision
+from ..primitives.pairwise import pairwise_bias_features
+from ..utils.checkpoint import (
+    block_checkpoint_policies,
+    checkpoint_block,
+    resolve_checkpoint_policy,
+)
+from ..utils.compile import compile_network
+from ..utils.offload import ActivationOffloader, offload_group, resolve_offloader
+from .inference import optimize_for_inference
 
 
 class LGATr(nn.Module):
@@ -40,7 +49,8 @@ class LGATr(nn.Module):
     hidden_s_channels : None or int
         If not None, sets the number of scalar hidden channels.
     attention: Dict
-        Data for SelfAttentionConfig
+        Data for SelfAttentionConfig. A sequence of ``linear_attention`` flags selects the
+        attention kernel per block.
     mlp: Dict
         Data for MLPConfig
     reinsert_mv_channels : None or Tuple[int]
@@ -49,8 +59,28 @@ class LGATr(nn.Module):
         If not None, specifies scalar channels that will be reinserted in every attention layer.
     dropout_prob : float or None
         Dropout probability
-    checkpoint_blocks : bool
-        Whether to use checkpointing for the blocks. If True, will save memory at the cost of speed.
+    checkpoint_blocks : bool or str
+        Activation checkpointing policy. If True or "block", full blocks are checkpointed, which
+        saves memory at the cost of speed. "attention" or "mlp" only checkpoint the respective
+        sublayers, and "selective" saves matrix multiplication outputs while recomputing
+        everything else. See ``lgatr.utils.checkpoint.resolve_checkpoint_policy`` for details.
+    checkpoint_every : int
+        Only checkpoint every ``checkpoint_every``-th block.
+    offload_activations : bool or str or ActivationOffloader
+        Offload the activations saved for backward of each block. True or "cpu" moves them
+        to host memory, "disk" to memory-mapped scratch files. During backward, the
+        activations of the previous block are prefetched in the background.
+        See ``lgatr.utils.offload.ActivationOffloader`` for more options.
+    compile : bool or str
+        Whether to compile the model with torch.compile. The primitives are traced without graph
+        breaks, except for attention backends that are excluded from compilation.
+        True or "full" compiles the full network, "regional" compiles each block separately
+        and reuses the compiled code across blocks, which is much faster to compile for deep
+        networks. See ``lgatr.utils.compile.warmup`` for precompiling shape buckets.
+    compile_mode : str
+        torch.compile compilation mode, see torch docs for more information.
+    compile_dynamic : bool
+        Whether to use dynamic shapes with torch.compile.
     """
 
     def __init__(
@@ -67,7 +97,12 @@ class LGATr(nn.Module):
         reinsert_mv_channels: tuple[int] | None = None,
         reinsert_s_channels: tuple[int] | None = None,
         dropout_prob: float | None = None,
-        checkpoint_blocks: bool = False,
+        checkpoint_blocks: bool | str = False,
+        checkpoint_every: int = 1,
+        offload_activations: bool | str | ActivationOffloader = False,
+        compile: bool | str = False,
+        compile_mode: str = "default",
+        compile_dynamic: bool = True,
     ) -> None:
         super().__init__()
         self.linear_in = EquiLinear(
@@ -84,16 +119,25 @@ class LGATr(nn.Module):
             additional_qk_s_channels=0 if reinsert_s_channels is None else len(reinsert_s_channels),
         )
         mlp = MLPConfig.cast(mlp)
+        self._checkpoint_policies = block_checkpoint_policies(
+            resolve_checkpoint_policy(checkpoint_blocks), num_blocks, checkpoint_every
+        )
+        self._offloader = resolve_offloader(offload_activations)
         self.blocks = nn.ModuleList(
             [
                 LGATrBlock(
                     mv_channels=hidden_mv_channels,
                     s_channels=hidden_s_channels,
-                    attention=attention,
+                    attention=block_attention,
                     mlp=mlp,
                     dropout_prob=dropout_prob,
+                    checkpoint_sublayers=policy,
+                )
+                for block_attention, policy in zip(
+                    block_attention_configs(attention, num_blocks),
+                    self._checkpoint_policies,
+                    strict=True,
                 )
-                for _ in range(num_blocks)
             ]
         )
         self.linear_out = EquiLinear(
@@ -104,12 +148,15 @@ class LGATr(nn.Module):
         )
         self._reinsert_s_channels = reinsert_s_channels
         self._reinsert_mv_channels = reinsert_mv_channels
-        self._checkpoint_blocks = checkpoint_blocks
 
+        compile_network(self, compile, mode=compile_mode, dynamic=compile_dynamic)
+
+    @resolve_precision
     def forward(
         self,
         multivectors: torch.Tensor,
         scalars: torch.Tensor | None = None,
+        pair_vectors: torch.Tensor | None = None,
         **attn_kwargs,
     ) -> tuple[torch.Tensor, torch.Tensor | None]:
         """Forward pass of the network.
@@ -120,6 +167,9 @@ class LGATr(nn.Module):
             Input multivectors with shape (..., items, in_mv_channels, 16).
         scalars : None or torch.Tensor
             Optional input scalars with shape (..., items, in_s_channels).
+        pair_vectors : None or torch.Tensor
+            Optional Lorentz vectors (E, px, py, pz) with shape (..., items, 4) from which the
+            pairwise attention bias is computed, if enabled with ``attention.pairwise_bias``.
         **attn_kwargs
             Optional keyword arguments passed to attention.
 
@@ -137,22 +187,20 @@ class LGATr(nn.Module):
             additional_qk_features_s,
         ) = self._construct_reinserted_channels(multivectors, scalars)
 
+        # Per-item features for the pairwise attention bias, shared across blocks
+        if pair_vectors is not None:
+            attn_kwargs["pair_features"] = pairwise_bias_features(pair_vectors)
+
         # Pass through the blocks
         h_mv, h_s = self.linear_in(multivectors, scalars=scalars)
-        for block in self.blocks:
-            if self._checkpoint_blocks:
-                h_mv, h_s = checkpoint(
+        for i, (block, policy) in enumerate(
+            zip(self.blocks, self._checkpoint_policies, strict=True)
+        ):
+            with offload_group(self._offloader, i):
+                h_mv, h_s = checkpoint_block(
                     block,
                     h_mv,
-                    use_reentrant=False,
-                    scalars=h_s,
-                    additional_qk_features_mv=additional_qk_features_mv,
-                    additional_qk_features_s=additional_qk_features_s,
-                    **attn_kwargs,
-                )
-            else:
-                h_mv, h_s = block(
-                    h_mv,
+                    policy=policy,
                     scalars=h_s,
                     additional_qk_features_mv=additional_qk_features_mv,
                     additional_qk_features_s=additional_qk_features_s,
@@ -163,6 +211,13 @@ class LGATr(nn.Module):
 
         return outputs_mv, outputs_s
 
+    def freeze(self) -> "LGATr":
+        """Returns a copy of the network that is optimized for inference.
+
+        See ``lgatr.nets.inference.optimize_for_inference`` for details.
+        """
+        return optimize_for_inference(self)
+
     def _construct_reinserted_channels(self, multivectors, scalars):
         """Constructs input features that will be reinserted in every attention layer."""
 
@@ -1,14 +1,32 @@
 """Equivariant transformer for vector and scalar data."""
 
 import math
+from collections.abc import Sequence
 
 import torch
 from torch import nn
 from torch.nn.functional import dropout, dropout1d
-from torch.utils.checkpoint import checkpoint
 
-from ..primitives.attention import scaled_dot_product_attention
-from ..utils.misc import minimum_autocast_precision
+from ..layers.attention.config import block_linear_attention
+from ..layers.quantization import Int8Linear
+from ..primitives.attention import (
+    concat_features,
+    linear_scaled_dot_product_attention,
+    pairwise_biased_attention,
+    scaled_dot_product_attention,
+    small_set_attention,
+)
+from ..primitives.config import gatr_config, resolve_precision
+from ..primitives.pairwise import pairwise_bias_features
+from ..primitives.quantization import int8_linear, quantize_per_channel
+from ..utils.checkpoint import (
+    block_checkpoint_policies,
+    checkpoint_block,
+    checkpoint_sublayer,
+    resolve_checkpoint_policy,
+)
+from ..utils.compile import compile_network
+from ..utils.offload import ActivationOffloader, offload_group, resolve_offloader
 
 
 def get_nonlinearity(label):
@@ -35,11 +53,6 @@ def _post_attention_reshape(out, hidden_v_channels):
     return h_v, h_s
 
 
-@minimum_autocast_precision(torch.float32)
-def _call_attention(*args, **kwargs):
-    return scaled_dot_product_attention(*args, **kwargs)
-
-
 class Dropout(nn.Module):
     """Dropout module for scalar and vector features.
 
@@ -83,7 +96,6 @@ class RMSNorm(nn.Module):
         super().__init__()
         self.epsilon = epsilon
 
-    @minimum_autocast_precision(torch.float32)
     def forward(self, vectors, scalars):
         """
         Parameters
@@ -98,6 +110,11 @@ class RMSNorm(nn.Module):
         torch.Tensor, torch.Tensor
             Tensors of the same shape as input representing the normalized vectors and scalars.
         """
+        dtype = gatr_config.precision.compute_dtype("norm", vectors)
+        if dtype is not None:
+            with gatr_config.precision.autocast("norm", vectors.device.type):
+                return self.forward(vectors.to(dtype), scalars.to(dtype))
+
         v_squared_norm = (vectors[..., 0].square() - vectors[..., 1:].square().sum(dim=-1)).abs()
         s_squared_norm = scalars.square()
         total_features = v_squared_norm.shape[-1] + s_squared_norm.shape[-1]
@@ -175,6 +192,11 @@ class Linear(nn.Module):
         torch.Tensor, torch.Tensor
             Tensors of the same shape as input representing the normalized vectors and scalars.
         """
+        dtype = gatr_config.precision.compute_dtype("linear", vectors)
+        if dtype is not None:
+            with gatr_config.precision.autocast("linear", vectors.device.type):
+                return self.forward(vectors.to(dtype), scalars.to(dtype))
+
         vectors_out = self.weight_v @ vectors
         scalars_out = self.linear_s(scalars)
         return vectors_out, scalars_out
@@ -198,6 +220,83 @@ class Linear(nn.Module):
         nn.init.uniform_(self.linear_s.weight, a=-bound, b=bound)
 
 
+class QuantizedLinear(nn.Module):
+    """Inference version of ``Linear`` with int8 weights.
+
+    The vector weights are quantized with one scale per output channel, which preserves
+    equivariance, and the scalar weights are stored in an ``Int8Linear``.
+    Use ``QuantizedLinear.from_linear`` to construct it.
+    """
+
+    def __init__(
+        self,
+        qweight_v: torch.Tensor,
+        scale_v: torch.Tensor,
+        linear_s: Int8Linear,
+        dynamic_activations: bool = True,
+    ):
+        """
+        Parameters
+        ----------
+        qweight_v : torch.Tensor
+            Int8 vector weights with shape (out_v_channels, in_v_channels).
+        scale_v : torch.Tensor
+            Vector weight scales with shape (out_v_channels,).
+        linear_s : Int8Linear
+            Quantized scalar linear layer.
+        dynamic_activations : bool, optional
+            Whether to quantize the inputs, by default True.
+        """
+        super().__init__()
+        self.dynamic_activations = dynamic_activations
+        self.register_buffer("qweight_v", qweight_v)
+        self.register_buffer("scale_v", scale_v)
+        self.linear_s = linear_s
+
+    @classmethod
+    @torch.no_grad()
+    def from_linear(cls, linear: Linear, dynamic_activations: bool = True):
+        """
+        Parameters
+        ----------
+        linear : Linear
+            Layer to quantize.
+        dynamic_activations : bool, optional
+            Whether to quantize the inputs, by default True.
+
+        Returns
+        -------
+        QuantizedLinear
+            Quantized layer.
+        """
+        qweight_v, scale_v = quantize_per_channel(linear.weight_v.detach())
+        linear_s = Int8Linear.from_linear(linear.linear_s, dynamic_activations=dynamic_activations)
+        return cls(qweight_v, scale_v, linear_s, dynamic_activations=dynamic_activations)
+
+    def forward(self, vectors, scalars):
+        """
+        Parameters
+        ----------
+        vectors : torch.Tensor
+            A tensor of shape (..., v_channels, 4) representing Lorentz vectors.
+        scalars : torch.Tensor
+            A tensor of shape (..., s_channels) representing scalar features.
+
+        Returns
+        -------
+        torch.Tensor, torch.Tensor
+            Tensors of the same shape as input representing the normalized vectors and scalars.
+        """
+        vectors_out = int8_linear(
+            vectors.transpose(-1, -2),
+            self.qweight_v,
+            self.scale_v,
+            dynamic_activations=self.dynamic_activations,
+        ).transpose(-1, -2)
+        scalars_out = self.linear_s(scalars)
+        return vectors_out, scalars_out
+
+
 class GatedLinearUnit(nn.Module):
     """Gated linear unit (GLU) for vector and scalar features.
 
@@ -246,8 +345,12 @@ class GatedLinearUnit(nn.Module):
         scalars_out = self.nonlinearity(s_gates) * s_pre
         return vectors_out, scalars_out
 
-    @minimum_autocast_precision(torch.float32)
     def _get_inner_product(self, v_gates_1, v_gates_2):
+        dtype = gatr_config.precision.compute_dtype("norm", v_gates_1)
+        if dtype is not None:
+            with gatr_config.precision.autocast("norm", v_gates_1.device.type):
+                return self._get_inner_product(v_gates_1.to(dtype), v_gates_2.to(dtype))
+
         t = v_gates_1[..., 0] * v_gates_2[..., 0]
         s = (v_gates_1[..., 1:] * v_gates_2[..., 1:]).sum(dim=-1)
         v_gates = (t - s).unsqueeze(-1)
@@ -255,7 +358,15 @@ class GatedLinearUnit(nn.Module):
 
 
 class SelfAttention(nn.Module):
-    """Self-attention module for Lorentz vectors and scalar features."""
+    """Self-attention module for Lorentz vectors and scalar features.
+
+    With ``linear_attention=True``, the softmax is replaced by a linear-complexity Taylor kernel,
+    see ``lgatr.primitives.attention.linear_scaled_dot_product_attention``.
+    With ``pairwise_bias=True``, a learnable pairwise Lorentz-invariant bias is added to the
+    attention logits if ``pair_features`` are passed, see ``lgatr.primitives.pairwise``.
+    If ``small_set`` is set, the attention is evaluated with explicit batched matrix
+    multiplications, see ``lgatr.nets.small_set.optimize_for_small_sets``.
+    """
 
     def __init__(
         self,
@@ -264,11 +375,18 @@ class SelfAttention(nn.Module):
         num_heads: int,
         attn_ratio: int = 1,
         dropout_prob: float | None = None,
+        linear_attention: bool = False,
+        pairwise_bias: bool = False,
     ):
         super().__init__()
         self.hidden_v_channels = max(attn_ratio * v_channels // num_heads, 1)
         self.hidden_s_channels = max(attn_ratio * s_channels // num_heads, 4)
         self.num_heads = num_heads
+        self.linear_attention = linear_attention
+        self.pairwise_bias = pairwise_bias
+        self.small_set = False
+        if pairwise_bias:
+            self.pair_bias_scale = nn.Parameter(torch.zeros(num_heads))
 
         metric = torch.tensor([1.0, -1.0, -1.0, -1.0])
         self.register_buffer("metric", metric)
@@ -312,12 +430,13 @@ class SelfAttention(nn.Module):
         q_s, k_s, v_s = qkv_s.unbind(0)
 
         q_v_mod = q_v * self.metric.to(q_v.dtype)
-        q = torch.cat([q_v_mod.flatten(start_dim=-2), q_s], dim=-1)
-        k = torch.cat([k_v.flatten(start_dim=-2), k_s], dim=-1)
-        v = torch.cat([v_v.flatten(start_dim=-2), v_s], dim=-1)
+        dtype = gatr_config.precision.compute_dtype("attention", q_s)
+        q = concat_features([q_v_mod.flatten(start_dim=-2), q_s], dtype=dtype)
+        k = concat_features([k_v.flatten(start_dim=-2), k_s], dtype=dtype)
+        v = concat_features([v_v.flatten(start_dim=-2), v_s], dtype=dtype)
         return q, k, v
 
-    def forward(self, vectors, scalars, **attn_kwargs):
+    def forward(self, vectors, scalars, pair_features=None, **attn_kwargs):
         """
         Parameters
         ----------
@@ -325,6 +444,10 @@ class SelfAttention(nn.Module):
             A tensor of shape (..., v_channels, 4) representing Lorentz vectors.
         scalars : torch.Tensor
             A tensor of shape (..., s_channels) representing scalar features.
+        pair_features : torch.Tensor | None
+            Optional per-item features of shape (..., items, 5) for the pairwise attention bias,
+            see ``lgatr.primitives.pairwise.pairwise_bias_features``.
+            Ignored unless ``pairwise_bias=True``.
         **attn_kwargs : dict
             Additional keyword arguments for the attention function.
 
@@ -336,7 +459,30 @@ class SelfAttention(nn.Module):
         qkv_v, qkv_s = self.linear_in(vectors, scalars)
 
         q, k, v = self._pre_attention_reshape(qkv_v, qkv_s)
-        out = _call_attention(q, k, v, **attn_kwargs)
+        use_pairwise_bias = self.pairwise_bias and pair_features is not None
+        if self.linear_attention:
+            if use_pairwise_bias or any(value is not None for value in attn_kwargs.values()):
+                raise NotImplementedError(
+                    f"Linear attention does not support attention arguments, got {list(attn_kwargs)}"
+                )
+            out = linear_scaled_dot_product_attention(q, k, v)
+        elif self.small_set and use_pairwise_bias:
+            out = small_set_attention(
+                q,
+                k,
+                v,
+                pair_features=pair_features,
+                pair_scale=self.pair_bias_scale,
+                **attn_kwargs,
+            )
+        elif self.small_set:
+            out = small_set_attention(q, k, v, **attn_kwargs)
+        elif use_pairwise_bias:
+            out = pairwise_biased_attention(
+                q, k, v, pair_features, self.pair_bias_scale, **attn_kwargs
+            )
+        else:
+            out = scaled_dot_product_attention(q, k, v, **attn_kwargs)
         h_v, h_s = _post_attention_reshape(out, self.hidden_v_channels)
 
         out_v, out_s = self.linear_out(h_v, h_s)
@@ -424,8 +570,12 @@ class LGATrSlimBlock(nn.Module):
         attn_ratio: int = 1,
         num_layers_mlp: int = 2,
         dropout_prob: float | None = None,
+        linear_attention: bool = False,
+        pairwise_bias: bool = False,
+        checkpoint_sublayers: str | None = None,
     ):
         super().__init__()
+        self._checkpoint_sublayers = checkpoint_sublayers
 
         self.norm = RMSNorm()
 
@@ -435,6 +585,8 @@ class LGATrSlimBlock(nn.Module):
             num_heads=num_heads,
             attn_ratio=attn_ratio,
             dropout_prob=dropout_prob,
+            linear_attention=linear_attention,
+            pairwise_bias=pairwise_bias,
         )
 
         self.mlp = MLP(
@@ -464,7 +616,9 @@ class LGATrSlimBlock(nn.Module):
         """
         h_v, h_s = self.norm(vectors, scalars)
 
-        h_v, h_s = self.attention(
+        h_v, h_s = checkpoint_sublayer(
+            self.attention,
+            self._checkpoint_sublayers == "attention",
             h_v,
             h_s,
             **attn_kwargs,
@@ -475,7 +629,7 @@ class LGATrSlimBlock(nn.Module):
 
         h_v, h_s = self.norm(outputs_v, outputs_s)
 
-        h_v, h_s = self.mlp(h_v, h_s)
+        h_v, h_s = checkpoint_sublayer(self.mlp, self._checkpoint_sublayers == "mlp", h_v, h_s)
 
         outputs_v = outputs_v + h_v
         outputs_s = outputs_s + h_s
@@ -501,8 +655,12 @@ class LGATrSlim(nn.Module):
         attn_ratio: int = 1,
         num_layers_mlp: int = 2,
         dropout_prob: float | None = None,
-        checkpoint_blocks: bool = False,
-        compile: bool = False,
+        linear_attention: bool | Sequence[bool] = False,
+        pairwise_bias: bool = False,
+        checkpoint_blocks: bool | str = False,
+        checkpoint_every: int = 1,
+        offload_activations: bool | str | ActivationOffloader = False,
+        compile: bool | str = False,
         compile_mode: str = "default",
         compile_dynamic: bool = True,
     ):
@@ -535,10 +693,29 @@ class LGATrSlim(nn.Module):
             Number of layers in MLP, by default 2.
         dropout_prob : float | None, optional
             Dropout probability, by default None.
-        checkpoint_blocks : bool, optional
-            Whether to use gradient checkpointing for blocks, by default False.
-        compile : bool, optional
+        linear_attention : bool | Sequence[bool], optional
+            Whether to use linear-complexity Taylor attention instead of softmax attention,
+            by default False. Attention arguments like masks are not supported in this mode.
+            A sequence with one flag per block selects the attention kernel of each block.
+        pairwise_bias : bool, optional
+            Whether to add a learnable pairwise Lorentz-invariant bias to the attention logits,
+            computed from the ``pair_vectors`` passed to ``forward``, by default False.
+        checkpoint_blocks : bool | str, optional
+            Activation checkpointing policy, by default False. True or "block" checkpoints
+            full blocks, "attention" or "mlp" only the respective sublayers, and "selective"
+            saves matrix multiplication outputs while recomputing everything else.
+            See ``lgatr.utils.checkpoint.resolve_checkpoint_policy`` for details.
+        checkpoint_every : int, optional
+            Only checkpoint every ``checkpoint_every``-th block, by default 1.
+        offload_activations : bool | str | ActivationOffloader, optional
+            Offload the activations saved for backward of each block, by default False.
+            True or "cpu" moves them to host memory, "disk" to memory-mapped scratch files.
+            See ``lgatr.utils.offload.ActivationOffloader`` for more options.
+        compile : bool | str, optional
             Whether to compile the model with torch.compile, by default False.
+            True or "full" compiles the full network, "regional" compiles each block separately
+            and reuses the compiled code across blocks, which is much faster to compile for deep
+            networks. See ``lgatr.utils.compile.warmup`` for precompiling shape buckets.
         compile_mode : str
             torch.compile compilation mode, see torch docs for more information.
         compile_dynamic : bool
@@ -553,6 +730,10 @@ class LGATrSlim(nn.Module):
             out_s_channels=hidden_s_channels,
         )
 
+        self._checkpoint_policies = block_checkpoint_policies(
+            resolve_checkpoint_policy(checkpoint_blocks), num_blocks, checkpoint_every
+        )
+        self._offloader = resolve_offloader(offload_activations)
         self.blocks = nn.ModuleList(
             [
                 LGATrSlimBlock(
@@ -564,8 +745,15 @@ class LGATrSlim(nn.Module):
                     attn_ratio=attn_ratio,
                     num_layers_mlp=num_layers_mlp,
                     dropout_prob=dropout_prob,
+                    linear_attention=linear,
+                    pairwise_bias=pairwise_bias,
+                    checkpoint_sublayers=policy,
+                )
+                for linear, policy in zip(
+                    block_linear_attention(linear_attention, num_blocks),
+                    self._checkpoint_policies,
+                    strict=True,
                 )
-                for _ in range(num_blocks)
             ]
         )
 
@@ -575,17 +763,11 @@ class LGATrSlim(nn.Module):
             out_v_channels=out_v_channels,
             out_s_channels=out_s_channels,
         )
-        self._checkpoint_blocks = checkpoint_blocks
-
-        if compile:
-            # ugly hack to make torch.compile convenient for users
-            # the clean solution is model = torch.compile(model, **kwargs) outside of the constructor
-            # note that we need fullgraph=False because of the torch.compiler.disable for attention
-            self.__class__ = torch.compile(
-                self.__class__, dynamic=compile_dynamic, mode=compile_mode
-            )
 
-    def forward(self, vectors, scalars, **attn_kwargs):
+        compile_network(self, compile, mode=compile_mode, dynamic=compile_dynamic)
+
+    @resolve_precision
+    def forward(self, vectors, scalars, pair_vectors=None, **attn_kwargs):
         """
         Parameters
         ----------
@@ -593,6 +775,9 @@ class LGATrSlim(nn.Module):
             A tensor of shape (..., v_channels, 4) representing Lorentz vectors.
         scalars : torch.Tensor
             A tensor of shape (..., s_channels) representing scalar features.
+        pair_vectors : torch.Tensor | None
+            Optional Lorentz vectors of shape (..., items, 4) from which the pairwise attention bias
+            is computed, if enabled with ``pairwise_bias=True``.
         **attn_kwargs : dict
             Additional keyword arguments for the attention function.
 
@@ -601,13 +786,17 @@ class LGATrSlim(nn.Module):
         torch.Tensor, torch.Tensor
             Tensors of the same shape as input representing the normalized vectors and scalars.
         """
+        if pair_vectors is not None:
+            # computed once and shared across blocks
+            attn_kwargs["pair_features"] = pairwise_bias_features(pair_vectors)
+
         h_v, h_s = self.linear_in(vectors, scalars)
 
-        for block in self.blocks:
-            if self._checkpoint_blocks:
-                h_v, h_s = checkpoint(block, h_v, h_s, use_reentrant=False, **attn_kwargs)
-            else:
-                h_v, h_s = block(h_v, h_s, **attn_kwargs)
+        for i, (block, policy) in enumerate(
+            zip(self.blocks, self._checkpoint_policies, strict=True)
+        ):
+            with offload_group(self._offloader, i):
+                h_v, h_s = checkpoint_block(block, h_v, h_s, policy=policy, **attn_kwargs)
 
         outputs_v, outputs_s = self.linear_out(h_v, h_s)
         return outputs_v, outputs_s
@@ -0,0 +1,115 @@
+"""Int8 quantization of the L-GATr networks for CPU inference."""
+
+import copy
+from typing import Any
+
+import torch
+from torch import nn
+
+from ..layers.linear import EquiLinear, FrozenEquiLinear
+from ..layers.quantization import Int8Linear, QuantizedEquiLinear
+from ..utils.timing import output_errors, timed_forward
+from .lgatr_slim import Linear, QuantizedLinear
+
+
+def quantize_for_inference(
+    model: nn.Module, dynamic_activations: bool = True, inplace: bool = False
+) -> nn.Module:
+    """Quantizes the linear layers of an L-GATr network to int8.
+
+    - every ``EquiLinear`` and ``FrozenEquiLinear`` is replaced by a ``QuantizedEquiLinear``,
+      which stores the composed weight in int8
+    - every slim ``Linear`` is replaced by a ``QuantizedLinear``
+    - all remaining ``torch.nn.Linear`` layers are replaced by ``Int8Linear``
+
+    The dequantized weights are exactly equivariant. With ``dynamic_activations``, the inputs of
+    each layer are quantized on the fly and the matrix multiplications run in int8,
+    which is faster on CPUs but makes the outputs approximately equivariant.
+    Works for ``LGATr``, ``ConditionalLGATr``, ``LGATrSlim``, ``ConditionalLGATrSlim`` and their
+    layers, also after ``optimize_for_inference``.
+    Use ``quantization_report`` to compare accuracy and throughput with the original network.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network or layer to quantize.
+    dynamic_activations : bool
+        Whether to quantize the inputs of each layer. If False, only the weights are quantized.
+    inplace : bool
+        If False, the transform is applied to a copy of ``model``.
+
+    Returns
+    -------
+    torch.nn.Module
+        Quantized network in eval mode.
+    """
+    if not inplace:
+        model = copy.deepcopy(model)
+    model.eval()
+
+    def convert(module):
+        if isinstance(module, EquiLinear):
+            return QuantizedEquiLinear.from_equi_linear(module, dynamic_activations)
+        if isinstance(module, FrozenEquiLinear):
+            return QuantizedEquiLinear.from_frozen_equi_linear(module, dynamic_activations)
+        if isinstance(module, Linear):
+            return QuantizedLinear.from_linear(module, dynamic_activations)
+        if isinstance(module, nn.Linear):
+            return Int8Linear.from_linear(module, dynamic_activations)
+        return None
+
+    converted = convert(model)
+    if converted is not None:
+        return converted.requires_grad_(False)
+
+    # parents are visited before their children, such that nn.Linear layers within EquiLinear
+    # and Linear are converted together with their parent
+    for parent in list(model.modules()):
+        for name, child in parent.named_children():
+            converted = convert(child)
+            if converted is not None:
+                setattr(parent, name, converted)
+
+    return model.requires_grad_(False)
+
+
+@torch.no_grad()
+def quantization_report(
+    model: nn.Module,
+    quantized: nn.Module,
+    args: tuple,
+    kwargs: dict[str, Any] | None = None,
+    num_repeats: int = 10,
+) -> dict[str, float]:
+    """Compares the accuracy and CPU throughput of a quantized network with the original network.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Original network.
+    quantized : torch.nn.Module
+        Network returned by ``quantize_for_inference``.
+    args : tuple
+        Positional arguments of ``model.forward``.
+    kwargs : dict or None
+        Keyword arguments of ``model.forward``.
+    num_repeats : int
+        Number of timed forward passes.
+
+    Returns
+    -------
+    dict[str, float]
+        ``max_abs_error`` and ``rel_error`` (ratio of the norms of the deviation and of the
+        original outputs) over all outputs, and ``time`` and ``time_quantized`` per forward pass
+        in seconds, and ``speedup``.
+    """
+    kwargs = {} if kwargs is None else kwargs
+    model.eval()
+    outputs, time_float = timed_forward(model, args, kwargs, num_repeats)
+    outputs_quantized, time_quantized = timed_forward(quantized, args, kwargs, num_repeats)
+    return dict(
+        **output_errors(outputs, outputs_quantized),
+        time=time_float,
+        time_quantized=time_quantized,
+        speedup=time_float / time_quantized,
+    )
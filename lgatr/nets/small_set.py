@@ -0,0 +1,118 @@
+"""Small-set execution mode of the L-GATr networks for events with a few particles."""
+
+from itertools import chain
+from typing import Any
+
+import torch
+from torch import nn
+
+from ..layers.attention.attention import GeometricAttention
+from ..utils.misc import mark_compile_constants
+from ..utils.timing import output_errors, timed_forward
+from .conditional_lgatr_slim import CrossAttention
+from .inference import optimize_for_inference
+from .lgatr_slim import SelfAttention
+
+
+def optimize_for_small_sets(
+    model: nn.Module,
+    compile: bool = True,
+    compile_mode: str | None = None,
+    inplace: bool = False,
+) -> nn.Module:
+    """Rewrites an L-GATr network for inputs with a few items, e.g. events with 4-8 particles.
+
+    For small sets, a forward pass is dominated by Python overhead rather than by arithmetic:
+    einops patterns, einsum paths, cached basis tensors, the attention backend and the precision
+    policy are resolved again in every layer. This transform
+
+    - applies ``optimize_for_inference``, which precomputes the constant work of the forward pass
+    - evaluates the attention with explicit batched matrix multiplications over the items,
+      see ``lgatr.primitives.attention.small_set_attention``
+    - compiles the network with static shapes and without graph breaks, such that all of this
+      is resolved once per input shape and later forward passes only launch the compiled
+      kernels. On CUDA, the default mode ``"reduce-overhead"`` replays the kernels of each shape
+      as a CUDA graph.
+
+    A graph is compiled for every new input shape, up to ``torch._dynamo.config.recompile_limit``
+    shapes. Use ``lgatr.utils.compile.warmup`` to compile all multiplicities and batch sizes
+    before serving, and ``small_set_report`` to compare the latency with the original network.
+    Works for ``LGATr``, ``ConditionalLGATr``, ``LGATrSlim`` and ``ConditionalLGATrSlim``.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network to optimize.
+    compile : bool
+        Whether to compile the network. Without compilation, only the constant work and the
+        attention dispatch are removed.
+    compile_mode : str or None
+        torch.compile compilation mode. Defaults to ``"reduce-overhead"`` on CUDA and
+        ``"default"`` otherwise.
+    inplace : bool
+        If False, the transform is applied to a copy of ``model``.
+
+    Returns
+    -------
+    torch.nn.Module
+        Optimized network in eval mode.
+    """
+    model = optimize_for_inference(model, inplace=inplace)
+    for module in model.modules():
+        if isinstance(module, GeometricAttention | SelfAttention | CrossAttention):
+            module.small_set = True
+
+    if compile:
+        if compile_mode is None:
+            tensor = next(chain(model.parameters(), model.buffers()), None)
+            on_cuda = tensor is not None and tensor.device.type == "cuda"
+            compile_mode = "reduce-overhead" if on_cuda else "default"
+        mark_compile_constants()
+        model.compile(mode=compile_mode, dynamic=False, fullgraph=True)
+    return model
+
+
+@torch.no_grad()
+def small_set_report(
+    model: nn.Module,
+    small_set_model: nn.Module,
+    args: tuple,
+    kwargs: dict[str, Any] | None = None,
+    num_repeats: int = 10,
+) -> dict[str, float]:
+    """Compares the per-event latency of a network in small-set mode with the original network.
+
+    The first forward pass of each network is not timed, such that it includes the compilation
+    for the shape of ``args``.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Original network.
+    small_set_model : torch.nn.Module
+        Network returned by ``optimize_for_small_sets``.
+    args : tuple
+        Positional arguments of ``model.forward``, with shape (batch, items, ...).
+    kwargs : dict or None
+        Keyword arguments of ``model.forward``.
+    num_repeats : int
+        Number of timed forward passes.
+
+    Returns
+    -------
+    dict[str, float]
+        ``max_abs_error`` and ``rel_error`` (ratio of the norms of the deviation and of the
+        original outputs) over all outputs, ``latency`` and ``latency_small_set`` per event in
+        seconds, and ``speedup``.
+    """
+    kwargs = {} if kwargs is None else kwargs
+    model.eval()
+    num_events = args[0].shape[0]
+    outputs, time_model = timed_forward(model, args, kwargs, num_repeats)
+    outputs_small_set, time_small_set = timed_forward(small_set_model, args, kwargs, num_repeats)
+    return dict(
+        **output_errors(outputs, outputs_small_set),
+        latency=time_model / num_events,
+        latency_small_set=time_small_set / num_events,
+        speedup=time_model / time_small_set,
+    )
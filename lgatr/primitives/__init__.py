@@ -1,4 +1,4 @@
-from .attention import sdp_attention
+from .attention import linear_sdp_attention, register_attention_hook, sdp_attention
 from .bilinear import geometric_product
 from .config import gatr_config
 from .dropout import grade_dropout
@@ -6,3 +6,4 @@ from .invariants import abs_squared_norm, inner_product
 from .linear import equi_linear, grade_involute, grade_project, reverse
 from .nonlinearities import gated_gelu, gated_relu, gated_sigmoid, gated_silu
 from .normalization import equi_layer_norm
+from .quantization import int8_linear
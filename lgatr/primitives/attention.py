@@ -1,13 +1,34 @@
 """Equivariant attention."""
 
+from collections import OrderedDict
+from collections.abc import Callable
+
 import torch
 from einops import rearrange
 from torch import Tensor
+from torch.utils.checkpoint import checkpoint
+from torch.utils.hooks import RemovableHandle
 
-from .attention_backends import get_attention_backend
+from ..utils.profiling import record_region
+from .attention_backends import (
+    FLEX_KWARGS,
+    _resolve_backend,
+    get_attention_backend,
+)
+from .config import gatr_config
 from .invariants import _load_inner_product_factors
+from .pairwise import pairwise_bias, pairwise_score_mod
+
+# hooks that receive summary statistics of every attention call, see register_attention_hook
+_ATTENTION_HOOKS: OrderedDict[int, Callable[[dict[str, Tensor]], None]] = OrderedDict()
+# ids of the hooks that request the attention entropy
+_ENTROPY_HOOKS: OrderedDict[int, bool] = OrderedDict()
 
+# attention kwargs for which the attention weights can be reconstructed in attention_statistics
+_ENTROPY_KWARGS = ["attn_mask", "dropout_p", "scale", "enable_gqa"]
 
+
+@record_region
 def sdp_attention(
     q_mv: Tensor,
     k_mv: Tensor,
@@ -15,6 +36,9 @@ def sdp_attention(
     q_s: Tensor,
     k_s: Tensor,
     v_s: Tensor,
+    pair_features: Tensor | None = None,
+    pair_scale: Tensor | None = None,
+    query_metric: bool = True,
     **attn_kwargs,
 ) -> tuple[Tensor, Tensor]:
     """Equivariant geometric attention based on scaled dot products.
@@ -45,6 +69,14 @@ def sdp_attention(
         Scalar keys with shape (..., items_out, s_channels)
     v_s : torch.Tensor
         Scalar values with shape (..., items_out, s_channels)
+    pair_features : torch.Tensor or None
+        Optional per-item features with shape (..., items, 5) for a pairwise Lorentz-invariant
+        attention bias in self-attention, see ``lgatr.primitives.pairwise``.
+    pair_scale : torch.Tensor or None
+        Bias scale for each head with shape (num_heads,). Required if ``pair_features`` is given.
+    query_metric : bool
+        Whether to multiply the multivector queries with the inner product factors. Set to False
+        if the factors are already folded into the query projection.
     **attn_kwargs
         Optional keyword arguments passed to attention.
 
@@ -55,31 +87,220 @@ def sdp_attention(
     outputs_s : torch.Tensor
         Scalar result with shape (..., items_out, s_channels)
     """
+    dtype = gatr_config.precision.compute_dtype("attention", q_mv)
+    q, k, v = geometric_qkv(q_mv, k_mv, v_mv, q_s, k_s, v_s, query_metric=query_metric, dtype=dtype)
+    if pair_features is None:
+        v_out = scaled_dot_product_attention(q, k, v, **attn_kwargs)
+    else:
+        v_out = pairwise_biased_attention(q, k, v, pair_features, pair_scale, **attn_kwargs)
+    return split_geometric_outputs(v_out, num_mv_channels=v_mv.shape[-2])
+
+
+@record_region
+def linear_sdp_attention(
+    q_mv: Tensor,
+    k_mv: Tensor,
+    v_mv: Tensor,
+    q_s: Tensor,
+    k_s: Tensor,
+    v_s: Tensor,
+    query_metric: bool = True,
+    contraction_dtype: torch.dtype | None = None,
+) -> tuple[Tensor, Tensor]:
+    """Equivariant geometric attention with a linear-complexity kernel.
+
+    Same inputs and outputs as ``sdp_attention``, but the softmax over the invariant
+    attention logits is replaced by its second-order Taylor expansion, see
+    ``linear_scaled_dot_product_attention``. The attention weights remain functions of
+    the same Lorentz-invariant logits as in ``sdp_attention``, so the layer stays
+    equivariant while its cost grows linearly with the number of items.
+
+    Parameters
+    ----------
+    q_mv : torch.Tensor
+        Multivector queries with shape (..., items_out, mv_channels, 16)
+    k_mv : torch.Tensor
+        Multivector keys with shape (..., items_in, mv_channels, 16)
+    v_mv : torch.Tensor
+        Multivector values with shape (..., items_in, mv_channels, 16)
+    q_s : torch.Tensor
+        Scalar queries with shape (..., items_out, s_channels)
+    k_s : torch.Tensor
+        Scalar keys with shape (..., items_in, s_channels)
+    v_s : torch.Tensor
+        Scalar values with shape (..., items_in, s_channels)
+    query_metric : bool
+        Whether to multiply the multivector queries with the inner product factors.
+    contraction_dtype : torch.dtype or None
+        Dtype of the contraction of the query features, see
+        ``linear_scaled_dot_product_attention``.
+
+    Returns
+    -------
+    outputs_mv : torch.Tensor
+        Multivector result with shape (..., items_out, mv_channels, 16)
+    outputs_s : torch.Tensor
+        Scalar result with shape (..., items_out, s_channels)
+    """
+    dtype = gatr_config.precision.compute_dtype("attention", q_mv)
+    q, k, v = geometric_qkv(q_mv, k_mv, v_mv, q_s, k_s, v_s, query_metric=query_metric, dtype=dtype)
+    v_out = linear_scaled_dot_product_attention(q, k, v, contraction_dtype=contraction_dtype)
+    return split_geometric_outputs(v_out, num_mv_channels=v_mv.shape[-2])
+
+
+@record_region
+def small_set_sdp_attention(
+    q_mv: Tensor,
+    k_mv: Tensor,
+    v_mv: Tensor,
+    q_s: Tensor,
+    k_s: Tensor,
+    v_s: Tensor,
+    pair_features: Tensor | None = None,
+    pair_scale: Tensor | None = None,
+    query_metric: bool = True,
+    **attn_kwargs,
+) -> tuple[Tensor, Tensor]:
+    """Equivariant geometric attention for sets of a few items.
 
-    # Construct queries and keys by concatenating relevant MV components and aux scalars
-    q = torch.cat(
-        [
-            rearrange(
-                q_mv * _load_inner_product_factors(device=q_mv.device, dtype=q_mv.dtype),
-                "... c x -> ... (c x)",
-            ),
-            q_s,
-        ],
-        -1,
+    Same inputs and outputs as ``sdp_attention``, but the attention is evaluated with explicit
+    batched matrix multiplications, see ``small_set_attention``.
+
+    Parameters
+    ----------
+    q_mv : torch.Tensor
+        Multivector queries with shape (..., items_out, mv_channels, 16)
+    k_mv : torch.Tensor
+        Multivector keys with shape (..., items_in, mv_channels, 16)
+    v_mv : torch.Tensor
+        Multivector values with shape (..., items_in, mv_channels, 16)
+    q_s : torch.Tensor
+        Scalar queries with shape (..., items_out, s_channels)
+    k_s : torch.Tensor
+        Scalar keys with shape (..., items_in, s_channels)
+    v_s : torch.Tensor
+        Scalar values with shape (..., items_in, s_channels)
+    pair_features : torch.Tensor or None
+        Optional per-item features with shape (..., items, 5) for a pairwise Lorentz-invariant
+        attention bias in self-attention, see ``lgatr.primitives.pairwise``.
+    pair_scale : torch.Tensor or None
+        Bias scale for each head with shape (num_heads,). Required if ``pair_features`` is given.
+    query_metric : bool
+        Whether to multiply the multivector queries with the inner product factors.
+    **attn_kwargs
+        Optional keyword arguments passed to ``small_set_attention``.
+
+    Returns
+    -------
+    outputs_mv : torch.Tensor
+        Multivector result with shape (..., items_out, mv_channels, 16)
+    outputs_s : torch.Tensor
+        Scalar result with shape (..., items_out, s_channels)
+    """
+    dtype = gatr_config.precision.compute_dtype("attention", q_mv)
+    q, k, v = geometric_qkv(q_mv, k_mv, v_mv, q_s, k_s, v_s, query_metric=query_metric, dtype=dtype)
+    v_out = small_set_attention(
+        q, k, v, pair_features=pair_features, pair_scale=pair_scale, **attn_kwargs
     )
-    k = torch.cat([rearrange(k_mv, "... c x -> ... (c x)"), k_s], -1)
+    return split_geometric_outputs(v_out, num_mv_channels=v_mv.shape[-2])
+
+
+def geometric_qkv(
+    q_mv: Tensor,
+    k_mv: Tensor,
+    v_mv: Tensor,
+    q_s: Tensor,
+    k_s: Tensor,
+    v_s: Tensor,
+    query_metric: bool = True,
+    dtype: torch.dtype | None = None,
+) -> tuple[Tensor, Tensor, Tensor]:
+    """Flattens multivector and scalar queries, keys and values for attention backends.
 
-    num_channels_out = v_mv.shape[-2]
-    v = torch.cat([rearrange(v_mv, "... c x -> ... (c x)"), v_s], -1)
+    The queries are multiplied with the inner product factors,
+    such that the euclidean dot product between the resulting queries and keys
+    equals the geometric algebra inner product plus the euclidean inner product of the scalars.
+
+    Parameters
+    ----------
+    q_mv, k_mv, v_mv : torch.Tensor
+        Multivector queries, keys and values with shape (..., items, mv_channels, 16)
+    q_s, k_s, v_s : torch.Tensor
+        Scalar queries, keys and values with shape (..., items, s_channels)
+    query_metric : bool
+        Whether to multiply the multivector queries with the inner product factors. If False,
+        the queries are expected to include the factors already.
+    dtype : torch.dtype or None
+        Dtype of the queries, keys and values. Defaults to the dtype of the inputs.
+        Typically the attention dtype of ``gatr_config.precision``, such that the attention
+        backends receive their inputs without another cast.
+
+    Returns
+    -------
+    q, k, v : torch.Tensor
+        Queries, keys and values with shape (..., items, 16 * mv_channels + s_channels)
+    """
+    if query_metric:
+        q_mv = q_mv * _load_inner_product_factors(device=q_mv.device, dtype=q_mv.dtype)
+    q = concat_features([rearrange(q_mv, "... c x -> ... (c x)"), q_s], dtype=dtype)
+    k = concat_features([rearrange(k_mv, "... c x -> ... (c x)"), k_s], dtype=dtype)
+    v = concat_features([rearrange(v_mv, "... c x -> ... (c x)"), v_s], dtype=dtype)
+    return q, k, v
 
-    v_out = scaled_dot_product_attention(q, k, v, **attn_kwargs)
 
-    v_out_mv = rearrange(v_out[..., : num_channels_out * 16], "... (c x) -> ...  c x", x=16)
-    v_out_s = v_out[..., num_channels_out * 16 :]
+def concat_features(features: list[Tensor], dtype: torch.dtype | None = None) -> Tensor:
+    """Concatenates features along the last dimension.
 
+    With a ``dtype`` that differs from the features, the result is allocated once in ``dtype``
+    and each feature is cast while it is copied into its slice, such that no cast copies of the
+    features are materialized.
+
+    Parameters
+    ----------
+    features : list of torch.Tensor
+        Features with shapes (..., channels_i).
+    dtype : torch.dtype or None
+        Dtype of the result. Defaults to the promoted dtype of the features.
+
+    Returns
+    -------
+    torch.Tensor
+        Concatenated features with shape (..., sum_i channels_i).
+    """
+    if dtype is None or all(x.dtype == dtype for x in features):
+        return torch.cat(features, dim=-1)
+    channels = sum(x.shape[-1] for x in features)
+    out = features[0].new_empty(*features[0].shape[:-1], channels, dtype=dtype)
+    start = 0
+    for x in features:
+        out[..., start : start + x.shape[-1]].copy_(x)
+        start += x.shape[-1]
+    return out
+
+
+def split_geometric_outputs(v_out: Tensor, num_mv_channels: int) -> tuple[Tensor, Tensor]:
+    """Inverse of ``geometric_qkv`` for the attention outputs.
+
+    Parameters
+    ----------
+    v_out : torch.Tensor
+        Attention outputs with shape (..., items, 16 * mv_channels + s_channels)
+    num_mv_channels : int
+        Number of multivector channels in the values.
+
+    Returns
+    -------
+    outputs_mv : torch.Tensor
+        Multivector outputs with shape (..., items, mv_channels, 16)
+    outputs_s : torch.Tensor
+        Scalar outputs with shape (..., items, s_channels)
+    """
+    v_out_mv = rearrange(v_out[..., : num_mv_channels * 16], "... (c x) -> ...  c x", x=16)
+    v_out_s = v_out[..., num_mv_channels * 16 :]
     return v_out_mv, v_out_s
 
 
+@record_region
 def scaled_dot_product_attention(
     query: Tensor,
     key: Tensor,
@@ -106,5 +327,522 @@ def scaled_dot_product_attention(
     torch.Tensor
         Tensor of shape (..., head, item_out, channels)
     """
+    dtype = gatr_config.precision.compute_dtype("attention", query)
+    if dtype is not None:
+        with gatr_config.precision.autocast("attention", query.device.type):
+            query, key, value, attn_kwargs = _cast_attention_inputs(
+                dtype, query, key, value, attn_kwargs
+            )
+            return scaled_dot_product_attention(query, key, value, **attn_kwargs)
+
     attention_backend = get_attention_backend(**attn_kwargs)
-    return attention_backend(query, key, value, **attn_kwargs)
+    # the backend name only selects the backend and is not an argument of it
+    attn_kwargs.pop("backend", None)
+    out = attention_backend(query, key, value, **attn_kwargs)
+    if _ATTENTION_HOOKS:
+        _call_attention_hooks(query, key, value, out, **attn_kwargs)
+    return out
+
+
+def register_attention_hook(
+    hook: Callable[[dict[str, Tensor]], None], entropy: bool = False
+) -> RemovableHandle:
+    """Registers a hook that is called with summary statistics after every attention call.
+
+    The statistics are computed by ``attention_statistics`` and only if at least one hook is
+    registered, so there is no overhead otherwise. The norms are cheap reductions over the
+    queries, keys, values and outputs. The entropy is only computed if at least one hook
+    requests it, because it recomputes all attention logits in float32, which costs about as
+    much as the attention call itself.
+    Use ``lgatr.layers.instrumentation.register_instrumentation`` to attribute the statistics
+    to individual blocks of a network.
+
+    Parameters
+    ----------
+    hook : Callable
+        Function with signature ``hook(stats) -> None``,
+        where ``stats`` is a dictionary of detached tensors with shape (head,).
+    entropy : bool
+        Whether the statistics include the attention entropy and the largest logit.
+
+    Returns
+    -------
+    torch.utils.hooks.RemovableHandle
+        Handle that removes the hook with ``handle.remove()``.
+    """
+    handle = RemovableHandle(_ATTENTION_HOOKS, extra_dict=_ENTROPY_HOOKS)
+    _ATTENTION_HOOKS[handle.id] = hook
+    if entropy:
+        _ENTROPY_HOOKS[handle.id] = True
+    return handle
+
+
+@torch.no_grad()
+def attention_statistics(
+    query: Tensor,
+    key: Tensor,
+    value: Tensor,
+    output: Tensor,
+    entropy: bool = False,
+    chunk_size: int = 1024,
+    **attn_kwargs,
+) -> dict[str, Tensor]:
+    """Computes per-head summary statistics of an attention call.
+
+    The statistics are
+
+    - ``query_norm``, ``key_norm``, ``value_norm``: mean euclidean norm of the items
+    - ``output_absmax``: largest absolute value of the attention output
+    - ``logit_max``: largest attention logit (only if ``entropy=True``)
+    - ``entropy``: mean entropy of the attention weights in nats (only if ``entropy=True``)
+
+    Entropy and logits are accumulated over chunks of ``chunk_size`` queries in float32.
+    This is a second pass over all query-key pairs, which costs about as much as the attention
+    call itself, so they are opt-in. They are only available for the native backend, because
+    the masks of other backends are not represented as tensors.
+
+    Parameters
+    ----------
+    query : torch.Tensor
+        Tensor of shape (..., head, items_out, channels)
+    key : torch.Tensor
+        Tensor of shape (..., head, items_in, channels)
+    value : torch.Tensor
+        Tensor of shape (..., head, items_in, channels_out)
+    output : torch.Tensor
+        Tensor of shape (..., head, items_out, channels_out)
+    entropy : bool
+        Whether to compute the attention entropy and the largest logit.
+    chunk_size : int
+        Number of queries for which the attention weights are materialized at once.
+    **attn_kwargs
+        Keyword arguments of the attention call.
+
+    Returns
+    -------
+    dict[str, torch.Tensor]
+        Statistics with shape (head,).
+    """
+    stats = {
+        "query_norm": _per_head(torch.linalg.vector_norm(query.float(), dim=-1)),
+        "key_norm": _per_head(torch.linalg.vector_norm(key.float(), dim=-1)),
+        "value_norm": _per_head(torch.linalg.vector_norm(value.float(), dim=-1)),
+        "output_absmax": _per_head(output.abs().amax(dim=-1), reduction=torch.amax).float(),
+    }
+    if not entropy or any(
+        value is not None and value is not False
+        for kwarg, value in attn_kwargs.items()
+        if kwarg not in _ENTROPY_KWARGS
+    ):
+        return stats
+
+    scale = attn_kwargs.get("scale", None)
+    scale = query.shape[-1] ** -0.5 if scale is None else scale
+    attn_mask = attn_kwargs.get("attn_mask", None)
+    key_t = key.float().transpose(-1, -2)
+    entropies, logit_maxs = [], []
+    for start in range(0, query.shape[-2], chunk_size):
+        stop = start + chunk_size
+        logits = (query[..., start:stop, :].float() @ key_t) * scale
+        if attn_mask is not None:
+            mask = attn_mask[..., start:stop, :] if attn_mask.shape[-2] > 1 else attn_mask
+            if mask.dtype == torch.bool:
+                logits = logits.masked_fill(~mask, float("-inf"))
+            else:
+                logits = logits + mask.float()
+        lse = logits.logsumexp(dim=-1, keepdim=True)
+        weights = (logits - lse).exp()
+        weighted_logits = torch.where(weights > 0, weights * logits, 0.0).sum(dim=-1)
+        entropies.append(lse.squeeze(-1) - weighted_logits)
+        logit_maxs.append(logits.amax(dim=-1))
+    stats["entropy"] = _per_head(torch.cat(entropies, dim=-1))
+    stats["logit_max"] = _per_head(torch.cat(logit_maxs, dim=-1), reduction=torch.amax)
+    return stats
+
+
+def _per_head(x: Tensor, reduction: Callable = torch.mean) -> Tensor:
+    """Reduces a tensor of shape (..., head, items) over all dimensions except the head."""
+    return reduction(x.movedim(-2, 0).flatten(start_dim=1), dim=1)
+
+
+def _cast_attention_inputs(
+    dtype: torch.dtype, query: Tensor, key: Tensor, value: Tensor, attn_kwargs: dict
+) -> tuple[Tensor, Tensor, Tensor, dict]:
+    """Casts queries, keys, values and a float attention mask to the attention dtype."""
+    attn_mask = attn_kwargs.get("attn_mask", None)
+    if attn_mask is not None and attn_mask.is_floating_point():
+        attn_kwargs = {**attn_kwargs, "attn_mask": attn_mask.to(dtype)}
+    return query.to(dtype), key.to(dtype), value.to(dtype), attn_kwargs
+
+
+def _call_attention_hooks(query, key, value, output, entropy=True, **attn_kwargs):
+    """Computes attention statistics and passes them to all registered hooks.
+
+    ``entropy=False`` skips the entropy for attention calls where it cannot be reconstructed.
+    """
+    entropy = entropy and bool(_ENTROPY_HOOKS)
+    stats = attention_statistics(query, key, value, output, entropy=entropy, **attn_kwargs)
+    for hook in list(_ATTENTION_HOOKS.values()):
+        hook(stats)
+
+
+def pairwise_biased_attention(
+    query: Tensor,
+    key: Tensor,
+    value: Tensor,
+    pair_features: Tensor,
+    pair_scale: Tensor,
+    chunk_size: int = 512,
+    **attn_kwargs,
+) -> Tensor:
+    """Scaled dot-product self-attention with a pairwise Lorentz-invariant bias.
+
+    The bias ``pair_scale[h] * log(1 + |m2_ij|)`` is computed on the fly from per-item features
+    and never stored for all pairs of items at once.
+    With the flex_attention backend, the bias is evaluated inside the kernel through a
+    ``score_mod``. Flex is used if it is selected via ``score_mod``, ``block_mask`` or
+    ``backend="flex"``, and by default for CUDA inputs without further attention arguments.
+    Otherwise, queries and keys are processed in tiles of ``chunk_size`` items with an online
+    softmax, such that the bias is materialized for at most (..., head, chunk_size, chunk_size)
+    pairs. With gradients, the tiles are recomputed in the backward pass instead of being stored.
+
+    Parameters
+    ----------
+    query : torch.Tensor
+        Tensor of shape (..., head, items, channels)
+    key : torch.Tensor
+        Tensor of shape (..., head, items, channels)
+    value : torch.Tensor
+        Tensor of shape (..., head, items, channels_out)
+    pair_features : torch.Tensor
+        Per-item features with shape (..., items, 5), see ``pairwise_bias_features``.
+    pair_scale : torch.Tensor
+        Bias scale for each head with shape (head,).
+    chunk_size : int
+        Number of queries and keys of the tiles in which the bias is materialized without flex.
+    **attn_kwargs
+        Optional keyword arguments passed to attention. Without flex, only ``attn_mask``,
+        ``scale`` and ``dropout_p`` are supported.
+
+    Returns
+    -------
+    torch.Tensor
+        Tensor of shape (..., head, items, channels_out)
+    """
+    dtype = gatr_config.precision.compute_dtype("attention", query)
+    if dtype is not None:
+        with gatr_config.precision.autocast("attention", query.device.type):
+            query, key, value, attn_kwargs = _cast_attention_inputs(
+                dtype, query, key, value, attn_kwargs
+            )
+            return pairwise_biased_attention(
+                query, key, value, pair_features, pair_scale, chunk_size=chunk_size, **attn_kwargs
+            )
+
+    pair_scale = pair_scale.to(pair_features.dtype)
+    if _use_flex_for_pairwise_bias(query, attn_kwargs):
+        attn_kwargs["backend"] = "flex"
+        attn_kwargs["score_mod"] = pairwise_score_mod(
+            pair_features.reshape(-1, *pair_features.shape[-2:]),
+            pair_scale,
+            score_mod=attn_kwargs.get("score_mod", None),
+        )
+        return scaled_dot_product_attention(query, key, value, **attn_kwargs)
+
+    supported = ["attn_mask", "scale", "dropout_p", "backend"]
+    if attn_kwargs.get("backend", None) not in [None, "native"] or any(
+        value is not None and value is not False
+        for kwarg, value in attn_kwargs.items()
+        if kwarg not in supported
+    ):
+        raise NotImplementedError(
+            "The pairwise attention bias is only supported for the native and flex backends, "
+            f"got attention arguments {list(attn_kwargs)}"
+        )
+
+    attn_mask = attn_kwargs.get("attn_mask", None)
+    scale = attn_kwargs.get("scale", None)
+    scale = query.shape[-1] ** -0.5 if scale is None else scale
+    dropout_p = attn_kwargs.get("dropout_p", None) or 0.0
+    recompute = torch.is_grad_enabled() and any(
+        tensor.requires_grad for tensor in (query, key, value, pair_features, pair_scale)
+    )
+    outputs = []
+    for q_start in range(0, query.shape[-2], chunk_size):
+        q_slice = slice(q_start, q_start + chunk_size)
+        q_mask = None
+        if attn_mask is not None:
+            q_mask = attn_mask[..., q_slice, :] if attn_mask.shape[-2] > 1 else attn_mask
+        state = None
+        for k_start in range(0, key.shape[-2], chunk_size):
+            k_slice = slice(k_start, k_start + chunk_size)
+            mask = None
+            if q_mask is not None:
+                mask = q_mask[..., k_slice] if q_mask.shape[-1] > 1 else q_mask
+            tile_args = (
+                query[..., q_slice, :],
+                key[..., k_slice, :],
+                value[..., k_slice, :],
+                pair_features[..., q_slice, :],
+                pair_features[..., k_slice, :],
+                pair_scale,
+                mask,
+                scale,
+                dropout_p,
+                state,
+            )
+            if recompute:
+                state = checkpoint(_pairwise_attention_tile, *tile_args, use_reentrant=False)
+            else:
+                state = _pairwise_attention_tile(*tile_args)
+        _, running_sum, acc = state
+        outputs.append((acc / running_sum).to(value.dtype))
+    out = torch.cat(outputs, dim=-2)
+    if _ATTENTION_HOOKS:
+        _call_attention_hooks(query, key, value, out, entropy=False)
+    return out
+
+
+def _use_flex_for_pairwise_bias(query: Tensor, attn_kwargs: dict) -> bool:
+    """Whether ``pairwise_biased_attention`` evaluates the bias in a flex ``score_mod``.
+
+    Without explicit selection, flex is only used on CUDA, where its kernel is fused. On CPU,
+    eager flex_attention materializes all logits and compiled flex_attention does not support
+    the per-item features of the ``score_mod``.
+    """
+    if any(attn_kwargs.get(kwarg, None) is not None for kwarg in FLEX_KWARGS):
+        return True
+    backend = attn_kwargs.get("backend", None)
+    if backend is not None:
+        return backend == "flex"
+    if not query.is_cuda or any(
+        value is not None for kwarg, value in attn_kwargs.items() if kwarg != "scale"
+    ):
+        return False
+    return _resolve_backend("flex") is not None
+
+
+def _pairwise_attention_tile(
+    query: Tensor,
+    key: Tensor,
+    value: Tensor,
+    features_q: Tensor,
+    features_k: Tensor,
+    pair_scale: Tensor,
+    attn_mask: Tensor | None,
+    scale: float,
+    dropout_p: float,
+    state: tuple[Tensor, Tensor, Tensor] | None,
+) -> tuple[Tensor, Tensor, Tensor]:
+    """Online-softmax update of ``pairwise_biased_attention`` with a tile of keys.
+
+    ``state`` holds the running maximum and sum of the exponentiated logits and the running
+    weighted sum of the values, in at least float32, or is None for the first tile.
+    """
+    dtype = torch.promote_types(query.dtype, torch.float32)
+    logits = (query @ key.transpose(-1, -2)).to(dtype) * scale
+    logits = logits + pairwise_bias(features_q, features_k, pair_scale).to(dtype)
+    if attn_mask is not None and attn_mask.dtype == torch.bool:
+        logits = logits.masked_fill(~attn_mask, float("-inf"))
+    elif attn_mask is not None:
+        logits = logits + attn_mask.to(dtype)
+
+    tile_max = logits.amax(dim=-1, keepdim=True)
+    if state is not None:
+        tile_max = torch.maximum(state[0], tile_max)
+    # rows without any allowed key so far keep a finite reference
+    reference = tile_max.masked_fill(tile_max == float("-inf"), 0.0)
+    weights = (logits - reference).exp()
+    weights_sum = weights.sum(dim=-1, keepdim=True)
+    if dropout_p > 0.0:
+        weights = torch.nn.functional.dropout(weights, p=dropout_p)
+    acc = weights @ value.to(dtype)
+    if state is not None:
+        running_max, running_sum, running_acc = state
+        correction = (running_max - reference).exp()
+        weights_sum = weights_sum + correction * running_sum
+        acc = acc + correction * running_acc
+    return tile_max, weights_sum, acc
+
+
+def small_set_attention(
+    query: Tensor,
+    key: Tensor,
+    value: Tensor,
+    attn_mask: Tensor | None = None,
+    scale: float | None = None,
+    pair_features: Tensor | None = None,
+    pair_scale: Tensor | None = None,
+    **attn_kwargs,
+) -> Tensor:
+    """Scaled dot-product attention as explicit batched matrix multiplications.
+
+    For sets of a few items, the attention matrix is tiny and the cost of an attention call is
+    dominated by the backend dispatch rather than by the arithmetic. This function evaluates
+    ``softmax(q k^T * scale + mask) v`` directly, which ``torch.compile`` fuses with the
+    surrounding projections. Memory grows quadratically with the number of items.
+
+    Parameters
+    ----------
+    query : torch.Tensor
+        Tensor of shape (..., items_out, channels)
+    key : torch.Tensor
+        Tensor of shape (..., items_in, channels)
+    value : torch.Tensor
+        Tensor of shape (..., items_in, channels_out)
+    attn_mask : torch.Tensor or None
+        Boolean mask, True for pairs of items that take part in the attention,
+        or float bias that is added to the logits. Broadcastable to (..., items_out, items_in).
+    scale : float or None
+        Scale of the logits. Defaults to ``1 / sqrt(channels)``.
+    pair_features : torch.Tensor or None
+        Optional per-item features with shape (..., items, 5) for a pairwise Lorentz-invariant
+        attention bias in self-attention, see ``pairwise_biased_attention``.
+        The bias is materialized for all pairs of items.
+    pair_scale : torch.Tensor or None
+        Bias scale for each head with shape (head,). Required if ``pair_features`` is given.
+    **attn_kwargs
+        Further keyword arguments of the attention backends, which are not supported.
+
+    Returns
+    -------
+    torch.Tensor
+        Tensor of shape (..., items_out, channels_out)
+    """
+    if any(value is not None for value in attn_kwargs.values()):
+        raise NotImplementedError(
+            f"Small-set attention only supports attn_mask and scale, got {list(attn_kwargs)}"
+        )
+    dtype = gatr_config.precision.compute_dtype("attention", query)
+    if dtype is not None:
+        with gatr_config.precision.autocast("attention", query.device.type):
+            query, key, value, mask_kwargs = _cast_attention_inputs(
+                dtype, query, key, value, dict(attn_mask=attn_mask)
+            )
+            return small_set_attention(
+                query,
+                key,
+                value,
+                scale=scale,
+                pair_features=pair_features,
+                pair_scale=pair_scale,
+                **mask_kwargs,
+            )
+
+    scale = query.shape[-1] ** -0.5 if scale is None else scale
+    logits = (query @ key.transpose(-1, -2)).mul_(scale)
+    if pair_features is not None:
+        pair_scale = pair_scale.to(pair_features.dtype)
+        logits = logits + pairwise_bias(pair_features, pair_features, pair_scale).to(logits.dtype)
+    if attn_mask is not None and attn_mask.dtype == torch.bool:
+        logits = logits.masked_fill(~attn_mask, float("-inf"))
+    elif attn_mask is not None:
+        logits = logits + attn_mask
+    out = logits.softmax(dim=-1) @ value
+    if _ATTENTION_HOOKS:
+        _call_attention_hooks(
+            query,
+            key,
+            value,
+            out,
+            entropy=pair_features is None,
+            attn_mask=attn_mask,
+            scale=scale,
+        )
+    return out
+
+
+def linear_scaled_dot_product_attention(
+    query: Tensor,
+    key: Tensor,
+    value: Tensor,
+    chunk_size: int = 1024,
+    contraction_dtype: torch.dtype | None = None,
+) -> Tensor:
+    """Scaled dot-product attention with a second-order Taylor kernel.
+
+    Replaces ``exp(x)`` in the softmax by ``1 + x + x^2 / 2`` with ``x = q.k / channels``.
+    The kernel is strictly positive and factorizes as ``phi(q).phi(k)`` with the feature map
+    ``phi(y) = [1, y, y_a^2 / sqrt(2), y_a y_b]`` of ``y = q / sqrt(channels)`` and
+    ``y = k / sqrt(channels)``, where ``a < b`` runs over the pairs of channels, so attention
+    can be evaluated as ``phi(Q) (phi(K)^T V)`` in linear time. Because the kernel only depends
+    on the dot product ``q.k``, the attention weights inherit all invariance properties of the
+    logits.
+
+    The logits are scaled by ``1 / channels`` instead of ``1 / sqrt(channels)`` as in the
+    softmax. This keeps them in the range where the Taylor expansion is accurate, and it limits
+    the float32 rounding errors of the quadratic features: for large components, e.g. of boosted
+    multivectors, the products ``y_a y_b`` cancel in the sum over channels, and their rounding
+    errors enter the attention weights relative to the leading constant of the kernel.
+    With ``contraction_dtype=torch.float64``, the query features are contracted with the
+    key-value state in float64, which removes these errors at a small cost on CPU. Most GPUs
+    compute float64 much more slowly, and MPS does not support it.
+
+    With ``1 + channels (channels + 3) / 2`` features, the cost grows like
+    ``items channels^2 channels_out`` instead of ``items^2 (channels + channels_out)`` in
+    softmax attention, so the linear kernel only pays off for many items, see
+    ``lgatr.bench.attention_crossover``.
+    Keys and queries are processed in chunks of ``chunk_size`` items to bound the memory
+    of the quadratic features. Masks are not supported.
+
+    Parameters
+    ----------
+    query : torch.Tensor
+        Tensor of shape (..., items_out, channels)
+    key : torch.Tensor
+        Tensor of shape (..., items_in, channels)
+    value : torch.Tensor
+        Tensor of shape (..., items_in, channels_out)
+    chunk_size : int
+        Number of items for which the quadratic features are materialized at once.
+    contraction_dtype : torch.dtype or None
+        Dtype of the contraction of the query features with the key-value state. Defaults to
+        the dtype of the inputs. The features and the state are always computed in the dtype of
+        the inputs.
+
+    Returns
+    -------
+    torch.Tensor
+        Tensor of shape (..., items_out, channels_out)
+    """
+    dtype = gatr_config.precision.compute_dtype("attention", query)
+    if dtype is not None:
+        with gatr_config.precision.autocast("attention", query.device.type):
+            return linear_scaled_dot_product_attention(
+                query.to(dtype),
+                key.to(dtype),
+                value.to(dtype),
+                chunk_size=chunk_size,
+                contraction_dtype=contraction_dtype,
+            )
+
+    kv_state, k_state = 0.0, 0.0
+    for start in range(0, key.shape[-2], chunk_size):
+        phi_k = _taylor_feature_map(key[..., start : start + chunk_size, :])
+        kv_state = kv_state + phi_k.transpose(-1, -2) @ value[..., start : start + chunk_size, :]
+        k_state = k_state + phi_k.sum(dim=-2, keepdim=True).transpose(-1, -2)
+
+    # the contractions of the query features cancel for large inputs, see above
+    if contraction_dtype is None:
+        contraction_dtype = value.dtype
+    state = torch.cat([kv_state, k_state], dim=-1).to(contraction_dtype)
+    outputs = []
+    for start in range(0, query.shape[-2], chunk_size):
+        phi_q = _taylor_feature_map(query[..., start : start + chunk_size, :])
+        numerator, denominator = (phi_q.to(contraction_dtype) @ state).split(
+            [value.shape[-1], 1], dim=-1
+        )
+        outputs.append((numerator / denominator).to(value.dtype))
+    out = torch.cat(outputs, dim=-2)
+    if _ATTENTION_HOOKS:
+        _call_attention_hooks(query, key, value, out, entropy=False)
+    return out
+
+
+def _taylor_feature_map(x: Tensor) -> Tensor:
+    """Feature map of the second-order Taylor kernel, see ``linear_scaled_dot_product_attention``."""
+    channels = x.shape[-1]
+    x = x * channels**-0.5
+    # slices are much faster than gathering the pairs with advanced indexing
+    pairs = [x[..., a : a + 1] * x[..., a + 1 :] for a in range(channels - 1)]
+    return torch.cat([torch.ones_like(x[..., :1]), x, x.square() * 0.5**0.5, *pairs], dim=-1)
@@ -1,10 +1,13 @@
 """Dynamic attention backend selection."""
 
-from functools import lru_cache
+import sys
+import threading
 from importlib import metadata
 
 import torch
 
+from ...utils.misc import compile_constant, locked_cache
+
 # common kwargs used in custom attention backends
 VARLEN_KWARGS = ["cu_seq_q", "cu_seq_k", "max_q", "max_k"]
 XFORMERS_KWARGS = ["attn_bias", "op"]
@@ -12,29 +15,106 @@ FLEX_KWARGS = ["score_mod", "block_mask"]
 FLASH_KWARGS = ["cu_seqlens_q", "cu_seqlens_k", "max_seqlen_q", "max_seqlen_k"]
 
 
-@lru_cache
+@locked_cache
 def get_device():
     device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
     return device
 
 
+# attention backends that were loaded, and the reasons why the others could not be loaded
 _REGISTRY = {}
-for ep in metadata.entry_points(group="lgatr.primitives.attention_backends"):
-    try:
-        # check if entry point code be loaded without ImportError
-        module = ep.load()
-    except ImportError:
-        continue
+_FAILED = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+@locked_cache
+def _entry_points():
+    """Entry points of the attention backends by name, without loading them."""
+    return {
+        ep.name: ep for ep in metadata.entry_points(group="lgatr.primitives.attention_backends")
+    }
+
+
+def _load_backend(name):
+    """Loads the attention backend ``name`` when it is first selected.
+
+    The backends are only imported on demand, such that importing ``lgatr`` does not import
+    optional packages or query CUDA. Backends that cannot be loaded are remembered in
+    ``_FAILED`` and not tried again.
+
+    Returns
+    -------
+    module or None
+        Module of the backend with its ``attention`` function, or None if it is not available.
+    """
+    module = _REGISTRY.get(name)
+    if module is not None:
+        return module
+    with _REGISTRY_LOCK:
+        if name in _REGISTRY or name in _FAILED:
+            return _REGISTRY.get(name)
+        ep = _entry_points().get(name)
+        if ep is None:
+            _FAILED[name] = "no entry point"
+            return None
+        if name in ["xformers", "flash"] and get_device() == torch.device("cpu"):
+            # xformers and flash-attn are not available on CPU
+            _FAILED[name] = "not available on CPU"
+            return None
+        try:
+            # check if entry point code be loaded without ImportError
+            module = ep.load()
+        except ImportError as err:
+            _FAILED[name] = str(err)
+            return None
+        _REGISTRY[name] = module
+        return module
+
+
+@compile_constant
+def _backend_module_name(name):
+    """Name of the module of the attention backend ``name``, or "" if it is not available.
+
+    While compiling, the backend is loaded outside of the traced code and only its module name
+    enters the graph as a constant, such that the first selection does not break the graph.
+    """
+    module = _load_backend(name)
+    return "" if module is None else module.__name__
+
+
+def _resolve_backend(name):
+    """Attention function of the backend ``name``, or None if it is not available."""
+    if torch.compiler.is_compiling():
+        module_name = _backend_module_name(name)
+        return sys.modules[module_name].attention if module_name else None
+    module = _load_backend(name)
+    return None if module is None else module.attention
+
+
+def available_backends():
+    """Names of the attention backends that can be loaded.
+
+    Unlike ``get_attention_backend``, this loads all registered backends.
+
+    Returns
+    -------
+    list of str
+        Names of the available backends, e.g. ``["native", "varlen", "flex"]``.
+    """
+    return [name for name in _entry_points() if _load_backend(name) is not None]
+
 
-    if ep.name in ["xformers", "flash"] and get_device() == torch.device("cpu"):
-        # xformers and flash-attn are not available on CPU
-        continue
-    _REGISTRY[ep.name] = module
+def _require_backend(name):
+    attention = _resolve_backend(name)
+    if attention is None:
+        raise RuntimeError(f"Attention backend {name} is not available: {_FAILED[name]}")
+    return attention
 
 
 def get_attention_backend(**kwargs):
     """
     Dynamically determine the attention backend based on the extra keyword arguments.
+    Backends are imported when they are first selected.
 
     Implemented backends:
     - PyTorch's native attention: torch.nn.functional.scaled_dot_product_attention
@@ -45,23 +125,25 @@ def get_attention_backend(**kwargs):
     """
     # check if backend is explicitly specified
     backend = kwargs.get("backend", None)
-    if backend in _REGISTRY:
-        return _REGISTRY[backend].attention
+    if backend is not None:
+        attention = _resolve_backend(backend)
+        if attention is not None:
+            return attention
 
     # automatic fall-back based on other **kwargs
     if any(kwargs.get(kwarg, None) is not None for kwarg in VARLEN_KWARGS):
-        return _REGISTRY["varlen"].attention
+        return _require_backend("varlen")
     elif any(kwargs.get(kwarg, None) is not None for kwarg in XFORMERS_KWARGS):
-        return _REGISTRY["xformers"].attention
+        return _require_backend("xformers")
     elif any(kwargs.get(kwarg, None) is not None for kwarg in FLEX_KWARGS):
-        return _REGISTRY["flex"].attention
+        return _require_backend("flex")
     elif any(kwargs.get(kwarg, None) is not None for kwarg in FLASH_KWARGS):
-        return _REGISTRY["flash"].attention
+        return _require_backend("flash")
 
     # fall-back to native torch attention
-    try:
-        return _REGISTRY["native"].attention
-    except KeyError as err:
+    attention = _resolve_backend("native")
+    if attention is None:
         raise RuntimeError(
-            f"No attention backend could be resolved. Available backends: {list(_REGISTRY)}"
-        ) from err
+            f"No attention backend could be resolved. Available backends: {available_backends()}"
+        )
+    return attention
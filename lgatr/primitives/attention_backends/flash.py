@@ -9,6 +9,8 @@ except ModuleNotFoundError as err:
         "flash-attn is not installed. Run 'pip install lgatr[flash-attention]'."
     ) from err
 
+from ..config import gatr_config
+
 
 @torch.compiler.disable()
 def attention(query, key, value, dtype=None, **kwargs):
@@ -28,7 +30,8 @@ def attention(query, key, value, dtype=None, **kwargs):
         Values with shape (batch, head, items_in, channel)
     dtype : torch.dtype, optional
         If specified, cast input tensors to this dtype before passing to flash-attention.
-        If None, use torch.get_autocast_gpu_dtype().
+        If None, use the attention dtype of ``gatr_config.precision`` if it is a half dtype,
+        and torch.get_autocast_gpu_dtype() otherwise.
     **kwargs
         Additional keyword arguments passed to flash_attn_varlen_func.
 
@@ -44,7 +47,9 @@ def attention(query, key, value, dtype=None, **kwargs):
     if query.dtype not in [torch.float16, torch.bfloat16]:
         # flash-attention only supports fp16 and bf16
         if dtype is None:
-            dtype = torch.get_autocast_gpu_dtype()
+            dtype = gatr_config.precision.attention
+            if dtype not in [torch.float16, torch.bfloat16]:
+                dtype = torch.get_autocast_gpu_dtype()
         in_dtype = query.dtype
         query, key, value = query.to(dtype), key.to(dtype), value.to(dtype)
     else:
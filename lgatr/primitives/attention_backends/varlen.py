@@ -9,6 +9,8 @@ except ModuleNotFoundError as err:
         "torch>=2.10 is not installed. Run 'pip install lgatr[varlen-attention]'."
     ) from err
 
+from ..config import gatr_config
+
 
 def attention(query, key, value, dtype=None, **kwargs):
     """Pass to pytorchs native varlen_attn.
@@ -25,7 +27,8 @@ def attention(query, key, value, dtype=None, **kwargs):
         Values with shape (batch, head, items_in, channel)
     dtype : torch.dtype, optional
         If specified, cast input tensors to this dtype before passing to flash-attention.
-        If None, use torch.get_autocast_gpu_dtype().
+        If None, use the attention dtype of ``gatr_config.precision`` if it is a half dtype,
+        and torch.get_autocast_gpu_dtype() otherwise.
     **kwargs
         Additional keyword arguments passed to varlen_attn.
 
@@ -41,7 +44,9 @@ def attention(query, key, value, dtype=None, **kwargs):
     if query.dtype not in [torch.float16, torch.bfloat16]:
         # flash-attention only supports fp16 and bf16
         if dtype is None:
-            dtype = torch.get_autocast_gpu_dtype()
+            dtype = gatr_config.precision.attention
+            if dtype not in [torch.float16, torch.bfloat16]:
+                dtype = torch.get_autocast_gpu_dtype()
         in_dtype = query.dtype
         query, key, value = query.to(dtype), key.to(dtype), value.to(dtype)
     else:
@@ -1,19 +1,22 @@
 """Geometric product."""
 
-from functools import lru_cache
 from pathlib import Path
 
 import torch
 
 from ..utils.einsum import cached_einsum
+from ..utils.misc import compile_constant, locked_cache
+from ..utils.profiling import record_region
+from .config import gatr_config
 from .linear import DEFAULT_DEVICE, DEFAULT_DTYPE
 
 
-@lru_cache
+@compile_constant
+@locked_cache
 def _load_geometric_product_tensor(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> torch.Tensor:
     """Loads geometric product tensor for geometric product between multivectors.
 
-    This function is cached.
+    This function is cached and its result is treated as a constant by ``torch.compile``.
 
     Parameters
     ----------
@@ -38,6 +41,7 @@ def _load_geometric_product_tensor(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -
     return gmt.to(device=device, dtype=dtype)
 
 
+@record_region
 def geometric_product(x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
     """Computes the geometric product ``f(x,y) = x*y``.
 
@@ -56,6 +60,10 @@ def geometric_product(x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
         Result with shape (..., 16).
         Batch dimensions are result of broadcasting between x, y, and coeffs.
     """
+    dtype = gatr_config.precision.compute_dtype("bilinear", x)
+    if dtype is not None:
+        with gatr_config.precision.autocast("bilinear", x.device.type):
+            return geometric_product(x.to(dtype), y.to(dtype))
 
     # Select kernel on correct device
     gp = _load_geometric_product_tensor(device=x.device, dtype=x.dtype)
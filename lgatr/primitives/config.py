@@ -1,6 +1,154 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import contextlib
+import functools
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import torch
+
+_HALF_DTYPES = (torch.float16, torch.bfloat16)
+_CATEGORIES = ("linear", "bilinear", "norm", "attention")
+
+# set by ``resolve_precision`` while a forward pass runs outside of autocast regions
+_resolved = threading.local()
+
+
+@dataclass
+class PrecisionPolicy:
+    """Compute dtypes of the operation categories inside ``torch.autocast`` regions.
+
+    Outside of autocast regions, the policy has no effect and every operation computes in the
+    dtype of its inputs. Inside autocast regions, the operations of a category compute in the
+    dtype that is assigned to it, and the outputs keep that dtype. An entry ``None`` leaves the
+    category to autocast.
+
+    The policy only sets compute dtypes. There are no separate storage dtypes: the activations
+    between the layers stay in the compute dtype of the operation that produced them, and the
+    next operation casts them to its own compute dtype. The parameters keep their dtype and are
+    cast by autocast or by the operations.
+
+    Parameters
+    ----------
+    linear : torch.dtype or None
+        Dtype of ``EquiLinear`` and the linear layers of ``LGATrSlim``.
+        A half dtype runs these layers under autocast with this dtype, such that the weights are
+        cast as well, ``torch.float32`` disables autocast for them.
+    bilinear : torch.dtype or None
+        Dtype of the geometric product.
+    norm : torch.dtype or None
+        Minimal dtype of norms, inner products and layer normalizations. Inputs with a higher
+        precision, e.g. ``torch.float64``, are not downcast. Defaults to ``torch.float32``,
+        because squared norms of multivectors overflow or lose precision in half precision.
+    attention : torch.dtype or None
+        Dtype of the attention operation. The queries, keys and values are assembled in this
+        dtype, such that the attention backends receive them without another cast.
+        Defaults to ``torch.float32``. Use ``torch.bfloat16`` or ``torch.float16`` to run the
+        attention in half precision, e.g. with flash-attention.
+    """
+
+    linear: torch.dtype | None = None
+    bilinear: torch.dtype | None = None
+    norm: torch.dtype | None = torch.float32
+    attention: torch.dtype | None = torch.float32
+
+    def compute_dtype(self, category: str, x: torch.Tensor) -> torch.dtype | None:
+        """Dtype in which an operation of ``category`` computes on inputs like ``x``.
+
+        Parameters
+        ----------
+        category : str
+            One of ``"linear"``, ``"bilinear"``, ``"norm"``, ``"attention"``.
+        x : torch.Tensor
+            Input of the operation, determines the device type and, for norms, the minimal dtype.
+
+        Returns
+        -------
+        dtype : torch.dtype or None
+            None if the policy does not apply, i.e. outside of autocast regions, for categories
+            without an entry, and inside of a region that already follows the policy.
+        """
+        if getattr(_resolved, "inactive", False):
+            return None
+        if category not in _CATEGORIES:
+            raise ValueError(f"Unknown category {category}, choose one of {_CATEGORIES}")
+        dtype = getattr(self, category)
+        device_type = x.device.type
+        if dtype is None or not _is_autocast_enabled(device_type):
+            return None
+        if dtype in _HALF_DTYPES and dtype == _get_autocast_dtype(device_type):
+            # the surrounding autocast region casts to this dtype already
+            return None
+        if category == "norm" and x.is_floating_point() and x.dtype.itemsize > dtype.itemsize:
+            return x.dtype
+        return dtype
+
+    def autocast(self, category: str, device_type: str) -> contextlib.AbstractContextManager:
+        """Autocast region in which an operation of ``category`` is executed.
+
+        Parameters
+        ----------
+        category : str
+            One of ``"linear"``, ``"bilinear"``, ``"norm"``, ``"attention"``.
+        device_type : str
+            Device type of the inputs.
+
+        Returns
+        -------
+        contextlib.AbstractContextManager
+            Autocast with the half dtype of ``category``, or disabled autocast if the inputs
+            are cast explicitly.
+        """
+        dtype = getattr(self, category)
+        if category == "linear" and dtype in _HALF_DTYPES:
+            return torch.autocast(device_type, dtype=dtype)
+        return torch.autocast(device_type, enabled=False)
+
+
+def resolve_precision(forward: Callable) -> Callable:
+    """Decorates the ``forward`` method of a network to resolve the precision policy once.
+
+    Outside of autocast regions, ``PrecisionPolicy.compute_dtype`` then returns None for all
+    operations of the forward pass without querying the autocast state of each operation.
+    Inside of autocast regions, the operations resolve the policy themselves. Under
+    compilation, the policy is resolved while tracing and the decorator has no effect.
+
+    Parameters
+    ----------
+    forward : Callable
+        Method whose first tensor argument determines the device type.
+
+    Returns
+    -------
+    Callable
+        Decorated method.
+    """
+
+    @functools.wraps(forward)
+    def wrapper(self, *args, **kwargs):
+        if torch.compiler.is_compiling() or getattr(_resolved, "inactive", False):
+            return forward(self, *args, **kwargs)
+        x = next(arg for arg in (*args, *kwargs.values()) if isinstance(arg, torch.Tensor))
+        if _is_autocast_enabled(x.device.type):
+            return forward(self, *args, **kwargs)
+        _resolved.inactive = True
+        try:
+            return forward(self, *args, **kwargs)
+        finally:
+            _resolved.inactive = False
+
+    return wrapper
+
+
+def _is_autocast_enabled(device_type: str) -> bool:
+    if device_type == "meta":  # shape-only tracing, e.g. in lgatr.nets.cost_model
+        return False
+    return torch.is_autocast_enabled(device_type)
+
+
+def _get_autocast_dtype(device_type: str) -> torch.dtype:
+    return torch.get_autocast_dtype(device_type)
 
 
 @dataclass
@@ -30,6 +178,9 @@ class LGATrConfig:
         If False, the GeometricBilinear layer is replaced
         by a EquiLinear + ScalarGatedNonlinearity layer.
         This is a toy switch to explore the effect of the geometric product.
+    precision : PrecisionPolicy
+        Compute dtypes of the operation categories inside ``torch.autocast`` regions.
+        The default computes norms and attention in float32 and leaves the rest to autocast.
     """
 
     use_fully_connected_subgroup: bool = True
@@ -37,6 +188,8 @@ class LGATrConfig:
     use_bivector: bool = True
     use_geometric_product: bool = True
 
+    precision: PrecisionPolicy = field(default_factory=PrecisionPolicy)
+
     @property
     def num_pin_linear_basis_elements(self):
         return 10 if self.use_fully_connected_subgroup else 5
@@ -2,9 +2,11 @@
 
 import torch
 
+from ..utils.profiling import record_region
 from .linear import grade_project
 
 
+@record_region
 def grade_dropout(x: torch.Tensor, p: float, training: bool = True) -> torch.Tensor:
     """Multivector dropout, dropping out grades independently.
 
@@ -1,16 +1,18 @@
 """Invariants, e.g. inner product, absolute squared norm, pin invariants."""
 
 import math
-from functools import lru_cache
 
 import torch
 
 from ..utils.einsum import cached_einsum
-from ..utils.misc import minimum_autocast_precision
+from ..utils.misc import compile_constant, locked_cache
+from ..utils.profiling import record_region
+from .config import gatr_config
 from .linear import DEFAULT_DEVICE, DEFAULT_DTYPE
 
 
-@lru_cache
+@compile_constant
+@locked_cache
 def _load_inner_product_factors(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> torch.Tensor:
     """Constructs an array of 1's and -1's for the metric of the space,
     used to compute the inner product.
@@ -35,7 +37,8 @@ def _load_inner_product_factors(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> t
     return factors.to(device=device, dtype=dtype)
 
 
-@lru_cache
+@compile_constant
+@locked_cache
 def _load_metric_grades(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> torch.Tensor:
     """Generate tensor of the diagonal of the GA metric, combined with a grade projection.
 
@@ -61,6 +64,7 @@ def _load_metric_grades(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> torch.Ten
     return m_grades.to(device=device, dtype=dtype)
 
 
+@record_region
 def inner_product(x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
     """Computes the inner product of multivectors ``f(x,y) = <x, y> = <~x y>_0``.
 
@@ -92,7 +96,7 @@ def inner_product(x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
     return outputs
 
 
-@minimum_autocast_precision(torch.float32)
+@record_region
 def abs_squared_norm(x: torch.Tensor) -> torch.Tensor:
     """Computes a modified version of the squared norm that is positive semidefinite and can
     therefore be used in layer normalization.
@@ -107,6 +111,11 @@ def abs_squared_norm(x: torch.Tensor) -> torch.Tensor:
     outputs : torch.Tensor
         Geometric algebra norm of x with shape (..., 1).
     """
+    dtype = gatr_config.precision.compute_dtype("norm", x)
+    if dtype is not None:
+        with gatr_config.precision.autocast("norm", x.device.type):
+            return abs_squared_norm(x.to(dtype))
+
     m = _load_metric_grades(device=x.device, dtype=x.dtype)
     abs_squared_norms = (
         cached_einsum("... i, ... i, g i -> ... g", x, x, m).abs().sum(-1, keepdim=True)
@@ -1,18 +1,20 @@
 """Linear operations on multivectors, in particular linear basis maps."""
 
-from functools import lru_cache
 from pathlib import Path
 
 import torch
 
 from ..utils.einsum import cached_einsum, custom_einsum
+from ..utils.misc import compile_constant, locked_cache
+from ..utils.profiling import record_region
 from .config import gatr_config
 
 DEFAULT_DEVICE = torch.device("cpu")
 DEFAULT_DTYPE = torch.float32
 
 
-@lru_cache
+@compile_constant
+@locked_cache
 def _compute_pin_equi_linear_basis(
     use_fully_connected_subgroup: bool = True,
     device=DEFAULT_DEVICE,
@@ -20,7 +22,7 @@ def _compute_pin_equi_linear_basis(
 ) -> torch.Tensor:
     """Constructs basis elements for Lorentz-equivariant linear maps between multivectors.
 
-    This function is cached.
+    This function is cached and its result is treated as a constant by ``torch.compile``.
 
     Parameters
     ----------
@@ -62,7 +64,8 @@ def _compute_pin_equi_linear_basis(
     return basis.to(device=device, dtype=dtype)
 
 
-@lru_cache
+@compile_constant
+@locked_cache
 def _compute_reversal(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> torch.Tensor:
     """Constructs a matrix that computes multivector reversal.
 
@@ -83,7 +86,8 @@ def _compute_reversal(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> torch.Tenso
     return reversal_flat
 
 
-@lru_cache
+@compile_constant
+@locked_cache
 def _compute_grade_involution(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> torch.Tensor:
     """Constructs a matrix that computes multivector grade involution.
 
@@ -105,6 +109,53 @@ def _compute_grade_involution(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> tor
     return involution_flat
 
 
+@compile_constant
+@locked_cache
+def _compute_scalar_components(
+    use_fully_connected_subgroup: bool = True, device=DEFAULT_DEVICE
+) -> torch.Tensor:
+    """Indices of the multivector components that transform like scalars.
+
+    Parameters
+    ----------
+    use_fully_connected_subgroup : bool
+        If True, the pseudoscalar is treated like another scalar,
+        see ``lgatr.primitives.config.LGATrConfig``.
+    device : torch.device
+        Device
+
+    Returns
+    -------
+    indices : torch.Tensor
+        Indices with shape (2,) for the scalar and pseudoscalar, or (1,) for the scalar.
+    """
+    indices = [0, 15] if use_fully_connected_subgroup else [0]
+    return torch.tensor(indices, device=device)
+
+
+@compile_constant
+@locked_cache
+def _compute_bivector_mask(device=DEFAULT_DEVICE, dtype=DEFAULT_DTYPE) -> torch.Tensor:
+    """Constructs a mask that removes the bivector components of multivectors.
+
+    Parameters
+    ----------
+    device : torch.device
+        Device
+    dtype : torch.dtype
+        Dtype
+
+    Returns
+    -------
+    mask : torch.Tensor
+        Mask with shape (16,), zero for the bivector components and one otherwise.
+    """
+    mask = torch.ones(16, device=device, dtype=dtype)
+    mask[5:11] = 0
+    return mask
+
+
+@record_region
 def equi_linear(x: torch.Tensor, coeffs: torch.Tensor) -> torch.Tensor:
     """Pin-equivariant linear map ``f(x) = sum_{a,j} coeffs_a W^a_ij x_j``.
 
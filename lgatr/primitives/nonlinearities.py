@@ -2,7 +2,10 @@
 
 import torch
 
+from ..utils.profiling import record_region
 
+
+@record_region
 def gated_relu(x: torch.Tensor, gates: torch.Tensor) -> torch.Tensor:
     """Pin-equivariant gated ReLU nonlinearity.
 
@@ -28,6 +31,7 @@ def gated_relu(x: torch.Tensor, gates: torch.Tensor) -> torch.Tensor:
     return outputs
 
 
+@record_region
 def gated_sigmoid(x: torch.Tensor, gates: torch.Tensor):
     """Pin-equivariant gated sigmoid nonlinearity.
 
@@ -53,6 +57,7 @@ def gated_sigmoid(x: torch.Tensor, gates: torch.Tensor):
     return outputs
 
 
+@record_region
 def gated_gelu(x: torch.Tensor, gates: torch.Tensor) -> torch.Tensor:
     """Pin-equivariant gated GeLU nonlinearity without division.
 
@@ -82,6 +87,7 @@ def gated_gelu(x: torch.Tensor, gates: torch.Tensor) -> torch.Tensor:
     return outputs
 
 
+@record_region
 def gated_silu(x: torch.Tensor, gates: torch.Tensor) -> torch.Tensor:
     """Pin-equivariant gated SiLU or Swish nonlinearity without division.
 
@@ -2,11 +2,12 @@
 
 import torch
 
-from ..utils.misc import minimum_autocast_precision
+from ..utils.profiling import record_region
+from .config import gatr_config
 from .invariants import abs_squared_norm
 
 
-@minimum_autocast_precision(torch.float32)
+@record_region
 def equi_layer_norm(
     x: torch.Tensor, channel_dim: int = -2, gain: float = 1.0, epsilon: float = 0.01
 ) -> torch.Tensor:
@@ -35,6 +36,10 @@ def equi_layer_norm(
     outputs : torch.Tensor
         Normalized multivectors with shape (..., 16).
     """
+    dtype = gatr_config.precision.compute_dtype("norm", x)
+    if dtype is not None:
+        with gatr_config.precision.autocast("norm", x.device.type):
+            return equi_layer_norm(x.to(dtype), channel_dim=channel_dim, gain=gain, epsilon=epsilon)
 
     # Compute mean_channels |inputs|^2
     abs_squared_norms = abs_squared_norm(x)
@@ -0,0 +1,99 @@
+"""Pairwise Lorentz-invariant attention biases."""
+
+from collections.abc import Callable
+
+import torch
+from torch import Tensor
+
+from ..utils.profiling import record_region
+from .config import gatr_config
+
+
+@record_region
+def pairwise_bias_features(vectors: Tensor) -> Tensor:
+    """Prepares per-item features for the pairwise attention bias.
+
+    The pairwise invariant ``m2_ij = (p_i + p_j)^2 = m2_i + m2_j + 2 p_i.p_j`` can be evaluated
+    from per-item quantities only, so we store ``[E, px, py, pz, m2]`` for each item. These
+    features are computed once per forward pass and shared across all attention layers.
+
+    Parameters
+    ----------
+    vectors : torch.Tensor
+        Lorentz vectors (E, px, py, pz) with shape (..., items, 4).
+
+    Returns
+    -------
+    torch.Tensor
+        Per-item features with shape (..., items, 5).
+    """
+    dtype = gatr_config.precision.compute_dtype("norm", vectors)
+    if dtype is not None:
+        with gatr_config.precision.autocast("norm", vectors.device.type):
+            return pairwise_bias_features(vectors.to(dtype))
+
+    m2 = vectors[..., 0] ** 2 - (vectors[..., 1:] ** 2).sum(dim=-1)
+    return torch.cat([vectors, m2.unsqueeze(-1)], dim=-1)
+
+
+def pairwise_bias(features_q: Tensor, features_k: Tensor, scale: Tensor) -> Tensor:
+    """Evaluates the pairwise attention bias ``scale[h] * log(1 + |m2_ij|)`` for a tile of items.
+
+    Parameters
+    ----------
+    features_q : torch.Tensor
+        Features of the query items with shape (..., items_out, 5), see ``pairwise_bias_features``.
+    features_k : torch.Tensor
+        Features of the key items with shape (..., items_in, 5).
+    scale : torch.Tensor
+        Bias scale for each head with shape (num_heads,).
+
+    Returns
+    -------
+    torch.Tensor
+        Attention bias with shape (..., num_heads, items_out, items_in).
+    """
+    time = features_q[..., :1] @ features_k[..., :1].transpose(-1, -2)
+    space = features_q[..., 1:4] @ features_k[..., 1:4].transpose(-1, -2)
+    dot = time - space
+    m2 = features_q[..., 4:5] + features_k[..., 4].unsqueeze(-2) + 2 * dot
+    return scale[:, None, None] * torch.log1p(m2.abs()).unsqueeze(-3)
+
+
+def pairwise_score_mod(
+    features: Tensor, scale: Tensor, score_mod: Callable | None = None
+) -> Callable:
+    """Constructs a flex_attention ``score_mod`` that adds the pairwise attention bias.
+
+    The bias is evaluated inside the attention kernel from the per-item features,
+    so no tensor of shape (..., items, items) is materialized.
+
+    Parameters
+    ----------
+    features : torch.Tensor
+        Per-item features with shape (batch, items, 5), see ``pairwise_bias_features``.
+    scale : torch.Tensor
+        Bias scale for each head with shape (num_heads,).
+    score_mod : Callable or None
+        Optional user-defined ``score_mod`` that is applied before adding the bias.
+
+    Returns
+    -------
+    Callable
+        ``score_mod`` function for ``torch.nn.attention.flex_attention.flex_attention``.
+    """
+    e, px, py, pz, m2 = features.unbind(dim=-1)
+
+    def _score_mod(score, b, h, q_idx, kv_idx):
+        if score_mod is not None:
+            score = score_mod(score, b, h, q_idx, kv_idx)
+        dot = (
+            e[b, q_idx] * e[b, kv_idx]
+            - px[b, q_idx] * px[b, kv_idx]
+            - py[b, q_idx] * py[b, kv_idx]
+            - pz[b, q_idx] * pz[b, kv_idx]
+        )
+        m2_ij = m2[b, q_idx] + m2[b, kv_idx] + 2 * dot
+        return score + scale[h] * torch.log1p(torch.abs(m2_ij))
+
+    return _score_mod
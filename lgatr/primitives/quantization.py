@@ -0,0 +1,131 @@
+"""Int8 quantization of linear maps for CPU inference."""
+
+import torch
+
+INT8_MAX = 127
+
+
+def quantize_per_channel(weight: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    """Symmetric int8 quantization with one scale per row of a weight matrix.
+
+    Parameters
+    ----------
+    weight : torch.Tensor
+        Weights with shape (out_channels, in_channels).
+
+    Returns
+    -------
+    qweight : torch.Tensor
+        Int8 weights with shape (out_channels, in_channels). They are stored in column-major
+        layout, such that ``qweight.T`` is contiguous, which is the fastest layout for the int8
+        matrix multiplication in ``int8_linear``.
+    scale : torch.Tensor
+        Scales with shape (out_channels,), such that ``weight ~ qweight * scale[:, None]``.
+    """
+    scale = weight.abs().amax(dim=-1) / INT8_MAX
+    scale = torch.where(scale > 0, scale, torch.ones_like(scale))
+    qweight = torch.round(weight / scale[:, None]).clamp(-INT8_MAX, INT8_MAX)
+    return qweight.to(torch.int8).T.contiguous().T, scale
+
+
+def int8_linear(
+    inputs: torch.Tensor,
+    qweight: torch.Tensor,
+    scale: torch.Tensor,
+    bias: torch.Tensor | None = None,
+    dynamic_activations: bool = True,
+) -> torch.Tensor:
+    """Linear map with int8 weights.
+
+    With ``dynamic_activations``, the inputs are quantized to int8 on the fly with one scale per
+    row, and the matrix multiplication is performed in int8 with int32 accumulation.
+    Otherwise, the weights are dequantized and the matrix multiplication is performed in the
+    dtype of the inputs.
+
+    Parameters
+    ----------
+    inputs : torch.Tensor
+        Inputs with shape (..., in_channels).
+    qweight : torch.Tensor
+        Int8 weights with shape (out_channels, in_channels), see ``quantize_per_channel``.
+    scale : torch.Tensor
+        Weight scales with shape (out_channels,).
+    bias : torch.Tensor or None
+        Optional bias with shape (out_channels,).
+    dynamic_activations : bool
+        Whether to quantize the inputs.
+
+    Returns
+    -------
+    outputs : torch.Tensor
+        Outputs with shape (..., out_channels).
+    """
+    if not dynamic_activations:
+        weight = qweight.to(inputs.dtype) * scale[:, None].to(inputs.dtype)
+        return torch.nn.functional.linear(inputs, weight, bias)
+
+    qx, x_scale = _quantize_rows(inputs.reshape(-1, inputs.shape[-1]))
+    # in-place updates avoid materializing the outer product of the scales
+    outputs = _int8_matmul(qx, qweight.T).mul_(x_scale).mul_(scale.float())
+    if bias is not None:
+        outputs.add_(bias.float())
+    return outputs.to(inputs.dtype).reshape(*inputs.shape[:-1], -1)
+
+
+def quantize_equi_linear_weight(weight: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    """Symmetric int8 quantization of the coefficients of an equivariant linear map.
+
+    The coefficients are quantized with one scale per output channel and basis element. The
+    dequantized coefficients multiply the same basis maps as before, such that the quantized
+    map is still exactly equivariant.
+
+    Parameters
+    ----------
+    weight : torch.Tensor
+        Coefficients with shape (out_channels, in_channels, num_pin_linear_basis_elements).
+
+    Returns
+    -------
+    qweight : torch.Tensor
+        Int8 coefficients with the same shape as ``weight``.
+    scale : torch.Tensor
+        Scales with shape (out_channels, num_pin_linear_basis_elements).
+    """
+    scale = weight.abs().amax(dim=1) / INT8_MAX
+    scale = torch.where(scale > 0, scale, torch.ones_like(scale))
+    qweight = torch.round(weight / scale[:, None, :]).clamp(-INT8_MAX, INT8_MAX)
+    return qweight.to(torch.int8), scale
+
+
+def dequantize_equi_linear_weight(qweight: torch.Tensor, scale: torch.Tensor) -> torch.Tensor:
+    """Inverse of ``quantize_equi_linear_weight``, up to rounding errors.
+
+    Parameters
+    ----------
+    qweight : torch.Tensor
+        Int8 coefficients with shape (out_channels, in_channels, num_pin_linear_basis_elements).
+    scale : torch.Tensor
+        Scales with shape (out_channels, num_pin_linear_basis_elements).
+
+    Returns
+    -------
+    weight : torch.Tensor
+        Coefficients with shape (out_channels, in_channels, num_pin_linear_basis_elements).
+    """
+    return qweight.to(scale.dtype) * scale[:, None, :]
+
+
+def _quantize_rows(x: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    """Symmetric int8 quantization with one float32 scale per row."""
+    x = x.float()
+    x_scale = x.abs().amax(dim=-1, keepdim=True) / INT8_MAX
+    x_scale = torch.where(x_scale > 0, x_scale, torch.ones_like(x_scale))
+    return (x * x_scale.reciprocal()).round_().to(torch.int8), x_scale
+
+
+def _int8_matmul(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
+    """Matrix multiplication of int8 matrices with float32 outputs."""
+    if a.device.type == "cpu" and hasattr(torch, "_int_mm"):
+        return torch._int_mm(a, b).float()
+    # exact as long as the accumulated products fit into the float32 mantissa
+    return a.float() @ b.float()
@@ -0,0 +1,5 @@
+from .async_engine import AsyncInferenceEngine
+from .engine import InferenceEngine
+from .memory import OOMSplitter, find_max_tokens, is_out_of_memory
+from .offline import event_files, load_model, run_inference
+from .sharding import ShardedInference, sharding_report
@@ -0,0 +1,65 @@
+"""Command line interface of the offline inference, ``lgatr-infer --help``."""
+
+import argparse
+import json
+import sys
+
+from ..utils.batching import PACKINGS
+from .offline import POOLINGS, load_model, run_inference
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="lgatr-infer",
+        description="Evaluate an L-GATr network on a directory of event files.",
+    )
+    parser.add_argument("input", help="event file or directory of event files")
+    parser.add_argument("output", help="output directory, continues a previous run")
+    parser.add_argument("--config", required=True, help="JSON file with the network config")
+    parser.add_argument("--weights", help="state_dict of the network saved with torch.save")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--max-tokens", type=int, default=8192, help="items per batch")
+    parser.add_argument(
+        "--packing",
+        choices=PACKINGS,
+        help="packed or padded batches, defaults to varlen on CUDA and padded otherwise",
+    )
+    parser.add_argument("--backend", help="attention backend, defaults to the packing")
+    parser.add_argument("--pool", choices=POOLINGS, default="none", help="reduction per event")
+    parser.add_argument(
+        "--workers", type=int, default=0, help="inference processes on CPU with shared weights"
+    )
+    parser.add_argument(
+        "--threads", type=int, help="intra-op threads of the inference, per worker process"
+    )
+    parser.add_argument("--loader-workers", type=int, default=0, help="data loading processes")
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=10, help="batches between checkpoints"
+    )
+    parser.add_argument(
+        "--no-optimize", action="store_true", help="skip optimize_for_inference for LGATr"
+    )
+    args = parser.parse_args(argv)
+
+    model = load_model(args.config, args.weights, args.device, optimize=not args.no_optimize)
+    stats = run_inference(
+        model,
+        args.input,
+        args.output,
+        max_tokens=args.max_tokens,
+        backend=args.backend,
+        packing=args.packing,
+        pool=args.pool,
+        num_workers=args.loader_workers,
+        num_processes=args.workers,
+        num_threads=args.threads,
+        checkpoint_every=args.checkpoint_every,
+        device=args.device,
+        verbose=True,
+    )
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""Asyncio front-end that coalesces concurrent awaits into batches."""
+
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any
+
+import torch
+from torch import nn
+
+from ..utils.batching import PACKINGS, collate_events
+from .engine import _batch_cost, _event_items, _scatter, _signature
+
+
+@dataclass
+class _AsyncRequest:
+    """Event that waits for the next batch of an ``AsyncInferenceEngine``."""
+
+    args: tuple
+    kwargs: dict[str, Any]
+    num_items: int
+    signature: tuple
+    future: asyncio.Future
+
+
+class AsyncInferenceEngine:
+    """Serves a network to asyncio tasks, with the forward passes on a dedicated executor.
+
+    All events that are awaited with ``infer`` within the same iteration of the event loop are
+    coalesced into batches, which are evaluated on a thread of ``executor`` without blocking the
+    event loop. While all ``max_concurrency`` batches are running, further events wait and form
+    the batches of a later tick, such that the batches grow with the load:
+
+    .. code-block::
+
+        async with AsyncInferenceEngine(model.freeze(), max_tokens=4096) as engine:
+            outputs_mv, outputs_s = await engine.infer(multivectors, scalars=scalars)
+
+    Events of a tick are grouped by their trailing shapes and arguments, and each group is split
+    into batches under the ``max_tokens`` and ``max_events`` budgets, with the costs of
+    ``InferenceEngine``. Cancelling an awaiting task, e.g. with ``asyncio.wait_for``, removes its
+    event from batches that have not started yet. The forward pass of a running batch is not
+    interrupted, but the outputs of cancelled events are discarded. ``timeout`` applies such a
+    time-out to every event. The numbers of waiting and running events are reported by
+    ``stats``.
+
+    The engine is bound to the event loop of its first ``infer`` call.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network in eval mode, e.g. ``LGATr.freeze()``.
+    max_tokens : int
+        Largest cost of a batch in items. Events with more items are evaluated alone.
+    max_events : int or None
+        Largest number of events in a batch.
+    packing : str
+        ``"padded"`` or ``"varlen"``, see ``InferenceEngine``.
+    backend : str
+        Attention backend for ``packing="varlen"``, see
+        ``lgatr.utils.batching.varlen_attention_kwargs``.
+    device : torch.device or None
+        Device of the network inputs. Defaults to the device of the model parameters.
+    timeout : float or None
+        Largest time in seconds between the call of ``infer`` and its outputs. Events that take
+        longer raise ``asyncio.TimeoutError``.
+    max_concurrency : int
+        Largest number of batches that are evaluated at the same time.
+    executor : concurrent.futures.Executor or None
+        Executor of the forward passes, which is not shut down by the engine. Defaults to a
+        thread pool with ``max_concurrency`` threads that is owned by the engine.
+    """
+
+    def __init__(
+        self,
+        model: nn.Module,
+        max_tokens: int = 4096,
+        max_events: int | None = None,
+        packing: str = "padded",
+        backend: str = "native",
+        device: torch.device | None = None,
+        timeout: float | None = None,
+        max_concurrency: int = 1,
+        executor: Executor | None = None,
+    ) -> None:
+        if packing not in PACKINGS:
+            raise ValueError(f"Unknown packing {packing}, choose from {PACKINGS}")
+        self.model = model
+        self.max_tokens = max_tokens
+        self.max_events = max_events
+        self.packing = packing
+        self.backend = backend
+        if device is None:
+            tensor = next(chain(model.parameters(), model.buffers()), None)
+            device = torch.device("cpu") if tensor is None else tensor.device
+        self.device = device
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="lgatr-inference")
+        self.executor = executor
+
+        self.num_batches = 0
+        self.num_events = 0
+        self.num_items = 0
+        self.num_padded_items = 0
+        self.num_cancelled = 0
+        self.num_timeouts = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.num_running = 0
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._waiting: list[_AsyncRequest] = []
+        self._wakeup: asyncio.Event | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._batches: set[asyncio.Task] = set()
+        self._closed = False
+
+    async def infer(self, *args, **kwargs):
+        """Evaluates a single event.
+
+        Parameters
+        ----------
+        *args
+            Positional arguments of ``model.forward`` for a single event. Tensors have the shape
+            (items, ...), without batch dimension.
+        **kwargs
+            Keyword arguments of ``model.forward`` for a single event.
+
+        Returns
+        -------
+        Outputs of the event, with the same structure as the outputs of ``model.forward`` and
+        shape (items, ...).
+        """
+        if self._closed:
+            raise RuntimeError("Cannot submit events to a closed AsyncInferenceEngine")
+        loop = self._start()
+        request = _AsyncRequest(
+            args, kwargs, _event_items(args, kwargs), _signature(args, kwargs), loop.create_future()
+        )
+        self._waiting.append(request)
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        self._wakeup.set()
+        try:
+            if self.timeout is None:
+                return await request.future
+            return await asyncio.wait_for(request.future, self.timeout)
+        except asyncio.TimeoutError:
+            self.num_timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self.num_cancelled += 1
+            raise
+
+    async def aclose(self) -> None:
+        """Stops accepting events and waits until all awaited events are evaluated."""
+        self._closed = True
+        if self._dispatcher is not None:
+            self._wakeup.set()
+            await self._dispatcher
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+    def stats(self) -> dict[str, float]:
+        """Batching and queue statistics.
+
+        Returns
+        -------
+        dict[str, float]
+            ``num_batches``, ``num_events``, ``events_per_batch``, ``padding_efficiency``, the
+            current ``queue_depth``, the number of events that wait for a batch, its maximum
+            ``max_queue_depth``, ``num_running``, the number of events in running batches, and
+            ``num_cancelled`` and ``num_timeouts``, the numbers of events that were cancelled or
+            timed out.
+        """
+        return dict(
+            num_batches=self.num_batches,
+            num_events=self.num_events,
+            events_per_batch=self.num_events / max(self.num_batches, 1),
+            padding_efficiency=self.num_items / max(self.num_padded_items, 1),
+            queue_depth=self.queue_depth,
+            max_queue_depth=self.max_queue_depth,
+            num_running=self.num_running,
+            num_cancelled=self.num_cancelled,
+            num_timeouts=self.num_timeouts,
+        )
+
+    async def __aenter__(self) -> "AsyncInferenceEngine":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        """Binds the engine to the running event loop and starts the dispatcher."""
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._dispatcher = loop.create_task(self._dispatch())
+        elif loop is not self._loop:
+            raise RuntimeError("AsyncInferenceEngine is bound to a different event loop")
+        return loop
+
+    async def _dispatch(self) -> None:
+        """Collects the events of each tick into batches and starts them."""
+        while not (self._closed and not self._waiting):
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # yield once, such that all tasks that are ready in this tick can add their events
+            await asyncio.sleep(0)
+            requests, self._waiting = self._waiting, []
+            for batch in self._split(requests):
+                await self._slots.acquire()
+                task = self._loop.create_task(self._run_batch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+        if self._batches:
+            await asyncio.gather(*self._batches)
+
+    def _split(self, requests: list[_AsyncRequest]) -> list[list[_AsyncRequest]]:
+        """Groups events by signature and splits the groups under the budgets."""
+        groups: dict[tuple, list[_AsyncRequest]] = {}
+        for request in requests:
+            groups.setdefault(request.signature, []).append(request)
+        batches = []
+        for group in groups.values():
+            batch = []
+            for request in group:
+                lengths = [other.num_items for other in batch] + [request.num_items]
+                full = self.max_events is not None and len(batch) == self.max_events
+                if batch and (full or _batch_cost(lengths, self.packing) > self.max_tokens):
+                    batches.append(batch)
+                    batch = []
+                batch.append(request)
+            batches.append(batch)
+        return batches
+
+    async def _run_batch(self, batch: list[_AsyncRequest]) -> None:
+        """Evaluates a batch on the executor and resolves the futures of its events."""
+        self.queue_depth -= len(batch)
+        # events that were cancelled while waiting are not evaluated
+        batch = [request for request in batch if not request.future.done()]
+        try:
+            if not batch:
+                return
+            self.num_running += len(batch)
+            lengths = [request.num_items for request in batch]
+            try:
+                events = await self._loop.run_in_executor(self.executor, self._evaluate, batch)
+            except Exception as exc:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+                return
+            finally:
+                self.num_running -= len(batch)
+
+            self.num_batches += 1
+            self.num_events += len(batch)
+            self.num_items += sum(lengths)
+            self.num_padded_items += _batch_cost(lengths, self.packing)
+            for request, event in zip(batch, events, strict=True):
+                if not request.future.done():
+                    request.future.set_result(event)
+        finally:
+            self._slots.release()
+
+    def _evaluate(self, batch: list[_AsyncRequest]) -> list:
+        """Evaluates the network for a batch, on a thread of the executor."""
+        lengths = [request.num_items for request in batch]
+        events = [(request.args, request.kwargs) for request in batch]
+        args, kwargs = collate_events(events, self.packing, self.backend, self.device)
+        with torch.inference_mode():
+            outputs = self.model(*args, **kwargs)
+        return _scatter(outputs, lengths, self.packing)
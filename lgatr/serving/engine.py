@@ -0,0 +1,291 @@
+"""Dynamic micro-batching of individual events for serving."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Any
+
+import torch
+from torch import Tensor, nn
+
+from ..utils.batching import PACKINGS, collate_events, unpack_events, unpad_events
+
+
+@dataclass
+class _Request:
+    """Event that waits in the queue of an ``InferenceEngine``."""
+
+    args: tuple
+    kwargs: dict[str, Any]
+    num_items: int
+    signature: tuple
+    future: Future = field(default_factory=Future)
+    arrival: float = field(default_factory=time.monotonic)
+
+
+class InferenceEngine:
+    """Serves a network for individual variable-length events with dynamic micro-batching.
+
+    Events are submitted from any number of threads, see ``submit``, or asyncio tasks, see
+    ``infer``. A worker thread coalesces the waiting events into a batch, evaluates the network
+    once and scatters the outputs back to the futures of the events. A batch is closed when
+
+    - ``max_latency`` seconds have passed since the arrival of its first event,
+    - another event would exceed the ``max_tokens`` budget,
+    - it contains ``max_events`` events, or
+    - the next event has different trailing shapes or arguments.
+
+    With ``packing="padded"``, the events are zero-padded to the largest number of items and the
+    padded keys are excluded with an ``attn_mask``, see ``lgatr.utils.batching.padding_mask``.
+    The cost of a batch is the number of items after padding.
+    With ``packing="varlen"``, the events are concatenated into a single sequence and the
+    attention is restricted to each event, see ``lgatr.utils.batching.varlen_attention_kwargs``.
+    The cost of a batch is the total number of items.
+
+    Works for ``LGATr``, ``LGATrSlim`` and their ``optimize_for_inference`` versions, or any
+    network whose tensor inputs have the shape (batch, items, ...) and whose items only interact
+    through attention. Use it as a context manager, or call ``close`` to stop the worker:
+
+    .. code-block::
+
+        with InferenceEngine(model.freeze(), max_tokens=4096, max_latency=2e-3) as engine:
+            future = engine.submit(multivectors, scalars=scalars)
+            outputs_mv, outputs_s = future.result()
+
+    The forward passes of the networks do not modify any state, so the same network may also be
+    evaluated directly from other threads while the engine serves it.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network in eval mode, e.g. ``LGATr.freeze()``.
+    max_tokens : int
+        Largest cost of a batch in items. Events with more items are evaluated alone.
+    max_latency : float
+        Largest time in seconds that an event waits for further events of its batch.
+    max_events : int or None
+        Largest number of events in a batch.
+    packing : str
+        ``"padded"`` or ``"varlen"``.
+    backend : str
+        Attention backend for ``packing="varlen"``, see
+        ``lgatr.utils.batching.varlen_attention_kwargs``.
+    device : torch.device or None
+        Device of the network inputs. Defaults to the device of the model parameters.
+    """
+
+    def __init__(
+        self,
+        model: nn.Module,
+        max_tokens: int = 4096,
+        max_latency: float = 2e-3,
+        max_events: int | None = None,
+        packing: str = "padded",
+        backend: str = "native",
+        device: torch.device | None = None,
+    ) -> None:
+        if packing not in PACKINGS:
+            raise ValueError(f"Unknown packing {packing}, choose from {PACKINGS}")
+        self.model = model
+        self.max_tokens = max_tokens
+        self.max_latency = max_latency
+        self.max_events = max_events
+        self.packing = packing
+        self.backend = backend
+        if device is None:
+            tensor = next(chain(model.parameters(), model.buffers()), None)
+            device = torch.device("cpu") if tensor is None else tensor.device
+        self.device = device
+
+        self.num_batches = 0
+        self.num_events = 0
+        self.num_items = 0
+        self.num_padded_items = 0
+
+        self._queue: queue.SimpleQueue[_Request | None] = queue.SimpleQueue()
+        self._pending: _Request | None = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="lgatr-inference", daemon=True)
+        self._worker.start()
+
+    def submit(self, *args, **kwargs) -> Future:
+        """Schedules a single event.
+
+        Parameters
+        ----------
+        *args
+            Positional arguments of ``model.forward`` for a single event. Tensors have the shape
+            (items, ...), without batch dimension.
+        **kwargs
+            Keyword arguments of ``model.forward`` for a single event.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future for the outputs of the event, with the same structure as the outputs of
+            ``model.forward`` and shape (items, ...).
+        """
+        request = _Request(args, kwargs, _event_items(args, kwargs), _signature(args, kwargs))
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Cannot submit events to a closed InferenceEngine")
+            self._queue.put(request)
+        return request.future
+
+    async def infer(self, *args, **kwargs):
+        """Evaluates a single event from an asyncio task, see ``submit``. Services that are built
+        on asyncio can use ``AsyncInferenceEngine`` instead, which does not need a worker thread
+        that waits for events.
+
+        Returns
+        -------
+        Outputs of the event, with the same structure as the outputs of ``model.forward``.
+        """
+        import asyncio
+
+        return await asyncio.wrap_future(self.submit(*args, **kwargs))
+
+    def close(self, wait: bool = True) -> None:
+        """Stops accepting events and stops the worker after all submitted events are evaluated.
+
+        Parameters
+        ----------
+        wait : bool
+            Whether to wait until the worker has stopped.
+        """
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        if wait:
+            self._worker.join()
+
+    def stats(self) -> dict[str, float]:
+        """Batching statistics.
+
+        Returns
+        -------
+        dict[str, float]
+            ``num_batches``, ``num_events``, ``events_per_batch`` and ``padding_efficiency``,
+            the fraction of evaluated items that belong to events.
+        """
+        return dict(
+            num_batches=self.num_batches,
+            num_events=self.num_events,
+            events_per_batch=self.num_events / max(self.num_batches, 1),
+            padding_efficiency=self.num_items / max(self.num_padded_items, 1),
+        )
+
+    def __enter__(self) -> "InferenceEngine":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        """Worker loop."""
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._evaluate(batch)
+            if stop:
+                return
+
+    def _next_batch(self) -> tuple[list[_Request], bool]:
+        """Collects the next batch, and whether the engine was closed."""
+        first = self._pending if self._pending is not None else self._queue.get()
+        self._pending = None
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = first.arrival + self.max_latency
+        while self.max_events is None or len(batch) < self.max_events:
+            try:
+                request = self._queue.get(timeout=max(deadline - time.monotonic(), 0.0))
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            lengths = [other.num_items for other in batch] + [request.num_items]
+            cost = _batch_cost(lengths, self.packing)
+            if request.signature != first.signature or cost > self.max_tokens:
+                self._pending = request
+                break
+            batch.append(request)
+        return batch, False
+
+    def _evaluate(self, batch: list[_Request]) -> None:
+        """Evaluates the network for a batch and resolves the futures."""
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            lengths = [request.num_items for request in batch]
+            args, kwargs = self._collate(batch)
+            with torch.inference_mode():
+                outputs = self.model(*args, **kwargs)
+            events = self._scatter(outputs, lengths)
+        except Exception as exc:
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+
+        self.num_batches += 1
+        self.num_events += len(batch)
+        self.num_items += sum(lengths)
+        self.num_padded_items += _batch_cost(lengths, self.packing)
+        for request, event in zip(batch, events, strict=True):
+            request.future.set_result(event)
+
+    def _collate(self, batch: list[_Request]) -> tuple[tuple, dict]:
+        """Pads or packs the inputs of a batch and constructs the attention arguments."""
+        events = [(request.args, request.kwargs) for request in batch]
+        return collate_events(events, self.packing, self.backend, self.device)
+
+    def _scatter(self, outputs, lengths: list[int]) -> list:
+        """Splits the outputs of a batch into the outputs of the events."""
+        return _scatter(outputs, lengths, self.packing)
+
+
+def _event_items(args: tuple, kwargs: dict[str, Any]) -> int:
+    """Number of items of a single event, checked across its tensor inputs."""
+    tensors = [value for value in chain(args, kwargs.values()) if isinstance(value, Tensor)]
+    if not tensors:
+        raise ValueError("An event needs at least one tensor input")
+    num_items = tensors[0].shape[0]
+    if any(tensor.shape[0] != num_items for tensor in tensors):
+        raise ValueError("All tensor inputs of an event need the same number of items")
+    return num_items
+
+
+def _signature(args: tuple, kwargs: dict[str, Any]) -> tuple:
+    """Events with the same signature can be evaluated in one batch."""
+
+    def describe(value):
+        if isinstance(value, Tensor):
+            return (tuple(value.shape[1:]), value.dtype)
+        return value
+
+    return (
+        tuple(describe(value) for value in args),
+        tuple((name, describe(value)) for name, value in sorted(kwargs.items())),
+    )
+
+
+def _batch_cost(lengths: list[int], packing: str) -> int:
+    """Number of evaluated items of a batch of events, including padding."""
+    return len(lengths) * max(lengths) if packing == "padded" else sum(lengths)
+
+
+def _scatter(outputs, lengths: list[int], packing: str) -> list:
+    """Splits the outputs of a padded or packed batch into the outputs of the events."""
+    split = unpad_events if packing == "padded" else unpack_events
+    if isinstance(outputs, Tensor):
+        return split(outputs, lengths)
+    per_output = [[None] * len(lengths) if out is None else split(out, lengths) for out in outputs]
+    return [tuple(event) for event in zip(*per_output, strict=True)]
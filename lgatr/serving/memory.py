@@ -0,0 +1,349 @@
+"""Memory budgets for batched inference: largest token budget and out-of-memory recovery."""
+
+import os
+from bisect import bisect_left
+from collections.abc import Sequence
+from itertools import accumulate, chain, cycle
+from typing import Any
+
+import torch
+from torch import Tensor, nn
+
+from ..utils.batching import (
+    DEFAULT_BACKENDS,
+    PACKINGS,
+    collate_events,
+    default_packing,
+    pack_events,
+    pad_events,
+    padding_attention_kwargs,
+    unpack_events,
+    unpad_events,
+    varlen_attention_kwargs,
+)
+from ..utils.timing import peak_memory
+
+
+def is_out_of_memory(exc: BaseException) -> bool:
+    """Whether an exception reports that an allocation failed, on CUDA or on the host."""
+    if isinstance(exc, torch.OutOfMemoryError):
+        return True
+    message = str(exc)
+    return isinstance(exc, RuntimeError) and (
+        "out of memory" in message or "can't allocate memory" in message
+    )
+
+
+def find_max_tokens(
+    model: nn.Module,
+    event: tuple[tuple, dict[str, Any]],
+    lengths: Sequence[int],
+    packing: str = "varlen",
+    backend: str = "native",
+    memory_limit: int | None = None,
+    safety: float = 0.9,
+    max_tokens: int = 2**20,
+    tolerance: float = 0.05,
+    device: torch.device | None = None,
+) -> dict[str, int]:
+    """Searches for the largest token budget whose batches fit into a memory limit.
+
+    Candidate batches are evaluated under ``torch.inference_mode``, and a budget fits if the
+    peak memory of the forward pass stays below ``memory_limit`` without an out-of-memory error,
+    see ``lgatr.utils.timing.peak_memory``. The budget is doubled until a batch does not fit
+    and then bisected. The batches are built from the worst case of ``lengths``:
+
+    - with ``packing="padded"``, all events have the largest number of items, and the budget is
+      a multiple of it,
+    - with ``packing="varlen"``, the events are taken from the longest to the shortest until
+      the budget is filled, and the last event is truncated.
+
+    The result is the ``max_tokens`` argument of ``InferenceEngine`` and
+    ``lgatr.data.PackedEventLoader``. Rare events beyond the budget can still be evaluated
+    with ``OOMSplitter``:
+
+    .. code-block::
+
+        budget = find_max_tokens(model, ((vectors, scalars), {}), dataset.lengths)
+        loader = PackedEventLoader(dataset, max_tokens=budget["max_tokens"], embed=False)
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network in eval mode whose inputs have the shape (batch, items, ...).
+    event : tuple
+        Positional and keyword arguments of a representative single event, in the format of
+        ``InferenceEngine.submit``. Tensors have the shape (items, ...) and are repeated along
+        the items to build events of other lengths.
+    lengths : Sequence of int
+        Numbers of items of representative events, e.g. ``RaggedEventDataset.lengths``.
+    packing : str
+        ``"padded"`` or ``"varlen"``, see ``lgatr.utils.batching.collate_events``.
+    backend : str
+        Attention backend for ``packing="varlen"``, see
+        ``lgatr.utils.batching.varlen_attention_kwargs``.
+    memory_limit : int or None
+        Memory in bytes that a batch may allocate on top of the memory allocated before.
+        Defaults to ``safety`` times the free device memory, or the available host memory on CPU.
+        Required on platforms without ``os.sysconf("SC_AVPHYS_PAGES")``, e.g. macOS.
+    safety : float
+        Fraction of the free memory that is used by default, leaves room for fragmentation.
+    max_tokens : int
+        Largest budget to try.
+    tolerance : float
+        Relative precision of the bisection.
+    device : torch.device or None
+        Device of the network inputs. Defaults to the device of the model parameters.
+
+    Returns
+    -------
+    dict[str, int]
+        ``max_tokens``, ``max_events`` (number of events in the largest batch), ``peak_memory``
+        (of the largest batch, in bytes) and ``memory_limit`` (in bytes).
+    """
+    if packing not in PACKINGS:
+        raise ValueError(f"Unknown packing {packing}, choose from {PACKINGS}")
+    if device is None:
+        tensor = next(chain(model.parameters(), model.buffers()), None)
+        device = torch.device("cpu") if tensor is None else tensor.device
+    device = torch.device(device)
+    if memory_limit is None:
+        memory_limit = int(safety * _free_memory(device))
+    longest = max(int(length) for length in lengths)
+    if packing == "padded":
+        # the budget is the number of events with the largest number of items
+        unit, max_size = longest, max_tokens // longest
+    else:
+        unit, max_size = 1, max_tokens
+    sorted_lengths = sorted((int(length) for length in lengths), reverse=True)
+
+    def batch_lengths(size: int) -> list[int]:
+        if packing == "padded":
+            return [longest] * size
+        out, tokens = [], 0
+        for length in cycle(sorted_lengths):
+            out.append(min(length, size - tokens))
+            tokens += out[-1]
+            if tokens == size:
+                return out
+
+    def measure(size: int) -> int | None:
+        """Peak memory of a batch, or None if it does not fit."""
+        events = [_resize_event(event, length) for length in batch_lengths(size)]
+        args, kwargs = collate_events(events, packing, backend, device)
+        del events
+
+        def forward():
+            with torch.inference_mode():
+                model(*args, **kwargs)
+
+        try:
+            peak = peak_memory(forward, device)
+        except Exception as exc:
+            if not is_out_of_memory(exc):
+                raise
+            peak = None
+        if peak is None:
+            _empty_cache(device)
+            return None
+        return peak if peak <= memory_limit else None
+
+    size = longest if packing == "varlen" else 1
+    best = measure(size) if size <= max_size else None
+    if best is None:
+        raise ValueError(
+            f"An event with {longest} items does not fit into {memory_limit} bytes "
+            f"or max_tokens={max_tokens}"
+        )
+    low, high = size, max_size + 1
+    while size < max_size:
+        size = min(2 * size, max_size)
+        peak = measure(size)
+        if peak is None:
+            high = size
+            break
+        low, best = size, peak
+    while high - low > max(1, int(tolerance * low)):
+        size = (low + high) // 2
+        peak = measure(size)
+        if peak is None:
+            high = size
+        else:
+            low, best = size, peak
+    return dict(
+        max_tokens=low * unit,
+        max_events=len(batch_lengths(low)),
+        peak_memory=best,
+        memory_limit=memory_limit,
+    )
+
+
+class OOMSplitter:
+    """Evaluates packed batches and splits them along event boundaries when they run out of memory.
+
+    A batch that raises an out-of-memory error is split into two halves with about the same
+    number of items, without separating the items of an event, and each half is evaluated
+    recursively. The outputs of the halves are concatenated along the items, so the result is the
+    same as for the full batch. A single event that does not fit raises the original error.
+    This keeps long offline jobs alive on rare high-multiplicity events, while the common
+    batches run at the full token budget, see ``find_max_tokens``:
+
+    .. code-block::
+
+        splitter = OOMSplitter(model, packing="varlen")
+        for batch in PackedEventLoader(dataset, max_tokens=8192):
+            batch = batch.to(device)
+            outputs_mv, outputs_s = splitter(batch.vectors, scalars=batch.scalars,
+                                             lengths=batch.lengths)
+
+    Works for networks whose items only interact through the attention, like ``LGATr`` and
+    ``LGATrSlim``, and whose outputs have the shape (1, items, ...). With ``packing="padded"``,
+    the events of each part are padded for the network and the outputs are packed again.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network in eval mode.
+    backend : str or None
+        Attention backend, see ``lgatr.utils.batching.varlen_attention_kwargs`` for packed and
+        ``lgatr.utils.batching.padding_attention_kwargs`` for padded batches. Defaults to
+        ``"varlen"`` for packed and ``"native"`` for padded batches.
+    packing : str or None
+        ``"varlen"`` to evaluate the packed events, or ``"padded"`` to pad them. Defaults to
+        ``lgatr.utils.batching.default_packing`` of the device of the inputs, which avoids a
+        dense mask over all items of a packed batch.
+    """
+
+    def __init__(
+        self, model: nn.Module, backend: str | None = None, packing: str | None = None
+    ) -> None:
+        if packing is not None and packing not in PACKINGS:
+            raise ValueError(f"Unknown packing {packing}, choose from {PACKINGS}")
+        self.model = model
+        self.backend = backend
+        self.packing = packing
+        self.num_batches = 0
+        self.num_splits = 0
+
+    def __call__(self, *args, lengths: Sequence[int] | Tensor, **kwargs):
+        """Evaluates a packed batch.
+
+        Parameters
+        ----------
+        *args
+            Positional arguments of ``model.forward``. Tensors with the shape (1, items, ...)
+            are split along the items, other arguments are passed to every part.
+        lengths : Sequence of int or torch.Tensor
+            Number of items of each event in the batch.
+        **kwargs
+            Keyword arguments of ``model.forward``, without the attention arguments.
+
+        Returns
+        -------
+        Outputs of ``model.forward`` for the full batch.
+        """
+        lengths = [int(length) for length in lengths]
+        num_items = sum(lengths)
+        self.num_batches += 1
+        with torch.inference_mode():
+            outputs = self._evaluate(args, kwargs, num_items, 0, lengths)
+        if len(outputs) == 1:
+            return outputs[0]
+        if isinstance(outputs[0], Tensor):
+            return torch.cat(outputs, dim=1)
+        return tuple(
+            None if parts[0] is None else torch.cat(parts, dim=1)
+            for parts in zip(*outputs, strict=True)
+        )
+
+    def _evaluate(
+        self, args: tuple, kwargs: dict[str, Any], num_items: int, start: int, lengths: list[int]
+    ) -> list:
+        """Outputs of consecutive parts of the events ``lengths`` that start at item ``start``."""
+        stop = start + sum(lengths)
+
+        def part(value):
+            if isinstance(value, Tensor) and value.dim() >= 2 and value.shape[:2] == (1, num_items):
+                return value[:, start:stop]
+            return value
+
+        args_part = tuple(part(value) for value in args)
+        kwargs_part = {name: part(value) for name, value in kwargs.items()}
+        tensor = next(v for v in chain(args_part, kwargs_part.values()) if isinstance(v, Tensor))
+        try:
+            return [self._forward(args_part, kwargs_part, lengths, tensor)]
+        except Exception as exc:
+            if len(lengths) == 1 or not is_out_of_memory(exc):
+                raise
+        # split outside of the except clause, whose traceback references the failed activations
+        del args_part, kwargs_part
+        _empty_cache(tensor.device)
+        self.num_splits += 1
+        cumulative = list(accumulate(lengths))
+        half = min(max(bisect_left(cumulative, cumulative[-1] / 2), 1), len(lengths) - 1)
+        first = self._evaluate(args, kwargs, num_items, start, lengths[:half])
+        return first + self._evaluate(
+            args, kwargs, num_items, start + cumulative[half - 1], lengths[half:]
+        )
+
+    def _forward(self, args: tuple, kwargs: dict[str, Any], lengths: list[int], tensor: Tensor):
+        """Outputs of the model for packed events, padded for ``packing="padded"``."""
+        packing = self.packing or default_packing(tensor.device)
+        backend = self.backend or DEFAULT_BACKENDS[packing]
+        if packing == "varlen":
+            kwargs = dict(kwargs, **varlen_attention_kwargs(lengths, backend, tensor.device))
+            return self.model(*args, **kwargs)
+
+        num_items = sum(lengths)
+
+        def pad(value):
+            if isinstance(value, Tensor) and value.dim() >= 2 and value.shape[:2] == (1, num_items):
+                return pad_events(unpack_events(value, lengths))
+            return value
+
+        def unpad(value):
+            if isinstance(value, Tensor):
+                return pack_events(unpad_events(value, lengths))
+            return value
+
+        args = tuple(pad(value) for value in args)
+        kwargs = {name: pad(value) for name, value in kwargs.items()}
+        kwargs.update(
+            padding_attention_kwargs(
+                lengths, backend=backend, dtype=tensor.dtype, device=tensor.device
+            )
+        )
+        outputs = self.model(*args, **kwargs)
+        if isinstance(outputs, Tensor):
+            return unpad(outputs)
+        return tuple(unpad(value) for value in outputs)
+
+
+def _resize_event(event: tuple[tuple, dict[str, Any]], num_items: int) -> tuple[tuple, dict]:
+    """Repeats or truncates the tensors of a single event to ``num_items`` items."""
+
+    def resize(value):
+        if not isinstance(value, Tensor):
+            return value
+        return value[torch.arange(num_items, device=value.device) % value.shape[0]]
+
+    args, kwargs = event
+    return tuple(resize(value) for value in args), {k: resize(v) for k, v in kwargs.items()}
+
+
+def _free_memory(device: torch.device) -> int:
+    """Free memory of a device in bytes."""
+    if device.type == "cuda":
+        return torch.cuda.mem_get_info(device)[0]
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError) as err:  # e.g. macOS
+        raise ValueError(
+            f"The free memory of {device} is unknown on this platform, pass memory_limit"
+        ) from err
+
+
+def _empty_cache(device: torch.device) -> None:
+    """Returns cached blocks after an out-of-memory error."""
+    if device.type == "cuda":
+        torch.cuda.empty_cache()
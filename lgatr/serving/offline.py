@@ -0,0 +1,385 @@
+"""Offline batch inference over event files with memory-mapped, resumable outputs."""
+
+import json
+import os
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import ExitStack
+from typing import Any
+
+import numpy as np
+import torch
+from torch import Tensor, nn
+
+from ..data.events import PackedEventLoader, RaggedEventDataset
+from ..nets.config import network_from_config
+from ..nets.inference import optimize_for_inference
+from ..nets.lgatr import LGATr
+from ..nets.lgatr_slim import LGATrSlim
+from ..utils.batching import default_packing
+from .memory import OOMSplitter
+from .sharding import ShardedInference
+
+POOLINGS = ("none", "mean", "sum")
+PROGRESS_FILE = "progress.json"
+
+
+def load_model(
+    config: str | Mapping[str, Any],
+    weights: str | None = None,
+    device: torch.device | str = "cpu",
+    optimize: bool = True,
+) -> nn.Module:
+    """Constructs a network from its configuration and loads its weights for inference.
+
+    Parameters
+    ----------
+    config : str or Mapping
+        Path of a JSON file or mapping with the keyword arguments of the network and its class
+        name under the key ``"net"``, see ``lgatr.nets.config.network_from_config``.
+    weights : str or None
+        Path of a ``state_dict`` saved with ``torch.save``. If None, the network keeps its
+        random initialization.
+    device : torch.device or str
+        Device of the network.
+    optimize : bool
+        Whether to apply ``optimize_for_inference`` to ``LGATr`` networks.
+
+    Returns
+    -------
+    torch.nn.Module
+        Network in eval mode.
+    """
+    if isinstance(config, str):
+        with open(config) as file:
+            config = json.load(file)
+    model = network_from_config({**config, "compile": False})
+    if weights is not None:
+        model.load_state_dict(torch.load(weights, map_location="cpu", weights_only=True))
+    model = model.to(device).eval()
+    if optimize and isinstance(model, LGATr):
+        model = optimize_for_inference(model, inplace=True)
+    return model
+
+
+def event_files(path: str) -> list[str]:
+    """Event files in a directory, sorted by name.
+
+    Parameters
+    ----------
+    path : str
+        A directory or ``.npz`` file written by ``lgatr.data.write_events``, or a directory that
+        contains such directories and files.
+
+    Returns
+    -------
+    list of str
+        Paths of the event files.
+    """
+    if _is_event_file(path):
+        return [path]
+    paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    return [path for path in paths if _is_event_file(path)]
+
+
+def run_inference(
+    model: nn.Module,
+    input_path: str,
+    output_path: str,
+    max_tokens: int = 8192,
+    backend: str | None = None,
+    packing: str | None = None,
+    pool: str = "none",
+    num_workers: int = 0,
+    num_processes: int = 0,
+    num_threads: int | None = None,
+    checkpoint_every: int = 10,
+    device: torch.device | str | None = None,
+    verbose: bool = False,
+) -> dict[str, float]:
+    """Evaluates a network on all events of a directory of event files.
+
+    The outputs of each event file ``<name>`` are written to the directory
+    ``<output_path>/<name>``, with one memory-mapped ``.npy`` array per network output, i.e.
+    ``multivectors.npy`` and ``scalars.npy`` for ``LGATr``, and ``vectors.npy`` and
+    ``scalars.npy`` for ``LGATrSlim``. With ``pool="none"``, the arrays have the shape
+    (total_items, ...) and are split into the events with the ``offsets.npy`` of the same
+    directory, otherwise they have the shape (num_events, ...).
+
+    The events are read in file order and packed into batches of at most ``max_tokens`` items
+    by ``num_workers`` ``torch.utils.data.DataLoader`` processes, see
+    ``lgatr.data.PackedEventLoader``. On CUDA devices with the ``"varlen"`` backend, the packed
+    events are evaluated with their offsets. Otherwise, the events of a batch are padded, and
+    ``max_tokens`` bounds the number of items after padding, see
+    ``lgatr.utils.batching.default_packing``. Packed batches with the ``"native"`` backend
+    need a dense mask with ``max_tokens^2`` entries, e.g. 67M for the default budget.
+    Batches that run out of memory are split along event boundaries, see ``OOMSplitter``.
+
+    With ``num_processes > 0``, the batches are evaluated on CPU by ``num_processes`` worker
+    processes with ``num_threads`` intra-op threads each, which share the weights of the
+    network, see ``ShardedInference``. Otherwise, they are evaluated in this process with
+    ``num_threads`` intra-op threads.
+
+    After every ``checkpoint_every`` batches, the outputs are flushed and the number of
+    completed events is stored in ``progress.json``. A later call with the same arguments
+    continues after the completed events, and skips completed files.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        ``LGATr`` or ``LGATrSlim`` network in eval mode, see ``load_model``.
+    input_path : str
+        Event file or directory of event files, see ``event_files``.
+    output_path : str
+        Output directory, created if it does not exist.
+    max_tokens : int
+        Largest number of items in a batch, see ``lgatr.serving.find_max_tokens``.
+    backend : str or None
+        Attention backend, see ``OOMSplitter``.
+    packing : str or None
+        ``"varlen"`` for packed or ``"padded"`` for padded batches. Defaults to
+        ``lgatr.utils.batching.default_packing`` of ``device``.
+    pool : str
+        ``"none"`` to write the outputs of each item, or ``"mean"`` or ``"sum"`` to write the
+        mean or sum over the items of each event.
+    num_workers : int
+        Number of processes that read and pack the events.
+    num_processes : int
+        Number of CPU worker processes that evaluate the batches, or 0 to evaluate them in this
+        process.
+    num_threads : int or None
+        Number of intra-op threads of the inference, per worker process for
+        ``num_processes > 0``, see ``torch.set_num_threads``. Defaults to the current number of
+        threads, or 1 per worker process.
+    checkpoint_every : int
+        Number of batches between checkpoints.
+    device : torch.device or str or None
+        Device of the network inputs. Defaults to the device of the model parameters.
+    verbose : bool
+        Whether to print the progress of each file.
+
+    Returns
+    -------
+    dict[str, float]
+        ``num_files``, ``num_events`` and ``num_items`` evaluated in this call, ``time`` in
+        seconds, ``events_per_second`` and ``num_splits``, the number of batches that were
+        split after running out of memory.
+    """
+    if not isinstance(model, (LGATr, LGATrSlim)):
+        raise ValueError(f"Unsupported network {type(model).__name__}, use LGATr or LGATrSlim")
+    if pool not in POOLINGS:
+        raise ValueError(f"Unknown pool {pool}, choose from {POOLINGS}")
+    if device is None:
+        device = next(model.parameters()).device
+    if num_processes > 0 and torch.device(device).type != "cpu":
+        raise ValueError(f"Worker processes evaluate the batches on CPU, not on {device}")
+    if num_threads is not None and num_processes == 0:
+        torch.set_num_threads(num_threads)
+    if packing is None:
+        packing = default_packing(device)
+    evaluation = _BatchEvaluation(model, backend, packing, pool)
+    stats = dict(num_files=0, num_events=0, num_items=0, num_splits=0)
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        if num_processes > 0:
+            runner = ShardedInference(evaluation, num_processes, num_threads or 1)
+            evaluate = stack.enter_context(runner).map
+        else:
+            evaluate = _evaluate_locally(evaluation)
+        for path in event_files(input_path):
+            name = os.path.basename(os.path.normpath(path)).removesuffix(".npz")
+            result = _infer_file(
+                evaluate,
+                evaluation,
+                RaggedEventDataset(path),
+                os.path.join(output_path, name),
+                max_tokens,
+                num_workers,
+                checkpoint_every,
+                device,
+            )
+            for key, value in result.items():
+                stats[key] += value
+            if verbose:
+                print(f"{path}: {result['num_events']} events, {result['num_items']} items")
+    stats["time"] = time.perf_counter() - start
+    stats["events_per_second"] = stats["num_events"] / max(stats["time"], 1e-9)
+    return stats
+
+
+class _BatchEvaluation(nn.Module):
+    """Evaluates and pools a packed batch, also in the workers of ``ShardedInference``.
+
+    Returns the pooled outputs by name and the number of out-of-memory splits of the batch.
+    """
+
+    def __init__(self, model: nn.Module, backend: str | None, packing: str, pool: str) -> None:
+        super().__init__()
+        self.model = model
+        self.splitter = OOMSplitter(model, backend, packing)
+        self.packing = packing
+        self.pool = pool
+
+    def forward(
+        self, vectors: Tensor, scalars: Tensor | None, lengths: Tensor
+    ) -> tuple[dict[str, Tensor], int]:
+        if scalars is None and isinstance(self.model, LGATrSlim):
+            scalars = vectors.new_zeros(*vectors.shape[:2], 0)
+        num_splits = self.splitter.num_splits
+        results = self.splitter(vectors, scalars=scalars, lengths=lengths)
+        results = {
+            name: _pool(result[0], lengths.to(result.device), self.pool)
+            for name, result in zip(_output_names(self.model), results, strict=True)
+            if result is not None
+        }
+        return results, self.splitter.num_splits - num_splits
+
+
+def _evaluate_locally(evaluation: _BatchEvaluation) -> Callable[[Iterable], Iterator]:
+    """Evaluates batches in this process, like ``ShardedInference.map``."""
+
+    def evaluate(batches: Iterable[tuple[tuple, dict[str, Any]]]) -> Iterator:
+        for args, kwargs in batches:
+            yield evaluation(*args, **kwargs)
+
+    return evaluate
+
+
+def _infer_file(
+    evaluate: Callable[[Iterable], Iterator],
+    evaluation: _BatchEvaluation,
+    dataset: RaggedEventDataset,
+    path: str,
+    max_tokens: int,
+    num_workers: int,
+    checkpoint_every: int,
+    device: torch.device | str,
+) -> dict[str, int]:
+    """Evaluates the events of a single file, starting after the completed events."""
+    os.makedirs(path, exist_ok=True)
+    completed = _read_progress(path, len(dataset))
+    if completed == len(dataset):
+        return dict(num_files=0, num_events=0, num_items=0, num_splits=0)
+    np.save(os.path.join(path, "offsets.npy"), dataset.offsets)
+
+    # the batches of the previous run, without the completed events
+    batches = [
+        range(max(indices.start, completed), indices.stop)
+        for indices in _batch_indices(dataset, max_tokens, evaluation.packing)
+        if indices.stop > completed
+    ]
+    # the splitter computes the attention arguments of each part
+    loader = torch.utils.data.DataLoader(
+        PackedEventLoader(dataset, batches=batches, embed=isinstance(evaluation.model, LGATr)),
+        batch_size=None,
+        num_workers=num_workers,
+    )
+    # worker processes may evaluate the next batches while the outputs are written
+    pending = (
+        ((batch.vectors.to(device), _to(batch.scalars, device), batch.lengths.to(device)), {})
+        for batch in loader
+    )
+    pool = evaluation.pool
+    outputs = None
+    num_splits = 0
+    for i, (indices, (results, splits)) in enumerate(zip(batches, evaluate(pending), strict=True)):
+        num_splits += splits
+        if outputs is None:
+            outputs = _open_outputs(path, results, dataset, pool, new=completed == 0)
+        if pool == "none":
+            rows = slice(dataset.offsets[indices.start], dataset.offsets[indices.stop])
+        else:
+            rows = slice(indices.start, indices.stop)
+        for name, result in results.items():
+            outputs[name][rows] = result.cpu().numpy()
+        if (i + 1) % checkpoint_every == 0 or i + 1 == len(batches):
+            for array in outputs.values():
+                array.flush()
+            _write_progress(path, indices.stop, len(dataset))
+    num_items = int(dataset.offsets[-1] - dataset.offsets[completed])
+    return dict(
+        num_files=1,
+        num_events=len(dataset) - completed,
+        num_items=num_items,
+        num_splits=num_splits,
+    )
+
+
+def _batch_indices(dataset: RaggedEventDataset, max_tokens: int, packing: str) -> Iterator[range]:
+    """Contiguous batches of events in file order under the token budget, which counts the
+    padded items for ``packing="padded"``."""
+    if packing == "varlen":
+        yield from PackedEventLoader(dataset, max_tokens=max_tokens).batch_indices()
+        return
+    start, max_items = 0, 0
+    for index, length in enumerate(dataset.lengths.tolist()):
+        max_items = max(max_items, length)
+        if index > start and (index - start + 1) * max_items > max_tokens:
+            yield range(start, index)
+            start, max_items = index, length
+    if start < len(dataset):
+        yield range(start, len(dataset))
+
+
+def _to(tensor: Tensor | None, device: torch.device | str) -> Tensor | None:
+    return None if tensor is None else tensor.to(device)
+
+
+def _output_names(model: nn.Module) -> tuple[str, str]:
+    return ("multivectors", "scalars") if isinstance(model, LGATr) else ("vectors", "scalars")
+
+
+def _pool(output: Tensor, lengths: Tensor, pool: str) -> Tensor:
+    """Mean or sum of packed outputs with shape (items, ...) over the items of each event."""
+    if pool == "none":
+        return output
+    events = torch.repeat_interleave(torch.arange(len(lengths), device=lengths.device), lengths)
+    pooled = output.new_zeros(len(lengths), *output.shape[1:]).index_add_(0, events, output)
+    if pool == "mean":
+        pooled /= lengths.view(-1, *[1] * (output.dim() - 1)).clamp(min=1)
+    return pooled
+
+
+def _open_outputs(
+    path: str, results: dict[str, Tensor], dataset: RaggedEventDataset, pool: str, new: bool
+) -> dict[str, np.memmap]:
+    """Creates the output arrays, or opens them to continue a previous run."""
+    num_rows = int(dataset.offsets[-1]) if pool == "none" else len(dataset)
+    outputs = {}
+    for name, result in results.items():
+        file = os.path.join(path, f"{name}.npy")
+        shape = (num_rows, *result.shape[1:])
+        dtype = np.dtype(str(result.dtype).removeprefix("torch."))
+        if new or not os.path.exists(file):
+            outputs[name] = np.lib.format.open_memmap(file, mode="w+", dtype=dtype, shape=shape)
+        else:
+            outputs[name] = np.load(file, mmap_mode="r+")
+            if outputs[name].shape != shape:
+                raise ValueError(f"{file} has shape {outputs[name].shape}, expected {shape}")
+    return outputs
+
+
+def _read_progress(path: str, num_events: int) -> int:
+    """Number of completed events of a previous run."""
+    file = os.path.join(path, PROGRESS_FILE)
+    if not os.path.exists(file):
+        return 0
+    with open(file) as f:
+        progress = json.load(f)
+    if progress["num_events"] != num_events:
+        raise ValueError(f"{file} belongs to a file with {progress['num_events']} events")
+    return progress["completed"]
+
+
+def _write_progress(path: str, completed: int, num_events: int) -> None:
+    """Stores the number of completed events, atomically replacing the previous checkpoint."""
+    file = os.path.join(path, PROGRESS_FILE)
+    with open(file + ".tmp", "w") as f:
+        json.dump(dict(completed=completed, num_events=num_events), f)
+    os.replace(file + ".tmp", file)
+
+
+def _is_event_file(path: str) -> bool:
+    if path.endswith(".npz"):
+        return os.path.isfile(path)
+    return os.path.isfile(os.path.join(path, "offsets.npy"))
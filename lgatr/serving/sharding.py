@@ -0,0 +1,260 @@
+"""Multi-process CPU inference with weights in shared memory."""
+
+import queue
+import time
+import traceback
+from collections.abc import Iterable, Iterator
+from dataclasses import fields
+from itertools import chain
+from typing import Any
+
+import torch
+import torch.multiprocessing as mp
+from torch import Tensor, nn
+
+from ..primitives.config import LGATrConfig, gatr_config
+
+# seconds between checks whether the worker processes are still alive
+_POLL_INTERVAL = 1.0
+
+
+class ShardedInference:
+    """Evaluates a network on CPU in several worker processes that share its weights.
+
+    A single process with many intra-op threads scales poorly on large CPU nodes, because each
+    operation of a small batch is split into ever smaller pieces. Instead, this runner starts
+    ``num_processes`` workers with ``num_threads`` intra-op threads each, which evaluate whole
+    batches in parallel. The parameters and buffers of ``model`` are moved to shared memory
+    with ``torch.nn.Module.share_memory``, such that all workers read the same copy of the
+    weights. The batches are pulled by idle workers and the outputs are returned in the order of
+    the inputs:
+
+    .. code-block::
+
+        model = optimize_for_inference(model)
+        with ShardedInference(model, num_processes=8, num_threads=8) as runner:
+            for outputs_mv, outputs_s in runner.map(batches):
+                ...
+
+    Inputs and outputs are exchanged through ``torch.multiprocessing`` queues, which move their
+    tensors to shared memory as well. The workers use the ``gatr_config`` of the process that
+    starts them, also with the ``"spawn"`` and ``"forkserver"`` start methods.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network on CPU in eval mode, e.g. ``optimize_for_inference(model)``. Its parameters and
+        buffers are moved to shared memory in place.
+    num_processes : int
+        Number of worker processes.
+    num_threads : int
+        Number of intra-op threads of each worker, see ``torch.set_num_threads``.
+    max_pending : int or None
+        Largest number of batches that are submitted but not yet returned, which bounds the
+        memory of the queues. Defaults to twice the number of workers.
+    start_method : str or None
+        Start method of the workers, see ``multiprocessing.get_context``. Defaults to the
+        platform default.
+    """
+
+    def __init__(
+        self,
+        model: nn.Module,
+        num_processes: int,
+        num_threads: int = 1,
+        max_pending: int | None = None,
+        start_method: str | None = None,
+    ) -> None:
+        if any(t.device.type != "cpu" for t in chain(model.parameters(), model.buffers())):
+            raise ValueError("ShardedInference requires a network on CPU")
+        self.model = model.share_memory()
+        self.num_processes = num_processes
+        self.num_threads = num_threads
+        self.max_pending = 2 * num_processes if max_pending is None else max_pending
+
+        context = mp.get_context(start_method)
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._workers = [
+            context.Process(
+                target=_worker,
+                args=(self.model, num_threads, gatr_config, self._tasks, self._results),
+                name=f"lgatr-shard-{i}",
+                daemon=True,
+            )
+            for i in range(num_processes)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._closed = False
+        # results of batches from an earlier, abandoned call of ``map`` are discarded
+        self._generation = 0
+
+    def map(self, batches: Iterable[tuple[tuple, dict[str, Any]]]) -> Iterator:
+        """Evaluates batches in the worker processes.
+
+        Parameters
+        ----------
+        batches : Iterable of tuple
+            Positional and keyword arguments of ``model.forward`` for each batch.
+
+        Yields
+        ------
+        Outputs of ``model.forward`` for each batch, in the order of ``batches``.
+        """
+        if self._closed:
+            raise RuntimeError("Cannot evaluate batches with a closed ShardedInference")
+        self._generation += 1
+        generation = self._generation
+        batches = iter(batches)
+        done: dict[int, Any] = {}
+        submitted = returned = 0
+        exhausted = False
+        while not exhausted or returned < submitted:
+            while not exhausted and submitted - returned < self.max_pending:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                    break
+                args, kwargs = batch
+                self._tasks.put((generation, submitted, args, kwargs))
+                submitted += 1
+            if returned == submitted:
+                continue
+            while returned not in done:
+                result_generation, index, outputs, error = self._get_result()
+                if result_generation != generation:
+                    continue
+                if error is not None:
+                    raise RuntimeError(f"Batch {index} failed in a worker process:\n{error}")
+                done[index] = outputs
+            yield done.pop(returned)
+            returned += 1
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+
+    def __enter__(self) -> "ShardedInference":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _get_result(self) -> tuple:
+        """Next result of any worker, fails if a worker died."""
+        while True:
+            try:
+                return self._results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                dead = [worker.name for worker in self._workers if not worker.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Worker processes {dead} stopped unexpectedly") from None
+
+
+def sharding_report(
+    model: nn.Module,
+    batches: list[tuple[tuple, dict[str, Any]]],
+    num_processes: int,
+    num_threads: int = 1,
+    num_repeats: int = 1,
+    start_method: str | None = None,
+) -> dict[str, float]:
+    """Compares the throughput of ``ShardedInference`` with a single process.
+
+    The single process uses ``num_processes * num_threads`` intra-op threads, i.e. the same
+    number of cores. Both runs evaluate ``batches`` once before the timing starts.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network on CPU in eval mode.
+    batches : list of tuple
+        Positional and keyword arguments of ``model.forward`` for each batch. Tensors have the
+        shape (batch, items, ...).
+    num_processes : int
+        Number of worker processes.
+    num_threads : int
+        Number of intra-op threads of each worker.
+    num_repeats : int
+        Number of timed passes over ``batches``.
+    start_method : str or None
+        Start method of the workers, see ``ShardedInference``.
+
+    Returns
+    -------
+    dict[str, float]
+        ``items_per_second`` of the single process and ``items_per_second_sharded``, the
+        ``speedup``, and ``max_abs_error``, the largest deviation between the outputs of both.
+    """
+    num_items = sum(_num_items(args, kwargs) for args, kwargs in batches)
+    threads = torch.get_num_threads()
+    torch.set_num_threads(num_processes * num_threads)
+    try:
+        with torch.inference_mode():
+            expected = [model(*args, **kwargs) for args, kwargs in batches]
+            start = time.perf_counter()
+            for _ in range(num_repeats):
+                for args, kwargs in batches:
+                    model(*args, **kwargs)
+            time_single = time.perf_counter() - start
+    finally:
+        torch.set_num_threads(threads)
+
+    with ShardedInference(model, num_processes, num_threads, start_method=start_method) as runner:
+        outputs = list(runner.map(batches))
+        start = time.perf_counter()
+        for _ in range(num_repeats):
+            for _ in runner.map(batches):
+                pass
+        time_sharded = time.perf_counter() - start
+
+    errors = [
+        (out - ref).abs().max().item()
+        for output, reference in zip(outputs, expected, strict=True)
+        for out, ref in zip(_tensors(output), _tensors(reference), strict=True)
+        if out.numel() > 0
+    ]
+    items_per_second = num_repeats * num_items / time_single
+    items_per_second_sharded = num_repeats * num_items / time_sharded
+    return dict(
+        items_per_second=items_per_second,
+        items_per_second_sharded=items_per_second_sharded,
+        speedup=items_per_second_sharded / items_per_second,
+        max_abs_error=max(errors, default=0.0),
+    )
+
+
+def _worker(model: nn.Module, num_threads: int, config: LGATrConfig, tasks, results) -> None:
+    """Evaluates batches from ``tasks`` until it receives None."""
+    for config_field in fields(config):
+        setattr(gatr_config, config_field.name, getattr(config, config_field.name))
+    torch.set_num_threads(num_threads)
+    with torch.inference_mode():
+        while (task := tasks.get()) is not None:
+            generation, index, args, kwargs = task
+            try:
+                results.put((generation, index, model(*args, **kwargs), None))
+            except Exception:
+                # the traceback is sent as text, because exceptions are not always picklable
+                results.put((generation, index, None, traceback.format_exc()))
+
+
+def _tensors(outputs) -> list[Tensor]:
+    if isinstance(outputs, Tensor):
+        return [outputs]
+    return [output for output in outputs if isinstance(output, Tensor)]
+
+
+def _num_items(args: tuple, kwargs: dict[str, Any]) -> int:
+    """Number of items of a batch with shape (batch, items, ...), or of a packed batch."""
+    tensor = next(value for value in chain(args, kwargs.values()) if isinstance(value, Tensor))
+    return tensor.shape[0] * tensor.shape[1]
@@ -0,0 +1,291 @@
+"""Batching of variable-length events into padded or packed tensors."""
+
+from collections.abc import Sequence
+
+import torch
+from torch import Tensor
+
+from ..primitives.attention_backends import available_backends
+
+PACKINGS = ("padded", "varlen")
+# attention backends of the packings that avoid a dense mask over all items of a batch
+DEFAULT_BACKENDS = dict(padded="native", varlen="varlen")
+
+
+def pad_events(events: Sequence[Tensor], max_items: int | None = None) -> Tensor:
+    """Stacks events with different numbers of items into a zero-padded batch.
+
+    Parameters
+    ----------
+    events : Sequence of torch.Tensor
+        Events with shape (items_i, ...), the trailing dimensions have to agree.
+    max_items : int or None
+        Number of items after padding. Defaults to the largest number of items.
+
+    Returns
+    -------
+    torch.Tensor
+        Padded batch with shape (batch, max_items, ...).
+    """
+    lengths = [event.shape[0] for event in events]
+    max_items = max(lengths) if max_items is None else max_items
+    out = events[0].new_zeros(len(events), max_items, *events[0].shape[1:])
+    for i, event in enumerate(events):
+        out[i, : event.shape[0]] = event
+    return out
+
+
+def pack_events(events: Sequence[Tensor]) -> Tensor:
+    """Concatenates events with different numbers of items into a single packed sequence.
+
+    Parameters
+    ----------
+    events : Sequence of torch.Tensor
+        Events with shape (items_i, ...), the trailing dimensions have to agree.
+
+    Returns
+    -------
+    torch.Tensor
+        Packed batch with shape (1, sum_i items_i, ...).
+    """
+    return torch.cat(list(events), dim=0).unsqueeze(0)
+
+
+def event_offsets(lengths: Sequence[int] | Tensor, device=None) -> Tensor:
+    """Start offsets of packed events, followed by the total number of items.
+
+    Parameters
+    ----------
+    lengths : Sequence of int or torch.Tensor
+        Number of items of each event.
+    device : torch.device or None
+        Device of the offsets.
+
+    Returns
+    -------
+    torch.Tensor
+        Offsets with shape (batch + 1,) and dtype int64.
+    """
+    lengths = torch.as_tensor(lengths, dtype=torch.int64, device=device)
+    return torch.nn.functional.pad(lengths.cumsum(0), (1, 0))
+
+
+def padding_mask(
+    lengths: Sequence[int] | Tensor, max_items: int | None = None, device=None
+) -> Tensor:
+    """Attention mask for padded batches that excludes the padded keys.
+
+    Parameters
+    ----------
+    lengths : Sequence of int or torch.Tensor
+        Number of items of each event.
+    max_items : int or None
+        Number of items after padding. Defaults to the largest number of items.
+    device : torch.device or None
+        Device of the mask.
+
+    Returns
+    -------
+    torch.Tensor
+        Boolean ``attn_mask`` with shape (batch, 1, 1, max_items), True for actual items.
+    """
+    lengths = torch.as_tensor(lengths, dtype=torch.int64, device=device)
+    max_items = int(lengths.max()) if max_items is None else max_items
+    mask = torch.arange(max_items, device=lengths.device) < lengths[:, None]
+    return mask[:, None, None, :]
+
+
+def padding_attention_kwargs(
+    lengths: Sequence[int] | Tensor,
+    max_items: int | None = None,
+    backend: str = "native",
+    num_heads: int = 1,
+    dtype: torch.dtype = torch.float32,
+    device=None,
+) -> dict[str, Tensor]:
+    """Attention arguments for padded batches that exclude the padded keys.
+
+    Parameters
+    ----------
+    lengths : Sequence of int or torch.Tensor
+        Number of items of each event.
+    max_items : int or None
+        Number of items after padding. Defaults to the largest number of items.
+    backend : str
+        ``"native"`` returns a boolean ``attn_mask``, see ``padding_mask``.
+        ``"xformers"`` returns an additive ``attn_bias`` with shape
+        (batch, num_heads, max_items, max_items), as required by xformers.
+    num_heads : int
+        Number of attention heads, only used for ``backend="xformers"``.
+    dtype : torch.dtype
+        Dtype of the ``attn_bias``, has to agree with the attention inputs.
+    device : torch.device or None
+        Device of the attention arguments.
+
+    Returns
+    -------
+    dict
+        Keyword arguments for the attention of the networks.
+    """
+    mask = padding_mask(lengths, max_items=max_items, device=device)
+    if backend == "native":
+        return dict(attn_mask=mask)
+    if backend == "xformers":
+        batch, max_items = mask.shape[0], mask.shape[-1]
+        # xformers requires the rows of the bias to be aligned to 8 elements
+        aligned = -(-max_items // 8) * 8
+        bias = torch.zeros(batch, 1, max_items, aligned, dtype=dtype, device=mask.device)
+        bias = bias[..., :max_items].masked_fill_(~mask, float("-inf"))
+        return dict(attn_bias=bias.expand(batch, num_heads, max_items, max_items))
+    raise ValueError(f"Unknown backend {backend}, choose from ('native', 'xformers')")
+
+
+def varlen_attention_kwargs(
+    lengths: Sequence[int] | Tensor, backend: str = "native", device=None
+) -> dict[str, Tensor | int]:
+    """Attention arguments that restrict the attention of packed events to the event itself.
+
+    Parameters
+    ----------
+    lengths : Sequence of int or torch.Tensor
+        Number of items of each event.
+    backend : str
+        ``"native"`` materializes a block-diagonal ``attn_mask``, which works with every
+        backend that accepts masks, but scales quadratically with the number of packed items.
+        ``"varlen"`` and ``"flash"`` return the offsets for the respective variable-length
+        attention backends.
+    device : torch.device or None
+        Device of the attention arguments.
+
+    Returns
+    -------
+    dict
+        Keyword arguments for the attention of the networks.
+    """
+    lengths = torch.as_tensor(lengths, dtype=torch.int64, device=device)
+    if backend == "native":
+        event = torch.repeat_interleave(torch.arange(len(lengths), device=lengths.device), lengths)
+        return dict(attn_mask=(event[:, None] == event[None, :])[None, None])
+
+    offsets = event_offsets(lengths).to(torch.int32)
+    max_items = int(lengths.max())
+    if backend == "varlen":
+        return dict(cu_seq_q=offsets, cu_seq_k=offsets, max_q=max_items, max_k=max_items)
+    if backend == "flash":
+        return dict(
+            cu_seqlens_q=offsets,
+            cu_seqlens_k=offsets,
+            max_seqlen_q=max_items,
+            max_seqlen_k=max_items,
+        )
+    raise ValueError(f"Unknown backend {backend}, choose from ('native', 'varlen', 'flash')")
+
+
+def default_packing(device=None) -> str:
+    """Packing of variable-length events that avoids a dense attention mask on ``device``.
+
+    Packed batches need the variable-length attention of the ``"varlen"`` backend, which is
+    only available on CUDA devices. Otherwise, packed batches need a block-diagonal mask with
+    ``total_items^2`` entries, e.g. 67M for 8192 items, while padded batches only need a mask
+    with ``batch * max_items`` entries.
+
+    Parameters
+    ----------
+    device : torch.device or None
+        Device of the batches.
+
+    Returns
+    -------
+    str
+        ``"varlen"`` on CUDA devices with the ``"varlen"`` backend, and ``"padded"`` otherwise.
+    """
+    device = torch.device("cpu" if device is None else device)
+    if device.type == "cuda" and "varlen" in available_backends():
+        return "varlen"
+    return "padded"
+
+
+def collate_events(
+    events: Sequence[tuple[tuple, dict]],
+    packing: str = "padded",
+    backend: str = "native",
+    device=None,
+) -> tuple[tuple, dict]:
+    """Pads or packs the network inputs of single events and adds the attention arguments.
+
+    Parameters
+    ----------
+    events : Sequence of tuple
+        Positional and keyword arguments of each event. Tensors have the shape (items_i, ...),
+        other arguments are taken from the first event.
+    packing : str
+        ``"padded"`` for ``pad_events`` with a ``padding_mask``, or ``"varlen"`` for
+        ``pack_events`` with ``varlen_attention_kwargs``.
+    backend : str
+        Attention backend for ``packing="varlen"``, see ``varlen_attention_kwargs``.
+    device : torch.device or None
+        Device of the batched tensors.
+
+    Returns
+    -------
+    args : tuple
+        Batched positional arguments.
+    kwargs : dict
+        Batched keyword arguments and attention arguments.
+    """
+    if packing not in PACKINGS:
+        raise ValueError(f"Unknown packing {packing}, choose from {PACKINGS}")
+    combine = pad_events if packing == "padded" else pack_events
+
+    def collate(values):
+        if not isinstance(values[0], Tensor):
+            return values[0]
+        return combine([value.to(device) for value in values])
+
+    lengths = [
+        next(value for value in (*args, *kwargs.values()) if isinstance(value, Tensor)).shape[0]
+        for args, kwargs in events
+    ]
+    args = tuple(collate(values) for values in zip(*(args for args, _ in events), strict=True))
+    kwargs = {name: collate([kwargs[name] for _, kwargs in events]) for name in events[0][1]}
+    if packing == "padded":
+        kwargs["attn_mask"] = padding_mask(lengths, device=device)
+    else:
+        kwargs.update(varlen_attention_kwargs(lengths, backend, device=device))
+    return args, kwargs
+
+
+def unpad_events(batch: Tensor, lengths: Sequence[int]) -> list[Tensor]:
+    """Inverse of ``pad_events``.
+
+    Parameters
+    ----------
+    batch : torch.Tensor
+        Padded batch with shape (batch, max_items, ...).
+    lengths : Sequence of int
+        Number of items of each event.
+
+    Returns
+    -------
+    list of torch.Tensor
+        Events with shape (items_i, ...).
+    """
+    return [batch[i, :length] for i, length in enumerate(lengths)]
+
+
+def unpack_events(batch: Tensor, lengths: Sequence[int]) -> list[Tensor]:
+    """Inverse of ``pack_events``.
+
+    Parameters
+    ----------
+    batch : torch.Tensor
+        Packed batch with shape (1, sum_i items_i, ...).
+    lengths : Sequence of int
+        Number of items of each event.
+
+    Returns
+    -------
+    list of torch.Tensor
+        Events with shape (items_i, ...).
+    """
+    return list(batch[0].split(list(lengths), dim=0))
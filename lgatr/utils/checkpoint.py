@@ -0,0 +1,96 @@
+"""Activation checkpointing policies for the L-GATr networks."""
+
+from collections.abc import Callable
+from functools import partial
+from typing import Any
+
+import torch
+from torch.utils.checkpoint import checkpoint, create_selective_checkpoint_contexts
+
+CHECKPOINT_POLICIES = ("block", "attention", "mlp", "selective")
+
+# ops whose outputs are stored by the "selective" policy, all other ops are recomputed
+_SELECTIVE_SAVE_OPS = [
+    getattr(torch.ops.aten, name).default
+    for name in [
+        "mm",
+        "bmm",
+        "addmm",
+        "baddbmm",
+        "_scaled_dot_product_flash_attention",
+        "_scaled_dot_product_flash_attention_for_cpu",
+        "_scaled_dot_product_efficient_attention",
+        "_scaled_dot_product_cudnn_attention",
+    ]
+    if hasattr(torch.ops.aten, name)
+]
+
+
+def resolve_checkpoint_policy(checkpoint_blocks: bool | str | Callable) -> str | Callable | None:
+    """Validates the ``checkpoint_blocks`` argument of the L-GATr networks.
+
+    Supported policies are
+
+    - ``False``: no checkpointing
+    - ``True`` or ``"block"``: checkpoint full blocks
+    - ``"attention"``: checkpoint only the attention sublayers of each block
+    - ``"mlp"``: checkpoint only the MLP sublayer of each block
+    - ``"selective"``: checkpoint full blocks, but save the outputs of matrix multiplications and
+      attention kernels and only recompute cheap elementwise and normalization operations
+    - a callable ``policy_fn(ctx, op, *args, **kwargs) -> torch.utils.checkpoint.CheckpointPolicy``
+      or a list of ops, used for selective checkpointing of full blocks
+
+    Parameters
+    ----------
+    checkpoint_blocks : bool or str or Callable
+        Checkpointing policy.
+
+    Returns
+    -------
+    str or Callable or None
+        Normalized policy, None if no checkpointing is used.
+    """
+    if checkpoint_blocks is None or checkpoint_blocks is False:
+        return None
+    if checkpoint_blocks is True:
+        return "block"
+    if isinstance(checkpoint_blocks, str) and checkpoint_blocks not in CHECKPOINT_POLICIES:
+        raise ValueError(
+            f"Unknown checkpointing policy {checkpoint_blocks}, choose from {CHECKPOINT_POLICIES}"
+        )
+    return checkpoint_blocks
+
+
+def block_checkpoint_policies(
+    policy: str | Callable | None, num_blocks: int, checkpoint_every: int = 1
+) -> list[str | Callable | None]:
+    """Distributes a checkpointing policy over blocks, only every ``checkpoint_every``-th block
+    is checkpointed, starting with the first one."""
+    if checkpoint_every < 1:
+        raise ValueError(f"checkpoint_every has to be a positive integer, got {checkpoint_every}")
+    return [policy if i % checkpoint_every == 0 else None for i in range(num_blocks)]
+
+
+def checkpoint_block(
+    function: Callable, *args: Any, policy: str | Callable | None = "block", **kwargs: Any
+) -> Any:
+    """Evaluates a full block with the given block-level checkpointing policy.
+
+    Sublayer policies ("attention", "mlp") are handled within the blocks,
+    so the block is evaluated without checkpointing in this case.
+    """
+    if policy is None or policy in ["attention", "mlp"]:
+        return function(*args, **kwargs)
+    if policy == "block":
+        return checkpoint(function, *args, use_reentrant=False, **kwargs)
+
+    policy_fn = _SELECTIVE_SAVE_OPS if policy == "selective" else policy
+    context_fn = partial(create_selective_checkpoint_contexts, policy_fn)
+    return checkpoint(function, *args, use_reentrant=False, context_fn=context_fn, **kwargs)
+
+
+def checkpoint_sublayer(function: Callable, enabled: bool, *args: Any, **kwargs: Any) -> Any:
+    """Evaluates a sublayer, with checkpointing if ``enabled``."""
+    if enabled:
+        return checkpoint(function, *args, use_reentrant=False, **kwargs)
+    return function(*args, **kwargs)
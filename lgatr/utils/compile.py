@@ -0,0 +1,165 @@
+"""Compilation of the L-GATr networks with torch.compile."""
+
+import os
+from collections.abc import Iterable
+from contextlib import nullcontext
+from typing import Any
+
+import torch
+from torch import nn
+
+from .misc import mark_compile_constants
+
+COMPILE_SCOPES = ("full", "regional")
+CACHE_FILENAME = "lgatr_compile_cache.bin"
+
+
+def resolve_compile_scope(compile: bool | str) -> str | None:
+    """Validates the ``compile`` argument of the L-GATr networks.
+
+    Supported scopes are
+
+    - ``False``: no compilation
+    - ``True`` or ``"full"``: compile the full forward pass
+    - ``"regional"``: compile each block separately. Blocks with the same configuration share the
+      compiled code, such that a deep stack is compiled in about the time of a single block.
+      This relies on dynamo inlining the built-in modules instead of guarding on each block,
+      ``torch._dynamo.config.inline_inbuilt_nn_modules``, the default since torch 2.5.
+
+    Parameters
+    ----------
+    compile : bool or str
+        Compilation scope.
+
+    Returns
+    -------
+    str or None
+        Normalized scope, None if the network is not compiled.
+    """
+    if compile is None or compile is False:
+        return None
+    if compile is True:
+        return "full"
+    if compile not in COMPILE_SCOPES:
+        raise ValueError(f"Unknown compile scope {compile}, choose from {COMPILE_SCOPES}")
+    return compile
+
+
+def compile_network(
+    model: nn.Module, compile: bool | str, mode: str = "default", dynamic: bool = True
+) -> None:
+    """Compiles an L-GATr network in place.
+
+    Only the given instance is compiled with ``nn.Module.compile``, other instances of the same
+    class are not affected.
+    We need fullgraph=False because of the torch.compiler.disable for attention.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Network with a ``blocks`` attribute.
+    compile : bool or str
+        Compilation scope, see ``resolve_compile_scope``.
+    mode : str
+        torch.compile compilation mode, see torch docs for more information.
+    dynamic : bool
+        Whether to use dynamic shapes with torch.compile.
+    """
+    scope = resolve_compile_scope(compile)
+    if scope is not None:
+        mark_compile_constants()
+    if scope == "full":
+        model.compile(mode=mode, dynamic=dynamic)
+    elif scope == "regional":
+        for block in model.blocks:
+            block.compile(mode=mode, dynamic=dynamic)
+
+
+def load_compile_cache(cache_dir: str) -> bool:
+    """Loads compiled artifacts that were stored with ``save_compile_cache``.
+
+    Compilation still traces the model, but skips code generation and autotuning
+    for all artifacts found in the cache. Has to be called before the first forward pass.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache directory.
+
+    Returns
+    -------
+    bool
+        Whether cached artifacts were found and loaded.
+    """
+    path = os.path.join(cache_dir, CACHE_FILENAME)
+    if not hasattr(torch.compiler, "load_cache_artifacts"):  # torch<2.7
+        # fall back to the file-based inductor cache
+        os.environ["TORCHINDUCTOR_CACHE_DIR"] = os.path.abspath(cache_dir)
+        return False
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb") as file:
+        torch.compiler.load_cache_artifacts(file.read())
+    return True
+
+
+def save_compile_cache(cache_dir: str) -> None:
+    """Stores all artifacts compiled in this process in ``cache_dir``.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Cache directory.
+    """
+    if not hasattr(torch.compiler, "save_cache_artifacts"):  # torch<2.7
+        return
+    artifacts = torch.compiler.save_cache_artifacts()
+    if artifacts is None:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, CACHE_FILENAME), "wb") as file:
+        file.write(artifacts[0])
+
+
+def warmup(
+    model: nn.Module,
+    inputs: Iterable[tuple | dict[str, Any]],
+    cache_dir: str | None = None,
+    grad: bool = False,
+) -> None:
+    """Compiles a network for a list of input shape buckets before serving.
+
+    Runs one forward pass per bucket, such that all graphs are compiled ahead of the first
+    request. If ``cache_dir`` is given, previously compiled artifacts are loaded first and
+    all artifacts are stored afterwards, such that restarted workers get hot quickly:
+
+    .. code-block::
+
+        model = LGATrSlim(..., compile="regional")
+        buckets = [(torch.randn(batch, n, 1, 4), torch.randn(batch, n, 1)) for n in [16, 64, 256]]
+        warmup(model, buckets, cache_dir="compile_cache")
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Compiled network, e.g. ``LGATrSlim(..., compile="regional")``.
+    inputs : Iterable of tuple or dict
+        Example inputs for each shape bucket, either a tuple of positional arguments
+        or a dict of keyword arguments of ``model.forward``.
+    cache_dir : str or None
+        Directory for persistent compilation artifacts.
+    grad : bool
+        Whether to compile with gradients enabled, for training.
+    """
+    if cache_dir is not None:
+        load_compile_cache(cache_dir)
+
+    with nullcontext() if grad else torch.no_grad():
+        for example in inputs:
+            if isinstance(example, dict):
+                model(**example)
+            else:
+                model(*example)
+
+    if cache_dir is not None:
+        save_compile_cache(cache_dir)
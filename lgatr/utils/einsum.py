@@ -1,15 +1,20 @@
 """This module provides efficiency improvements over torch's einsum through caching."""
 
-import functools
 from collections.abc import Sequence
 
 import opt_einsum
 import torch
 
+from .misc import locked_cache
+
 
 def custom_einsum(equation: str, *operands: torch.Tensor, path: list[int]) -> torch.Tensor:
     """Computes einsum with a custom contraction order."""
 
+    if torch.compiler.is_compiling():
+        # torch._VF is not traceable, but the aten op with the same signature is
+        return torch.ops.aten.einsum(equation, list(operands), path=path)
+
     # Justification: For the sake of performance, we need direct access to torch's private methods.
 
     return torch._VF.einsum(equation, operands, path=path)
@@ -20,14 +25,21 @@ def cached_einsum(equation: str, *operands: torch.Tensor) -> torch.Tensor:
 
     Inspired by upstream
     https://github.com/pytorch/pytorch/blob/v1.13.0/torch/functional.py#L381.
+
+    In ``torch.compile``, the operands are contracted from left to right instead, because the
+    path search is not traceable. For the equations in ``lgatr.primitives``, this path needs the
+    same number of operations as the optimal one.
     """
+    if torch.compiler.is_compiling():
+        return torch.ops.aten.einsum(equation, list(operands))
+
     op_shape = tuple(op.shape for op in operands)
     path = _get_cached_path_for_equation_and_shapes(equation=equation, op_shape=op_shape)
 
     return custom_einsum(equation, *operands, path=path)
 
 
-@functools.cache
+@locked_cache
 def _get_cached_path_for_equation_and_shapes(
     equation: str, op_shape: Sequence[torch.Tensor]
 ) -> list[int]:
@@ -1,11 +1,129 @@
+import inspect
+import threading
 from collections.abc import Callable
 from functools import wraps
-from itertools import chain
+from itertools import chain, product
 from typing import Any, Literal
 
 import torch
 from torch import Tensor
 
+# functions decorated with compile_constant, see mark_compile_constants
+_COMPILE_CONSTANTS: list[Callable] = []
+
+
+def locked_cache(func: Callable) -> Callable:
+    """Caches the results of a function like ``functools.cache``, but computes each result only
+    once when the function is called concurrently from several threads.
+
+    Cache hits are plain dictionary lookups. On a miss, a lock of the function serializes the
+    computation, and threads that wait for the same arguments reuse its result. The lock is
+    reentrant, such that the function may call itself with other arguments.
+
+    Parameters
+    ----------
+    func : Callable
+        Function with hashable arguments.
+
+    Returns
+    -------
+    decorated_func : Callable
+        Decorated function, with ``cache_clear()`` to empty the cache.
+    """
+    results = {}
+    lock = threading.RLock()
+
+    @wraps(func)
+    def decorated_func(*args: Any, **kwargs: Any):
+        key = (args, tuple(kwargs.items()))
+        try:
+            return results[key]
+        except KeyError:
+            pass
+        with lock:
+            if key not in results:
+                results[key] = func(*args, **kwargs)
+            return results[key]
+
+    decorated_func.cache_clear = results.clear
+    return decorated_func
+
+
+def compile_constant(func: Callable) -> Callable:
+    """Decorator for functions that construct constant tensors, e.g. basis maps loaded from disk.
+
+    Combine with ``locked_cache`` (as inner decorator) to cache the result. The function is
+    evaluated outside of ``torch.inference_mode``, such that cached constants that are first
+    created during inference can later be used in training.
+
+    ``mark_compile_constants`` computes the cached tensors eagerly for all devices and dtypes,
+    such that ``torch.compile`` reads them from the cache as constants, and marks the function
+    with ``torch.compiler.assume_constant_result``. The marking waits for
+    ``mark_compile_constants``, because it imports ``torch._dynamo``.
+
+    Parameters
+    ----------
+    func : Callable
+        Function whose arguments are Python constants (including devices and dtypes).
+
+    Returns
+    -------
+    decorated_func : Callable
+        Decorated function.
+    """
+
+    parameters = inspect.signature(func).parameters
+    defaults = {name: parameter.default for name, parameter in parameters.items()}
+
+    @wraps(func)
+    def decorated_func(*args: Any, **kwargs: Any):
+        # the same cache entry for all ways to pass the arguments, see mark_compile_constants
+        kwargs = {**defaults, **dict(zip(parameters, args, strict=False)), **kwargs}
+        with torch.inference_mode(False):
+            return func(**kwargs)
+
+    _COMPILE_CONSTANTS.append(decorated_func)
+    return decorated_func
+
+
+def mark_compile_constants() -> None:
+    """Prepares the functions decorated with ``compile_constant`` for ``torch.compile``.
+
+    Computes their cached tensors on the CPU and all CUDA and MPS devices for the floating-point
+    dtypes that the networks use, also in autocast regions. The tensors are a few kilobytes. The
+    undecorated functions are marked with ``torch.compiler.assume_constant_result``, such that
+    functions without cached tensors, e.g. of Python constants, are evaluated at trace time.
+
+    The compilation and export helpers of lgatr call this before they trace a network, such that
+    importing lgatr does not import ``torch._dynamo``. Call it before compiling code that uses the
+    primitives directly with ``torch.compile``, otherwise the constants break the graph.
+    """
+    options = dict(
+        device=_constant_devices(),
+        dtype=[torch.float16, torch.bfloat16, torch.float32, torch.float64],
+        use_fully_connected_subgroup=[True, False],
+    )
+    for func in _COMPILE_CONSTANTS:
+        # the wrappers share the name of their code, which torch.compile uses for the constants
+        torch.compiler.assume_constant_result(inspect.unwrap(func))
+        names = list(inspect.signature(func).parameters)
+        if "device" not in names or any(name not in options for name in names):
+            continue
+        for values in product(*(options[name] for name in names)):
+            kwargs = dict(zip(names, values, strict=True))
+            if kwargs["device"].type == "mps" and kwargs.get("dtype") == torch.float64:
+                continue
+            func(**kwargs)
+
+
+def _constant_devices() -> list[torch.device]:
+    devices = [torch.device("cpu")]
+    if torch.cuda.is_available():
+        devices += [torch.device("cuda", i) for i in range(torch.cuda.device_count())]
+    if torch.backends.mps.is_available():
+        devices.append(torch.device("mps", 0))
+    return devices
+
 
 def minimum_autocast_precision(
     min_dtype: torch.dtype = torch.float32,
@@ -77,12 +195,12 @@ def minimum_autocast_precision(
                 return func(*args, **kwargs)
             # Cast inputs to at least 32 bit
             mod_args = [
-                _cast_in(arg) for i, arg in enumerate(args) if which_args is None or i in which_args
+                _cast_in(arg) if which_args is None or i in which_args else arg
+                for i, arg in enumerate(args)
             ]
             mod_kwargs = {
-                key: _cast_in(val)
+                key: _cast_in(val) if which_kwargs is None or key in which_kwargs else val
                 for key, val in kwargs.items()
-                if which_kwargs is None or key in which_kwargs
             }
             # Call function w/o autocast enabled
             with (
@@ -107,7 +225,7 @@ def minimum_autocast_precision(
             else:
                 out_dtype = output
             if isinstance(outputs, tuple):
-                return (_cast_out(val, out_dtype) for val in outputs)
+                return tuple(_cast_out(val, out_dtype) for val in outputs)
             else:
                 return _cast_out(outputs, out_dtype)
 
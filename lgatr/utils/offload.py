@@ -0,0 +1,247 @@
+"""Offloading of saved activations to host memory or disk."""
+
+import os
+import tempfile
+import weakref
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext, suppress
+
+import torch
+from torch import Tensor
+
+OFFLOAD_STORES = ("cpu", "disk")
+
+
+class _OffloadedTensor:
+    """Handle for a saved tensor that lives outside of device memory."""
+
+    __slots__ = (
+        "shape",
+        "dtype",
+        "device",
+        "storage_dtype",
+        "data",
+        "path",
+        "prefetched",
+        "__weakref__",
+    )
+
+    def __init__(self, shape, dtype, device, storage_dtype, data=None, path=None):
+        self.shape = shape
+        self.dtype = dtype
+        self.device = device
+        self.storage_dtype = storage_dtype
+        self.data = data
+        self.path = path
+        self.prefetched: Future | None = None
+
+    def __del__(self):
+        if self.path is not None:
+            with suppress(OSError):
+                os.remove(self.path)
+
+
+class ActivationOffloader:
+    """Moves tensors saved for backward to host memory or a scratch directory.
+
+    Based on ``torch.autograd.graph.saved_tensors_hooks``. Saved tensors are packed into
+    groups, typically one group per transformer block, see ``group``. During backward, when the
+    first tensor of group ``i`` is needed, the tensors of group ``i - 1`` are loaded in a background
+    thread, such that loading overlaps with the backward computation of group ``i``.
+    Offloading is not traced by ``torch.compile`` and leads to graph breaks in compiled models.
+
+    Parameters
+    ----------
+    store : str
+        ``"cpu"`` keeps the saved tensors in (pinned) host memory. This only has an effect for
+        tensors on accelerators, or if ``storage_dtype`` is set.
+        ``"disk"`` writes the saved tensors to memory-mapped files in ``directory``, which also
+        reduces host memory usage on CPU-only machines.
+    directory : str or None
+        Scratch directory for the ``"disk"`` store. If None, a temporary directory is created
+        when the first tensor is offloaded, and removed by ``close``, at the end of a ``with``
+        block, or when the offloader is garbage collected.
+    storage_dtype : torch.dtype or None
+        If set, floating-point tensors with higher precision are stored in this dtype,
+        e.g. ``torch.bfloat16``, and cast back when loaded. Note that this makes the gradients
+        approximate.
+    min_numel : int
+        Tensors with fewer elements stay in place.
+    pin_memory : bool
+        Whether to use pinned host memory for tensors on accelerators in the ``"cpu"`` store.
+    prefetch : bool
+        Whether to load the previous group in a background thread during backward.
+    """
+
+    def __init__(
+        self,
+        store: str = "cpu",
+        directory: str | None = None,
+        storage_dtype: torch.dtype | None = None,
+        min_numel: int = 1024,
+        pin_memory: bool = True,
+        prefetch: bool = True,
+    ) -> None:
+        if store not in OFFLOAD_STORES:
+            raise ValueError(f"Unknown offload store {store}, choose from {OFFLOAD_STORES}")
+        self.store = store
+        self.directory = directory
+        self.storage_dtype = storage_dtype
+        self.min_numel = min_numel
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.prefetch = prefetch
+
+        self._groups: dict[int, list[weakref.ref]] = defaultdict(list)
+        self._current_group: int | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._counter = 0
+        self._tempdir: tempfile.TemporaryDirectory | None = None
+        self._finalizer: weakref.finalize | None = None
+
+    def __getstate__(self):
+        # the thread pool and the saved tensors of the current step are not copied, and copies
+        # create their own temporary directory
+        state = self.__dict__.copy()
+        state.update(_groups=defaultdict(list), _current_group=None, _executor=None)
+        if self._tempdir is not None:
+            state.update(directory=None, _tempdir=None, _finalizer=None)
+        return state
+
+    def close(self) -> None:
+        """Stops the prefetching thread and removes the temporary directory, if one was created.
+
+        Tensors that are still saved for a backward pass cannot be loaded anymore. The offloader
+        can be used again afterwards.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._finalizer is not None:
+            self._finalizer()
+            self.directory = self._tempdir = self._finalizer = None
+
+    def __enter__(self) -> "ActivationOffloader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @contextmanager
+    def group(self, index: int):
+        """Offloads all tensors that are saved for backward within this context to group
+        ``index``. Groups should be numbered in the order of the forward pass."""
+        previous, self._current_group = self._current_group, index
+        # forget tensors of earlier steps that were released without a backward pass
+        self._groups[index] = [ref for ref in self._groups[index] if ref() is not None]
+        try:
+            with torch.autograd.graph.saved_tensors_hooks(self._pack, self._unpack):
+                yield
+        finally:
+            self._current_group = previous
+
+    def _pack(self, tensor: Tensor):
+        if tensor.numel() < self.min_numel or (tensor.requires_grad and tensor.is_leaf):
+            # small tensors and parameters stay where they are
+            return tensor
+        dtype = tensor.dtype
+        storage_dtype = dtype
+        if (
+            self.storage_dtype is not None
+            and dtype.is_floating_point
+            and torch.finfo(dtype).bits > torch.finfo(self.storage_dtype).bits
+        ):
+            storage_dtype = self.storage_dtype
+        if self.store == "cpu" and tensor.device.type == "cpu" and storage_dtype == dtype:
+            return tensor
+
+        with torch.no_grad():
+            if self.store == "cpu":
+                data = torch.empty(
+                    tensor.shape,
+                    dtype=storage_dtype,
+                    pin_memory=self.pin_memory and tensor.device.type != "cpu",
+                )
+                data.copy_(tensor, non_blocking=True)
+                handle = _OffloadedTensor(
+                    tensor.shape, dtype, tensor.device, storage_dtype, data=data
+                )
+            else:
+                path = self._next_path()
+                data = torch.from_file(path, shared=True, size=tensor.numel(), dtype=storage_dtype)
+                data.copy_(tensor.reshape(-1))
+                del data
+                handle = _OffloadedTensor(
+                    tensor.shape, dtype, tensor.device, storage_dtype, path=path
+                )
+
+        if self._current_group is not None:
+            self._groups[self._current_group].append(weakref.ref(handle))
+        return (self._current_group, handle)
+
+    def _unpack(self, packed):
+        if isinstance(packed, Tensor):
+            return packed
+        group, handle = packed
+        if group is not None:
+            self._groups.pop(group, None)
+            if self.prefetch:
+                self._prefetch_group(group - 1)
+
+        future, handle.prefetched = handle.prefetched, None
+        if future is not None:
+            return future.result()
+        return self._load(handle)
+
+    def _load(self, handle: _OffloadedTensor) -> Tensor:
+        if handle.path is None:
+            data = handle.data.to(handle.device, non_blocking=True)
+        else:
+            data = torch.from_file(
+                handle.path, size=handle.shape.numel(), dtype=handle.storage_dtype
+            )
+            # read the file now, not lazily in the backward pass
+            data = data.to(handle.device, copy=True)
+        return data.to(handle.dtype).view(handle.shape)
+
+    def _prefetch_group(self, group: int) -> None:
+        if group not in self._groups:
+            return
+        refs = self._groups.pop(group)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lgatr-offload")
+        for ref in refs:
+            handle = ref()
+            if handle is not None and handle.prefetched is None:
+                handle.prefetched = self._executor.submit(self._load, handle)
+
+    def _next_path(self) -> str:
+        if self.directory is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix="lgatr-offload-")
+            self.directory = self._tempdir.name
+            # removes the directory without a warning if the offloader is not closed
+            self._finalizer = weakref.finalize(self, self._tempdir.cleanup)
+        os.makedirs(self.directory, exist_ok=True)
+        self._counter += 1
+        return os.path.join(self.directory, f"{os.getpid()}-{id(self)}-{self._counter}.bin")
+
+
+def resolve_offloader(
+    offload_activations: bool | str | ActivationOffloader,
+) -> ActivationOffloader | None:
+    """Converts the ``offload_activations`` argument of the L-GATr networks into an
+    ``ActivationOffloader``. True corresponds to the ``"cpu"`` store."""
+    if offload_activations is None or offload_activations is False:
+        return None
+    if isinstance(offload_activations, ActivationOffloader):
+        return offload_activations
+    if offload_activations is True:
+        return ActivationOffloader("cpu")
+    return ActivationOffloader(offload_activations)
+
+
+def offload_group(offloader: ActivationOffloader | None, index: int):
+    """Context manager for offloading the activations of block ``index``, if enabled."""
+    if offloader is None:
+        return nullcontext()
+    return offloader.group(index)
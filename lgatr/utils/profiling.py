@@ -0,0 +1,267 @@
+"""Opt-in profiling of L-GATr networks with annotated blocks, layers and primitives."""
+
+import threading
+from collections import defaultdict
+from collections.abc import Callable
+from functools import wraps
+from typing import Any
+
+import torch
+from torch import nn
+from torch.profiler import ProfilerActivity, profile, record_function
+
+# number of active profilers, primitives are only annotated if it is positive
+_NUM_ACTIVE = 0
+_LOCAL = threading.local()
+_LOCK = threading.Lock()
+
+PRIMITIVE_PREFIX = "lgatr.primitives."
+MODULE_PREFIX = "lgatr."
+KINDS = ("block", "attention", "mlp", "norm", "primitive")
+
+
+def record_region(func: Callable) -> Callable:
+    """Decorator that annotates a primitive as ``lgatr.primitives.<name>`` while an
+    ``LGATrProfiler`` is active.
+
+    Without an active profiler, the decorated function only checks a module-level flag, which
+    ``torch.compile`` resolves at trace time. Direct recursion, e.g. after casting the inputs
+    to the precision of ``gatr_config.precision``, is annotated only once.
+
+    Parameters
+    ----------
+    func : Callable
+        Primitive to annotate.
+
+    Returns
+    -------
+    decorated_func : Callable
+        Decorated function.
+    """
+    name = PRIMITIVE_PREFIX + func.__name__
+
+    @wraps(func)
+    def decorated_func(*args: Any, **kwargs: Any):
+        if not _NUM_ACTIVE:
+            return func(*args, **kwargs)
+        outer = getattr(_LOCAL, "region", None)
+        if outer == name:
+            return func(*args, **kwargs)
+        _LOCAL.region = name
+        try:
+            with record_function(name):
+                return func(*args, **kwargs)
+        finally:
+            _LOCAL.region = outer
+
+    return decorated_func
+
+
+class LGATrProfiler:
+    """Profiles an L-GATr network with named regions for blocks, layers and primitives.
+
+    Within the context, ``torch.profiler`` records the forward (and backward) passes of all
+    models, with ``torch.profiler.record_function`` ranges
+
+    - ``lgatr.<module name>`` for each block, attention, MLP and norm layer of ``model``, e.g.
+      ``lgatr.blocks.0.attention``, ``lgatr.blocks.0.mlp`` or ``lgatr.blocks.0.norm``
+    - ``lgatr.primitives.<name>`` for the primitives, e.g. ``lgatr.primitives.equi_linear``,
+      ``lgatr.primitives.geometric_product`` or ``lgatr.primitives.sdp_attention``
+
+    After the context, ``summary`` and ``table`` report the number of calls, the wall time and
+    the allocated-memory delta of each region, and ``export_chrome_trace`` writes the full trace.
+    The regions are inclusive, e.g. the time of a block contains the time of its attention.
+    Without an active profiler, the networks are not affected, see ``record_region``.
+    Compiled networks are profiled as a whole.
+
+    .. code-block::
+
+        with LGATrProfiler(model) as prof:
+            model(multivectors, scalars=scalars)
+        print(prof.table(group_by="kind"))
+        prof.export_chrome_trace("trace.json")
+
+    Parameters
+    ----------
+    model : torch.nn.Module or None
+        Network whose blocks and layers are annotated. Works for ``LGATr``, ``ConditionalLGATr``,
+        ``LGATrSlim``, ``ConditionalLGATrSlim`` and their layers. If None, only the primitives
+        are annotated.
+    primitives : bool
+        Whether to annotate the primitives.
+    activities : list of torch.profiler.ProfilerActivity or None
+        Activities to record, defaults to the CPU and, if available, CUDA.
+    record_shapes : bool
+        Whether to record the input shapes of each operation, see ``torch.profiler.profile``.
+    with_stack : bool
+        Whether to record the Python stack of each operation, see ``torch.profiler.profile``.
+    """
+
+    def __init__(
+        self,
+        model: nn.Module | None = None,
+        primitives: bool = True,
+        activities: list[ProfilerActivity] | None = None,
+        record_shapes: bool = False,
+        with_stack: bool = False,
+    ) -> None:
+        if activities is None:
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+        self.model = model
+        self.primitives = primitives
+        self.regions: dict[str, str] = {}
+        self._profile = profile(
+            activities=activities,
+            profile_memory=True,
+            record_shapes=record_shapes,
+            with_stack=with_stack,
+        )
+        self._handles = []
+        self._stack: list = []
+
+    def __enter__(self) -> "LGATrProfiler":
+        global _NUM_ACTIVE
+        if self.model is not None:
+            self._register_hooks(self.model)
+        if self.primitives:
+            with _LOCK:
+                _NUM_ACTIVE += 1
+        self._profile.__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _NUM_ACTIVE
+        while self._stack:
+            self._stack.pop().__exit__(None, None, None)
+        self._profile.__exit__(*exc_info)
+        if self.primitives:
+            with _LOCK:
+                _NUM_ACTIVE -= 1
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+
+    def summary(self, group_by: str = "region") -> list[dict[str, Any]]:
+        """Statistics of the profiled regions.
+
+        Parameters
+        ----------
+        group_by : str
+            ``"region"`` for one row per region name, or ``"kind"`` for one row per kind of
+            region, i.e. ``"block"``, ``"attention"``, ``"mlp"``, ``"norm"`` and ``"primitive"``.
+
+        Returns
+        -------
+        list of dict
+            Rows with ``name``, ``kind``, ``calls``, ``wall_time`` (total in seconds),
+            ``mean_wall_time`` (seconds) and ``memory_delta`` (allocated bytes at the end of
+            the region minus at its start, summed over host and device), sorted by the total
+            wall time.
+        """
+        if group_by not in ("region", "kind"):
+            raise ValueError(f"Unknown group_by {group_by}, choose from ('region', 'kind')")
+        rows = defaultdict(lambda: dict(calls=0, wall_time=0.0, memory_delta=0))
+        for event in self._profile.events():
+            kind = self._kind(event.name)
+            if kind is None:
+                continue
+            key = event.name if group_by == "region" else kind
+            row = rows[key]
+            row["name"], row["kind"] = key, kind
+            row["calls"] += 1
+            row["wall_time"] += event.time_range.elapsed_us() * 1e-6
+            row["memory_delta"] += event.cpu_memory_usage + event.device_memory_usage
+        for row in rows.values():
+            row["mean_wall_time"] = row["wall_time"] / row["calls"]
+        return sorted(rows.values(), key=lambda row: row["wall_time"], reverse=True)
+
+    def table(self, group_by: str = "region", row_limit: int | None = None) -> str:
+        """Summary table of the profiled regions, see ``summary``."""
+        rows = self.summary(group_by)[:row_limit]
+        width = max([len(row["name"]) for row in rows] + [6])
+        lines = [
+            f"{'Region':<{width}}  {'Kind':<9}  {'Calls':>6}  {'Total ms':>10}  "
+            f"{'Mean ms':>10}  {'Memory MiB':>10}"
+        ]
+        lines.append("-" * len(lines[0]))
+        for row in rows:
+            lines.append(
+                f"{row['name']:<{width}}  {row['kind']:<9}  {row['calls']:>6}  "
+                f"{1e3 * row['wall_time']:>10.3f}  {1e3 * row['mean_wall_time']:>10.3f}  "
+                f"{row['memory_delta'] / 2**20:>10.3f}"
+            )
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Writes the trace in the Chrome trace format, e.g. for https://ui.perfetto.dev."""
+        self._profile.export_chrome_trace(path)
+
+    @property
+    def profiler(self) -> profile:
+        """Underlying ``torch.profiler.profile``."""
+        return self._profile
+
+    def _kind(self, name: str) -> str | None:
+        if name in self.regions:
+            return self.regions[name]
+        if name.startswith(PRIMITIVE_PREFIX):
+            return "primitive"
+        return None
+
+    def _register_hooks(self, model: nn.Module) -> None:
+        kinds = _module_kinds()
+        for module_name, module in model.named_modules():
+            kind = next((k for k, classes in kinds.items() if isinstance(module, classes)), None)
+            if kind is None:
+                continue
+            name = MODULE_PREFIX + (module_name or type(module).__name__)
+            self.regions[name] = kind
+            self._handles.append(module.register_forward_pre_hook(self._enter_hook(name)))
+            self._handles.append(module.register_forward_hook(self._exit_hook()))
+
+    def _enter_hook(self, name: str) -> Callable:
+        def hook(module, args):
+            region = record_function(name)
+            region.__enter__()
+            self._stack.append(region)
+
+        return hook
+
+    def _exit_hook(self) -> Callable:
+        def hook(module, args, outputs):
+            if self._stack:
+                self._stack.pop().__exit__(None, None, None)
+
+        return hook
+
+
+def _module_kinds() -> dict[str, tuple[type, ...]]:
+    """Classes of the annotated modules for each kind of region."""
+    from ..layers import (
+        ConditionalLGATrBlock,
+        CrossAttention,
+        EquiLayerNorm,
+        GeoMLP,
+        LGATrBlock,
+        SelfAttention,
+    )
+    from ..nets import conditional_lgatr_slim, lgatr_slim
+
+    return dict(
+        block=(
+            LGATrBlock,
+            ConditionalLGATrBlock,
+            lgatr_slim.LGATrSlimBlock,
+            conditional_lgatr_slim.ConditionalLGATrSlimBlock,
+        ),
+        attention=(
+            SelfAttention,
+            CrossAttention,
+            lgatr_slim.SelfAttention,
+            conditional_lgatr_slim.CrossAttention,
+        ),
+        mlp=(GeoMLP, lgatr_slim.MLP),
+        norm=(EquiLayerNorm, lgatr_slim.RMSNorm),
+    )
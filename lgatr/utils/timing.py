@@ -0,0 +1,101 @@
+"""Timing, memory and accuracy measurements of functions and networks."""
+
+import time
+from collections.abc import Callable
+from itertools import accumulate
+from typing import Any
+
+import torch
+from torch import nn
+from torch.profiler import ProfilerActivity, profile
+
+
+def peak_memory(fn: Callable[[], object], device: torch.device | str = "cpu") -> int:
+    """Largest amount of memory allocated during a call of ``fn``, in bytes.
+
+    On CUDA, this is based on ``torch.cuda.max_memory_allocated``. On CPU, the allocations and
+    deallocations of a call are recorded with ``torch.profiler`` and accumulated in time.
+    Operations also report the deallocations of temporary buffers of their child operations,
+    e.g. ``einsum``, so deallocations are counted at the end of an operation and allocations at
+    its start.
+    """
+    device = torch.device(device)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        before = torch.cuda.memory_allocated(device)
+        fn()
+        torch.cuda.synchronize(device)
+        return torch.cuda.max_memory_allocated(device) - before
+
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        fn()
+    deltas = sorted(
+        (
+            event.time_range.start if event.self_cpu_memory_usage > 0 else event.time_range.end,
+            event.self_cpu_memory_usage,
+        )
+        for event in prof.events()
+        if event.self_cpu_memory_usage != 0
+    )
+    return max(0, max(accumulate(delta for _, delta in deltas), default=0))
+
+
+def timed_forward(
+    net: nn.Module, args: tuple, kwargs: dict[str, Any], num_repeats: int
+) -> tuple[Any, float]:
+    """Outputs of ``net`` and the wall time per forward pass after one untimed pass.
+
+    Parameters
+    ----------
+    net : torch.nn.Module
+        Network to time.
+    args : tuple
+        Positional arguments of ``net.forward``.
+    kwargs : dict
+        Keyword arguments of ``net.forward``.
+    num_repeats : int
+        Number of timed forward passes.
+
+    Returns
+    -------
+    outputs : Any
+        Outputs of the untimed forward pass.
+    time : float
+        Mean time per forward pass in seconds.
+    """
+    outputs = net(*args, **kwargs)
+    start = time.perf_counter()
+    for _ in range(num_repeats):
+        net(*args, **kwargs)
+    return outputs, (time.perf_counter() - start) / num_repeats
+
+
+def output_errors(outputs: tuple, approximations: tuple) -> dict[str, float]:
+    """Deviation of approximate network outputs, e.g. of a quantized network.
+
+    Parameters
+    ----------
+    outputs : tuple of torch.Tensor or None
+        Reference outputs, None entries are skipped.
+    approximations : tuple of torch.Tensor or None
+        Approximate outputs with the same structure.
+
+    Returns
+    -------
+    dict[str, float]
+        ``max_abs_error``, the largest absolute deviation, and ``rel_error``, the ratio of the
+        norms of the deviation and of the outputs, over all outputs.
+    """
+    max_abs_error, squared_error, squared_norm = 0.0, 0.0, 0.0
+    for out, approx in zip(outputs, approximations, strict=True):
+        if out is None:
+            continue
+        error = (approx - out).double()
+        max_abs_error = max(max_abs_error, error.abs().max().item())
+        squared_error += error.square().sum().item()
+        squared_norm += out.double().square().sum().item()
+    return dict(
+        max_abs_error=max_abs_error,
+        rel_error=(squared_error / max(squared_norm, 1e-30)) ** 0.5,
+    )
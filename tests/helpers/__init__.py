@@ -5,3 +5,4 @@ from .geometric_algebra import (
     check_consistence_with_grade_involution,
     check_consistence_with_reversal,
 )
+from .networks import NETWORKS, StubModel, build_network, network_inputs, random_events
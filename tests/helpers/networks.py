@@ -0,0 +1,96 @@
+"""Small networks and their inputs, used for multiple tests."""
+
+import torch
+
+from lgatr.nets import ConditionalLGATr, ConditionalLGATrSlim, LGATr, LGATrSlim
+
+NETWORKS = [LGATr, ConditionalLGATr, LGATrSlim, ConditionalLGATrSlim]
+
+
+def build_network(net_class, num_blocks=2, channels=None, seed=0, **kwargs):
+    """Builds a small network of the class ``net_class``.
+
+    ``channels`` sets the hidden multivector (or vector) and scalar channels, further keyword
+    arguments are passed to the network, e.g. ``checkpoint_blocks``.
+    """
+    torch.manual_seed(seed)
+    if net_class in (LGATr, ConditionalLGATr):
+        options = dict(
+            num_blocks=num_blocks,
+            in_mv_channels=2,
+            out_mv_channels=1,
+            hidden_mv_channels=4 if channels is None else channels,
+            in_s_channels=3,
+            out_s_channels=2,
+            hidden_s_channels=6 if channels is None else channels,
+            attention=dict(num_heads=2),
+            mlp=dict(),
+        )
+        if net_class is ConditionalLGATr:
+            options.update(
+                condition_mv_channels=3,
+                condition_s_channels=2,
+                crossattention=dict(num_heads=2),
+            )
+    else:
+        options = dict(
+            in_v_channels=2,
+            out_v_channels=1,
+            hidden_v_channels=8 if channels is None else channels,
+            in_s_channels=3,
+            out_s_channels=2,
+            hidden_s_channels=8 if channels is None else channels,
+            num_blocks=num_blocks,
+            num_heads=2,
+        )
+        if net_class is ConditionalLGATrSlim:
+            options.update(condition_v_channels=3, condition_s_channels=2)
+    options.update(kwargs)
+    return net_class(**options)
+
+
+def network_inputs(net_class, batch=2, items=5, items_condition=4):
+    """Random positional and keyword inputs for ``build_network(net_class)``."""
+    if net_class is LGATr:
+        return (torch.randn(batch, items, 2, 16),), dict(scalars=torch.randn(batch, items, 3))
+    if net_class is ConditionalLGATr:
+        return (
+            torch.randn(batch, items, 2, 16),
+            torch.randn(batch, items_condition, 3, 16),
+        ), dict(
+            scalars=torch.randn(batch, items, 3),
+            scalars_condition=torch.randn(batch, items_condition, 2),
+        )
+    if net_class is LGATrSlim:
+        return (torch.randn(batch, items, 2, 4), torch.randn(batch, items, 3)), {}
+    return (
+        torch.randn(batch, items, 2, 4),
+        torch.randn(batch, items_condition, 3, 4),
+        torch.randn(batch, items, 3),
+        torch.randn(batch, items_condition, 2),
+    ), {}
+
+
+class StubModel(torch.nn.Module):
+    """Sums the items of each event through the attention arguments and records the batches.
+
+    Stands in for a network in the serving tests, with a single tensor input of shape
+    (batch, items, channels) and an optional ``scale`` input of the same batch and items.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def forward(self, x, scale=None, attn_mask=None, **attn_kwargs):
+        self.batches.append((tuple(x.shape), attn_mask is not None))
+        if attn_mask is None:
+            raise ValueError("Expected an attention mask")
+        weights = attn_mask.to(x.dtype).expand(x.shape[0], 1, x.shape[1], x.shape[1])[:, 0]
+        out = torch.einsum("bij,bjc->bic", weights, x)
+        return out, None if scale is None else out * scale
+
+
+def random_events(lengths, channels=3):
+    """Random single events with shape (items, channels) for the ``StubModel``."""
+    return [torch.randn(length, channels) for length in lengths]
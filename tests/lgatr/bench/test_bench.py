@@ -0,0 +1,120 @@
+import copy
+import os
+
+import pytest
+import torch
+
+from lgatr.bench import (
+    all_cases,
+    attention_crossover,
+    compare,
+    load_results,
+    measure,
+    output_errors,
+    peak_memory,
+    run_benchmarks,
+    timed_forward,
+)
+from lgatr.bench.__main__ import main
+from lgatr.primitives import geometric_product
+
+BASELINE = "benchmarks/baselines/cpu-quick.json"
+
+
+def test_measure():
+    """Tests the timing and the peak memory of a function with known allocations."""
+
+    def fn():
+        x = torch.ones(2**18)
+        y = x + 1
+        del x
+        return y.sum()
+
+    result = measure(fn, num_warmup=1, num_repeats=3)
+    assert 0 < result["time_min"] <= result["time_median"]
+    assert result["calls_per_sample"] >= 1
+    assert 2**21 <= result["peak_memory_bytes"] < 2**22
+    assert peak_memory(lambda: None) == 0
+
+    # einsum reports the deallocation of its intermediate outer product of shape (1024, 16, 16)
+    x = torch.randn(1024, 16)
+    with torch.no_grad():
+        assert peak_memory(lambda: geometric_product(x, x)) >= 4 * 1024 * 16 * 16
+
+
+def test_timed_forward_and_output_errors():
+    """Tests the forward timing and the output deviations used by the inference reports."""
+    net = torch.nn.Linear(3, 2)
+    x = torch.randn(4, 3)
+    outputs, time = timed_forward(lambda x: (net(x), None), (x,), {}, num_repeats=2)
+    assert time > 0
+    torch.testing.assert_close(outputs[0], net(x))
+
+    errors = output_errors(outputs, (outputs[0] + 0.5, None))
+    assert errors["max_abs_error"] == pytest.approx(0.5)
+    norm = outputs[0].double().norm().item()
+    assert errors["rel_error"] == pytest.approx(0.5 * outputs[0].numel() ** 0.5 / norm)
+
+
+def test_cases():
+    """Tests that all primitives and networks are covered with unique names."""
+    names = [case.name for case in all_cases(quick=True)]
+    assert len(names) == len(set(names))
+    for primitive in [
+        "equi_linear",
+        "geometric_product",
+        "inner_product",
+        "equi_layer_norm",
+        "grade_dropout",
+        "linear_sdp_attention",
+        "sdp_attention[native]",
+    ]:
+        assert any(name.startswith(f"primitives/{primitive}/") for name in names)
+    for net in ["LGATr", "ConditionalLGATr", "LGATrSlim", "ConditionalLGATrSlim"]:
+        assert f"nets/{net}/items=16,channels=8,batch=2/backward" in names
+
+    # the stored baseline covers all cases, regenerate it when adding cases
+    path = os.path.join(os.path.dirname(__file__), *[os.pardir] * 3, BASELINE)
+    assert set(names) <= set(load_results(path)["results"])
+
+
+@pytest.mark.parametrize("pattern", ["primitives/*", "nets/*LGATr/*"])
+def test_run_and_compare(pattern):
+    """Tests the benchmark run and the regression detection."""
+    results = run_benchmarks(quick=True, pattern=pattern, num_warmup=0, num_repeats=1)
+    assert results["metadata"]["quick"]
+    assert results["results"]
+
+    comparisons = compare(results, results)
+    assert comparisons and not any(c["regression"] or c["missing"] for c in comparisons)
+
+    baseline = copy.deepcopy(results)
+    name = next(iter(baseline["results"]))
+    baseline["results"][name]["time_min"] /= 2
+    regressions = [c for c in compare(results, baseline, threshold=0.5) if c["regression"]]
+    assert [(c["name"], c["metric"]) for c in regressions] == [(name, "time_min")]
+
+    # cases and metrics without a baseline are reported
+    del baseline["results"][name]
+    missing = [c for c in compare(results, baseline) if c["missing"]]
+    assert {c["name"] for c in missing} == {name} and not any(c["regression"] for c in missing)
+    assert all(c["baseline"] is None and c["ratio"] is None for c in missing)
+
+
+def test_cli(tmp_path, capsys):
+    """Tests the command line interface with a stored baseline."""
+    output, baseline = str(tmp_path / "results.json"), str(tmp_path / "baseline.json")
+    args = ["--quick", "-k", "primitives/inner_product/*", "--repeats", "1", "--no-memory"]
+    assert main([*args, "-o", baseline]) == 0
+    assert main([*args, "-o", output, "--baseline", baseline, "--threshold", "1000"]) == 0
+    assert "No regressions" in capsys.readouterr().out
+    assert set(load_results(output)["results"]) == set(load_results(baseline)["results"])
+    assert main([*args, "--baseline", baseline, "--threshold", "-1"]) == 1
+
+
+def test_attention_crossover():
+    """Tests the timing of softmax against linear attention."""
+    result = attention_crossover(items=(8, 16), channels=1, heads=1, num_warmup=0, num_repeats=1)
+    assert result["items"] == [8, 16]
+    assert len(result["softmax"]) == len(result["linear"]) == 2
+    assert result["crossover"] in (None, 8, 16)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import torch
+
+from lgatr.data import (
+    BucketBatchSampler,
+    PaddedCollator,
+    RaggedEventDataset,
+    write_events,
+)
+from lgatr.interface import embed_vector
+from lgatr.nets import LGATr
+from lgatr.utils.batching import padding_attention_kwargs
+from tests.helpers import MILD_TOLERANCES
+
+
+def _lengths(num_events=500):
+    rng = np.random.default_rng(1)
+    return rng.integers(2, 60, size=num_events)
+
+
+@pytest.mark.parametrize("shuffle", [True, False])
+def test_bucket_sampler(shuffle):
+    """Tests that the batches cover all events under the token budget with little padding."""
+    lengths = _lengths()
+    sampler = BucketBatchSampler(lengths, max_tokens=256, shuffle=shuffle, seed=3)
+    batches = list(sampler)
+    assert len(sampler) == len(batches)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) * lengths[batch].max() <= 256
+
+    stats = sampler.stats()
+    assert stats["num_batches"] == len(batches)
+    assert stats["padding_efficiency"] > 0.85
+    assert stats["padding_efficiency"] > stats["padding_efficiency_random"]
+    assert len(stats["bucket_efficiency"]) == len(sampler.boundaries) + 1
+
+    sampler.set_epoch(1)
+    assert (list(sampler) != batches) == shuffle
+
+    dropped = BucketBatchSampler(lengths, max_tokens=256, boundaries=[10, 30], drop_last=True)
+    assert len(dropped.buckets) == 3
+    assert sum(len(batch) for batch in dropped) < len(lengths)
+
+
+def test_padded_collator(tmp_path):
+    """Tests that padded batches reproduce the network outputs of single events."""
+    lengths = [3, 7, 5]
+    rng = np.random.default_rng(0)
+    write_events(
+        str(tmp_path),
+        [rng.normal(size=(n, 4)) for n in lengths],
+        [rng.normal(size=(n, 3)) for n in lengths],
+        labels=np.arange(3),
+    )
+    dataset = RaggedEventDataset(str(tmp_path))
+    sampler = BucketBatchSampler(dataset.lengths, max_tokens=64, num_buckets=1)
+    loader = torch.utils.data.DataLoader(
+        dataset, batch_sampler=sampler, collate_fn=PaddedCollator()
+    )
+    (batch,) = list(loader)
+    assert batch.vectors.shape == (3, 7, 1, 16)
+    assert batch.attn_kwargs["attn_mask"].shape == (3, 1, 1, 7)
+
+    torch.manual_seed(0)
+    net = LGATr(
+        num_blocks=1,
+        in_mv_channels=1,
+        out_mv_channels=1,
+        hidden_mv_channels=4,
+        in_s_channels=3,
+        out_s_channels=2,
+        hidden_s_channels=4,
+        attention=dict(num_heads=2),
+        mlp=dict(),
+    ).eval()
+    with torch.no_grad():
+        outputs = net(batch.vectors, scalars=batch.scalars, **batch.attn_kwargs)[1]
+        for out, label in zip(batch.unpack(outputs), batch.labels.tolist(), strict=True):
+            vector, scalar, _ = dataset[label]
+            expected = net(embed_vector(vector)[None, :, None], scalars=scalar[None])[1]
+            torch.testing.assert_close(out, expected[0], **MILD_TOLERANCES)
+
+
+def test_padding_attention_kwargs():
+    """Tests the additive attention bias for xformers."""
+    bias = padding_attention_kwargs([2, 3], backend="xformers", num_heads=4)["attn_bias"]
+    assert bias.shape == (2, 4, 3, 3)
+    assert torch.isinf(bias[0, :, :, 2]).all()
+    assert (bias[1] == 0).all()
+    with pytest.raises(ValueError):
+        padding_attention_kwargs([2, 3], backend="flash")
@@ -0,0 +1,116 @@
+import pickle
+
+import numpy as np
+import pytest
+import torch
+
+from lgatr.data import PackedEventLoader, RaggedEventDataset, write_events
+from lgatr.interface import embed_vector
+from lgatr.nets import LGATrSlim
+from tests.helpers import MILD_TOLERANCES
+
+LENGTHS = [3, 1, 5, 2, 4, 6, 2]
+
+
+@pytest.fixture
+def events(tmp_path):
+    """Writes random events and returns the directory and the original arrays."""
+    rng = np.random.default_rng(0)
+    vectors = [rng.normal(size=(n, 4)) for n in LENGTHS]
+    scalars = [rng.normal(size=(n, 3)) for n in LENGTHS]
+    labels = np.arange(len(LENGTHS))
+    write_events(str(tmp_path), vectors, scalars, labels)
+    return str(tmp_path), vectors, scalars
+
+
+def test_dataset(events):
+    """Tests that events are read back, and that contiguous batches share the memory map."""
+    path, vectors, scalars = events
+    dataset = RaggedEventDataset(path)
+    assert len(dataset) == len(LENGTHS)
+    assert dataset.lengths.tolist() == LENGTHS
+
+    vector, scalar, label = dataset[2]
+    torch.testing.assert_close(vector, torch.tensor(vectors[2], dtype=torch.float32))
+    torch.testing.assert_close(scalar, torch.tensor(scalars[2], dtype=torch.float32))
+    assert label.item() == 2
+
+    batch = dataset.get_batch([1, 2, 3], embed=False, backend="native")
+    assert batch.vectors.shape == (1, 8, 1, 4)
+    assert batch.vectors.data_ptr() == dataset.arrays["vectors"][3:11].ctypes.data
+    assert batch.attn_kwargs["attn_mask"].shape == (1, 1, 8, 8)
+    assert batch.offsets.tolist() == [0, 1, 6, 8]
+
+    gathered = dataset.get_batch([4, 0])
+    assert gathered.vectors.shape == (1, 7, 1, 16)
+    assert gathered.labels.tolist() == [4, 0]
+    assert gathered.offsets.tolist() == [0, 4, 7]
+    assert "attn_mask" not in gathered.attn_kwargs
+    assert gathered.attn_kwargs["cu_seq_q"].tolist() == [0, 4, 7]
+    assert gathered.attention_kwargs("native")["attn_mask"].shape == (1, 1, 7, 7)
+    for event, i in zip(gathered.unpack(gathered.vectors), [4, 0], strict=True):
+        expected = embed_vector(torch.tensor(vectors[i], dtype=torch.float32))
+        torch.testing.assert_close(event[:, 0], expected)
+
+    restored = pickle.loads(pickle.dumps(dataset))
+    assert restored._arrays is None
+    torch.testing.assert_close(restored[2][0], vector)
+
+
+def test_dataset_npz(events, tmp_path):
+    """Tests that events written to a .npz archive agree with the memory-mapped format."""
+    path, vectors, scalars = events
+    archive = str(tmp_path / "events.npz")
+    write_events(archive, vectors, scalars, np.arange(len(LENGTHS)))
+    dataset, reference = RaggedEventDataset(archive), RaggedEventDataset(path)
+    assert dataset.lengths.tolist() == LENGTHS
+    batch, expected = dataset.get_batch([4, 0, 1]), reference.get_batch([4, 0, 1])
+    torch.testing.assert_close(batch.vectors, expected.vectors)
+    torch.testing.assert_close(batch.scalars, expected.scalars)
+    assert batch.labels.tolist() == [4, 0, 1]
+
+    write_events(archive, vectors)
+    assert RaggedEventDataset(archive)[0][1] is None
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_loader(events, num_workers):
+    """Tests the token and event budgets and the distribution over workers."""
+    dataset = RaggedEventDataset(events[0])
+    loader = PackedEventLoader(dataset, max_tokens=8, max_events=3)
+    indices = [list(batch) for batch in loader.batch_indices()]
+    assert indices == [[0, 1], [2, 3], [4], [5, 6]]
+
+    batches = list(torch.utils.data.DataLoader(loader, batch_size=None, num_workers=num_workers))
+    labels = sorted(label for batch in batches for label in batch.labels.tolist())
+    assert labels == list(range(len(LENGTHS)))
+
+    custom = PackedEventLoader(dataset, batches=[[6, 0], [1]], embed=False)
+    assert [batch.lengths.tolist() for batch in custom] == [[2, 3], [1]]
+
+    with pytest.raises(ValueError):
+        PackedEventLoader(dataset)
+
+
+def test_loader_network(events):
+    """Tests that packed batches reproduce the network outputs of single events."""
+    torch.manual_seed(0)
+    net = LGATrSlim(
+        in_v_channels=1,
+        out_v_channels=1,
+        hidden_v_channels=4,
+        in_s_channels=3,
+        out_s_channels=2,
+        hidden_s_channels=4,
+        num_blocks=1,
+        num_heads=2,
+    ).eval()
+    dataset = RaggedEventDataset(events[0])
+    loader = PackedEventLoader(dataset, max_tokens=16, embed=False, backend="native")
+    batch = next(iter(loader))
+    with torch.no_grad():
+        outputs = net(batch.vectors, batch.scalars, **batch.attn_kwargs)[1]
+        for i, out in enumerate(batch.unpack(outputs)):
+            vector, scalar, _ = dataset[i]
+            expected = net(vector[None, :, None], scalar[None])[1]
+            torch.testing.assert_close(out, expected[0], **MILD_TOLERANCES)
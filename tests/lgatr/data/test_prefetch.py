@@ -0,0 +1,115 @@
+import time
+
+import numpy as np
+import pytest
+import torch
+
+from lgatr.data import (
+    BucketBatchSampler,
+    EventPreprocessor,
+    PackedEventLoader,
+    PaddedCollator,
+    PrefetchPipeline,
+    RaggedEventDataset,
+    write_events,
+)
+from lgatr.interface import embed_vector, get_spurions
+from lgatr.utils.batching import event_offsets
+
+LENGTHS = [3, 1, 5, 2, 4, 6, 2, 7]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(0)
+    write_events(
+        str(tmp_path),
+        [rng.normal(size=(n, 4)) for n in LENGTHS],
+        [rng.normal(size=(n, 2)) for n in LENGTHS],
+        labels=np.arange(len(LENGTHS)),
+    )
+    return RaggedEventDataset(str(tmp_path))
+
+
+@pytest.mark.parametrize("padded", [False, True])
+def test_preprocessor(dataset, padded):
+    """Tests the embedding and the spurions as channels and as tokens."""
+    if padded:
+        sampler = BucketBatchSampler(dataset.lengths, max_tokens=64, num_buckets=1, shuffle=False)
+        collate = PaddedCollator(embed=False)
+        batch = collate([dataset[i] for i in next(iter(sampler))])
+    else:
+        batch = dataset.get_batch(range(len(dataset)), embed=False)
+    spurions = get_spurions()
+
+    channels = EventPreprocessor(spurions=spurions)(batch)
+    assert channels.vectors.shape == (*batch.vectors.shape[:-2], 3, 16)
+    torch.testing.assert_close(channels.vectors[..., :1, :], embed_vector(batch.vectors))
+    torch.testing.assert_close(
+        channels.vectors[..., 1:, :], spurions.expand_as(channels.vectors[..., 1:, :])
+    )
+
+    tokens = EventPreprocessor(spurions=spurions, spurion_tokens=True)(batch)
+    assert tokens.lengths.tolist() == [n + 2 for n in batch.lengths.tolist()]
+    assert type(tokens) is type(batch)
+    for event, scalars, raw in zip(
+        tokens.unpack(tokens.vectors),
+        tokens.unpack(tokens.scalars),
+        batch.unpack(batch.vectors),
+        strict=True,
+    ):
+        torch.testing.assert_close(event[:2, 0], spurions)
+        torch.testing.assert_close(event[2:], embed_vector(raw))
+        assert (scalars[:2] == 0).all()
+    assert tokens.offsets.tolist() == event_offsets(tokens.lengths).tolist()
+    if padded:
+        mask = tokens.attn_kwargs["attn_mask"]
+        assert mask.shape == (len(LENGTHS), 1, 1, max(LENGTHS) + 2)
+    else:
+        assert "attn_mask" not in tokens.attn_kwargs
+        assert tokens.attn_kwargs["cu_seq_q"][-1] == sum(LENGTHS) + 2 * len(LENGTHS)
+
+    with pytest.raises(ValueError):
+        EventPreprocessor(embed=False, spurions=spurions)(batch)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_pipeline(dataset, executor):
+    """Tests that the pipeline reproduces the preprocessed batches in order."""
+    loader = PackedEventLoader(dataset, max_events=2, embed=False)
+    transform = EventPreprocessor(spurions=get_spurions())
+    pipeline = PrefetchPipeline(loader, transform, num_workers=2, executor=executor)
+    expected = [transform(batch) for batch in loader]
+    for _ in range(2 if executor == "thread" else 1):
+        batches = list(pipeline)
+        assert len(batches) == len(expected)
+        for batch, batch_expected in zip(batches, expected, strict=True):
+            torch.testing.assert_close(batch.vectors, batch_expected.vectors)
+            torch.testing.assert_close(batch.labels, batch_expected.labels)
+
+
+def _slow_source(num_batches, delay):
+    for i in range(num_batches):
+        time.sleep(delay)
+        yield torch.full((2,), float(i))
+
+
+def test_pipeline_prefetch():
+    """Tests the prefetching ahead of a slow consumer, early exit and error propagation."""
+    pipeline = PrefetchPipeline(_slow_source(6, 0.02), prefetch=3)
+    start = time.perf_counter()
+    for _ in pipeline:
+        time.sleep(0.02)
+    assert time.perf_counter() - start < 6 * 0.04
+
+    pipeline = PrefetchPipeline(_slow_source(100, 0.0), prefetch=2)
+    values = [batch[0].item() for batch, _ in zip(pipeline, range(4), strict=False)]
+    assert values == [0, 1, 2, 3]
+
+    def fail(batch):
+        raise RuntimeError("preprocessing failure")
+
+    with pytest.raises(RuntimeError, match="preprocessing failure"):
+        list(PrefetchPipeline(_slow_source(2, 0.0), fail))
+    with pytest.raises(ValueError):
+        PrefetchPipeline([], executor="fiber")
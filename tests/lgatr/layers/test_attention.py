@@ -1,7 +1,13 @@
 import pytest
 import torch
 
-from lgatr.layers import SelfAttention, SelfAttentionConfig
+from lgatr.layers import (
+    CrossAttentionConfig,
+    SelfAttention,
+    SelfAttentionConfig,
+    block_attention_configs,
+)
+from lgatr.primitives.pairwise import pairwise_bias_features
 from tests.helpers import BATCH_DIMS, TOLERANCES, check_pin_equivariance
 
 
@@ -12,6 +18,7 @@ from tests.helpers import BATCH_DIMS, TOLERANCES, check_pin_equivariance
 @pytest.mark.parametrize("in_s_channels,out_s_channels", [(17, 13), (11, None)])
 @pytest.mark.parametrize("num_heads", [4, 1])
 @pytest.mark.parametrize("multi_query,head_scale", [(True, True), (False, False)])
+@pytest.mark.parametrize("linear_attention", [False, True])
 def test_attention_equivariance(
     batch_dims,
     num_items,
@@ -23,6 +30,7 @@ def test_attention_equivariance(
     out_s_channels,
     multi_query,
     increase_hidden_channels,
+    linear_attention,
 ):
     """Tests the SelfAttention layer for Pin equivariance, with scalar inputs."""
 
@@ -35,6 +43,7 @@ def test_attention_equivariance(
         head_scale=head_scale,
         multi_query=multi_query,
         increase_hidden_channels=increase_hidden_channels,
+        linear_attention=linear_attention,
     )
     layer = SelfAttention(config)
 
@@ -48,3 +57,66 @@ def test_attention_equivariance(
         spin=True,
         **TOLERANCES,
     )
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("num_items,in_channels,in_s_channels,num_heads", [(5, 4, 6, 2)])
+@pytest.mark.parametrize("multi_query", [False, True])
+def test_attention_pairwise_bias_equivariance(
+    batch_dims, num_items, in_channels, in_s_channels, num_heads, multi_query
+):
+    """Tests the SelfAttention layer with pairwise bias for Pin equivariance.
+
+    The pairwise features are Lorentz-invariant, so they stay fixed under the transformation.
+    """
+    config = SelfAttentionConfig(
+        in_mv_channels=in_channels,
+        out_mv_channels=in_channels,
+        in_s_channels=in_s_channels,
+        out_s_channels=in_s_channels,
+        num_heads=num_heads,
+        multi_query=multi_query,
+        pairwise_bias=True,
+    )
+    layer = SelfAttention(config)
+    with torch.no_grad():
+        layer.pair_bias_scale.normal_()
+
+    pair_features = pairwise_bias_features(torch.randn(*batch_dims, num_items, 4))
+    scalars = torch.randn(*batch_dims, num_items, in_s_channels)
+    multivectors = torch.randn(*batch_dims, num_items, in_channels, 16)
+    out_mv, _ = layer(multivectors, scalars=scalars, pair_features=pair_features)
+    out_mv_nobias, _ = layer(multivectors, scalars=scalars)
+    assert not torch.allclose(out_mv, out_mv_nobias)
+
+    data_dims = tuple(list(batch_dims) + [num_items, in_channels])
+    check_pin_equivariance(
+        layer,
+        1,
+        batch_dims=data_dims,
+        fn_kwargs=dict(scalars=scalars, pair_features=pair_features),
+        spin=True,
+        **TOLERANCES,
+    )
+
+
+def test_block_attention_configs():
+    """Tests the distribution of per-block linear_attention flags over blocks."""
+    config = SelfAttentionConfig(linear_attention=True)
+    assert block_attention_configs(config, 3) == [config] * 3
+
+    config = CrossAttentionConfig(linear_attention=[True, False])
+    flags = [c.linear_attention for c in block_attention_configs(config, 2)]
+    assert flags == [True, False]
+
+    with pytest.raises(ValueError, match="Expected 3 linear_attention flags"):
+        block_attention_configs(config, 3)
+    with pytest.raises(ValueError, match="single linear_attention flag"):
+        config = SelfAttentionConfig(
+            in_mv_channels=4,
+            out_mv_channels=4,
+            in_s_channels=4,
+            out_s_channels=4,
+            linear_attention=[True],
+        )
+        SelfAttention(config)
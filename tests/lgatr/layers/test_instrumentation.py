@@ -0,0 +1,83 @@
+import pytest
+import torch
+
+from lgatr.layers import register_instrumentation
+from lgatr.nets import LGATr, LGATrSlim
+from tests.helpers import BATCH_DIMS
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("num_items,num_heads,num_blocks", [(5, 2, 3)])
+@pytest.mark.parametrize("checkpoint_blocks,entropy", [(False, True), (True, False)])
+def test_lgatr_instrumentation(
+    batch_dims, num_items, num_heads, num_blocks, checkpoint_blocks, entropy
+):
+    """Tests that LGATr emits attention and activation statistics for every block."""
+    net = LGATr(
+        num_blocks=num_blocks,
+        in_mv_channels=2,
+        out_mv_channels=2,
+        hidden_mv_channels=4,
+        in_s_channels=3,
+        out_s_channels=3,
+        hidden_s_channels=6,
+        attention=dict(num_heads=num_heads),
+        mlp=dict(),
+        checkpoint_blocks=checkpoint_blocks,
+    )
+    multivectors = torch.randn(*batch_dims, num_items, 2, 16)
+    scalars = torch.randn(*batch_dims, num_items, 3)
+
+    received = []
+    with register_instrumentation(
+        net, lambda name, stats: received.append((name, stats)), entropy=entropy
+    ):
+        with torch.no_grad():
+            net(multivectors, scalars=scalars)
+
+    names = [name for name, _ in received]
+    expected = []
+    for i in range(num_blocks):
+        expected += [f"blocks.{i}.attention", f"blocks.{i}"]
+    assert names == expected
+
+    for name, stats in received:
+        if name.endswith("attention"):
+            expected_stats = {"query_norm", "key_norm", "value_norm", "output_absmax"}
+            if not entropy:
+                assert set(stats) == expected_stats
+                continue
+            assert set(stats) == expected_stats | {"entropy", "logit_max"}
+            assert stats["entropy"].shape == (num_heads,)
+            assert torch.all(stats["entropy"] >= 0)
+            assert torch.all(stats["entropy"] <= torch.log(torch.tensor(num_items)) + 1e-5)
+        else:
+            assert set(stats) == {"mv_absmax", "mv_rms", "s_absmax", "s_rms", "nonfinite"}
+            assert stats["nonfinite"] == 0
+
+    # no statistics after removing the hooks
+    received.clear()
+    net(multivectors, scalars=scalars)
+    assert not received
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+def test_lgatr_slim_instrumentation(batch_dims):
+    """Tests that LGATrSlim emits attention and activation statistics for every block."""
+    net = LGATrSlim(
+        in_v_channels=2,
+        out_v_channels=2,
+        hidden_v_channels=8,
+        in_s_channels=3,
+        out_s_channels=3,
+        hidden_s_channels=8,
+        num_blocks=2,
+        num_heads=2,
+    )
+    received = []
+    handle = register_instrumentation(
+        net, lambda name, stats: received.append(name), activations=False
+    )
+    net(torch.randn(*batch_dims, 2, 4), torch.randn(*batch_dims, 3))
+    handle.remove()
+    assert received == ["blocks.0.attention", "blocks.1.attention"]
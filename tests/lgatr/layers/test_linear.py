@@ -1,7 +1,7 @@
 import pytest
 import torch
 
-from lgatr.layers.linear import EquiLinear
+from lgatr.layers.linear import EquiLinear, FrozenEquiLinear
 from lgatr.primitives.config import gatr_config
 from tests.helpers import BATCH_DIMS, TOLERANCES, check_pin_equivariance
 
@@ -189,3 +189,46 @@ def test_linear_layer_equivariance(
 
     # restore defaults
     gatr_config.use_fully_connected_subgroup = True
+
+
+@pytest.mark.parametrize("batch_dims", [(3, 7)])
+@pytest.mark.parametrize("in_mv_channels, out_mv_channels", [(5, 3)])
+@pytest.mark.parametrize(
+    "in_s_channels, out_s_channels", [(None, None), (None, 4), (6, None), (6, 4)]
+)
+@pytest.mark.parametrize("bias", [True, False])
+@pytest.mark.parametrize("use_fully_connected_subgroup", [True, False])
+def test_frozen_linear_layer(
+    batch_dims,
+    in_mv_channels,
+    out_mv_channels,
+    in_s_channels,
+    out_s_channels,
+    bias,
+    use_fully_connected_subgroup,
+):
+    """Tests that `FrozenEquiLinear` reproduces `EquiLinear`, with and without scalar inputs."""
+    gatr_config.use_fully_connected_subgroup = use_fully_connected_subgroup
+    layer = EquiLinear(
+        in_mv_channels,
+        out_mv_channels,
+        in_s_channels=in_s_channels,
+        out_s_channels=out_s_channels,
+        bias=bias,
+    )
+    frozen = FrozenEquiLinear.from_equi_linear(layer)
+
+    inputs = torch.randn(*batch_dims, in_mv_channels, 16)
+    scalar_options = [None]
+    if in_s_channels is not None:
+        scalar_options.append(torch.randn(*batch_dims, in_s_channels))
+    for scalars in scalar_options:
+        outputs_mv, outputs_s = layer(inputs, scalars=scalars)
+        frozen_mv, frozen_s = frozen(inputs, scalars=scalars)
+        torch.testing.assert_close(frozen_mv, outputs_mv, **TOLERANCES)
+        if outputs_s is None:
+            assert frozen_s is None
+        else:
+            torch.testing.assert_close(frozen_s, outputs_s, **TOLERANCES)
+
+    gatr_config.use_fully_connected_subgroup = True
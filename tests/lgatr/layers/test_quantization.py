@@ -0,0 +1,110 @@
+import pytest
+import torch
+from torch import nn
+
+from lgatr.layers.linear import EquiLinear, FrozenEquiLinear
+from lgatr.layers.quantization import Int8Linear, QuantizedEquiLinear
+from lgatr.primitives.config import gatr_config
+from tests.helpers import BATCH_DIMS, TOLERANCES, check_pin_equivariance
+
+
+@pytest.mark.parametrize("bias", [False, True])
+@pytest.mark.parametrize("dynamic_activations", [True, False])
+def test_int8_linear_layer(bias, dynamic_activations):
+    """Tests that `Int8Linear` approximates `torch.nn.Linear`."""
+    linear = nn.Linear(32, 6, bias=bias)
+    quantized = Int8Linear.from_linear(linear, dynamic_activations=dynamic_activations)
+    inputs = torch.randn(3, 4, 32)
+
+    with torch.no_grad():
+        outputs, expected = quantized(inputs), linear(inputs)
+    assert (outputs - expected).norm() < 0.02 * expected.norm()
+
+
+@pytest.mark.parametrize("batch_dims", [(3, 7)])
+@pytest.mark.parametrize("in_mv_channels, out_mv_channels", [(5, 3)])
+@pytest.mark.parametrize(
+    "in_s_channels, out_s_channels", [(None, None), (None, 4), (6, None), (6, 4)]
+)
+@pytest.mark.parametrize("dynamic_activations", [True, False])
+@pytest.mark.parametrize("frozen", [False, True])
+@pytest.mark.parametrize("use_fully_connected_subgroup", [True, False])
+def test_quantized_linear_layer(
+    batch_dims,
+    in_mv_channels,
+    out_mv_channels,
+    in_s_channels,
+    out_s_channels,
+    dynamic_activations,
+    frozen,
+    use_fully_connected_subgroup,
+):
+    """Tests that `QuantizedEquiLinear` approximates `EquiLinear`, with and without scalar
+    inputs."""
+    gatr_config.use_fully_connected_subgroup = use_fully_connected_subgroup
+    layer = EquiLinear(
+        in_mv_channels,
+        out_mv_channels,
+        in_s_channels=in_s_channels,
+        out_s_channels=out_s_channels,
+    )
+    if frozen:
+        quantized = QuantizedEquiLinear.from_frozen_equi_linear(
+            FrozenEquiLinear.from_equi_linear(layer), dynamic_activations=dynamic_activations
+        )
+    else:
+        quantized = QuantizedEquiLinear.from_equi_linear(
+            layer, dynamic_activations=dynamic_activations
+        )
+    assert len(list(quantized.parameters())) == 0
+    assert quantized.qweight.dtype == torch.int8
+
+    inputs = torch.randn(*batch_dims, in_mv_channels, 16)
+    scalar_options = [None]
+    if in_s_channels is not None:
+        scalar_options.append(torch.randn(*batch_dims, in_s_channels))
+    for scalars in scalar_options:
+        with torch.no_grad():
+            outputs_mv, outputs_s = layer(inputs, scalars=scalars)
+            quantized_mv, quantized_s = quantized(inputs, scalars=scalars)
+        assert (quantized_mv - outputs_mv).norm() < 0.02 * outputs_mv.norm()
+        if outputs_s is None:
+            assert quantized_s is None
+        else:
+            assert (quantized_s - outputs_s).norm() < 0.02 * outputs_s.norm()
+
+    gatr_config.use_fully_connected_subgroup = True
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("in_mv_channels", [9, 1])
+@pytest.mark.parametrize("out_mv_channels", [7, 1])
+@pytest.mark.parametrize("in_s_channels", [None, 3])
+@pytest.mark.parametrize("out_s_channels", [None, 4])
+@pytest.mark.parametrize("use_fully_connected_subgroup", [True, False])
+def test_quantized_linear_layer_equivariance(
+    batch_dims,
+    in_mv_channels,
+    out_mv_channels,
+    in_s_channels,
+    out_s_channels,
+    use_fully_connected_subgroup,
+):
+    """Tests that the int8 weights of `QuantizedEquiLinear` define an equivariant map."""
+    gatr_config.use_fully_connected_subgroup = use_fully_connected_subgroup
+
+    layer = EquiLinear(
+        in_mv_channels,
+        out_mv_channels,
+        in_s_channels=in_s_channels,
+        out_s_channels=out_s_channels,
+    )
+    quantized = QuantizedEquiLinear.from_equi_linear(layer, dynamic_activations=False)
+    data_dims = tuple(list(batch_dims) + [in_mv_channels])
+    scalars = None if in_s_channels is None else torch.randn(*batch_dims, in_s_channels)
+    check_pin_equivariance(
+        quantized, 1, fn_kwargs=dict(scalars=scalars), batch_dims=data_dims, **TOLERANCES
+    )
+
+    # restore defaults
+    gatr_config.use_fully_connected_subgroup = True
@@ -162,3 +162,37 @@ def test_conditional_gatr_equivariance(
         fn_kwargs=dict(scalars=scalars, scalars_condition=scalars_condition),
         **MILD_TOLERANCES,
     )
+
+
+def test_conditional_lgatr_compile():
+    """Tests that ConditionalLGATr compiles without graph breaks and matches the eager network."""
+    kwargs = dict(
+        num_blocks=2,
+        in_mv_channels=3,
+        condition_mv_channels=4,
+        out_mv_channels=2,
+        hidden_mv_channels=4,
+        in_s_channels=5,
+        condition_s_channels=2,
+        out_s_channels=3,
+        hidden_s_channels=6,
+        attention=SelfAttentionConfig(num_heads=2),
+        crossattention=CrossAttentionConfig(num_heads=2),
+        mlp=MLPConfig(),
+    )
+    torch.manual_seed(0)
+    net = ConditionalLGATr(**kwargs).eval()
+    torch.manual_seed(0)
+    net_compiled = ConditionalLGATr(**kwargs, compile=True).eval()
+
+    inputs = (torch.randn(2, 7, 3, 16), torch.randn(2, 4, 4, 16))
+    scalars = dict(scalars=torch.randn(2, 7, 5), scalars_condition=torch.randn(2, 4, 2))
+
+    torch._dynamo.reset()
+    explanation = torch._dynamo.explain(net)(*inputs, **scalars)
+    assert explanation.graph_break_count == 0
+
+    outputs = net(*inputs, **scalars)
+    outputs_compiled = net_compiled(*inputs, **scalars)
+    for out, out_compiled in zip(outputs, outputs_compiled, strict=True):
+        torch.testing.assert_close(out_compiled, out, **MILD_TOLERANCES)
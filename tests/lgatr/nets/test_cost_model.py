@@ -0,0 +1,148 @@
+import pytest
+import torch
+from torch.nn.attention import SDPBackend, sdpa_kernel
+from torch.utils.flop_counter import FlopCounterMode
+
+from lgatr.nets import LGATr, LGATrSlim, cost_model
+from lgatr.utils.timing import peak_memory
+from tests.helpers import NETWORKS, build_network, network_inputs
+
+
+def _saved_bytes(net, args, kwargs):
+    """Bytes of the distinct tensors that autograd saves for the backward pass."""
+    storages = {}
+
+    def pack(tensor):
+        storage = tensor.untyped_storage()
+        storages[storage.data_ptr()] = storage.nbytes()
+        return tensor
+
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda tensor: tensor):
+        net(*args, **kwargs)
+    parameters = {p.untyped_storage().data_ptr() for p in net.parameters()}
+    return sum(nbytes for ptr, nbytes in storages.items() if ptr not in parameters)
+
+
+@pytest.mark.parametrize("net_class", NETWORKS)
+@pytest.mark.parametrize("items,channels,batch", [(16, 16, 2), (64, 8, 1)])
+def test_cost_model_matches_measurements(net_class, items, channels, batch):
+    """Tests the FLOPs and the saved activations against the counted FLOPs and saved tensors."""
+    net = build_network(net_class, channels=channels)
+    args, kwargs = network_inputs(net_class, batch, items, items_condition=items)
+    costs = cost_model(net, items=items, batch=batch, backend="math")
+
+    # FlopCounterMode only counts matrix multiplications, and not the fused CPU kernels
+    with sdpa_kernel(SDPBackend.MATH):
+        with FlopCounterMode(display=False) as counter:
+            net(*args, **kwargs)
+        flops_forward = counter.get_total_flops()
+        with FlopCounterMode(display=False) as counter:
+            outputs = net(*args, **kwargs)
+            sum(output.sum() for output in outputs if output is not None).backward()
+        flops_backward = counter.get_total_flops() - flops_forward
+        saved = _saved_bytes(net, args, kwargs)
+
+    elementwise = sum(costs["layers"][kind]["flops_forward"] for kind in ("norm", "nonlinearity"))
+    assert costs["flops_forward"] - elementwise == pytest.approx(flops_forward, rel=0.1)
+    assert costs["flops_backward"] == pytest.approx(flops_backward, rel=0.25)
+    assert costs["activation_memory"] == pytest.approx(saved, rel=0.15)
+    assert costs["peak_memory"] > costs["activation_memory"]
+    assert 0 < costs["peak_memory_inference"] < costs["peak_memory"]
+    assert sum(layer["flops_forward"] for layer in costs["layers"].values()) == pytest.approx(
+        costs["flops_forward"]
+    )
+
+
+@pytest.mark.parametrize("net_class", NETWORKS)
+def test_cost_model_peak_memory(net_class):
+    """Tests the peak memory estimates against the peak memory of a forward pass and a training
+    step on CPU."""
+    items, batch = 64, 4
+    net = build_network(net_class, channels=16)
+    args, kwargs = network_inputs(net_class, batch, items, items_condition=items)
+    costs = cost_model(net, items=items, batch=batch, backend="math")
+
+    def inference():
+        with torch.no_grad():
+            net(*args, **kwargs)
+
+    def training():
+        outputs = net(*args, **kwargs)
+        sum(output.sum() for output in outputs if output is not None).backward()
+
+    with sdpa_kernel(SDPBackend.MATH):
+        # the gradients of the parameters are allocated in the first training step
+        training()
+        measured_inference = peak_memory(inference)
+        measured_training = peak_memory(training)
+
+    # the estimates neglect temporary buffers inside operations and the allocator, which puts
+    # the measurements within 0.8 to 1.5 times the estimates for these sizes
+    assert measured_inference == pytest.approx(costs["peak_memory_inference"], rel=0.5)
+    assert measured_training == pytest.approx(costs["peak_memory"], rel=0.5)
+
+
+@pytest.mark.parametrize("net_class", NETWORKS)
+@pytest.mark.parametrize("checkpoint_blocks", [True, "attention", "mlp", "selective"])
+def test_cost_model_checkpointing(net_class, checkpoint_blocks):
+    """Tests that checkpointing trades activation memory for recomputation."""
+    net = build_network(net_class, channels=16)
+    costs = cost_model(net, items=64, batch=4)
+    checkpointed = cost_model(net, items=64, batch=4, checkpoint_blocks=checkpoint_blocks)
+    assert checkpointed["flops_forward"] == costs["flops_forward"]
+    assert checkpointed["flops_backward"] > costs["flops_backward"]
+    assert checkpointed["activation_memory"] < costs["activation_memory"]
+    assert checkpointed["peak_memory_inference"] == costs["peak_memory_inference"]
+
+    # the policy of the network is used by default
+    net = build_network(net_class, channels=16, checkpoint_blocks=checkpoint_blocks)
+    assert cost_model(net, items=64, batch=4) == checkpointed
+
+
+def test_cost_model_scaling():
+    """Tests the scaling with the batch size, the number of items and the dtype."""
+    net = build_network(LGATr, channels=16)
+    costs = cost_model(net, items=32, batch=1)
+
+    # the EquiLinear weights are computed and saved once per call, independent of the batch size
+    costs_2, costs_3 = (cost_model(net, items=32, batch=batch) for batch in (2, 3))
+    for key in ("flops_forward", "flops_backward", "activation_memory"):
+        assert costs_2[key] > costs[key]
+        assert costs_3[key] - costs_2[key] == costs_2[key] - costs[key]
+    half = cost_model(net, items=32, batch=1, dtype=torch.bfloat16)
+    assert half["flops_forward"] == costs["flops_forward"]
+    assert 2 * half["activation_memory"] == costs["activation_memory"]
+
+    # materialized attention weights grow quadratically with the number of items
+    weights = []
+    for items in (128, 256):
+        fused = cost_model(net, items=items, batch=1)["layers"]["attention"]
+        math = cost_model(net, items=items, batch=1, backend="math")["layers"]["attention"]
+        assert fused["flops_forward"] == math["flops_forward"]
+        weights.append(math["activation_memory"] - fused["activation_memory"])
+    assert weights[1] == pytest.approx(4 * weights[0], rel=0.05)
+
+
+def test_cost_model_config():
+    """Tests the cost model of a network configuration."""
+    config = dict(
+        num_blocks=2,
+        in_v_channels=1,
+        out_v_channels=1,
+        hidden_v_channels=16,
+        in_s_channels=2,
+        out_s_channels=1,
+        hidden_s_channels=16,
+        num_heads=4,
+    )
+    net = LGATrSlim(**config)
+    costs = cost_model(dict(net="LGATrSlim", **config), items=32, batch=2)
+    assert costs == cost_model(net, items=32, batch=2)
+    assert costs["layers"]["attention"]["calls"] == 2
+
+    with pytest.raises(ValueError):
+        cost_model(dict(net="Transformer"), items=32)
+    with pytest.raises(ValueError):
+        cost_model(net, items=32, backend="unknown")
+    with pytest.raises(ValueError):
+        cost_model(torch.nn.Linear(2, 2), items=32)
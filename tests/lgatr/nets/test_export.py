@@ -0,0 +1,57 @@
+import pytest
+import torch
+
+from lgatr.nets import (
+    ConditionalLGATr,
+    ConditionalLGATrSlim,
+    LGATr,
+    LGATrSlim,
+    aot_compile,
+    export_model,
+    load_aot_package,
+    optimize_for_inference,
+)
+from tests.helpers import MILD_TOLERANCES, build_network, network_inputs
+
+
+@pytest.mark.parametrize(
+    "net_class,freeze",
+    [
+        (LGATr, False),
+        (LGATr, True),
+        (ConditionalLGATr, False),
+        (ConditionalLGATr, True),
+        (LGATrSlim, False),
+        (ConditionalLGATrSlim, False),
+    ],
+)
+def test_export_roundtrip(net_class, freeze):
+    """Tests that exported networks reproduce the eager outputs for new batch and item sizes."""
+    net = build_network(net_class).eval()
+    if freeze:
+        net = optimize_for_inference(net)
+
+    args, kwargs = network_inputs(net_class, batch=2, items=5, items_condition=4)
+    exported = export_model(net, args, kwargs).module()
+
+    args, kwargs = network_inputs(net_class, batch=3, items=9, items_condition=6)
+    with torch.no_grad():
+        outputs = net(*args, **kwargs)
+        outputs_exported = exported(*args, **kwargs)
+    for out, out_exported in zip(outputs, outputs_exported, strict=True):
+        torch.testing.assert_close(out_exported, out, **MILD_TOLERANCES)
+
+
+def test_aot_compile_roundtrip(tmp_path):
+    """Tests that the AOTInductor package reproduces the eager outputs."""
+    net = build_network(LGATrSlim).eval()
+    args, _ = network_inputs(LGATrSlim, batch=2, items=5, items_condition=4)
+    path = aot_compile(net, str(tmp_path / "lgatr_slim.pt2"), args)
+    compiled = load_aot_package(path)
+
+    args, _ = network_inputs(LGATrSlim, batch=3, items=9, items_condition=4)
+    with torch.no_grad():
+        outputs = net(*args)
+    outputs_compiled = compiled(*args)
+    for out, out_compiled in zip(outputs, outputs_compiled, strict=True):
+        torch.testing.assert_close(out_compiled, out, **MILD_TOLERANCES)
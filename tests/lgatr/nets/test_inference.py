@@ -0,0 +1,83 @@
+import pytest
+import torch
+
+from lgatr.layers.linear import EquiLinear
+from lgatr.nets import ConditionalLGATr, LGATr, optimize_for_inference
+from lgatr.primitives.config import gatr_config
+from tests.helpers import TOLERANCES
+
+
+@pytest.mark.parametrize("multi_query", [False, True])
+@pytest.mark.parametrize("head_scale", [False, True])
+@pytest.mark.parametrize("reinsert", [False, True])
+@pytest.mark.parametrize("use_fully_connected_subgroup", [True, False])
+def test_freeze_lgatr(multi_query, head_scale, reinsert, use_fully_connected_subgroup):
+    """Tests that the frozen LGATr reproduces the eval-mode network."""
+    gatr_config.use_fully_connected_subgroup = use_fully_connected_subgroup
+    net = LGATr(
+        num_blocks=2,
+        in_mv_channels=3,
+        out_mv_channels=2,
+        hidden_mv_channels=4,
+        in_s_channels=5,
+        out_s_channels=3,
+        hidden_s_channels=6,
+        attention=dict(num_heads=2, multi_query=multi_query, head_scale=head_scale),
+        mlp=dict(),
+        reinsert_mv_channels=(0,) if reinsert else None,
+        reinsert_s_channels=(1, 2) if reinsert else None,
+        dropout_prob=0.2,
+    )
+    if head_scale:
+        for block in net.blocks:
+            block.attention.head_scale.data.uniform_(0.5, 1.5)
+    multivectors = torch.randn(2, 7, 3, 16)
+    scalars = torch.randn(2, 7, 5)
+
+    frozen = net.freeze()
+    assert net.training
+    assert not frozen.training
+    assert len(list(frozen.parameters())) == 0
+    assert not any(isinstance(module, EquiLinear) for module in frozen.modules())
+
+    net.eval()
+    with torch.no_grad():
+        expected_mv, expected_s = net(multivectors, scalars=scalars)
+        outputs_mv, outputs_s = frozen(multivectors, scalars=scalars)
+    torch.testing.assert_close(outputs_mv, expected_mv, **TOLERANCES)
+    torch.testing.assert_close(outputs_s, expected_s, **TOLERANCES)
+
+    gatr_config.use_fully_connected_subgroup = True
+
+
+@pytest.mark.parametrize("multi_query", [False, True])
+@pytest.mark.parametrize("head_scale", [False, True])
+def test_freeze_conditional_lgatr(multi_query, head_scale):
+    """Tests that the frozen ConditionalLGATr reproduces the eval-mode network."""
+    net = ConditionalLGATr(
+        num_blocks=2,
+        in_mv_channels=3,
+        condition_mv_channels=4,
+        out_mv_channels=2,
+        hidden_mv_channels=4,
+        in_s_channels=5,
+        condition_s_channels=2,
+        out_s_channels=3,
+        hidden_s_channels=6,
+        attention=dict(num_heads=2, multi_query=multi_query, head_scale=head_scale),
+        crossattention=dict(num_heads=2, multi_query=multi_query, head_scale=head_scale),
+        mlp=dict(),
+        dropout_prob=0.2,
+    ).eval()
+    for name, param in net.named_parameters():
+        if name.endswith("head_scale"):
+            param.data.uniform_(0.5, 1.5)
+    inputs = (torch.randn(2, 7, 3, 16), torch.randn(2, 4, 4, 16))
+    kwargs = dict(scalars=torch.randn(2, 7, 5), scalars_condition=torch.randn(2, 4, 2))
+
+    frozen = optimize_for_inference(net)
+    with torch.no_grad():
+        expected = net(*inputs, **kwargs)
+        outputs = frozen(*inputs, **kwargs)
+    for out, exp in zip(outputs, expected, strict=True):
+        torch.testing.assert_close(out, exp, **TOLERANCES)
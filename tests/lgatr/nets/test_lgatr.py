@@ -3,9 +3,15 @@ import torch
 
 from lgatr.layers.attention.config import SelfAttentionConfig
 from lgatr.layers.mlp.config import MLPConfig
-from lgatr.nets import LGATr
+from lgatr.nets import ConditionalLGATr, LGATr, LGATrSlim
 from lgatr.primitives.config import gatr_config
-from tests.helpers import BATCH_DIMS, MILD_TOLERANCES, check_pin_equivariance
+from tests.helpers import (
+    BATCH_DIMS,
+    MILD_TOLERANCES,
+    build_network,
+    check_pin_equivariance,
+    network_inputs,
+)
 
 S_CHANNELS = [(None, None, 7), (4, 5, 6)]
 
@@ -118,3 +124,135 @@ def test_lgatr_equivariance(
     check_pin_equivariance(
         net, 1, batch_dims=data_dims, fn_kwargs=dict(scalars=scalars), **MILD_TOLERANCES
     )
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize(
+    "num_items,in_mv_channels,out_mv_channels,hidden_mv_channels", [(8, 3, 4, 6)]
+)
+@pytest.mark.parametrize("num_heads,num_blocks", [(4, 2)])
+@pytest.mark.parametrize("in_s_channels,out_s_channels,hidden_s_channels", S_CHANNELS)
+@pytest.mark.parametrize("checkpoint_blocks", [False, True])
+def test_lgatr_pairwise_bias_equivariance(
+    batch_dims,
+    num_items,
+    in_mv_channels,
+    out_mv_channels,
+    hidden_mv_channels,
+    num_blocks,
+    num_heads,
+    in_s_channels,
+    out_s_channels,
+    hidden_s_channels,
+    checkpoint_blocks,
+):
+    """Tests LGATr with pairwise attention bias for equivariance.
+
+    The bias only depends on Lorentz invariants, so the pair vectors can stay fixed.
+    """
+    scalars = None if in_s_channels is None else torch.randn(*batch_dims, num_items, in_s_channels)
+    pair_vectors = torch.randn(*batch_dims, num_items, 4)
+    net = LGATr(
+        in_mv_channels=in_mv_channels,
+        out_mv_channels=out_mv_channels,
+        hidden_mv_channels=hidden_mv_channels,
+        in_s_channels=in_s_channels,
+        out_s_channels=out_s_channels,
+        hidden_s_channels=hidden_s_channels,
+        attention=dict(num_heads=num_heads, pairwise_bias=True),
+        num_blocks=num_blocks,
+        mlp=dict(),
+        checkpoint_blocks=checkpoint_blocks,
+    )
+    with torch.no_grad():
+        for block in net.blocks:
+            block.attention.pair_bias_scale.normal_()
+
+    inputs = torch.randn(*batch_dims, num_items, in_mv_channels, 16)
+    outputs, _ = net(inputs, scalars=scalars, pair_vectors=pair_vectors)
+    outputs_nobias, _ = net(inputs, scalars=scalars)
+    assert outputs.shape == (*batch_dims, num_items, out_mv_channels, 16)
+    assert not torch.allclose(outputs, outputs_nobias)
+
+    data_dims = tuple(list(batch_dims) + [num_items, in_mv_channels])
+    check_pin_equivariance(
+        net,
+        1,
+        batch_dims=data_dims,
+        fn_kwargs=dict(scalars=scalars, pair_vectors=pair_vectors),
+        spin=True,
+        **MILD_TOLERANCES,
+    )
+
+
+@pytest.mark.parametrize(
+    "num_items,in_mv_channels,out_mv_channels,hidden_mv_channels", [(8, 3, 4, 6)]
+)
+@pytest.mark.parametrize("in_s_channels,out_s_channels,hidden_s_channels", [(4, 5, 6)])
+@pytest.mark.parametrize("multi_query_attention", [False, True])
+def test_lgatr_compile(
+    num_items,
+    in_mv_channels,
+    out_mv_channels,
+    hidden_mv_channels,
+    in_s_channels,
+    out_s_channels,
+    hidden_s_channels,
+    multi_query_attention,
+):
+    """Tests that LGATr compiles without graph breaks and matches the eager network."""
+    kwargs = dict(
+        in_mv_channels=in_mv_channels,
+        out_mv_channels=out_mv_channels,
+        hidden_mv_channels=hidden_mv_channels,
+        in_s_channels=in_s_channels,
+        out_s_channels=out_s_channels,
+        hidden_s_channels=hidden_s_channels,
+        attention=dict(num_heads=2, multi_query=multi_query_attention),
+        mlp=dict(),
+        num_blocks=2,
+        reinsert_mv_channels=(0,),
+        reinsert_s_channels=(1,),
+    )
+    torch.manual_seed(0)
+    net = LGATr(**kwargs).eval()
+    torch.manual_seed(0)
+    net_compiled = LGATr(**kwargs, compile=True).eval()
+
+    inputs = torch.randn(2, num_items, in_mv_channels, 16)
+    scalars = torch.randn(2, num_items, in_s_channels)
+
+    torch._dynamo.reset()
+    explanation = torch._dynamo.explain(net)(inputs, scalars=scalars)
+    assert explanation.graph_break_count == 0
+
+    outputs = net(inputs, scalars=scalars)
+    outputs_compiled = net_compiled(inputs, scalars=scalars)
+    for out, out_compiled in zip(outputs, outputs_compiled, strict=True):
+        torch.testing.assert_close(out_compiled, out, **MILD_TOLERANCES)
+
+
+def _linear_attention_kwargs(net_class, flags):
+    if net_class is LGATrSlim:
+        return dict(linear_attention=flags)
+    kwargs = dict(attention=dict(num_heads=2, linear_attention=flags))
+    if net_class is ConditionalLGATr:
+        kwargs.update(crossattention=dict(num_heads=2, linear_attention=flags))
+    return kwargs
+
+
+@pytest.mark.parametrize("net_class", [LGATr, ConditionalLGATr, LGATrSlim])
+def test_linear_attention_per_block(net_class):
+    """Tests the selection of linear attention per block."""
+    flags = [True, False, True]
+    net = build_network(net_class, num_blocks=3, **_linear_attention_kwargs(net_class, flags))
+    for block, flag in zip(net.blocks, flags, strict=True):
+        layers = [m for m in block.modules() if hasattr(m, "linear_attention")]
+        assert layers and all(m.linear_attention is flag for m in layers)
+
+    args, kwargs = network_inputs(net_class)
+    outputs = net(*args, **kwargs)
+    assert all(torch.isfinite(out).all() for out in outputs if out is not None)
+
+    with pytest.raises(ValueError, match="Expected 3 linear_attention flags"):
+        build_network(net_class, num_blocks=3, **_linear_attention_kwargs(net_class, [True]))
@@ -153,18 +153,21 @@ def test_Linear_initialization(
 @pytest.mark.parametrize("batch_dims", BATCH_DIMS)
 @pytest.mark.parametrize("v_channels,s_channels", [(24, 14)])
 @pytest.mark.parametrize("num_heads,attn_ratio", [(2, 1), (1, 2)])
+@pytest.mark.parametrize("linear_attention", [False, True])
 def test_SelfAttention_equivariance(
     batch_dims,
     v_channels,
     s_channels,
     num_heads,
     attn_ratio,
+    linear_attention,
 ):
     layer = SelfAttention(
         v_channels=v_channels,
         s_channels=s_channels,
         num_heads=num_heads,
         attn_ratio=attn_ratio,
+        linear_attention=linear_attention,
     )
     s = torch.randn(*batch_dims, s_channels)
 
@@ -309,3 +312,62 @@ def test_LGATrSlim_equivariance_compiled(
     # equivariance
     batch_dims = batch_dims + [in_v_channels]
     check_equivariance(layer, batch_dims=batch_dims, fn_kwargs=dict(scalars=s), **TOLERANCES)
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize(
+    "in_v_channels,in_s_channels,out_v_channels,out_s_channels", [(4, 3, 9, 2)]
+)
+@pytest.mark.parametrize(
+    "hidden_v_channels,hidden_s_channels,num_heads,num_blocks", [(16, 8, 4, 2)]
+)
+@pytest.mark.parametrize("checkpoint_blocks", [False, True])
+def test_LGATrSlim_pairwise_bias_equivariance(
+    batch_dims,
+    in_v_channels,
+    in_s_channels,
+    out_v_channels,
+    out_s_channels,
+    hidden_v_channels,
+    hidden_s_channels,
+    num_heads,
+    num_blocks,
+    checkpoint_blocks,
+):
+    layer = LGATrSlim(
+        in_v_channels=in_v_channels,
+        out_v_channels=out_v_channels,
+        hidden_v_channels=hidden_v_channels,
+        in_s_channels=in_s_channels,
+        out_s_channels=out_s_channels,
+        hidden_s_channels=hidden_s_channels,
+        num_blocks=num_blocks,
+        num_heads=num_heads,
+        pairwise_bias=True,
+        checkpoint_blocks=checkpoint_blocks,
+    )
+    layer.eval()
+    with torch.no_grad():
+        for block in layer.blocks:
+            block.attention.pair_bias_scale.normal_()
+
+    def fn(vectors, pair_vectors, scalars):
+        return layer(vectors, scalars, pair_vectors=pair_vectors)
+
+    s = torch.randn(*batch_dims, in_s_channels)
+    v = torch.randn(*batch_dims, in_v_channels, 4)
+    p = torch.randn(*batch_dims, 4)
+    out_v, out_s = fn(v, p, s)
+    out_v_nobias, _ = layer(v, s)
+    assert out_v.shape == v.shape[:-2] + (out_v_channels, 4)
+    assert out_s.shape == s.shape[:-1] + (out_s_channels,)
+    assert not torch.allclose(out_v, out_v_nobias)
+
+    # equivariance, with the pair vectors transformed alongside the inputs
+    check_equivariance(
+        fn,
+        batch_dims=[batch_dims + [in_v_channels], batch_dims],
+        num_args=2,
+        fn_kwargs=dict(scalars=s),
+        **TOLERANCES,
+    )
@@ -0,0 +1,44 @@
+import pytest
+from torch import nn
+
+from lgatr.layers.linear import EquiLinear, FrozenEquiLinear
+from lgatr.nets import (
+    ConditionalLGATr,
+    ConditionalLGATrSlim,
+    LGATr,
+    LGATrSlim,
+    optimize_for_inference,
+    quantization_report,
+    quantize_for_inference,
+)
+from lgatr.nets.lgatr_slim import Linear
+from tests.helpers import build_network, network_inputs
+
+
+@pytest.mark.parametrize(
+    "net_class,freeze",
+    [
+        (LGATr, False),
+        (LGATr, True),
+        (ConditionalLGATr, False),
+        (LGATrSlim, False),
+        (ConditionalLGATrSlim, False),
+    ],
+)
+@pytest.mark.parametrize("dynamic_activations", [True, False])
+def test_quantize_for_inference(net_class, freeze, dynamic_activations):
+    """Tests that the quantized networks approximate the eval-mode networks."""
+    net = build_network(net_class)
+    if freeze:
+        net = optimize_for_inference(net)
+    quantized = quantize_for_inference(net, dynamic_activations=dynamic_activations)
+    assert net.training or freeze
+    assert not quantized.training
+    assert len(list(quantized.parameters())) == 0
+    float_layers = (EquiLinear, FrozenEquiLinear, Linear, nn.Linear)
+    assert not any(isinstance(module, float_layers) for module in quantized.modules())
+
+    args, kwargs = network_inputs(net_class, batch=2, items=7, items_condition=4)
+    report = quantization_report(net, quantized, args, kwargs, num_repeats=1)
+    assert report["rel_error"] < 0.05
+    assert report["speedup"] > 0
@@ -0,0 +1,75 @@
+import pytest
+import torch
+
+from lgatr.layers.attention.attention import GeometricAttention
+from lgatr.nets import (
+    ConditionalLGATr,
+    ConditionalLGATrSlim,
+    LGATr,
+    LGATrSlim,
+    optimize_for_small_sets,
+    small_set_report,
+)
+from lgatr.nets.lgatr_slim import SelfAttention
+from tests.helpers import MILD_TOLERANCES, build_network, network_inputs
+
+
+@pytest.mark.parametrize("net_class", [LGATr, ConditionalLGATr, LGATrSlim, ConditionalLGATrSlim])
+def test_small_set_mode(net_class):
+    """Tests that the small-set mode reproduces the eval-mode networks."""
+    net = build_network(net_class)
+    small_set = optimize_for_small_sets(net, compile=False)
+    assert net.training
+    assert not small_set.training
+    attention_layers = [
+        module
+        for module in small_set.modules()
+        if isinstance(module, GeometricAttention | SelfAttention)
+    ]
+    assert attention_layers and all(module.small_set for module in attention_layers)
+
+    args, kwargs = network_inputs(net_class, batch=3, items=5, items_condition=4)
+    report = small_set_report(net, small_set, args, kwargs, num_repeats=1)
+    assert report["rel_error"] < 1e-5
+    assert report["latency"] > 0 and report["latency_small_set"] > 0
+
+
+def test_small_set_mode_pairwise_bias():
+    """Tests the small-set mode with the pairwise attention bias."""
+    net = LGATrSlim(
+        in_v_channels=2,
+        out_v_channels=1,
+        hidden_v_channels=8,
+        in_s_channels=3,
+        out_s_channels=2,
+        hidden_s_channels=8,
+        num_blocks=2,
+        num_heads=2,
+        pairwise_bias=True,
+    ).eval()
+    for module in net.modules():
+        if isinstance(module, SelfAttention):
+            torch.nn.init.normal_(module.pair_bias_scale)
+    small_set = optimize_for_small_sets(net, compile=False)
+
+    args, _ = network_inputs(LGATrSlim, batch=3, items=5, items_condition=4)
+    kwargs = dict(pair_vectors=torch.randn(3, 5, 4))
+    with torch.no_grad():
+        outputs = net(*args, **kwargs)
+        outputs_small_set = small_set(*args, **kwargs)
+    for out, out_small_set in zip(outputs, outputs_small_set, strict=True):
+        torch.testing.assert_close(out_small_set, out, **MILD_TOLERANCES)
+
+
+@pytest.mark.parametrize("net_class", [LGATr, LGATrSlim])
+def test_small_set_mode_compile(net_class):
+    """Tests that the compiled small-set mode reproduces the eager network for several shapes."""
+    net = build_network(net_class).eval()
+    small_set = optimize_for_small_sets(net)
+    for items in [4, 6]:
+        args, kwargs = network_inputs(net_class, batch=2, items=items, items_condition=4)
+        with torch.no_grad():
+            outputs = net(*args, **kwargs)
+            outputs_small_set = small_set(*args, **kwargs)
+        for out, out_small_set in zip(outputs, outputs_small_set, strict=True):
+            torch.testing.assert_close(out_small_set, out, **MILD_TOLERANCES)
@@ -1,8 +1,18 @@
 import pytest
 import torch
 
-from lgatr.primitives import sdp_attention
-from tests.helpers import BATCH_DIMS, TOLERANCES, check_pin_equivariance
+from lgatr.primitives import linear_sdp_attention, sdp_attention
+from lgatr.primitives.attention import (
+    attention_statistics,
+    linear_scaled_dot_product_attention,
+    pairwise_biased_attention,
+    register_attention_hook,
+    scaled_dot_product_attention,
+    small_set_attention,
+    small_set_sdp_attention,
+)
+from lgatr.primitives.pairwise import pairwise_bias_features
+from tests.helpers import BATCH_DIMS, MILD_TOLERANCES, TOLERANCES, check_pin_equivariance
 
 
 @pytest.mark.parametrize("batch_dims", BATCH_DIMS)
@@ -52,3 +62,144 @@ def test_scalar_attention_equivariance(batch_dims, key_dim, item_dim, num_scalar
     check_pin_equivariance(
         sdp_attention, 3, batch_dims=[data_dims] * 3, fn_kwargs=kwargs, **TOLERANCES
     )
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("num_tokens_in,num_tokens_out", [(7, 5), (1, 3)])
+@pytest.mark.parametrize("chunk_size", [1024, 2])
+def test_linear_attention_matches_quadratic(batch_dims, num_tokens_in, num_tokens_out, chunk_size):
+    """Tests linear_scaled_dot_product_attention() against explicit Taylor-kernel weights."""
+    channels = 6
+    query = torch.randn(*batch_dims, num_tokens_out, channels, dtype=torch.float64)
+    key = torch.randn(*batch_dims, num_tokens_in, channels, dtype=torch.float64)
+    value = torch.randn(*batch_dims, num_tokens_in, 3, dtype=torch.float64)
+
+    logits = query @ key.transpose(-1, -2) / channels
+    weights = 1 + logits + logits**2 / 2
+    weights = weights / weights.sum(dim=-1, keepdim=True)
+    expected = weights @ value
+
+    out = linear_scaled_dot_product_attention(query, key, value, chunk_size=chunk_size)
+    torch.testing.assert_close(out, expected)
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("num_scalars", [5])
+@pytest.mark.parametrize("key_dim", [2])
+@pytest.mark.parametrize("item_dim", [3])
+@pytest.mark.parametrize("contraction_dtype", [None, torch.float64])
+def test_linear_attention_equivariance(
+    batch_dims, key_dim, item_dim, num_scalars, contraction_dtype
+):
+    """Tests linear_sdp_attention() for Pin equivariance."""
+    data_dims = tuple(list(batch_dims) + [item_dim, key_dim])
+    queries_scalar = torch.randn(*batch_dims, item_dim, num_scalars)
+    keys_scalar = torch.randn(*batch_dims, item_dim, num_scalars)
+    values_scalar = torch.randn(*batch_dims, item_dim, num_scalars)
+    kwargs = dict(
+        q_s=queries_scalar, k_s=keys_scalar, v_s=values_scalar, contraction_dtype=contraction_dtype
+    )
+    # the float32 contraction loses digits for boosted inputs, see linear_sdp_attention
+    tolerances = TOLERANCES if contraction_dtype == torch.float64 else MILD_TOLERANCES
+    check_pin_equivariance(
+        linear_sdp_attention, 3, batch_dims=[data_dims] * 3, fn_kwargs=kwargs, **tolerances
+    )
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("num_heads,num_items,channels", [(3, 6, 5)])
+@pytest.mark.parametrize("mask", [None, "bool", "float"])
+@pytest.mark.parametrize("pairwise", [False, True])
+def test_small_set_attention(batch_dims, num_heads, num_items, channels, mask, pairwise):
+    """Tests small_set_attention() against the attention backends."""
+    query, key, value = (torch.randn(*batch_dims, num_heads, num_items, channels) for _ in range(3))
+    attn_kwargs = {}
+    if mask == "bool":
+        attn_kwargs["attn_mask"] = torch.rand(*batch_dims, 1, num_items, num_items) > 0.5
+        attn_kwargs["attn_mask"][..., 0] = True
+    elif mask == "float":
+        attn_kwargs["attn_mask"] = torch.randn(*batch_dims, 1, num_items, num_items)
+
+    if pairwise:
+        features = pairwise_bias_features(torch.randn(*batch_dims, num_items, 4))
+        scale = torch.randn(num_heads)
+        expected = pairwise_biased_attention(query, key, value, features, scale, **attn_kwargs)
+        attn_kwargs.update(pair_features=features, pair_scale=scale)
+    else:
+        expected = scaled_dot_product_attention(query, key, value, **attn_kwargs)
+
+    out = small_set_attention(query, key, value, **attn_kwargs)
+    torch.testing.assert_close(out, expected, **TOLERANCES)
+
+    with pytest.raises(NotImplementedError):
+        small_set_attention(query, key, value, is_causal=True)
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("num_scalars", [5])
+@pytest.mark.parametrize("key_dim", [2])
+@pytest.mark.parametrize("item_dim", [3])
+def test_small_set_attention_equivariance(batch_dims, key_dim, item_dim, num_scalars):
+    """Tests small_set_sdp_attention() for Pin equivariance."""
+    data_dims = tuple(list(batch_dims) + [item_dim, key_dim])
+    queries_scalar = torch.randn(*batch_dims, item_dim, num_scalars)
+    keys_scalar = torch.randn(*batch_dims, item_dim, num_scalars)
+    values_scalar = torch.randn(*batch_dims, item_dim, num_scalars)
+    kwargs = dict(q_s=queries_scalar, k_s=keys_scalar, v_s=values_scalar)
+    check_pin_equivariance(
+        small_set_sdp_attention, 3, batch_dims=[data_dims] * 3, fn_kwargs=kwargs, **TOLERANCES
+    )
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("num_heads,num_items,channels", [(3, 7, 5)])
+@pytest.mark.parametrize("use_mask", [False, True])
+def test_attention_statistics(batch_dims, num_heads, num_items, channels, use_mask):
+    """Tests the chunked attention statistics against explicit attention weights."""
+    query, key, value = (
+        torch.randn(*batch_dims, num_heads, num_items, channels, dtype=torch.float64)
+        for _ in range(3)
+    )
+    logits = query @ key.transpose(-1, -2) / channels**0.5
+    attn_kwargs = {}
+    if use_mask:
+        mask = torch.rand(num_items, num_items) > 0.5
+        mask[:, 0] = True
+        logits = logits.masked_fill(~mask, float("-inf"))
+        attn_kwargs["attn_mask"] = mask
+    weights = logits.softmax(dim=-1)
+    entropy = -torch.where(weights > 0, weights * weights.log(), 0.0).sum(dim=-1)
+    output = weights @ value
+
+    received = []
+    handle = register_attention_hook(received.append)
+    try:
+        scaled_dot_product_attention(query, key, value, **attn_kwargs)
+    finally:
+        handle.remove()
+    handle = register_attention_hook(received.append, entropy=True)
+    try:
+        scaled_dot_product_attention(query, key, value, **attn_kwargs)
+    finally:
+        handle.remove()
+    scaled_dot_product_attention(query, key, value, **attn_kwargs)
+    assert len(received) == 2
+    assert "entropy" not in received[0]
+    stats = received[1]
+
+    stats_chunked = attention_statistics(
+        query, key, value, output, entropy=True, chunk_size=2, **attn_kwargs
+    )
+    for key_ in stats:
+        assert stats[key_].shape == (num_heads,)
+        torch.testing.assert_close(stats[key_], stats_chunked[key_])
+
+    def per_head(x):
+        return x.movedim(-2, 0).flatten(start_dim=1)
+
+    expected_entropy = per_head(entropy).mean(dim=1).float()
+    expected_logit_max = per_head(logits.amax(dim=-1)).amax(dim=1).float()
+    expected_absmax = per_head(output.abs().amax(dim=-1)).amax(dim=1).float()
+    torch.testing.assert_close(stats["entropy"], expected_entropy)
+    torch.testing.assert_close(stats["logit_max"], expected_logit_max)
+    torch.testing.assert_close(stats["output_absmax"], expected_absmax)
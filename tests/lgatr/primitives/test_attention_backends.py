@@ -1,12 +1,20 @@
 import importlib.util
+import json
+import subprocess
+import sys
 
 import pytest
 import torch
 from torch.nn.functional import scaled_dot_product_attention as torch_sdpa
 
-from lgatr.primitives.attention_backends import get_attention_backend
+import lgatr.primitives.attention_backends as attention_backends
+from lgatr.primitives.attention import scaled_dot_product_attention
+from lgatr.primitives.attention_backends import available_backends, get_attention_backend
 from tests.helpers.constants import STRICT_TOLERANCES as TOLERANCES
 
+# upper bound on the time of "import lgatr" after "import torch", in seconds
+IMPORT_TIME_BUDGET = 1.0
+
 SHAPES = [
     (32, 8, 5, 32),
     (9, 3, 7, 13),
@@ -137,3 +145,62 @@ def test_varlen_backend_selection(shape):
     qkv = _random_qkv(shape, device=device)
     out = backend_fn(*qkv, **kwargs)
     assert out.shape == shape
+
+
+def test_import_time():
+    """Tests that importing lgatr neither loads attention backends or the benchmark harness nor
+    queries CUDA."""
+    script = """
+import json, sys, time
+import torch
+
+def fail():
+    raise AssertionError("CUDA queried at import")
+
+torch.cuda.is_available = fail
+start = time.perf_counter()
+import lgatr
+elapsed = time.perf_counter() - start
+modules = [name for name in sys.modules if name.startswith(("lgatr.primitives.attention_backends.",
+    "xformers", "flash_attn", "torch.nn.attention.flex_attention", "torch._dynamo",
+    "lgatr.bench"))]
+print(json.dumps(dict(elapsed=elapsed, modules=modules)))
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    result = json.loads(result.stdout.splitlines()[-1])
+    assert result["modules"] == []
+    assert result["elapsed"] < IMPORT_TIME_BUDGET
+
+
+def test_lazy_backend_loading(monkeypatch):
+    """Tests that backends are loaded on first selection and that failures are cached."""
+
+    class BrokenEntryPoint:
+        num_loads = 0
+
+        def load(self):
+            self.num_loads += 1
+            raise ImportError("broken backend")
+
+    broken = BrokenEntryPoint()
+    entry_points = {**attention_backends._entry_points(), "broken": broken}
+    monkeypatch.setattr(attention_backends, "_entry_points", lambda: entry_points)
+    monkeypatch.setattr(attention_backends, "_REGISTRY", {})
+    monkeypatch.setattr(attention_backends, "_FAILED", {})
+
+    assert get_attention_backend(backend="broken") is torch_sdpa
+    assert get_attention_backend(backend="broken") is torch_sdpa
+    assert broken.num_loads == 1
+    assert list(attention_backends._REGISTRY) == ["native"]
+    assert "broken" not in available_backends() and "native" in available_backends()
+    with pytest.raises(RuntimeError, match="broken backend"):
+        attention_backends._require_backend("broken")
+
+
+def test_backend_kwarg():
+    """Tests that an explicit backend name is not passed on to the backend."""
+    q, k, v = _random_qkv(SHAPES[1])
+    out = scaled_dot_product_attention(q, k, v, backend="native")
+    torch.testing.assert_close(out, scaled_dot_product_attention(q, k, v))
@@ -0,0 +1,113 @@
+import pytest
+import torch
+
+from lgatr.layers.linear import EquiLinear
+from lgatr.nets import LGATr
+from lgatr.primitives import config
+from lgatr.primitives.attention import concat_features, sdp_attention
+from lgatr.primitives.bilinear import geometric_product
+from lgatr.primitives.config import PrecisionPolicy, gatr_config
+from lgatr.primitives.invariants import abs_squared_norm
+from lgatr.primitives.normalization import equi_layer_norm
+from tests.helpers.networks import build_network, network_inputs
+
+
+@pytest.fixture
+def precision():
+    """Yields the global precision policy and restores the defaults afterwards."""
+    yield gatr_config.precision
+    gatr_config.precision = PrecisionPolicy()
+
+
+def _qkv(dtype=torch.float32):
+    q_mv, k_mv, v_mv = (torch.randn(2, 3, 5, 4, 16, dtype=dtype) for _ in range(3))
+    q_s, k_s, v_s = (torch.randn(2, 3, 5, 6, dtype=dtype) for _ in range(3))
+    return q_mv, k_mv, v_mv, q_s, k_s, v_s
+
+
+@pytest.mark.parametrize("category", ["linear", "bilinear", "norm", "attention"])
+def test_precision_policy_outside_autocast(precision, category):
+    """Tests that the policy has no effect outside of autocast regions."""
+    setattr(precision, category, torch.bfloat16)
+    assert precision.compute_dtype(category, torch.randn(3)) is None
+    with torch.autocast("cpu", dtype=torch.bfloat16, enabled=False):
+        assert precision.compute_dtype(category, torch.randn(3)) is None
+
+    with pytest.raises(ValueError):
+        precision.compute_dtype("softmax", torch.randn(3))
+
+
+def test_precision_policy_norm(precision):
+    """Tests that norms are computed in at least float32 under autocast."""
+    x = torch.randn(3, 5, 16)
+    with torch.autocast("cpu", dtype=torch.bfloat16):
+        assert abs_squared_norm(x.bfloat16()).dtype == torch.float32
+        assert equi_layer_norm(x.bfloat16()).dtype == torch.float32
+        assert abs_squared_norm(x.double()).dtype == torch.float64
+
+        precision.norm = None
+        assert abs_squared_norm(x.bfloat16()).dtype == torch.bfloat16
+
+
+@pytest.mark.parametrize("attention_dtype", [torch.float32, torch.bfloat16, None])
+def test_precision_policy_attention(precision, attention_dtype):
+    """Tests that the attention computes in the attention dtype of the policy."""
+    precision.attention = attention_dtype
+    inputs = _qkv(torch.bfloat16)
+    with torch.autocast("cpu", dtype=torch.bfloat16):
+        out_mv, out_s = sdp_attention(*inputs)
+    expected = torch.bfloat16 if attention_dtype is None else attention_dtype
+    assert out_mv.dtype == out_s.dtype == expected
+
+    out_mv, out_s = sdp_attention(*inputs)
+    assert out_mv.dtype == out_s.dtype == torch.bfloat16
+
+
+def test_precision_policy_linear_and_bilinear(precision):
+    """Tests that linear and bilinear operations can be kept in float32 under autocast."""
+    layer = EquiLinear(4, 3, in_s_channels=2, out_s_channels=5)
+    x, s = torch.randn(7, 4, 16), torch.randn(7, 2)
+    with torch.autocast("cpu", dtype=torch.bfloat16):
+        assert layer(x, s)[0].dtype == torch.bfloat16
+        assert geometric_product(x, x).dtype == torch.bfloat16
+
+        precision.linear = torch.float32
+        precision.bilinear = torch.float32
+        outputs_mv, outputs_s = layer(x, s)
+        assert outputs_mv.dtype == outputs_s.dtype == torch.float32
+        assert geometric_product(x.bfloat16(), x).dtype == torch.float32
+
+    expected_mv, expected_s = layer(x, s)
+    torch.testing.assert_close(outputs_mv, expected_mv)
+    torch.testing.assert_close(outputs_s, expected_s)
+
+
+def test_resolve_precision(precision, monkeypatch):
+    """Tests that the networks resolve the policy once per forward pass outside of autocast."""
+    net = build_network(LGATr)
+    args, kwargs = network_inputs(LGATr)
+    calls = []
+    is_autocast_enabled = config._is_autocast_enabled
+    monkeypatch.setattr(
+        config,
+        "_is_autocast_enabled",
+        lambda device_type: calls.append(device_type) or is_autocast_enabled(device_type),
+    )
+    expected_mv, _ = net(*args, **kwargs)
+    assert calls == ["cpu"]
+
+    precision.linear = torch.bfloat16
+    with torch.autocast("cpu", dtype=torch.bfloat16):
+        outputs_mv, _ = net(*args, **kwargs)
+    assert len(calls) > 2
+    assert outputs_mv.dtype == torch.bfloat16
+    torch.testing.assert_close(outputs_mv.float(), expected_mv, atol=0.5, rtol=0.1)
+    assert not getattr(config._resolved, "inactive", False)
+
+
+def test_concat_features_dtype():
+    """Tests that ``concat_features`` casts the features into the result dtype."""
+    x, y = torch.randn(2, 3, 4, dtype=torch.bfloat16), torch.randn(2, 3, 2, dtype=torch.float64)
+    out = concat_features([x, y], dtype=torch.float32)
+    assert out.dtype == torch.float32
+    torch.testing.assert_close(out, torch.cat([x.float(), y.float()], dim=-1))
@@ -0,0 +1,109 @@
+import pytest
+import torch
+from lloca.utils.rand_transforms import rand_lorentz
+from torch.nn.functional import scaled_dot_product_attention
+
+from lgatr.primitives import attention
+from lgatr.primitives.attention import pairwise_biased_attention
+from lgatr.primitives.pairwise import pairwise_bias, pairwise_bias_features
+from tests.helpers import BATCH_DIMS, TOLERANCES
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("num_items,num_heads", [(5, 3)])
+def test_pairwise_bias_invariance(batch_dims, num_items, num_heads):
+    """Tests that the pairwise bias is invariant under Lorentz transformations."""
+    vectors = torch.randn(*batch_dims, num_items, 4, dtype=torch.float64)
+    scale = torch.randn(num_heads, dtype=torch.float64)
+    trafo = rand_lorentz((1,) * (len(batch_dims) + 1), dtype=torch.float64)
+    vectors_transformed = torch.einsum("...ij,...j->...i", trafo, vectors)
+
+    features = pairwise_bias_features(vectors)
+    features_transformed = pairwise_bias_features(vectors_transformed)
+    bias = pairwise_bias(features, features, scale)
+    bias_transformed = pairwise_bias(features_transformed, features_transformed, scale)
+
+    assert bias.shape == (*batch_dims, num_heads, num_items, num_items)
+    torch.testing.assert_close(bias, bias_transformed, **TOLERANCES)
+
+    # explicit invariant mass of the pairs
+    pair = vectors[..., :, None, :] + vectors[..., None, :, :]
+    m2 = pair[..., 0] ** 2 - (pair[..., 1:] ** 2).sum(dim=-1)
+    expected = scale[:, None, None] * torch.log1p(m2.abs()).unsqueeze(-3)
+    torch.testing.assert_close(bias, expected)
+
+
+@pytest.mark.parametrize("batch_dims", BATCH_DIMS)
+@pytest.mark.parametrize("num_items,num_heads,channels", [(11, 4, 8)])
+@pytest.mark.parametrize("chunk_size", [1024, 4])
+@pytest.mark.parametrize("use_mask", [False, True])
+def test_pairwise_attention_native(
+    batch_dims, num_items, num_heads, channels, chunk_size, use_mask
+):
+    """Tests the chunked pairwise-bias attention against a materialized attention mask."""
+    query, key, value = (torch.randn(*batch_dims, num_heads, num_items, channels) for _ in range(3))
+    features = pairwise_bias_features(torch.randn(*batch_dims, num_items, 4))
+    scale = torch.randn(num_heads)
+
+    bias = pairwise_bias(features, features, scale)
+    attn_kwargs = {}
+    if use_mask:
+        mask = torch.rand(*batch_dims, 1, num_items, num_items) > 0.5
+        mask[..., 0] = True
+        bias = bias.masked_fill(~mask, float("-inf"))
+        attn_kwargs["attn_mask"] = mask
+    expected = scaled_dot_product_attention(query, key, value, attn_mask=bias)
+
+    out = pairwise_biased_attention(
+        query, key, value, features, scale, chunk_size=chunk_size, **attn_kwargs
+    )
+    torch.testing.assert_close(out, expected, **TOLERANCES)
+
+
+@pytest.mark.parametrize("batch_size,num_items,num_heads,channels", [(3, 11, 4, 8)])
+def test_pairwise_attention_flex(batch_size, num_items, num_heads, channels):
+    """Tests the flex_attention score_mod against a materialized attention mask."""
+    pytest.importorskip("torch.nn.attention.flex_attention")
+    query, key, value = (torch.randn(batch_size, num_heads, num_items, channels) for _ in range(3))
+    features = pairwise_bias_features(torch.randn(batch_size, num_items, 4))
+    scale = torch.randn(num_heads)
+
+    expected = scaled_dot_product_attention(
+        query, key, value, attn_mask=pairwise_bias(features, features, scale)
+    )
+    out = pairwise_biased_attention(
+        query, key, value, features, scale, score_mod=lambda score, b, h, q_idx, kv_idx: score
+    )
+    torch.testing.assert_close(out, expected, **TOLERANCES)
+
+
+@pytest.mark.parametrize("chunk_size", [512, 4])
+def test_pairwise_attention_tiles(chunk_size, monkeypatch):
+    """Tests that the bias is only evaluated on tiles and that the gradients are exact."""
+    num_heads, num_items = 2, 11
+    query, key, value = (
+        torch.randn(3, num_heads, num_items, 8, dtype=torch.float64, requires_grad=True)
+        for _ in range(3)
+    )
+    features = pairwise_bias_features(torch.randn(3, num_items, 4, dtype=torch.float64))
+    scale = torch.randn(num_heads, dtype=torch.float64, requires_grad=True)
+
+    expected = scaled_dot_product_attention(
+        query, key, value, attn_mask=pairwise_bias(features, features, scale)
+    )
+    grads_expected = torch.autograd.grad(expected.square().sum(), (query, key, value, scale))
+
+    tiles = []
+
+    def record_tile(features_q, features_k, scale):
+        tiles.append((features_q.shape[-2], features_k.shape[-2]))
+        return pairwise_bias(features_q, features_k, scale)
+
+    monkeypatch.setattr(attention, "pairwise_bias", record_tile)
+    out = pairwise_biased_attention(query, key, value, features, scale, chunk_size=chunk_size)
+    grads = torch.autograd.grad(out.square().sum(), (query, key, value, scale))
+
+    torch.testing.assert_close(out, expected)
+    for grad, grad_expected in zip(grads, grads_expected, strict=True):
+        torch.testing.assert_close(grad, grad_expected)
+    assert max(max(tile) for tile in tiles) == min(chunk_size, num_items)
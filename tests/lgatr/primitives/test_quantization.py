@@ -0,0 +1,58 @@
+import pytest
+import torch
+
+from lgatr.primitives.config import gatr_config
+from lgatr.primitives.quantization import (
+    dequantize_equi_linear_weight,
+    int8_linear,
+    quantize_equi_linear_weight,
+    quantize_per_channel,
+)
+
+
+def test_quantize_per_channel():
+    """Tests the rounding error and the memory layout of `quantize_per_channel`."""
+    weight = torch.randn(13, 7) * torch.logspace(-3, 1, 13)[:, None]
+    weight[3] = 0.0
+    qweight, scale = quantize_per_channel(weight)
+
+    assert qweight.dtype == torch.int8
+    assert qweight.shape == weight.shape
+    assert qweight.T.is_contiguous()
+    assert (qweight.abs().amax(dim=-1)[weight.abs().amax(dim=-1) > 0] == 127).all()
+    assert (qweight.float() * scale[:, None] - weight).abs().le(scale[:, None] / 2 + 1e-7).all()
+
+
+@pytest.mark.parametrize("batch_dims", [(5,), (3, 4)])
+@pytest.mark.parametrize("bias", [False, True])
+@pytest.mark.parametrize("dynamic_activations", [True, False])
+def test_int8_linear(batch_dims, bias, dynamic_activations):
+    """Tests that `int8_linear` approximates `torch.nn.functional.linear`."""
+    weight = torch.randn(6, 32)
+    bias = torch.randn(6) if bias else None
+    inputs = torch.randn(*batch_dims, 32)
+    qweight, scale = quantize_per_channel(weight)
+
+    outputs = int8_linear(inputs, qweight, scale, bias, dynamic_activations=dynamic_activations)
+    expected = torch.nn.functional.linear(inputs, weight, bias)
+    assert outputs.shape == expected.shape
+    assert (outputs - expected).norm() < 0.02 * expected.norm()
+
+
+@pytest.mark.parametrize("use_fully_connected_subgroup", [True, False])
+def test_quantize_equi_linear_weight(use_fully_connected_subgroup):
+    """Tests that the coefficients of an equivariant linear map are quantized with one scale per
+    output channel and basis element."""
+    gatr_config.use_fully_connected_subgroup = use_fully_connected_subgroup
+    num_elements = gatr_config.num_pin_linear_basis_elements
+    weight = torch.randn(4, 9, num_elements) * torch.logspace(-3, 0, num_elements)
+
+    qweight, scale = quantize_equi_linear_weight(weight)
+    assert qweight.dtype == torch.int8
+    assert qweight.shape == weight.shape
+    assert scale.shape == (4, num_elements)
+
+    dequantized = dequantize_equi_linear_weight(qweight, scale)
+    assert (dequantized - weight).abs().le(scale[:, None, :] / 2 + 1e-7).all()
+
+    gatr_config.use_fully_connected_subgroup = True
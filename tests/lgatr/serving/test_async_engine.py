@@ -0,0 +1,130 @@
+import asyncio
+import threading
+
+import pytest
+import torch
+
+from lgatr.nets import LGATr, LGATrSlim, optimize_for_inference
+from lgatr.serving import AsyncInferenceEngine
+from tests.helpers import MILD_TOLERANCES, StubModel, build_network, random_events
+
+
+class _BlockingModel(StubModel):
+    """Waits for ``release`` before evaluating a batch."""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def forward(self, x, scale=None, attn_mask=None, **attn_kwargs):
+        self.started.set()
+        self.release.wait(timeout=10)
+        return super().forward(x, scale, attn_mask, **attn_kwargs)
+
+
+@pytest.mark.parametrize("packing", ["padded", "varlen"])
+def test_async_engine_coalescing(packing):
+    """Tests that the events of one tick form one batch and reach the right tasks."""
+    model = StubModel()
+    lengths = [(3 * i) % 7 + 1 for i in range(20)]
+    events = random_events(lengths)
+
+    async def main():
+        async with AsyncInferenceEngine(model, packing=packing) as engine:
+            outputs = await asyncio.gather(*(engine.infer(event) for event in events))
+            # events of another signature and beyond the budgets are split into more batches
+            engine.max_events = 3
+            await asyncio.gather(*(engine.infer(event) for event in events[:4]))
+            await asyncio.gather(engine.infer(events[0]), engine.infer(torch.randn(2, 5)))
+        return outputs, engine.stats()
+
+    outputs, stats = asyncio.run(main())
+    for event, (out, _) in zip(events, outputs, strict=True):
+        torch.testing.assert_close(out, event.sum(dim=0, keepdim=True).expand_as(event))
+    assert stats["num_batches"] == 5 and stats["num_events"] == 26
+    assert stats["max_queue_depth"] == 20
+    assert stats["queue_depth"] == stats["num_running"] == 0
+    assert [shape[-1] for shape, _ in model.batches[-2:]] == [3, 5]
+
+
+def test_async_engine_cancellation():
+    """Tests that cancelled and timed-out events are not evaluated."""
+    model = _BlockingModel()
+
+    async def main():
+        engine = AsyncInferenceEngine(model, timeout=0.1)
+        first = asyncio.ensure_future(engine.infer(torch.randn(2, 3)))
+        while not model.started.is_set():
+            await asyncio.sleep(1e-3)
+        # waits for the running batch and is cancelled before it starts
+        second = asyncio.ensure_future(engine.infer(torch.randn(4, 3)))
+        await asyncio.sleep(0.01)
+        assert engine.stats()["queue_depth"] == 1 and engine.stats()["num_running"] == 1
+        second.cancel()
+        with pytest.raises(asyncio.TimeoutError):
+            await first
+        model.release.set()
+        await engine.aclose()
+        assert second.cancelled()
+        with pytest.raises(RuntimeError):
+            await engine.infer(torch.randn(2, 3))
+        return engine.stats()
+
+    stats = asyncio.run(main())
+    assert stats["num_timeouts"] == 1 and stats["num_cancelled"] == 1
+    assert [shape for shape, _ in model.batches] == [(1, 2, 3)]
+
+
+def test_async_engine_errors():
+    """Tests that exceptions of the network and invalid events reach the awaiting tasks."""
+
+    def fail(x, attn_mask=None):
+        raise RuntimeError("model failure")
+
+    model = StubModel()
+    model.forward = fail
+
+    async def main():
+        async with AsyncInferenceEngine(model) as engine:
+            with pytest.raises(RuntimeError, match="model failure"):
+                await engine.infer(torch.randn(3, 2))
+            with pytest.raises(ValueError):
+                await engine.infer(torch.randn(3, 2), torch.randn(4, 2))
+            # the engine continues with later events
+            model.forward = StubModel().forward
+            out, _ = await engine.infer(torch.ones(3, 2))
+        return out
+
+    torch.testing.assert_close(asyncio.run(main()), torch.full((3, 2), 3.0))
+    with pytest.raises(ValueError):
+        AsyncInferenceEngine(model, packing="ragged")
+
+
+@pytest.mark.parametrize("net_class", [LGATr, LGATrSlim])
+def test_async_engine_networks(net_class):
+    """Tests that batched events reproduce the outputs of single events."""
+    net = optimize_for_inference(build_network(net_class))
+    lengths = [3, 6, 1, 4]
+    if net_class is LGATr:
+        events = [(torch.randn(n, 2, 16),) for n in lengths]
+        kwargs = [dict(scalars=torch.randn(n, 3)) for n in lengths]
+    else:
+        events = [(torch.randn(n, 2, 4), torch.randn(n, 3)) for n in lengths]
+        kwargs = [{} for _ in lengths]
+
+    async def main():
+        async with AsyncInferenceEngine(net, packing="varlen") as engine:
+            outputs = await asyncio.gather(
+                *(engine.infer(*a, **k) for a, k in zip(events, kwargs, strict=True))
+            )
+        assert engine.stats()["num_batches"] == 1
+        return outputs
+
+    for args, kw, outs in zip(events, kwargs, asyncio.run(main()), strict=True):
+        with torch.no_grad():
+            expected = net(
+                *(arg.unsqueeze(0) for arg in args), **{k: v.unsqueeze(0) for k, v in kw.items()}
+            )
+        for out, exp in zip(outs, expected, strict=True):
+            torch.testing.assert_close(out, exp[0], **MILD_TOLERANCES)
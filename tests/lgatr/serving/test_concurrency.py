@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import torch
+
+from lgatr.nets import LGATr, LGATrSlim, optimize_for_inference
+from lgatr.primitives.bilinear import _load_geometric_product_tensor
+from lgatr.primitives.invariants import _load_inner_product_factors, _load_metric_grades
+from lgatr.primitives.linear import (
+    _compute_grade_involution,
+    _compute_pin_equi_linear_basis,
+    _compute_reversal,
+)
+from lgatr.utils.einsum import _get_cached_path_for_equation_and_shapes
+from tests.helpers import build_network, network_inputs
+
+NUM_THREADS = 16
+LOADERS = [
+    _load_geometric_product_tensor,
+    _load_inner_product_factors,
+    _load_metric_grades,
+    _compute_grade_involution,
+    _compute_pin_equi_linear_basis,
+    _compute_reversal,
+    _get_cached_path_for_equation_and_shapes,
+]
+
+
+@pytest.mark.parametrize("net_class,optimize", [(LGATr, False), (LGATr, True), (LGATrSlim, False)])
+def test_concurrent_inference(net_class, optimize):
+    """Tests that many threads evaluating one network get the single-threaded outputs."""
+    model = build_network(net_class, channels=8).eval()
+    if optimize:
+        model = optimize_for_inference(model)
+    batches = [
+        network_inputs(net_class, batch, items) for batch, items in [(2, 7), (1, 30), (3, 4)]
+    ]
+    with torch.no_grad():
+        expected = [model(*args, **kwargs) for args, kwargs in batches]
+
+    # the threads start with empty caches, such that they race for the first initialization
+    for loader in LOADERS:
+        loader.cache_clear()
+    barrier = threading.Barrier(NUM_THREADS)
+
+    def evaluate(index):
+        args, kwargs = batches[index % len(batches)]
+        barrier.wait()
+        with torch.inference_mode():
+            return model(*args, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=NUM_THREADS) as pool:
+        outputs = list(pool.map(evaluate, range(4 * NUM_THREADS)))
+    for index, output in enumerate(outputs):
+        for out, ref in zip(output, expected[index % len(batches)], strict=True):
+            torch.testing.assert_close(out, ref, rtol=0.0, atol=0.0)
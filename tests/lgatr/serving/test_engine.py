@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+import pytest
+import torch
+
+from lgatr.nets import LGATr, LGATrSlim, optimize_for_inference
+from lgatr.serving import InferenceEngine
+from tests.helpers import MILD_TOLERANCES, StubModel, build_network, random_events
+
+
+@pytest.mark.parametrize("packing", ["padded", "varlen"])
+def test_engine_many_producers(packing):
+    """Tests that events from many threads are coalesced and scattered to the right futures."""
+    model = StubModel()
+    lengths = [(3 * i) % 7 + 1 for i in range(64)]
+    events = random_events(lengths)
+    futures = [None] * len(events)
+
+    with InferenceEngine(model, max_tokens=64, max_latency=0.05, packing=packing) as engine:
+
+        def produce(indices):
+            for i in indices:
+                futures[i] = engine.submit(events[i], scale=torch.full((lengths[i], 1), 2.0))
+
+        threads = [threading.Thread(target=produce, args=(range(k, 64, 8),)) for k in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        outputs = [future.result(timeout=10) for future in futures]
+
+    for event, (out, out_scaled) in zip(events, outputs, strict=True):
+        expected = event.sum(dim=0, keepdim=True).expand_as(event)
+        torch.testing.assert_close(out, expected)
+        torch.testing.assert_close(out_scaled, 2 * expected)
+
+    stats = engine.stats()
+    assert stats["num_events"] == 64
+    assert stats["num_batches"] < 64
+    for shape, _ in model.batches:
+        cost = shape[0] * shape[1]
+        assert cost <= 64
+    if packing == "varlen":
+        assert stats["padding_efficiency"] == 1.0
+
+
+def test_engine_budgets():
+    """Tests the event limit, the separation of signatures and oversized events."""
+    model = StubModel()
+    with InferenceEngine(model, max_tokens=10, max_latency=0.05, max_events=2) as engine:
+        futures = [engine.submit(event) for event in random_events([2, 2, 2])]
+        futures.append(engine.submit(torch.randn(3, 5)))
+        futures.append(engine.submit(torch.randn(20, 5)))
+        outputs = [future.result(timeout=10) for future in futures]
+    assert [out.shape for out, _ in outputs[-2:]] == [(3, 5), (20, 5)]
+    assert all(scaled is None for _, scaled in outputs)
+    assert [shape for shape, _ in model.batches] == [(2, 2, 3), (1, 2, 3), (1, 3, 5), (1, 20, 5)]
+
+
+def test_engine_errors():
+    """Tests that exceptions reach the futures and that a closed engine rejects events."""
+
+    def fail(x, attn_mask=None):
+        raise RuntimeError("model failure")
+
+    model = StubModel()
+    model.forward = fail
+    engine = InferenceEngine(model, max_latency=0.01)
+    future = engine.submit(torch.randn(3, 2))
+    with pytest.raises(RuntimeError, match="model failure"):
+        future.result(timeout=10)
+    with pytest.raises(ValueError):
+        engine.submit(torch.randn(3, 2), torch.randn(4, 2))
+    engine.close()
+    with pytest.raises(RuntimeError):
+        engine.submit(torch.randn(3, 2))
+    with pytest.raises(ValueError):
+        InferenceEngine(model, packing="ragged")
+
+
+def test_engine_asyncio():
+    """Tests that asyncio tasks can await events."""
+    model = StubModel()
+    events = random_events([2, 5, 3])
+
+    async def main(engine):
+        return await asyncio.gather(*(engine.infer(event) for event in events))
+
+    with InferenceEngine(model, max_latency=0.05) as engine:
+        outputs = asyncio.run(main(engine))
+    for event, (out, _) in zip(events, outputs, strict=True):
+        torch.testing.assert_close(out, event.sum(dim=0, keepdim=True).expand_as(event))
+
+
+@pytest.mark.parametrize("net_class", [LGATr, LGATrSlim])
+@pytest.mark.parametrize("packing", ["padded", "varlen"])
+def test_engine_networks(net_class, packing):
+    """Tests that batched events reproduce the outputs of single events."""
+    net = optimize_for_inference(build_network(net_class))
+    lengths = [3, 6, 1, 4]
+    if net_class is LGATr:
+        events = [(torch.randn(n, 2, 16),) for n in lengths]
+        kwargs = [dict(scalars=torch.randn(n, 3)) for n in lengths]
+    else:
+        events = [(torch.randn(n, 2, 4), torch.randn(n, 3)) for n in lengths]
+        kwargs = [{} for _ in lengths]
+
+    with InferenceEngine(net, max_latency=0.1, packing=packing) as engine:
+        futures = [engine.submit(*a, **k) for a, k in zip(events, kwargs, strict=True)]
+        outputs = [future.result(timeout=30) for future in futures]
+    assert engine.stats()["num_batches"] < len(lengths)
+
+    for args, kw, outs in zip(events, kwargs, outputs, strict=True):
+        with torch.no_grad():
+            expected = net(
+                *(arg.unsqueeze(0) for arg in args), **{k: v.unsqueeze(0) for k, v in kw.items()}
+            )
+        for out, exp in zip(outs, expected, strict=True):
+            torch.testing.assert_close(out, exp[0], **MILD_TOLERANCES)
@@ -0,0 +1,137 @@
+import pytest
+import torch
+
+from lgatr.nets import LGATrSlim
+from lgatr.serving import OOMSplitter, find_max_tokens, is_out_of_memory
+from lgatr.utils.batching import pack_events, unpack_events
+from tests.helpers import MILD_TOLERANCES, StubModel, random_events
+
+
+class _LimitedModel(StubModel):
+    """Raises an out-of-memory error for batches with more than ``max_tokens`` (padded) items."""
+
+    def __init__(self, max_tokens):
+        super().__init__()
+        self.max_tokens = max_tokens
+
+    def forward(self, x, scale=None, attn_mask=None, **attn_kwargs):
+        if x.shape[0] * x.shape[1] > self.max_tokens:
+            self.batches.append((tuple(x.shape), None))
+            raise torch.OutOfMemoryError("CUDA out of memory. Tried to allocate 1.00 GiB")
+        return super().forward(x, scale, attn_mask, **attn_kwargs)
+
+
+def test_is_out_of_memory():
+    """Tests the detection of CUDA and host allocation failures."""
+    assert is_out_of_memory(torch.OutOfMemoryError("CUDA out of memory"))
+    assert is_out_of_memory(RuntimeError("DefaultCPUAllocator: can't allocate memory"))
+    assert not is_out_of_memory(RuntimeError("shape mismatch"))
+    assert not is_out_of_memory(ValueError("out of memory"))
+
+
+def test_oom_splitter():
+    """Tests that batches that run out of memory are split at event boundaries."""
+    lengths = [5, 40, 3, 8, 8, 1, 20, 2]
+    events = random_events(lengths)
+    x, scale = pack_events(events), torch.full((1, sum(lengths), 1), 2.0)
+
+    splitter = OOMSplitter(_LimitedModel(max_tokens=40), backend="native", packing="varlen")
+    out, out_scaled = splitter(x, scale=scale, lengths=torch.tensor(lengths))
+    assert splitter.num_batches == 1 and splitter.num_splits > 0
+    assert out.shape == x.shape
+    for event, event_out, event_scaled in zip(
+        events, unpack_events(out, lengths), unpack_events(out_scaled, lengths), strict=True
+    ):
+        expected = event.sum(dim=0, keepdim=True).expand_as(event)
+        torch.testing.assert_close(event_out, expected)
+        torch.testing.assert_close(event_scaled, 2 * expected)
+    # the evaluated parts consist of complete, consecutive events
+    parts = [shape[1] for shape, mask in splitter.model.batches if mask is not None]
+    boundaries = {sum(lengths[:i]) for i in range(len(lengths) + 1)}
+    assert sum(parts) == sum(lengths) and max(parts) <= 40
+    assert all(sum(parts[:i]) in boundaries for i in range(len(parts)))
+
+    # batches that fit are evaluated at once, padded on CPU by default
+    splitter = OOMSplitter(_LimitedModel(max_tokens=400))
+    torch.testing.assert_close(splitter(x, scale=scale, lengths=lengths)[0], out)
+    assert splitter.num_splits == 0
+    assert splitter.model.batches == [((len(lengths), max(lengths), 3), True)]
+
+    # padded parts are split by their number of items after padding
+    splitter = OOMSplitter(_LimitedModel(max_tokens=90), packing="padded")
+    torch.testing.assert_close(splitter(x, scale=scale, lengths=lengths)[1], out_scaled)
+    assert splitter.num_splits > 0
+
+    # single events that do not fit and other errors, e.g. inconsistent lengths, are raised
+    with pytest.raises(torch.OutOfMemoryError):
+        OOMSplitter(_LimitedModel(max_tokens=30))(x, lengths=lengths)
+    with pytest.raises(RuntimeError):
+        OOMSplitter(_LimitedModel(max_tokens=200))(x, lengths=[1, 2])
+
+
+@pytest.mark.parametrize("packing", ["padded", "varlen"])
+def test_find_max_tokens_out_of_memory(packing):
+    """Tests the search for the token budget against a model with a known budget."""
+    model = _LimitedModel(max_tokens=1000)
+    event = ((torch.randn(7, 3),), dict(scale=torch.ones(7, 1)))
+    lengths = [10, 30, 20, 5]
+    budget = find_max_tokens(
+        model, event, lengths, packing=packing, memory_limit=2**30, tolerance=0.0
+    )
+    if packing == "padded":
+        assert budget["max_tokens"] == 990 and budget["max_events"] == 33
+    else:
+        # 15 times the events from the longest to the shortest, and a truncated longest event
+        assert budget["max_tokens"] == 1000 and budget["max_events"] == 15 * 4 + 1
+    assert 0 < budget["peak_memory"] <= budget["memory_limit"] == 2**30
+
+    with pytest.raises(ValueError):
+        find_max_tokens(_LimitedModel(max_tokens=20), event, lengths, packing=packing)
+    with pytest.raises(ValueError):
+        find_max_tokens(model, event, lengths, packing="ragged")
+
+
+def test_find_max_tokens_memory_limit():
+    """Tests that the largest batch of a network fits into the memory limit."""
+    torch.manual_seed(0)
+    model = LGATrSlim(
+        in_v_channels=1,
+        out_v_channels=1,
+        hidden_v_channels=8,
+        in_s_channels=2,
+        out_s_channels=1,
+        hidden_s_channels=8,
+        num_blocks=1,
+        num_heads=2,
+    ).eval()
+    event = ((torch.randn(10, 1, 4), torch.randn(10, 2)), {})
+    lengths = [10, 25, 40]
+    small = find_max_tokens(model, event, lengths, memory_limit=2**21)
+    large = find_max_tokens(model, event, lengths, memory_limit=2**23)
+    assert small["peak_memory"] <= 2**21 < large["peak_memory"] <= 2**23
+    assert 40 <= small["max_tokens"] < large["max_tokens"]
+
+    # splitting reproduces the outputs of the full batch
+    lengths = [12, 30, 7]
+    events = [(torch.randn(n, 1, 4), torch.randn(n, 2)) for n in lengths]
+    vectors, scalars = (pack_events(tensors) for tensors in zip(*events, strict=True))
+    out_v, out_s = OOMSplitter(model)(vectors, scalars, lengths=lengths)
+    for (v, s), event_v, event_s in zip(
+        events, unpack_events(out_v, lengths), unpack_events(out_s, lengths), strict=True
+    ):
+        with torch.no_grad():
+            expected_v, expected_s = model(v[None], s[None])
+        torch.testing.assert_close(event_v, expected_v[0], **MILD_TOLERANCES)
+        torch.testing.assert_close(event_s, expected_s[0], **MILD_TOLERANCES)
+
+
+def test_find_max_tokens_unknown_free_memory(monkeypatch):
+    """Tests that an explicit memory limit is required where the free host memory is unknown."""
+
+    def sysconf(name):
+        raise ValueError(f"unrecognized configuration name {name}")
+
+    monkeypatch.setattr("os.sysconf", sysconf)
+    event = ((torch.randn(7, 3),), dict(scale=torch.ones(7, 1)))
+    with pytest.raises(ValueError, match="memory_limit"):
+        find_max_tokens(_LimitedModel(max_tokens=1000), event, [10, 30])
@@ -0,0 +1,151 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import torch
+
+from lgatr.data import write_events
+from lgatr.interface import embed_vector
+from lgatr.primitives.config import gatr_config
+from lgatr.serving import event_files, load_model, run_inference
+from lgatr.serving.__main__ import main
+from tests.helpers import MILD_TOLERANCES
+
+LENGTHS = [[3, 1, 5, 2, 4, 6, 2, 7], [4, 4, 2]]
+CONFIGS = dict(
+    LGATr=dict(
+        net="LGATr",
+        num_blocks=1,
+        in_mv_channels=1,
+        out_mv_channels=2,
+        hidden_mv_channels=4,
+        in_s_channels=3,
+        out_s_channels=1,
+        hidden_s_channels=4,
+        attention=dict(num_heads=2),
+        mlp=dict(),
+    ),
+    LGATrSlim=dict(
+        net="LGATrSlim",
+        num_blocks=1,
+        in_v_channels=1,
+        out_v_channels=2,
+        hidden_v_channels=4,
+        in_s_channels=3,
+        out_s_channels=1,
+        hidden_s_channels=4,
+        num_heads=2,
+    ),
+)
+
+
+@pytest.fixture
+def files(tmp_path):
+    """Writes a memory-mapped event directory and a .npz archive of random events."""
+    rng = np.random.default_rng(0)
+    events = []
+    for name, lengths in zip(["a", "b.npz"], LENGTHS, strict=True):
+        vectors = [rng.normal(size=(n, 4)).astype(np.float32) for n in lengths]
+        scalars = [rng.normal(size=(n, 3)).astype(np.float32) for n in lengths]
+        write_events(str(tmp_path / "events" / name), vectors, scalars)
+        events.append(list(zip(vectors, scalars, strict=True)))
+    return str(tmp_path / "events"), events
+
+
+def _expected(model, vector, scalar):
+    vector, scalar = torch.from_numpy(vector)[None, :, None], torch.from_numpy(scalar)[None]
+    with torch.no_grad():
+        if type(model).__name__ == "LGATr":
+            return model(embed_vector(vector), scalars=scalar)
+        return model(vector, scalar)
+
+
+@pytest.mark.parametrize("net", ["LGATr", "LGATrSlim"])
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_cli(files, tmp_path, net, num_workers):
+    """Tests that the command line interface writes the outputs of every item."""
+    path, events = files
+    # the command builds the network with the default configuration
+    gatr_config.use_geometric_product = True
+    torch.manual_seed(0)
+    model = load_model(CONFIGS[net], optimize=False)
+    torch.save(model.state_dict(), tmp_path / "weights.pt")
+    with open(tmp_path / "config.json", "w") as file:
+        json.dump(CONFIGS[net], file)
+    assert [os.path.basename(file) for file in event_files(path)] == ["a", "b.npz"]
+
+    output = str(tmp_path / "outputs")
+    argv = [path, output, "--config", str(tmp_path / "config.json")]
+    argv += ["--weights", str(tmp_path / "weights.pt"), "--max-tokens", "8"]
+    argv += ["--workers", str(num_workers), "--threads", "1"]
+    if num_workers == 0:
+        assert main(argv) == 0
+    else:
+        # forking the test process for the inference and data-loading workers can hang at exit
+        # after numba, which the equivariance helpers use, has started its threads
+        argv += ["--loader-workers", "1"]
+        process = subprocess.run(
+            [sys.executable, "-m", "lgatr.serving", *argv], check=True, capture_output=True
+        )
+        stdout = process.stdout.decode()
+        stats = json.loads(stdout[stdout.index("{") :])
+        assert stats["num_events"] == sum(map(len, LENGTHS))
+
+    names = ("multivectors", "scalars") if net == "LGATr" else ("vectors", "scalars")
+    for name, file_events in zip(["a", "b"], events, strict=True):
+        offsets = np.load(os.path.join(output, name, "offsets.npy"))
+        arrays = [np.load(os.path.join(output, name, f"{key}.npy")) for key in names]
+        for i, (vector, scalar) in enumerate(file_events):
+            for array, expected in zip(arrays, _expected(model, vector, scalar), strict=True):
+                actual = torch.from_numpy(array[offsets[i] : offsets[i + 1]])
+                torch.testing.assert_close(actual, expected[0], **MILD_TOLERANCES)
+
+
+def test_resume_and_pool(files, tmp_path):
+    """Tests pooling and that an interrupted run continues after the completed events."""
+    path, events = files
+    model = load_model(CONFIGS["LGATrSlim"])
+    output = str(tmp_path / "outputs")
+    stats = run_inference(model, path, output, max_tokens=8, pool="mean", checkpoint_every=1)
+    assert stats["num_files"] == 2 and stats["num_events"] == sum(map(len, LENGTHS))
+    assert stats["num_items"] == sum(map(sum, LENGTHS)) and stats["num_splits"] == 0
+
+    scalars = np.load(os.path.join(output, "a", "scalars.npy"))
+    assert scalars.shape == (len(LENGTHS[0]), 1)
+    for i, (vector, scalar) in enumerate(events[0]):
+        expected = _expected(model, vector, scalar)[1][0].mean(dim=0)
+        torch.testing.assert_close(torch.from_numpy(scalars[i]), expected, **MILD_TOLERANCES)
+
+    # completed files are skipped
+    assert run_inference(model, path, output, max_tokens=8, pool="mean")["num_files"] == 0
+
+    # interrupt the first file after 3 events
+    progress = os.path.join(output, "a", "progress.json")
+    with open(progress, "w") as file:
+        json.dump(dict(completed=3, num_events=len(LENGTHS[0])), file)
+    array = np.load(os.path.join(output, "a", "scalars.npy"), mmap_mode="r+")
+    array[3:] = 0.0
+    array.flush()
+    stats = run_inference(model, path, output, max_tokens=8, pool="mean")
+    assert stats["num_files"] == 1 and stats["num_events"] == len(LENGTHS[0]) - 3
+    np.testing.assert_allclose(np.load(os.path.join(output, "a", "scalars.npy")), scalars)
+    with open(progress) as file:
+        assert json.load(file)["completed"] == len(LENGTHS[0])
+
+    with pytest.raises(ValueError):
+        run_inference(model, path, output, pool="max")
+
+    # packed batches with a dense mask agree with the default padded batches on CPU
+    packed = str(tmp_path / "packed")
+    stats = run_inference(
+        model, path, packed, max_tokens=8, packing="varlen", backend="native", pool="mean"
+    )
+    assert stats["num_events"] == sum(map(len, LENGTHS))
+    torch.testing.assert_close(
+        torch.from_numpy(np.load(os.path.join(packed, "a", "scalars.npy"))),
+        torch.from_numpy(scalars),
+        **MILD_TOLERANCES,
+    )
@@ -0,0 +1,55 @@
+import pytest
+import torch
+
+from lgatr.nets import LGATr, LGATrSlim, optimize_for_inference
+from lgatr.serving import ShardedInference, sharding_report
+from tests.helpers import MILD_TOLERANCES, build_network, network_inputs
+
+# forking the test process can hang at exit after numba, which the equivariance helpers use, has
+# started its threads
+START_METHOD = "forkserver"
+
+
+@pytest.mark.parametrize("net_class", [LGATr, LGATrSlim])
+def test_sharded_inference(net_class):
+    """Tests that the workers share the weights and return the outputs in order."""
+    model = build_network(net_class, channels=8).eval()
+    if net_class is LGATr:
+        model = optimize_for_inference(model)
+    batches = [
+        network_inputs(net_class, batch, items) for batch, items in [(3, 5), (1, 40), (2, 9)]
+    ]
+    batches = 3 * batches
+    with torch.no_grad():
+        expected = [model(*args, **kwargs) for args, kwargs in batches]
+
+    with ShardedInference(
+        model, num_processes=2, max_pending=3, start_method=START_METHOD
+    ) as runner:
+        assert all(tensor.is_shared() for tensor in model.state_dict().values())
+        outputs = list(runner.map(batches))
+        for output, reference in zip(outputs, expected, strict=True):
+            for out, ref in zip(output, reference, strict=True):
+                torch.testing.assert_close(out, ref, **MILD_TOLERANCES)
+
+        # abandoned iterations and failing batches do not affect later calls
+        next(runner.map(batches))
+        with pytest.raises(RuntimeError, match="failed in a worker process"):
+            list(runner.map([((torch.randn(2, 3),), {})]))
+        outputs = list(runner.map(batches[:2]))
+        torch.testing.assert_close(outputs[1][0], expected[1][0], **MILD_TOLERANCES)
+
+    with pytest.raises(RuntimeError):
+        list(runner.map(batches))
+
+
+def test_sharding_report():
+    """Tests the throughput comparison with a single process."""
+    model = build_network(LGATrSlim, channels=8).eval()
+    batches = [network_inputs(LGATrSlim, 2, 16) for _ in range(4)]
+    report = sharding_report(model, batches, num_processes=2, start_method=START_METHOD)
+    assert report["items_per_second"] > 0 and report["items_per_second_sharded"] > 0
+    assert report["speedup"] == pytest.approx(
+        report["items_per_second_sharded"] / report["items_per_second"]
+    )
+    assert report["max_abs_error"] < 1e-5
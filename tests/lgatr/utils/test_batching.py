@@ -0,0 +1,52 @@
+import pytest
+import torch
+
+from lgatr.utils.batching import (
+    event_offsets,
+    pack_events,
+    pad_events,
+    padding_mask,
+    unpack_events,
+    unpad_events,
+    varlen_attention_kwargs,
+)
+
+LENGTHS = [3, 1, 4]
+
+
+def test_pad_and_pack():
+    """Tests that padding and packing are inverted by unpadding and unpacking."""
+    events = [torch.randn(n, 2, 4) for n in LENGTHS]
+    padded = pad_events(events)
+    assert padded.shape == (3, 4, 2, 4)
+    assert (padded[1, 1:] == 0).all()
+    packed = pack_events(events)
+    assert packed.shape == (1, 8, 2, 4)
+    for unpacked in [unpad_events(padded, LENGTHS), unpack_events(packed, LENGTHS)]:
+        for event, event_unpacked in zip(events, unpacked, strict=True):
+            torch.testing.assert_close(event_unpacked, event)
+
+
+def test_masks():
+    """Tests the padding mask and the attention arguments of packed events."""
+    assert event_offsets(LENGTHS).tolist() == [0, 3, 4, 8]
+    mask = padding_mask(LENGTHS)
+    assert mask.shape == (3, 1, 1, 4)
+    assert mask.sum().item() == sum(LENGTHS)
+
+    attn_mask = varlen_attention_kwargs(LENGTHS)["attn_mask"]
+    assert attn_mask.shape == (1, 1, 8, 8)
+    assert attn_mask.sum().item() == sum(n**2 for n in LENGTHS)
+    assert not attn_mask[0, 0, 0, 3]
+
+    varlen = varlen_attention_kwargs(LENGTHS, backend="varlen")
+    assert varlen["cu_seq_q"].dtype == torch.int32
+    assert varlen["max_q"] == 4
+    assert set(varlen_attention_kwargs(LENGTHS, backend="flash")) == {
+        "cu_seqlens_q",
+        "cu_seqlens_k",
+        "max_seqlen_q",
+        "max_seqlen_k",
+    }
+    with pytest.raises(ValueError):
+        varlen_attention_kwargs(LENGTHS, backend="ragged")
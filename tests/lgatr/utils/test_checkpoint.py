@@ -0,0 +1,55 @@
+import pytest
+import torch
+
+from lgatr.nets import LGATr
+from lgatr.primitives.config import gatr_config
+from lgatr.utils.checkpoint import block_checkpoint_policies, resolve_checkpoint_policy
+from tests.helpers import NETWORKS, TOLERANCES, build_network, network_inputs
+
+POLICIES = [True, "block", "attention", "mlp", "selective"]
+
+
+@pytest.mark.parametrize("net_class", NETWORKS)
+@pytest.mark.parametrize("checkpoint_blocks", POLICIES)
+@pytest.mark.parametrize("checkpoint_every", [1, 2])
+def test_checkpoint_policies(net_class, checkpoint_blocks, checkpoint_every):
+    """Tests that all checkpointing policies reproduce outputs and gradients."""
+    args, kwargs = network_inputs(net_class)
+
+    grads = []
+    for policy in [False, checkpoint_blocks]:
+        net = build_network(
+            net_class, num_blocks=3, checkpoint_blocks=policy, checkpoint_every=checkpoint_every
+        )
+        outputs = net(*args, **kwargs)
+        loss = sum(out.square().sum() for out in outputs)
+        loss.backward()
+        grads.append([param.grad.clone() for param in net.parameters() if param.grad is not None])
+
+    assert len(grads[0]) == len(grads[1])
+    for grad, grad_checkpoint in zip(*grads, strict=True):
+        torch.testing.assert_close(grad, grad_checkpoint, **TOLERANCES)
+
+
+def test_selective_checkpoint_without_bivector(monkeypatch):
+    """Tests that the selective policy does not see in-place changes of saved outputs."""
+    monkeypatch.setattr(gatr_config, "use_bivector", False)
+    test_checkpoint_policies(LGATr, "selective", 1)
+
+
+def test_resolve_checkpoint_policy():
+    assert resolve_checkpoint_policy(False) is None
+    assert resolve_checkpoint_policy(True) == "block"
+    assert resolve_checkpoint_policy("mlp") == "mlp"
+    with pytest.raises(ValueError):
+        resolve_checkpoint_policy("everything")
+
+    assert block_checkpoint_policies("attention", 5, 2) == [
+        "attention",
+        None,
+        "attention",
+        None,
+        "attention",
+    ]
+    with pytest.raises(ValueError):
+        block_checkpoint_policies("block", 5, 0)
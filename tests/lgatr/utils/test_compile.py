@@ -0,0 +1,78 @@
+import os
+
+import pytest
+import torch
+from torch._dynamo.utils import counters
+
+from lgatr.nets import LGATrSlim
+from lgatr.utils.compile import CACHE_FILENAME, resolve_compile_scope, warmup
+from tests.helpers import MILD_TOLERANCES
+
+
+def test_resolve_compile_scope():
+    assert resolve_compile_scope(False) is None
+    assert resolve_compile_scope(True) == "full"
+    assert resolve_compile_scope("regional") == "regional"
+    with pytest.raises(ValueError):
+        resolve_compile_scope("everything")
+
+
+def test_regional_compile_warmup(tmp_path):
+    """Tests that regional compilation shares the compiled code across blocks and that
+    warmup stores the compiled artifacts."""
+    kwargs = dict(
+        in_v_channels=2,
+        out_v_channels=1,
+        hidden_v_channels=8,
+        in_s_channels=3,
+        out_s_channels=2,
+        hidden_s_channels=8,
+        num_blocks=6,
+        num_heads=2,
+    )
+    torch.manual_seed(0)
+    net = LGATrSlim(**kwargs).eval()
+    torch.manual_seed(0)
+    net_compiled = LGATrSlim(**kwargs, compile="regional").eval()
+
+    buckets = [(torch.randn(2, n, 2, 4), torch.randn(2, n, 3)) for n in [4, 7]]
+    torch._dynamo.reset()
+    counters.clear()
+    warmup(net_compiled, buckets, cache_dir=str(tmp_path))
+
+    # compiling each block separately would create at least one graph per block
+    assert counters["stats"]["unique_graphs"] < kwargs["num_blocks"]
+    assert os.path.exists(tmp_path / CACHE_FILENAME)
+
+    with torch.no_grad():
+        for vectors, scalars in buckets:
+            outputs = net(vectors, scalars)
+            outputs_compiled = net_compiled(vectors, scalars)
+            for out, out_compiled in zip(outputs, outputs_compiled, strict=True):
+                torch.testing.assert_close(out_compiled, out, **MILD_TOLERANCES)
+
+
+def test_regional_compile_single_graph():
+    """Tests that the blocks of a regionally compiled network share a graph, such that the
+    number of graphs does not grow with the depth."""
+    kwargs = dict(
+        in_v_channels=2,
+        out_v_channels=1,
+        hidden_v_channels=8,
+        in_s_channels=3,
+        out_s_channels=2,
+        hidden_s_channels=8,
+        num_heads=2,
+    )
+    vectors, scalars = torch.randn(2, 5, 2, 4), torch.randn(2, 5, 3)
+    num_graphs = {}
+    for num_blocks in [2, 6]:
+        net = LGATrSlim(**kwargs, num_blocks=num_blocks, compile="regional").eval()
+        torch._dynamo.reset()
+        counters.clear()
+        with torch.no_grad():
+            net(vectors, scalars)
+        num_graphs[num_blocks] = counters["stats"]["unique_graphs"]
+
+    # the first block gets its own graph, because its inputs are views of the input layer
+    assert num_graphs[6] == num_graphs[2] <= 2
@@ -1,8 +1,19 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import pytest
 import torch
 from torch import Tensor
 
-from lgatr.utils.misc import minimum_autocast_precision
+from lgatr.primitives.bilinear import _load_geometric_product_tensor, geometric_product
+from lgatr.utils.misc import (
+    compile_constant,
+    locked_cache,
+    mark_compile_constants,
+    minimum_autocast_precision,
+)
 
 
 # Choose dtypes to work on most devices -- torch.bfloat16 is not available on some GPUs
@@ -85,3 +96,83 @@ def test_minimum_autocast_precision_outputs(
     with torch.autocast(device, amp_dtype, enabled=True):
         outputs = sum_(*inputs)
     assert outputs.dtype == expected_dtype
+
+
+def test_minimum_autocast_precision_selection(device="cpu", amp_dtype=torch.bfloat16):
+    """Tests that arguments outside of which_args/which_kwargs are passed through unchanged,
+    and that tuple outputs are cast."""
+
+    @minimum_autocast_precision(torch.float32, output="low", which_args=[1], which_kwargs=["c"])
+    def return_dtypes(a, b, c=None, d=None):
+        return a, b, c, d
+
+    inputs = [torch.randn(3, device=device, dtype=amp_dtype) for _ in range(4)]
+    with torch.autocast(device, amp_dtype, enabled=True):
+        outputs = return_dtypes(inputs[0], inputs[1], c=inputs[2], d=inputs[3])
+
+    assert isinstance(outputs, tuple)
+    assert len(outputs) == 4
+    for out in outputs:
+        assert out.dtype == amp_dtype
+
+    @minimum_autocast_precision(torch.float32, which_args=[1], which_kwargs=["c"])
+    def return_input_dtypes(a, b, c=None, d=None):
+        return a.dtype, b.dtype, c.dtype, d.dtype
+
+    with torch.autocast(device, amp_dtype, enabled=True):
+        dtypes = return_input_dtypes(inputs[0], inputs[1], c=inputs[2], d=inputs[3])
+    assert dtypes == (amp_dtype, torch.float32, torch.float32, amp_dtype)
+
+
+def test_compile_constant_inference_mode():
+    """Tests that constants first cached in inference mode can be used for training."""
+
+    @compile_constant
+    @lru_cache
+    def constant(device="cpu"):
+        return torch.arange(4.0, device=device)
+
+    with torch.inference_mode():
+        assert not constant().is_inference()
+    x = torch.ones(4, requires_grad=True)
+    (constant() * x).sum().backward()
+    torch.testing.assert_close(x.grad, constant())
+
+
+def test_locked_cache():
+    """Tests that concurrent calls compute each result once, also for recursive functions."""
+    calls = []
+    barrier = threading.Barrier(8)
+
+    @locked_cache
+    def square(x, offset=0):
+        calls.append(x)
+        time.sleep(0.01)
+        if x > 0:
+            square(x - 1)
+        return x**2 + offset
+
+    def call(x):
+        barrier.wait()
+        return square(x)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(call, [3, 2, 3, 1, 3, 2, 0, 3]))
+    assert results == [9, 4, 9, 1, 9, 4, 0, 9]
+    assert sorted(calls) == [0, 1, 2, 3]
+    assert square(2, offset=1) == 5 and square(2) == 4
+    assert len(calls) == 5
+
+    square.cache_clear()
+    assert square(0) == 0 and len(calls) == 6
+
+
+@pytest.mark.parametrize("dtype", [torch.float32, torch.float64])
+def test_compile_constant_marker(dtype):
+    """Tests that mark_compile_constants builds the constants before torch.compile reads them,
+    without graph breaks."""
+    _load_geometric_product_tensor.cache_clear()
+    mark_compile_constants()
+    x = torch.randn(3, 16, dtype=dtype)
+    compiled = torch.compile(geometric_product, fullgraph=True)
+    torch.testing.assert_close(compiled(x, x), geometric_product(x, x))
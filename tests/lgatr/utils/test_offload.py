@@ -0,0 +1,97 @@
+import gc
+import os
+
+import pytest
+import torch
+
+from lgatr.nets import LGATrSlim
+from lgatr.utils.offload import ActivationOffloader
+from tests.helpers import NETWORKS, TOLERANCES, build_network, network_inputs
+
+
+@pytest.mark.parametrize("net_class", NETWORKS)
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_offload_disk(net_class, prefetch, tmp_path):
+    """Tests that the disk store reproduces the gradients and cleans up its scratch files."""
+    args, kwargs = network_inputs(net_class, items=64)
+    offloader = ActivationOffloader(
+        "disk", directory=str(tmp_path), min_numel=16, prefetch=prefetch
+    )
+
+    grads = []
+    for offload in [False, offloader]:
+        net = build_network(net_class, num_blocks=3, offload_activations=offload)
+        outputs = net(*args, **kwargs)
+        if offload:
+            assert len(os.listdir(tmp_path)) > 0
+        loss = sum(out.square().sum() for out in outputs)
+        loss.backward()
+        del outputs, loss
+        grads.append([param.grad.clone() for param in net.parameters() if param.grad is not None])
+
+    assert len(os.listdir(tmp_path)) == 0
+    assert len(grads[0]) == len(grads[1])
+    for grad, grad_offload in zip(*grads, strict=True):
+        torch.testing.assert_close(grad, grad_offload, **TOLERANCES)
+
+
+@pytest.mark.parametrize("store", ["cpu", "disk"])
+def test_offload_storage_dtype(store, tmp_path):
+    """Tests low-precision storage of the saved activations."""
+    args, kwargs = network_inputs(LGATrSlim, items=64)
+    offloader = ActivationOffloader(
+        store, directory=str(tmp_path), storage_dtype=torch.bfloat16, min_numel=16
+    )
+
+    grads = []
+    for offload in [False, offloader]:
+        net = build_network(LGATrSlim, num_blocks=3, offload_activations=offload)
+        outputs = net(*args, **kwargs)
+        loss = sum(out.square().sum() for out in outputs)
+        loss.backward()
+        grads.append(torch.cat([param.grad.flatten() for param in net.parameters()]))
+
+    # bfloat16 storage makes the gradients approximate
+    torch.testing.assert_close(grads[0], grads[1], rtol=0.1, atol=0.1 * grads[0].abs().max())
+
+
+def test_offload_arguments():
+    net = LGATrSlim(
+        in_v_channels=1,
+        out_v_channels=1,
+        hidden_v_channels=4,
+        in_s_channels=1,
+        out_s_channels=1,
+        hidden_s_channels=4,
+        num_blocks=1,
+        num_heads=1,
+        offload_activations="disk",
+    )
+    assert net._offloader.store == "disk"
+    with pytest.raises(ValueError):
+        ActivationOffloader("gpu")
+
+
+def test_offload_temporary_directory():
+    """Tests that the temporary directory of the disk store is removed by close, at the end of a
+    with block and by garbage collection."""
+    args, kwargs = network_inputs(LGATrSlim, items=64)
+
+    def train_step(offloader):
+        net = build_network(LGATrSlim, offload_activations=offloader)
+        outputs = net(*args, **kwargs)
+        sum(out.square().sum() for out in outputs).backward()
+        return offloader.directory
+
+    with ActivationOffloader("disk", min_numel=16) as offloader:
+        directory = train_step(offloader)
+        assert os.path.isdir(directory)
+    assert not os.path.exists(directory) and offloader.directory is None
+    assert os.path.isdir(train_step(offloader))
+    offloader.close()
+
+    offloader = ActivationOffloader("disk", min_numel=16)
+    directory = train_step(offloader)
+    del offloader
+    gc.collect()
+    assert not os.path.exists(directory)
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+import torch
+
+from lgatr.bench.cases import build_network, network_inputs
+from lgatr.primitives import normalization
+from lgatr.primitives.config import gatr_config
+from lgatr.primitives.normalization import equi_layer_norm
+from lgatr.utils import profiling
+from lgatr.utils.profiling import KINDS, LGATrProfiler
+
+
+@pytest.mark.parametrize("name", ["LGATr", "ConditionalLGATr", "LGATrSlim", "ConditionalLGATrSlim"])
+def test_profiler(name, tmp_path):
+    """Tests that blocks, layers and primitives are annotated and summarized."""
+    gatr_config.use_geometric_product = True
+    net = build_network(name, channels=8)
+    args, kwargs = network_inputs(name, batch=2, items=5)
+    with LGATrProfiler(net) as prof:
+        outputs = net(*args, **kwargs)
+        outputs[0].sum().backward()
+    assert profiling._NUM_ACTIVE == 0
+    assert not net.blocks[0]._forward_pre_hooks
+
+    rows = {row["name"]: row for row in prof.summary()}
+    assert rows["lgatr.blocks.0"]["calls"] == 1
+    attention = "selfattention" if name == "ConditionalLGATrSlim" else "attention"
+    assert rows[f"lgatr.blocks.1.{attention}"]["kind"] == "attention"
+    assert rows["lgatr.blocks.0.mlp"]["wall_time"] <= rows["lgatr.blocks.0"]["wall_time"]
+    if name in ("LGATr", "ConditionalLGATr"):
+        assert rows["lgatr.primitives.equi_linear"]["calls"] > 0
+        assert rows["lgatr.primitives.geometric_product"]["calls"] == 2
+    else:
+        assert rows["lgatr.primitives.scaled_dot_product_attention"]["calls"] > 0
+
+    kinds = {row["name"] for row in prof.summary(group_by="kind")}
+    assert kinds == set(KINDS)
+    assert f"lgatr.blocks.0.{attention}" in prof.table()
+
+    path = tmp_path / "trace.json"
+    prof.export_chrome_trace(str(path))
+    names = {event.get("name") for event in json.loads(path.read_text())["traceEvents"]}
+    assert "lgatr.blocks.0" in names
+
+    with pytest.raises(ValueError):
+        prof.summary(group_by="layer")
+
+
+def test_profiler_primitives():
+    """Tests that recursive primitives are annotated once and that nothing is recorded afterwards."""
+    x = torch.randn(3, 4, 16)
+    with LGATrProfiler() as prof, torch.autocast("cpu", dtype=torch.bfloat16):
+        # the primitives are annotated through a flag, not by replacing them
+        assert normalization.equi_layer_norm is equi_layer_norm
+        equi_layer_norm(x.bfloat16())
+    rows = {row["name"]: row for row in prof.summary()}
+    assert rows["lgatr.primitives.equi_layer_norm"]["calls"] == 1
+    assert rows["lgatr.primitives.abs_squared_norm"]["calls"] == 1
+
+    with torch.profiler.profile() as plain:
+        equi_layer_norm(x)
+    assert not any(event.name.startswith("lgatr.") for event in plain.events())